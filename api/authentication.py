@@ -0,0 +1,106 @@
+"""
+Authentication backends for the NCC School Management API.
+"""
+
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from common.cache import TTLCache
+from .tokens import (
+    VERSION_CLAIM, ACTIVE_CLAIM, STAFF_CLAIM, SUPERUSER_CLAIM, PERMISSIONS_CLAIM,
+    get_token_version, _stateless_setting
+)
+
+_user_cache = TTLCache("jwt_users", ttl=_stateless_setting("USER_CACHE_TTL", 60), max_size=1000)
+
+
+class ClaimsUser(TokenUser):
+    """
+    User built from validated token claims instead of the auth_user row.
+
+    Identity, activity and permission checks are answered from the token.
+    Any other attribute (email, first_name, ...) is read from the full user,
+    which is loaded once and kept in a short-lived in-process cache.
+    """
+
+    @property
+    def is_active(self):
+        return bool(self.token.get(ACTIVE_CLAIM, False))
+
+    @property
+    def is_staff(self):
+        return bool(self.token.get(STAFF_CLAIM, False))
+
+    @property
+    def is_superuser(self):
+        return bool(self.token.get(SUPERUSER_CLAIM, False))
+
+    def get_all_permissions(self, obj=None):
+        if not self.is_active:
+            return set()
+        return set(self.token.get(PERMISSIONS_CLAIM, []))
+
+    def has_perm(self, perm, obj=None):
+        if self.is_active and self.is_superuser:
+            return True
+        return perm in self.get_all_permissions(obj)
+
+    def has_perms(self, perm_list, obj=None):
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, module):
+        if self.is_active and self.is_superuser:
+            return True
+        return any(perm.startswith(f"{module}.") for perm in self.get_all_permissions())
+
+    def get_user(self):
+        """
+        Return the full user instance, loading it at most once per cache TTL.
+        """
+        key = (self.id, self.token.get(VERSION_CLAIM))
+        user = _user_cache.get(key)
+        if user is None:
+            user = get_user_model().objects.get(**{api_settings.USER_ID_FIELD: self.id})
+            _user_cache.set(key, user)
+        return user
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name == "token":
+            raise AttributeError(name)
+        return getattr(self.get_user(), name)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts token claims and skips the per-request user query.
+
+    Tokens are revoked by bumping the user's token version; the version check
+    is served from cache. Tokens issued without the stateless claims fall back
+    to the regular database lookup.
+    """
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        if not validated_token.get(ACTIVE_CLAIM, False):
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        if validated_token[VERSION_CLAIM] != get_token_version(user_id):
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+
+        return ClaimsUser(validated_token)
+
+
+def clear_user_cache():
+    """
+    Drop the in-process user cache.
+    """
+    _user_cache.clear()
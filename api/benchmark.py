@@ -0,0 +1,196 @@
+"""
+Scale benchmarks for the NCC School Management API.
+
+``seed`` fills the database with synthetic rows at a given scale and
+``run_benchmarks`` times list, retrieve, search, filter, ordering and create
+requests against every viewset registered in ``api.urls``. Results are plain
+dicts that ``compare`` can diff between runs to catch regressions. The
+``benchmark_api`` management command wires these together.
+"""
+
+import math
+import random
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from common.middleware import QueryCounter
+from crm.models import Lead
+from management.models import Contract
+from . import factories
+from .seeding import ScaleSeeder
+from .urls import router
+
+BENCHMARK_USERNAME = "benchmark"
+
+
+def seed(scale, batch_size=5000, seed_value=0, log=None):
+    """
+    Populate the database with a synthetic dataset of scale students.
+    """
+    return ScaleSeeder(scale, seed=seed_value, batch_size=batch_size, log=log).run()
+
+
+def percentile(values, fraction):
+    """
+    Return the nearest-rank percentile of values.
+    """
+    ordered = sorted(values)
+    index = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def _create_payload(viewset, rng):
+    """
+    Build a POST payload from an existing row, without read-only fields.
+    """
+    queryset = viewset.queryset.model.objects.all()
+    obj = queryset[rng.randrange(queryset.count())]
+    serializer = viewset.serializer_class(obj)
+    data = {
+        name: value
+        for name, value in serializer.data.items()
+        if not serializer.fields[name].read_only
+    }
+    if viewset.queryset.model is Contract:
+        # Contracts are unique per student and product.
+        data["student"] = factories.StudentFactory().pk
+    if viewset.queryset.model is Lead:
+        # Leads with a known email or phone are rejected as duplicates.
+        data["email"], data["phone"] = f"benchmark-{rng.getrandbits(64):x}@example.com", None
+    return data
+
+
+def _scenarios(prefix, viewset, rng):
+    """
+    Yield (name, method, request factory) tuples for one viewset.
+    """
+    model = viewset.queryset.model
+    base = f"/api/{prefix}/"
+    pks = list(model.objects.order_by("?").values_list("pk", flat=True)[:1000])
+    if not pks:
+        return
+
+    yield "list", "get", lambda: (base, None)
+    yield "retrieve", "get", lambda: (f"{base}{rng.choice(pks)}/", None)
+
+    search_fields = getattr(viewset, "search_fields", None)
+    if search_fields:
+        sample = model.objects.filter(pk=pks[0]).values_list(search_fields[0], flat=True).first() or "a"
+        term = str(sample)[:3]
+        yield "search", "get", lambda: (base, {"search": term})
+
+    filter_fields = getattr(viewset, "filterset_fields", None)
+    if filter_fields:
+        # A list of fields, or a dict of fields to their lookups.
+        field = next(iter(filter_fields))
+        lookups = filter_fields[field] if isinstance(filter_fields, dict) else ["exact"]
+        param = field if "exact" in lookups else f"{field}__{lookups[0]}"
+        values = list(model.objects.filter(pk__in=pks[:50]).values_list(field, flat=True))
+        yield f"filter:{param}", "get", lambda: (base, {param: rng.choice(values)})
+
+    for field in getattr(viewset, "ordering_fields", None) or []:
+        yield f"ordering:{field}", "get", lambda field=field: (base, {"ordering": f"-{field}"})
+
+    # Read-only viewsets would only answer 405.
+    if hasattr(viewset, "create"):
+        yield "create", "post", lambda: (base, _create_payload(viewset, rng))
+
+
+def _measure(client, method, request, iterations, warmup):
+    """
+    Time a request repeatedly and return latency, query and memory figures.
+    """
+    latencies, queries, errors = [], [], 0
+    for i in range(warmup + iterations):
+        url, data = request()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data, format="json" if method == "post" else None)
+            elapsed = time.perf_counter() - start
+        if i < warmup:
+            continue
+        latencies.append(elapsed)
+        queries.append(counter.count)
+        errors += response.status_code >= 400
+
+    url, data = request()
+    tracemalloc.start()
+    try:
+        getattr(client, method)(url, data, format="json" if method == "post" else None)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "queries": max(queries),
+        "peak_memory_kb": round(peak / 1024, 1),
+        "errors": errors,
+    }
+
+
+def run_benchmarks(iterations=20, warmup=2, seed_value=0, only=None, log=None):
+    """
+    Benchmark every registered viewset and return {"<prefix>.<scenario>": figures}.
+    """
+    rng = random.Random(seed_value)
+    log = log or (lambda message: None)
+    user, _ = get_user_model().objects.get_or_create(
+        username=BENCHMARK_USERNAME, defaults={"is_staff": True, "is_superuser": True}
+    )
+    client = APIClient()
+    client.force_authenticate(user)
+
+    rest_framework = {
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {scope: None for scope in settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]},
+    }
+    results = {}
+    with override_settings(REST_FRAMEWORK=rest_framework, PERFORMANCE_INSTRUMENTATION={"SAMPLE_RATE": 0.0}):
+        for prefix, viewset, _ in router.registry:
+            if only and prefix not in only:
+                continue
+            for name, method, request in _scenarios(prefix, viewset, rng):
+                key = f"{prefix}.{name}"
+                results[key] = _measure(client, method, request, iterations, warmup)
+                log(f"{key}: p95 {results[key]['p95_ms']} ms, {results[key]['queries']} queries")
+    return results
+
+
+def compare(baseline, current, threshold=0.2, min_delta_ms=1.0):
+    """
+    Return regressions of current against baseline.
+
+    A scenario regresses when its p95 latency grows by more than threshold
+    (and by at least min_delta_ms, to ignore noise on fast endpoints) or when
+    it issues more queries than before.
+    """
+    regressions = []
+    for scale, scenarios in current.get("results", {}).items():
+        previous = baseline.get("results", {}).get(scale, {})
+        for key, figures in sorted(scenarios.items()):
+            before = previous.get(key)
+            if before is None:
+                continue
+            slower = (
+                figures["p95_ms"] > before["p95_ms"] * (1 + threshold)
+                and figures["p95_ms"] - before["p95_ms"] >= min_delta_ms
+            )
+            if slower or figures["queries"] > before["queries"]:
+                regressions.append({
+                    "scale": scale,
+                    "scenario": key,
+                    "p95_ms": [before["p95_ms"], figures["p95_ms"]],
+                    "queries": [before["queries"], figures["queries"]],
+                })
+    return regressions
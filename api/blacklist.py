@@ -0,0 +1,155 @@
+"""
+Refresh token blacklist for the NCC School Management API.
+
+Revoked JTIs are stored in the database and mirrored into a per-process
+Bloom filter. A token that is not in the filter is definitely not revoked,
+so only probable hits (revoked tokens and rare false positives) reach the
+database. Each worker pulls newly revoked JTIs at most once per sync
+interval with an indexed range query on the revocation time. Rows can
+commit out of order, so each pull reaches back SYNC_LAG seconds before the
+previous one.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import RevokedToken
+
+
+def _blacklist_setting(name, default):
+    return getattr(settings, "TOKEN_BLACKLIST", {}).get(name, default)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.size = max(int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenBlacklist:
+    """
+    Database-backed blacklist of refresh token JTIs with a Bloom filter pre-check.
+    """
+
+    def __init__(self, sync_interval=None, rebuild_interval=None, capacity=None, error_rate=None):
+        self.sync_interval = _blacklist_setting("SYNC_INTERVAL", 2) if sync_interval is None else sync_interval
+        self.rebuild_interval = (
+            _blacklist_setting("REBUILD_INTERVAL", 3600) if rebuild_interval is None else rebuild_interval
+        )
+        self.capacity = _blacklist_setting("BLOOM_CAPACITY", 100000) if capacity is None else capacity
+        self.error_rate = _blacklist_setting("BLOOM_ERROR_RATE", 0.001) if error_rate is None else error_rate
+        self.sync_lag = timedelta(seconds=_blacklist_setting("SYNC_LAG", 60))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the in-memory filter; it is rebuilt from the database on next use.
+        """
+        self._bloom = None
+        self._pulled_at = None
+        self._synced_at = 0.0
+        self._built_at = 0.0
+
+    def _sync(self):
+        """
+        Bring the filter up to date with rows revoked by other workers.
+        """
+        now = time.monotonic()
+        if self._bloom is not None and now - self._synced_at < self.sync_interval:
+            return
+        with self._lock:
+            if self._bloom is not None and now - self._synced_at < self.sync_interval:
+                return
+            # Rows revoked before this instant but committed after the query
+            # are picked up by the next pull, which reaches back sync_lag.
+            pulled_at = timezone.now()
+            rows = RevokedToken.objects.filter(expires_at__gt=pulled_at)
+            rebuild = (
+                self._bloom is None
+                or now - self._built_at >= self.rebuild_interval
+                or self._bloom.count >= self._bloom.capacity
+            )
+            if rebuild:
+                # A full rebuild also drops expired JTIs from the filter.
+                live = rows.count()
+                bloom = BloomFilter(max(self.capacity, live * 2), self.error_rate)
+                self._built_at = now
+            else:
+                bloom = self._bloom
+                rows = rows.filter(revoked_at__gte=self._pulled_at - self.sync_lag)
+            for jti in rows.values_list("jti", flat=True).iterator(chunk_size=5000):
+                # Overlapping pulls see the same rows again; only count new ones.
+                if jti not in bloom:
+                    bloom.add(jti)
+            self._bloom = bloom
+            self._pulled_at = pulled_at
+            self._synced_at = now
+
+    def is_revoked(self, jti):
+        """
+        Return whether the token with the given JTI has been revoked.
+        """
+        self._sync()
+        if jti not in self._bloom:
+            return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def revoke(self, jti, expires_at):
+        """
+        Revoke a token; return False when it had already been revoked.
+        """
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        if self._bloom is not None:
+            self._bloom.add(jti)
+        return True
+
+    def prune(self, batch_size=1000):
+        """
+        Delete expired rows in batches and return how many were removed.
+        """
+        removed = 0
+        cutoff = timezone.now()
+        while True:
+            ids = list(
+                RevokedToken.objects.filter(expires_at__lte=cutoff).values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return removed
+            removed += RevokedToken.objects.filter(id__in=ids).delete()[0]
+
+
+blacklist = TokenBlacklist()
@@ -0,0 +1,278 @@
+"""
+Teacher calendars for the NCC School Management system.
+
+A teacher's calendar (groups and lessons in a date range) is built with two
+range queries served by the ``(teacher, scheduled_at)`` and
+``(teacher, occurred_at)`` indexes and cached in the shared Django cache
+under a per-teacher version. Saving a teacher, group or lesson bumps the
+version (see ``api.signals``), which invalidates the cached calendars and
+changes their ETags, so polling clients get ``304 Not Modified`` without
+touching the database. Versions need a cache shared by the workers (see
+``common.cache.CacheVersions``).
+"""
+
+import hashlib
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date, parse_datetime
+
+from common.cache import CacheVersions
+from management.models import Lesson, StudentsGroup
+
+CACHE_KEY_PREFIX = "calendar:"
+FEED_SALT = "api.calendars.feed"
+
+_versions = CacheVersions("calendar:ver:")
+
+
+def _calendar_setting(name, default):
+    return getattr(settings, "TEACHER_CALENDAR", {}).get(name, default)
+
+
+def get_calendar_version(teacher_id):
+    """
+    Return the current calendar version of a teacher.
+    """
+    return _versions.get(teacher_id)
+
+
+def bump_calendar_version(*teacher_ids):
+    """
+    Invalidate the cached calendars of the given teachers.
+    """
+    _versions.bump(*teacher_ids)
+
+
+def week_range(day=None):
+    """
+    Return (start, end) datetimes of the local week (Monday to Monday) containing day.
+    """
+    day = day or timezone.localdate()
+    monday = day - timedelta(days=day.weekday())
+    start = timezone.make_aware(datetime.combine(monday, dt_time.min))
+    return start, start + timedelta(days=7)
+
+
+def _parse_moment(value, name):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"'{name}' must be an ISO 8601 date or datetime")
+        moment = datetime.combine(day, dt_time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_range(start=None, end=None):
+    """
+    Return the (start, end) datetimes requested, defaulting to the current week.
+
+    Dates mean local midnight. Raises ValueError for invalid or too long ranges.
+    """
+    try:
+        if not start and not end:
+            return week_range()
+        start = _parse_moment(start, "start") if start else None
+        end = _parse_moment(end, "end") if end else None
+    except ValueError as error:
+        raise ValueError(str(error)) from None
+    start = start or end - timedelta(days=7)
+    end = end or start + timedelta(days=7)
+    if end <= start:
+        raise ValueError("'end' must be after 'start'")
+    max_days = _calendar_setting("MAX_DAYS", 92)
+    if end - start > timedelta(days=max_days):
+        raise ValueError(f"The range cannot be longer than {max_days} days")
+    return start, end
+
+
+def feed_range():
+    """
+    Return the (start, end) range covered by ICS feeds.
+
+    It is anchored on the current week so it stays the same, and cacheable,
+    for a whole week.
+    """
+    start, _ = week_range()
+    return (
+        start - timedelta(days=_calendar_setting("FEED_PAST_DAYS", 30)),
+        start + timedelta(days=_calendar_setting("FEED_FUTURE_DAYS", 90)),
+    )
+
+
+def calendar_etag(teacher_id, version, *parts):
+    digest = hashlib.md5(":".join(map(str, (teacher_id, version) + parts)).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request, etag):
+    """
+    Return whether the request's If-None-Match header matches etag.
+    """
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _weekly_occurrences(first, start, end):
+    if first >= end:
+        return []
+    weeks = max((start - first).days // 7, 0)
+    moment = first + timedelta(weeks=weeks)
+    occurrences = []
+    while moment < end:
+        if moment >= start:
+            occurrences.append(moment)
+        moment += timedelta(weeks=1)
+    return occurrences
+
+
+def build_calendar(teacher, start, end):
+    """
+    Return the groups and lessons of teacher between start and end.
+
+    Groups meet weekly from their ``scheduled_at``; each one lists its
+    occurrences in the range. Runs two queries.
+    """
+    groups = (
+        StudentsGroup.objects.filter(teacher_id=teacher.pk, scheduled_at__lt=end)
+        .annotate(students_count=Count("students", filter=Q(students__deleted_at__isnull=True)))
+        .order_by("scheduled_at")
+        .values("id", "scheduled_at", "max_students", "students_count")
+    )
+    lessons = (
+        Lesson.objects.filter(teacher_id=teacher.pk, occurred_at__gte=start, occurred_at__lt=end)
+        .order_by("occurred_at")
+        .values("id", "students_group", "occurred_at", "notes")
+    )
+    return {
+        "teacher": {"id": teacher.pk, "name": teacher.name},
+        "start": start,
+        "end": end,
+        "generated_at": timezone.now(),
+        "groups": [
+            dict(group, occurrences=_weekly_occurrences(group["scheduled_at"], start, end)) for group in groups
+        ],
+        "lessons": list(lessons),
+    }
+
+
+def teacher_calendar(teacher, start, end, version=None):
+    """
+    Return the calendar of teacher between start and end, from cache when possible.
+    """
+    version = version or get_calendar_version(teacher.pk)
+    key = f"{CACHE_KEY_PREFIX}{teacher.pk}:{version}:{start.isoformat()}:{end.isoformat()}"
+    calendar = cache.get(key)
+    if calendar is None:
+        calendar = build_calendar(teacher, start, end)
+        cache.set(key, calendar, _calendar_setting("CACHE_TTL", 300))
+    return calendar
+
+
+def feed_token(teacher_id):
+    """
+    Return the token that authorizes reading a teacher's ICS feed.
+    """
+    return signing.Signer(salt=FEED_SALT).signature(str(teacher_id))
+
+
+def check_feed_token(teacher_id, token):
+    return bool(token) and constant_time_compare(token, feed_token(teacher_id))
+
+
+def _ics_text(value):
+    return (
+        str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def _ics_moment(moment):
+    return moment.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _fold(line):
+    """
+    Fold a content line at 75 octets as required by RFC 5545.
+    """
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts, chunk = [], b""
+    for char in line:
+        char_bytes = char.encode()
+        if len(chunk) + len(char_bytes) > (75 if not parts else 74):
+            parts.append(chunk.decode())
+            chunk = b""
+        chunk += char_bytes
+    parts.append(chunk.decode())
+    return "\r\n ".join(parts)
+
+
+def render_ics(calendar):
+    """
+    Render a calendar from ``build_calendar`` as an iCalendar document.
+
+    Groups become weekly recurring events and lessons single events.
+    """
+    duration = f"PT{_calendar_setting('LESSON_MINUTES', 60)}M"
+    stamp = _ics_moment(calendar["generated_at"])
+    teacher = calendar["teacher"]
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//NCC School Management//Teacher Calendar//EN",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_ics_text(teacher['name'])}",
+    ]
+    for group in calendar["groups"]:
+        summary = f"Group {group['id']} ({group['students_count']} students)"
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:group-{group['id']}@ncc-school-management",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{_ics_moment(group['scheduled_at'])}",
+            f"DURATION:{duration}",
+            "RRULE:FREQ=WEEKLY",
+            f"SUMMARY:{_ics_text(summary)}",
+            "END:VEVENT",
+        ]
+    for lesson in calendar["lessons"]:
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:lesson-{lesson['id']}@ncc-school-management",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{_ics_moment(lesson['occurred_at'])}",
+            f"DURATION:{duration}",
+            f"SUMMARY:Lesson - group {lesson['students_group']}",
+        ]
+        if lesson["notes"]:
+            lines.append(f"DESCRIPTION:{_ics_text(lesson['notes'])}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
+
+def teacher_feed(teacher, version=None):
+    """
+    Return the ICS feed of teacher, from cache when possible.
+    """
+    version = version or get_calendar_version(teacher.pk)
+    start, end = feed_range()
+    key = f"{CACHE_KEY_PREFIX}ics:{teacher.pk}:{version}:{start.isoformat()}"
+    feed = cache.get(key)
+    if feed is None:
+        feed = render_ics(build_calendar(teacher, start, end))
+        cache.set(key, feed, _calendar_setting("CACHE_TTL", 300))
+    return feed
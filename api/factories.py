@@ -0,0 +1,110 @@
+"""
+factory-boy factories for the NCC School Management models.
+
+factory-boy is a development dependency; import this module only from tests,
+benchmarks and other development tooling.
+"""
+
+from datetime import timedelta, timezone
+
+import factory
+from factory import fuzzy
+
+from comercial.models import Product
+from crm.models import Lead
+from financial.models import Payment, PaymentMethod, TeacherPayments
+from management.models import Contract, Lesson, Student, StudentsGroup, StudentsStatus, Teacher, TeacherStatus
+
+
+class ProductFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Product
+
+    name = factory.Sequence(lambda n: f"Course {n}")
+    description = factory.Faker("sentence")
+    price = fuzzy.FuzzyDecimal(100, 2000)
+    duration = fuzzy.FuzzyInteger(8, 48)
+    is_active = True
+
+
+class StudentFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Student
+
+    name = factory.Faker("name")
+    birth_date = factory.Faker("date_of_birth", minimum_age=8, maximum_age=70)
+    extra_info = factory.Faker("sentence")
+    status = fuzzy.FuzzyChoice(StudentsStatus.values)
+
+
+class TeacherFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Teacher
+
+    name = factory.Faker("name")
+    pix_key = factory.Faker("email")
+    status = fuzzy.FuzzyChoice(TeacherStatus.values)
+
+
+class ContractFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Contract
+
+    student = factory.SubFactory(StudentFactory)
+    product = factory.SubFactory(ProductFactory)
+    payment_method = fuzzy.FuzzyChoice(PaymentMethod.values)
+    statements = fuzzy.FuzzyInteger(1, 12)
+    first_lesson_on = factory.Faker("date_between", start_date="-2y", end_date="today")
+    last_lesson_on = factory.LazyAttribute(lambda o: o.first_lesson_on + timedelta(days=180))
+
+
+class StudentsGroupFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = StudentsGroup
+
+    scheduled_at = factory.Faker("date_time_between", start_date="-1y", end_date="+1y", tzinfo=timezone.utc)
+    teacher = factory.SubFactory(TeacherFactory)
+    max_students = fuzzy.FuzzyInteger(4, 20)
+
+
+class LessonFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Lesson
+
+    students_group = factory.SubFactory(StudentsGroupFactory)
+    teacher = factory.SelfAttribute("students_group.teacher")
+    occurred_at = factory.Faker("date_time_between", start_date="-2y", end_date="now", tzinfo=timezone.utc)
+    notes = factory.Faker("sentence")
+
+
+class PaymentFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Payment
+
+    payment_method = fuzzy.FuzzyChoice(PaymentMethod.values)
+    value = fuzzy.FuzzyDecimal(50, 1500)
+    paid_at = factory.Faker("date_time_between", start_date="-2y", end_date="now", tzinfo=timezone.utc)
+    description = factory.Faker("sentence", nb_words=4)
+
+
+class TeacherPaymentsFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = TeacherPayments
+
+    teacher = factory.SubFactory(TeacherFactory)
+    value = fuzzy.FuzzyDecimal(500, 5000)
+    paid_at = factory.Faker("date_time_between", start_date="-2y", end_date="now", tzinfo=timezone.utc)
+    payment_method = fuzzy.FuzzyChoice(PaymentMethod.values)
+    description = factory.Faker("sentence", nb_words=4)
+
+
+class LeadFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Lead
+
+    name = factory.Faker("name")
+    goals = factory.Faker("sentence")
+    birth_date = factory.Faker("date_of_birth", minimum_age=8, maximum_age=70)
+    interests = factory.Faker("sentence", nb_words=5)
+    email = factory.Faker("email")
+    phone = factory.Faker("numerify", text="+55###########")
@@ -0,0 +1,319 @@
+"""
+Bulk CSV imports for the NCC School Management system.
+
+``CsvImporter`` streams a CSV file, validates rows in chunks against the
+target model's field definitions and stages valid rows in a temporary
+table (with ``COPY`` on PostgreSQL). Once the whole file is staged, the rows
+are merged into the target table with one ``INSERT ... SELECT`` inside the
+same transaction, so an import either lands completely or not at all.
+Invalid rows, and rows duplicating a live row or an earlier row of the file
+(leads sharing a normalized email or phone), are written to an optional
+rejects CSV with their errors.
+
+Uploads through the API are stored with ``save_upload`` and imported by the
+``import_csv`` background job (see ``api.tasks``), which writes rejected rows
+next to the upload (``rejects_path``).
+"""
+
+import csv
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from common.bulk import get_loader
+from common.models import next_change_seq_sql
+from crm.models import FunnelMonthlySummary, Lead, normalize_email, normalize_phone
+from financial.models import Payment
+from management.history import backfill_status_history
+from management.models import Student
+
+# Target name -> (model, importable columns).
+IMPORT_TARGETS = {
+    "students": (Student, ("name", "birth_date", "extra_info", "status")),
+    "leads": (Lead, ("name", "goals", "birth_date", "interests", "email", "phone")),
+    "payments": (Payment, ("payment_method", "value", "paid_at", "description")),
+}
+# Target name -> (derived columns, function of the cleaned values dict).
+DERIVED_COLUMNS = {
+    "leads": (
+        ("email_key", "phone_key"),
+        lambda values: (normalize_email(values["email"]), normalize_phone(values["phone"])),
+    ),
+}
+# Target name -> {key column: field its errors are reported under}. Rows
+# sharing a key with a live row, or with an earlier row of the file, are
+# rejected as duplicates.
+UNIQUE_KEYS = {
+    "leads": {"email_key": "email", "phone_key": "phone"},
+}
+MAX_REPORTED_ERRORS = 100
+
+
+class CsvImportError(ValueError):
+    """
+    Raised when a CSV file cannot be imported at all (e.g. missing columns).
+    """
+
+
+def _upload_dir():
+    return Path(getattr(settings, "CSV_IMPORT", {}).get("UPLOAD_DIR") or settings.BASE_DIR / "imports")
+
+
+def save_upload(upload):
+    """
+    Store an uploaded file for an import job and return its name.
+    """
+    directory = _upload_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{uuid.uuid4().hex}.csv"
+    with open(directory / name, "wb") as destination:
+        for chunk in upload.chunks():
+            destination.write(chunk)
+    return name
+
+
+def upload_path(name):
+    """
+    Return the path of an upload stored by save_upload; raises CsvImportError for other names.
+    """
+    if not name or Path(name).name != name:
+        raise CsvImportError(f"Invalid upload name '{name}'")
+    return _upload_dir() / name
+
+
+def rejects_path(name):
+    """
+    Return the path where the rejected rows of the upload name are written.
+    """
+    return upload_path(name).with_suffix(".rejects.csv")
+
+
+def prune_rejects(older_than):
+    """
+    Delete the rejects files last written before older_than (a datetime); return how many.
+    """
+    removed = 0
+    for path in _upload_dir().glob("*.rejects.csv"):
+        try:
+            if path.stat().st_mtime < older_than.timestamp():
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+def _required(field):
+    return not field.has_default() and not field.null and not field.blank
+
+
+class CsvImporter:
+    """
+    Import a CSV file into one of ``IMPORT_TARGETS``.
+    """
+
+    def __init__(self, target, chunk_size=5000, using="default", method="auto"):
+        if target not in IMPORT_TARGETS:
+            raise CsvImportError(f"Unknown import target '{target}'; choose from {', '.join(IMPORT_TARGETS)}")
+        self.target = target
+        self.model, columns = IMPORT_TARGETS[target]
+        self.fields = [self.model._meta.get_field(column) for column in columns]
+        self.derived_columns, self.derive = DERIVED_COLUMNS.get(target, ((), None))
+        self.unique_keys = UNIQUE_KEYS.get(target, {})
+        self.chunk_size = chunk_size
+        self.connection = connections[using]
+        self.loader = get_loader(self.connection, chunk_size, method)
+
+    def run(self, csv_file, rejects_file=None, dry_run=False):
+        """
+        Import csv_file (a text stream) and return a summary dict.
+
+        With dry_run, rows are only validated. Rejected rows (duplicates
+        included) are written to rejects_file (a text stream) with their
+        line number and errors.
+        """
+        started = time.monotonic()
+        reader = csv.DictReader(csv_file)
+        self.check_header(reader.fieldnames)
+        rejects = None
+        if rejects_file is not None:
+            rejects = csv.writer(rejects_file)
+            rejects.writerow(["line"] + list(reader.fieldnames) + ["errors"])
+
+        summary = {"target": self.target, "total": 0, "imported": 0, "rejected": 0, "duplicates": 0, "errors": []}
+        stage = f"import_stage_{uuid.uuid4().hex[:12]}"
+        columns = [field.column for field in self.fields] + list(self.derived_columns)
+        seen = {column: {} for column in self.unique_keys}
+        # DDL is transactional on PostgreSQL and SQLite, so a failed import
+        # also rolls back the staging table.
+        with transaction.atomic(using=self.connection.alias):
+            if not dry_run:
+                self._create_stage(stage, columns)
+            for chunk in self._chunks(reader):
+                valid = self._validate(chunk, reader.fieldnames, summary, rejects)
+                if self.unique_keys:
+                    valid = self._skip_duplicates(valid, columns, seen, reader.fieldnames, summary, rejects)
+                if valid and not dry_run:
+                    self.loader.load(self.model, columns, [values for _, _, values in valid], table=stage)
+            if dry_run:
+                summary["imported"] = summary["total"] - summary["rejected"]
+            else:
+                summary["imported"] = self._merge(stage, columns)
+                self._drop_stage(stage)
+                if self.model is Lead and summary["imported"]:
+                    # The merge bypasses Lead.save, so count the month here.
+                    FunnelMonthlySummary.increment(timezone.now(), leads=summary["imported"])
+                elif self.model is Student and summary["imported"]:
+                    # Likewise for the status history of the new students.
+                    backfill_status_history(using=self.connection.alias)
+
+        summary["dry_run"] = dry_run
+        summary["seconds"] = round(time.monotonic() - started, 3)
+        return summary
+
+    def check_header(self, header):
+        """
+        Raise CsvImportError unless header has every required column.
+
+        Optional columns may be left out; their rows get the field default.
+        """
+        if not header:
+            raise CsvImportError("The CSV file is empty or has no header row")
+        header = set(header)
+        missing = [field.name for field in self.fields if _required(field) and field.name not in header]
+        if missing:
+            raise CsvImportError(f"Missing required column(s): {', '.join(missing)}")
+
+    def _chunks(self, reader):
+        chunk = []
+        for row in reader:
+            chunk.append((reader.line_num, row))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _validate(self, chunk, header, summary, rejects):
+        """
+        Return (line, row, cleaned values) of the valid rows in chunk; record the others.
+        """
+        valid = []
+        for line, row in chunk:
+            summary["total"] += 1
+            values, errors = [], {}
+            for field in self.fields:
+                raw = row.get(field.name)
+                raw = raw.strip() if raw is not None else None
+                if raw in (None, ""):
+                    value = field.get_default() if field.has_default() else (None if field.null else "")
+                else:
+                    value = raw
+                try:
+                    value = field.clean(value, None)
+                except ValidationError as error:
+                    errors[field.name] = error.messages
+                    continue
+                if isinstance(value, datetime) and timezone.is_naive(value):
+                    value = timezone.make_aware(value)
+                values.append(value)
+            if not errors:
+                if self.derive is not None:
+                    values.extend(self.derive(dict(zip((field.name for field in self.fields), values))))
+                valid.append((line, row, values))
+            else:
+                self._reject(line, row, errors, header, summary, rejects)
+        return valid
+
+    def _skip_duplicates(self, valid, columns, seen, header, summary, rejects):
+        """
+        Return the rows of valid that share no unique key with a live row or an earlier row; record the others.
+
+        seen maps each key column to {key: line} of the rows kept so far.
+        Live rows are looked up with one query per key column and chunk.
+        """
+        positions = {column: columns.index(column) for column in self.unique_keys}
+        existing = {}
+        for column, position in positions.items():
+            keys = {values[position] for _, _, values in valid if values[position] is not None}
+            existing[column] = dict(
+                self.model.objects.using(self.connection.alias).filter(**{f"{column}__in": keys})
+                .values_list(column, "pk")
+            ) if keys else {}
+
+        kept = []
+        for line, row, values in valid:
+            errors = {}
+            for column, position in positions.items():
+                key = values[position]
+                if key in existing[column]:
+                    errors[self.unique_keys[column]] = [
+                        f"Duplicate of {self.model._meta.verbose_name} #{existing[column][key]}"
+                    ]
+                elif key in seen[column]:
+                    errors[self.unique_keys[column]] = [f"Duplicate of line {seen[column][key]}"]
+            if errors:
+                summary["duplicates"] += 1
+                self._reject(line, row, errors, header, summary, rejects)
+                continue
+            for column, position in positions.items():
+                if values[position] is not None:
+                    seen[column][values[position]] = line
+            kept.append((line, row, values))
+        return kept
+
+    def _reject(self, line, row, errors, header, summary, rejects):
+        summary["rejected"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"line": line, "errors": errors})
+        if rejects is not None:
+            message = "; ".join(f"{name}: {' '.join(messages)}" for name, messages in errors.items())
+            rejects.writerow([line] + [row.get(name) for name in header] + [message])
+
+    def _create_stage(self, stage, columns):
+        ops = self.connection.ops
+        columns = ", ".join(ops.quote_name(column) for column in columns)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {ops.quote_name(stage)} AS "
+                f"SELECT {columns} FROM {ops.quote_name(self.model._meta.db_table)} WHERE 1 = 0"
+            )
+
+    def _drop_stage(self, stage):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.connection.ops.quote_name(stage)}")
+
+    def _merge(self, stage, columns):
+        """
+        Move the staged rows into the target table with one statement.
+
+        Rows sharing a unique key with a live row are left out, which
+        covers rows created since the chunks were checked.
+        """
+        ops = self.connection.ops
+        table = ops.quote_name(self.model._meta.db_table)
+        stage = ops.quote_name(stage)
+        columns = ", ".join(ops.quote_name(column) for column in columns)
+        timestamp_field = self.model._meta.get_field("created_at")
+        now = timestamp_field.get_db_prep_save(timezone.now(), self.connection)
+        change_seq = next_change_seq_sql(self.model, self.connection)
+        where = " AND ".join(
+            f"NOT EXISTS (SELECT 1 FROM {table} live WHERE live.{ops.quote_name('deleted_at')} IS NULL "
+            f"AND live.{ops.quote_name(column)} = {stage}.{ops.quote_name(column)})"
+            for column in self.unique_keys
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} "
+                f"({columns}, {ops.quote_name('created_at')}, {ops.quote_name('updated_at')}, "
+                f"{ops.quote_name('change_seq')}) "
+                f"SELECT {columns}, %s, %s, {change_seq} FROM {stage}" + (f" WHERE {where}" if where else ""),
+                [now, now],
+            )
+            return cursor.rowcount
@@ -0,0 +1,136 @@
+"""
+Benchmark every API endpoint against seeded data at several scales.
+"""
+
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmark import compare, run_benchmarks, seed
+
+
+class Command(BaseCommand):
+    """
+    Seed a throwaway database at each scale and time the API against it.
+
+    Every scale runs in a fresh test database (``test_<NAME>``), so the
+    configured database is never touched. Run with
+    ``--settings=ncc_school_management.test_settings`` to benchmark on SQLite.
+    """
+    help = "Benchmark API endpoints at 10k/100k/1M rows and compare against a baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales",
+            default="10000",
+            help="Comma separated numbers of students to seed, e.g. 10000,100000,1000000"
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Timed requests per scenario"
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=2,
+            help="Untimed requests per scenario before measuring"
+        )
+        parser.add_argument(
+            "--endpoints",
+            default="",
+            help="Comma separated API prefixes to benchmark (default: all)"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows inserted per statement while seeding"
+        )
+        parser.add_argument(
+            "--output",
+            help="Write results as JSON to this file"
+        )
+        parser.add_argument(
+            "--compare",
+            help="Baseline JSON file; exit with status 1 on regressions"
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.2,
+            help="Allowed relative p95 increase before a scenario counts as a regression"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(scale) for scale in options["scales"].split(",") if scale]
+        except ValueError:
+            raise CommandError("--scales must be a comma separated list of integers")
+        only = [prefix for prefix in options["endpoints"].split(",") if prefix] or None
+
+        report = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "iterations": options["iterations"],
+            "results": {},
+        }
+        setup_test_environment(debug=False)
+        try:
+            for scale in scales:
+                report["results"][str(scale)] = self._run_scale(scale, only, options)
+        finally:
+            teardown_test_environment()
+
+        self._print_table(report)
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options["compare"]:
+            with open(options["compare"]) as baseline_file:
+                baseline = json.load(baseline_file)
+            regressions = compare(baseline, report, threshold=options["threshold"])
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f"REGRESSION {regression['scale']} {regression['scenario']}: "
+                    f"p95 {regression['p95_ms'][0]} -> {regression['p95_ms'][1]} ms, "
+                    f"queries {regression['queries'][0]} -> {regression['queries'][1]}"
+                ))
+            if regressions:
+                sys.exit(1)
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
+
+    def _run_scale(self, scale, only, options):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            self.stdout.write(f"Seeding scale {scale}...")
+            seed(scale, batch_size=options["batch_size"], log=self.stdout.write)
+            return run_benchmarks(
+                iterations=options["iterations"],
+                warmup=options["warmup"],
+                only=only,
+                log=self.stdout.write,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _print_table(self, report):
+        header = f"{'scale':>8}  {'scenario':<40} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>7} {'peak KB':>9}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for scale, scenarios in report["results"].items():
+            for key, figures in scenarios.items():
+                self.stdout.write(
+                    f"{scale:>8}  {key:<40} {figures['p50_ms']:>9} {figures['p95_ms']:>9} "
+                    f"{figures['p99_ms']:>9} {figures['queries']:>7} {figures['peak_memory_kb']:>9}"
+                )
@@ -0,0 +1,65 @@
+"""
+Import students, leads or payments from a CSV file.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.imports import IMPORT_TARGETS, CsvImporter, CsvImportError
+
+
+class Command(BaseCommand):
+    """
+    Validate and bulk load a CSV file, writing rejected rows to a separate file.
+    """
+    help = "Bulk import a CSV file into students, leads or payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "target",
+            choices=list(IMPORT_TARGETS),
+            help="Table to import into"
+        )
+        parser.add_argument(
+            "path",
+            help="CSV file with a header row"
+        )
+        parser.add_argument(
+            "--rejects",
+            help="Write rejected rows and their errors to this CSV file"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Rows validated and staged per chunk"
+        )
+        parser.add_argument(
+            "--encoding",
+            default="utf-8-sig",
+            help="Encoding of the CSV file"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate rows without importing them"
+        )
+
+    def handle(self, *args, **options):
+        importer = CsvImporter(options["target"], chunk_size=options["chunk_size"])
+        rejects_file = open(options["rejects"], "w", newline="") if options["rejects"] else None
+        try:
+            with open(options["path"], newline="", encoding=options["encoding"]) as csv_file:
+                summary = importer.run(csv_file, rejects_file=rejects_file, dry_run=options["dry_run"])
+        except (CsvImportError, OSError, UnicodeDecodeError) as error:
+            raise CommandError(str(error))
+        finally:
+            if rejects_file is not None:
+                rejects_file.close()
+
+        verb = "Validated" if summary["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {summary['imported']} of {summary['total']} row(s) into {summary['target']} "
+            f"in {summary['seconds']}s; {summary['rejected']} rejected, {summary['duplicates']} as duplicates."
+        ))
+        if summary["rejected"] and options["rejects"]:
+            self.stdout.write(f"Rejected rows written to {options['rejects']}")
@@ -0,0 +1,30 @@
+"""
+Delete the rejected rows of old CSV imports.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.imports import prune_rejects
+
+
+class Command(BaseCommand):
+    """
+    Prune rejects files of import jobs finished longer ago than the retention period.
+    """
+    help = "Delete rejects files of CSV imports older than the retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "CSV_IMPORT", {}).get("REJECTS_RETENTION_DAYS", 7),
+            help="Age in days after which rejects files are deleted"
+        )
+
+    def handle(self, *args, **options):
+        removed = prune_rejects(timezone.now() - timedelta(days=options["days"]))
+        self.stdout.write(self.style.SUCCESS(f"Pruned {removed} rejects file(s)."))
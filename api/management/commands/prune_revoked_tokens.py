@@ -0,0 +1,26 @@
+"""
+Delete expired entries from the refresh token blacklist.
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.blacklist import blacklist
+
+
+class Command(BaseCommand):
+    """
+    Prune revoked refresh tokens whose expiry has passed.
+    """
+    help = "Delete expired revoked refresh tokens in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows deleted per statement"
+        )
+
+    def handle(self, *args, **options):
+        removed = blacklist.prune(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Pruned {removed} expired revoked token(s)."))
@@ -0,0 +1,96 @@
+"""
+Generate large volumes of synthetic data for reproducing production issues.
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.seeding import ScaleSeeder, seed_plan
+
+
+class Command(BaseCommand):
+    """
+    Load a deterministic synthetic dataset sized by the number of students.
+    """
+    help = "Generate referentially consistent synthetic data with PostgreSQL COPY (batched INSERT elsewhere)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--students",
+            type=int,
+            default=10000,
+            help="Number of students; every other table is sized relative to it"
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed; the same seed and end date always generate the same data"
+        )
+        parser.add_argument(
+            "--years",
+            type=float,
+            default=3,
+            help="Length of the generated history in years"
+        )
+        parser.add_argument(
+            "--end-date",
+            type=date.fromisoformat,
+            help="Last day of the generated history (YYYY-MM-DD, default: today)"
+        )
+        parser.add_argument(
+            "--deleted-fraction",
+            type=float,
+            default=0.03,
+            help="Fraction of rows to soft delete"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Rows sent per COPY or INSERT batch"
+        )
+        parser.add_argument(
+            "--method",
+            choices=["auto", "copy", "insert"],
+            default="auto",
+            help="Load method; auto uses COPY on PostgreSQL and batched INSERT otherwise"
+        )
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Database alias to load into"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only print the approximate number of rows per table"
+        )
+
+    def handle(self, *args, **options):
+        if options["students"] < 1:
+            raise CommandError("--students must be positive")
+        if not 0 <= options["deleted_fraction"] < 1:
+            raise CommandError("--deleted-fraction must be between 0 and 1")
+
+        if options["dry_run"]:
+            for model, count in seed_plan(options["students"]).items():
+                self.stdout.write(f"{model._meta.db_table:<40} ~{count}")
+            return
+
+        seeder = ScaleSeeder(
+            options["students"],
+            seed=options["seed"],
+            years=options["years"],
+            end_date=options["end_date"],
+            deleted_fraction=options["deleted_fraction"],
+            batch_size=options["batch_size"],
+            using=options["database"],
+            method=options["method"],
+            log=self.stdout.write if options["verbosity"] > 1 else None,
+        )
+        counts = seeder.run()
+        for table, count in counts.items():
+            self.stdout.write(f"{table:<40} {count}")
+        self.stdout.write(self.style.SUCCESS(f"Generated {sum(counts.values())} rows."))
@@ -0,0 +1,38 @@
+"""
+Precompute teacher calendars for the current week.
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.calendars import teacher_calendar, teacher_feed, week_range
+from management.models import Teacher, TeacherStatus
+
+
+class Command(BaseCommand):
+    """
+    Build and cache the week view and ICS feed of every active teacher.
+
+    Run it after deploys or from cron at the start of the week so the first
+    polls of calendar clients are served from cache.
+    """
+    help = "Cache this week's calendar and the ICS feed of every active teacher"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--weeks",
+            type=int,
+            default=1,
+            help="Number of weeks to precompute, starting with the current one"
+        )
+
+    def handle(self, *args, **options):
+        start, end = week_range()
+        week = end - start
+        teachers = Teacher.objects.filter(status=TeacherStatus.ACTIVE).only("id", "name")
+        count = 0
+        for teacher in teachers.iterator(chunk_size=500):
+            for number in range(options["weeks"]):
+                teacher_calendar(teacher, start + week * number, end + week * number)
+            teacher_feed(teacher)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Cached calendars of {count} teacher(s)."))
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TokenVersion",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "version",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Current token version; tokens carrying an older value are rejected"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, help_text="Timestamp when the version was last bumped"),
+                ),
+                (
+                    "user",
+                    models.OneToOneField(
+                        help_text="User the token version belongs to",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="token_version",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Token Version",
+                "verbose_name_plural": "Token Versions",
+                "db_table": "api_token_versions",
+            },
+        ),
+    ]
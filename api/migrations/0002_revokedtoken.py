@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RevokedToken",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "jti",
+                    models.CharField(
+                        help_text="Unique identifier (jti claim) of the revoked token", max_length=255, unique=True
+                    ),
+                ),
+                (
+                    "expires_at",
+                    models.DateTimeField(
+                        db_index=True, help_text="Expiry of the revoked token; the row can be pruned after it"
+                    ),
+                ),
+                (
+                    "revoked_at",
+                    models.DateTimeField(auto_now_add=True, help_text="Timestamp when the token was revoked"),
+                ),
+            ],
+            options={
+                "verbose_name": "Revoked Token",
+                "verbose_name_plural": "Revoked Tokens",
+                "db_table": "api_revoked_tokens",
+            },
+        ),
+    ]
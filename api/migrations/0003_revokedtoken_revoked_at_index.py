@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_revokedtoken"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="revokedtoken",
+            name="revoked_at",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, help_text="Timestamp when the token was revoked"
+            ),
+        ),
+    ]
@@ -1,3 +1,68 @@
-from django.db import models  # noqa: F401
+"""
+API models for the NCC School Management system.
+"""
 
-# Create your models here.
+from django.conf import settings
+from django.db import models
+
+
+class TokenVersion(models.Model):
+    """
+    Per-user counter embedded in issued JWTs.
+
+    Bumping the counter revokes every token issued before the bump, without
+    the authentication layer having to read the user row on each request.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="token_version",
+        help_text="User the token version belongs to"
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+        help_text="Current token version; tokens carrying an older value are rejected"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Timestamp when the version was last bumped"
+    )
+
+    class Meta:
+        db_table = "api_token_versions"
+        verbose_name = "Token Version"
+        verbose_name_plural = "Token Versions"
+
+    def __str__(self):
+        return f"Token version {self.version} for user {self.user_id}"
+
+
+class RevokedToken(models.Model):
+    """
+    Refresh token that can no longer be used, identified by its JTI.
+
+    Rows are only needed until the token would have expired anyway and are
+    pruned in batches after that.
+    """
+    jti = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="Unique identifier (jti claim) of the revoked token"
+    )
+    expires_at = models.DateTimeField(
+        db_index=True,
+        help_text="Expiry of the revoked token; the row can be pruned after it"
+    )
+    revoked_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        help_text="Timestamp when the token was revoked"
+    )
+
+    class Meta:
+        db_table = "api_revoked_tokens"
+        verbose_name = "Revoked Token"
+        verbose_name_plural = "Revoked Tokens"
+
+    def __str__(self):
+        return f"Revoked token {self.jti}"
@@ -0,0 +1,168 @@
+"""
+Student overview (profile page) for the NCC School Management system.
+
+The overview gathers a student's contracts with their products, groups with
+their teachers and schedule, latest lessons and a payment summary, which
+clients would otherwise fetch with one request per resource. It is built
+with a fixed number of queries, whatever the number of contracts, groups or
+payments: relations are joined, counts and totals are aggregated by the
+database and lesson attendance is an ``EXISTS`` subquery. Overviews are
+cached for ``STUDENT_OVERVIEW["CACHE_TTL"]`` seconds under a per-student
+version, along with the versions of the student's groups they were built
+from. Saving the student or one of their contracts or payments, or joining
+or leaving a group, bumps the student's version; saving or deleting a group
+or one of its lessons bumps the group's version, so no roster is read (see
+``api.signals``). Versions need a cache shared by the workers (see
+``common.cache.CacheVersions``).
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, Max, OuterRef, Q, Sum
+from django.utils import timezone
+
+from common.cache import CacheVersions
+from financial.ledger import ZERO
+from financial.models import Payment, StudentBalance
+from management.models import Contract, Lesson, LessonAbsence, StudentsGroup
+
+CACHE_KEY_PREFIX = "overview:"
+
+_versions = CacheVersions("overview:ver:")
+_group_versions = CacheVersions("overview:group:ver:")
+
+
+def _overview_setting(name, default):
+    return getattr(settings, "STUDENT_OVERVIEW", {}).get(name, default)
+
+
+def get_overview_version(student_id):
+    """
+    Return the current overview version of a student.
+    """
+    return _versions.get(student_id)
+
+
+def bump_overview_version(*student_ids):
+    """
+    Invalidate the cached overviews of the given students.
+    """
+    _versions.bump(*student_ids)
+
+
+def bump_group_overview_version(*group_ids):
+    """
+    Invalidate the cached overviews of the students of the given groups.
+    """
+    _group_versions.bump(*group_ids)
+
+
+def _group_ids(student):
+    return list(
+        StudentsGroup.students.through.objects.filter(student_id=student.pk).values_list("studentsgroup_id", flat=True)
+    )
+
+
+def build_overview(student, group_ids=None):
+    """
+    Return the contracts, groups, latest lessons and payment summary of student.
+
+    group_ids are the ids of the student's groups, read when not given.
+    Runs six queries, five when group_ids are given.
+    """
+    if group_ids is None:
+        group_ids = _group_ids(student)
+    contracts = (
+        Contract.objects.filter(student_id=student.pk, deleted_at__isnull=True)
+        .order_by("-created_at")
+        .values(
+            "id", "payment_method", "statements", "first_lesson_on", "last_lesson_on", "created_at",
+            "product_id", "product__name", "product__price", "product__duration",
+        )
+    )
+    groups = (
+        StudentsGroup.objects.filter(pk__in=group_ids, deleted_at__isnull=True)
+        .annotate(students_count=Count("students", filter=Q(students__deleted_at__isnull=True)))
+        .order_by("scheduled_at")
+        .values("id", "scheduled_at", "max_students", "students_count", "teacher_id", "teacher__name")
+    )
+    lessons = (
+        Lesson.objects.filter(students_group_id__in=group_ids, deleted_at__isnull=True)
+        .annotate(absent=Exists(LessonAbsence.objects.filter(lesson_id=OuterRef("pk"), student_id=student.pk)))
+        .order_by("-occurred_at")
+        .values("id", "students_group_id", "occurred_at", "notes", "attendance_taken_at", "absent",
+                "teacher_id", "teacher__name")[:_overview_setting("RECENT_LESSONS", 10)]
+    )
+    payments = Payment.objects.filter(student_id=student.pk, deleted_at__isnull=True).aggregate(
+        count=Count("id"), total=Sum("value"), last_paid_at=Max("paid_at")
+    )
+    balance = StudentBalance.objects.filter(student_id=student.pk).values("charged", "balance").first() or {}
+    return {
+        "contracts": [
+            {
+                "id": contract["id"],
+                "product": {
+                    "id": contract["product_id"],
+                    "name": contract["product__name"],
+                    "price": contract["product__price"],
+                    "duration": contract["product__duration"],
+                },
+                "payment_method": contract["payment_method"],
+                "statements": contract["statements"],
+                "first_lesson_on": contract["first_lesson_on"],
+                "last_lesson_on": contract["last_lesson_on"],
+                "created_at": contract["created_at"],
+            }
+            for contract in contracts
+        ],
+        "groups": [
+            {
+                "id": group["id"],
+                "scheduled_at": group["scheduled_at"],
+                "max_students": group["max_students"],
+                "students_count": group["students_count"],
+                "teacher": {"id": group["teacher_id"], "name": group["teacher__name"]},
+            }
+            for group in groups
+        ],
+        "recent_lessons": [
+            {
+                "id": lesson["id"],
+                "students_group": lesson["students_group_id"],
+                "occurred_at": lesson["occurred_at"],
+                "notes": lesson["notes"],
+                "teacher": {"id": lesson["teacher_id"], "name": lesson["teacher__name"]},
+                # None until attendance is marked.
+                "present": None if lesson["attendance_taken_at"] is None else not lesson["absent"],
+            }
+            for lesson in lessons
+        ],
+        "payments": {
+            "count": payments["count"],
+            "total": payments["total"] or ZERO,
+            "last_paid_at": payments["last_paid_at"],
+            "charged": balance.get("charged", ZERO),
+            "balance": balance.get("balance", ZERO),
+        },
+        "generated_at": timezone.now(),
+    }
+
+
+def student_overview(student):
+    """
+    Return build_overview(student), cached for CACHE_TTL seconds (0 disables the cache).
+    """
+    ttl = _overview_setting("CACHE_TTL", 60)
+    if not ttl:
+        return build_overview(student)
+    key = f"{CACHE_KEY_PREFIX}{student.pk}:{get_overview_version(student.pk)}"
+    cached = cache.get(key)
+    if cached is not None and _group_versions.get_many(cached["group_versions"]) == cached["group_versions"]:
+        return cached["overview"]
+    # Group versions are read before the groups, so bumps made meanwhile
+    # invalidate the overview built here.
+    group_ids = _group_ids(student)
+    group_versions = _group_versions.get_many(group_ids)
+    overview = build_overview(student, group_ids)
+    cache.set(key, {"overview": overview, "group_versions": group_versions}, ttl)
+    return overview
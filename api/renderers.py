@@ -0,0 +1,27 @@
+"""
+API renderers for the NCC School Management system.
+"""
+
+from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
+
+from common.instrumentation import timed
+
+
+class InstrumentedJSONRenderer(JSONRenderer):
+    """
+    JSON renderer that reports its time to the request metrics.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed("render"):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class InstrumentedBrowsableAPIRenderer(BrowsableAPIRenderer):
+    """
+    Browsable API renderer that reports its time to the request metrics.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed("render"):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,400 @@
+"""
+Synthetic data generation for the NCC School Management system.
+
+``ScaleSeeder`` generates referentially consistent rows for every model in
+``comercial``, ``management``, ``financial`` and ``crm`` from a single
+``random.Random(seed)``, so the same seed and end date always produce the
+same data. Rows are written with explicit ids and timestamps through
+PostgreSQL ``COPY``, or through batched ``INSERT`` statements on other
+databases, and sequences are reset afterwards.
+"""
+
+import math
+import random
+from bisect import bisect_left
+from collections import deque
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Max
+
+from common.bulk import get_loader
+from comercial.models import Product
+from crm.funnel import rebuild_funnel_summary
+from crm.models import Lead, normalize_email, normalize_phone
+from financial.ledger import rebuild_ledger
+from financial.models import LedgerEntry, Payment, PaymentMethod, TeacherPayments
+from management.history import backfill_history
+from management.models import (
+    Contract, Lesson, Student, StudentsGroup, StudentsStatus, StudentStatusHistory, Teacher, TeacherStatus,
+    TeacherStatusHistory
+)
+
+FIRST_NAMES = (
+    "Ana", "Beatriz", "Bruno", "Camila", "Carlos", "Daniel", "Eduarda", "Felipe", "Fernanda", "Gabriel",
+    "Gustavo", "Helena", "Isabela", "João", "Julia", "Larissa", "Leonardo", "Letícia", "Lucas", "Luiza",
+    "Marcos", "Maria", "Mariana", "Matheus", "Natália", "Pedro", "Rafael", "Renata", "Rodrigo", "Sofia",
+    "Thiago", "Vinícius", "Vitória", "Yasmin",
+)
+LAST_NAMES = (
+    "Almeida", "Alves", "Araújo", "Barbosa", "Cardoso", "Carvalho", "Castro", "Costa", "Dias", "Fernandes",
+    "Ferreira", "Gomes", "Lima", "Martins", "Melo", "Moreira", "Nascimento", "Oliveira", "Pereira", "Ribeiro",
+    "Rocha", "Rodrigues", "Santos", "Silva", "Soares", "Souza", "Teixeira", "Vieira",
+)
+LANGUAGES = ("English", "Spanish", "French", "German", "Italian", "Japanese", "Mandarin", "Portuguese")
+LEVELS = (
+    "Beginner", "Elementary", "Intermediate", "Upper Intermediate", "Advanced", "Conversation", "Business",
+    "Exam Preparation",
+)
+GOALS = (
+    "Travel abroad", "Career growth", "Study abroad", "Pass a proficiency exam", "Business meetings",
+    "Talk with family", "Hobby", "Move to another country",
+)
+PAYMENT_METHOD_WEIGHTS = {PaymentMethod.PIX: 50, PaymentMethod.CREDIT_CARD: 35, PaymentMethod.BOLETO: 15}
+# Fraction of leads that repeat a recent lead (same person, another campaign).
+DUPLICATE_LEAD_FRACTION = 0.05
+# Fraction of students converted from a lead.
+CONVERTED_STUDENT_FRACTION = 0.3
+# Relative number of leads per month: enrollment peaks in January/February and July/August.
+LEAD_SEASONALITY = (1.6, 1.4, 1.0, 0.9, 0.8, 0.8, 1.5, 1.3, 0.9, 0.8, 0.7, 0.5)
+# Lessons run Monday to Saturday; evening slots are the busiest.
+LESSON_HOURS = (8, 9, 10, 11, 14, 15, 16, 17, 18, 19, 20, 21)
+LESSON_HOUR_WEIGHTS = (2, 3, 3, 2, 2, 2, 3, 4, 6, 7, 6, 3)
+
+
+def seed_plan(students):
+    """
+    Return the approximate number of rows generated per model for a number of students.
+    """
+    groups = max(students // 8, 5)
+    return {
+        Product: min(max(students // 5000, 16), len(LANGUAGES) * len(LEVELS)),
+        Teacher: max(students // 100, 5),
+        Student: students,
+        Contract: round(students * 1.3),
+        StudentsGroup: groups,
+        StudentsGroup.students.through: round(students * 1.2),
+        Lesson: groups * 35,
+        Payment: round(students * 1.3 * 6),
+        TeacherPayments: max(students // 100, 5) * 24,
+        Lead: students * 2 + round(students * CONVERTED_STUDENT_FRACTION),
+    }
+
+
+class ScaleSeeder:
+    """
+    Generate a realistic school dataset sized by the number of students.
+
+    Time distributions follow the business: enrollment grows over the
+    period, lessons happen weekly in each group's slot, students pay monthly
+    statements early in the month and leads arrive in seasonal waves. A
+    ``deleted_fraction`` of rows is soft-deleted, and rows whose parent is
+    soft-deleted are soft-deleted as well so live rows never reference
+    deleted ones.
+    """
+
+    def __init__(self, students, seed=0, years=3, end_date=None, deleted_fraction=0.03,
+                 batch_size=5000, using="default", method="auto", log=None):
+        self.students = students
+        self.rng = random.Random(seed)
+        self.end = datetime.combine(end_date or date.today(), time(), tzinfo=timezone.utc)
+        self.start = self.end - timedelta(days=round(365 * years))
+        self.deleted_fraction = deleted_fraction
+        self.plan = seed_plan(students)
+        self.connection = connections[using]
+        self.log = log or (lambda message: None)
+        self.loader = get_loader(self.connection, batch_size, method)
+        self.counts = {}
+
+    def run(self):
+        """
+        Generate and load every table; return {db_table: rows inserted}.
+        """
+        self.products = self._load(Product, ("name", "description", "price", "duration", "is_active"),
+                                   self._products)
+        self.teachers = self._load(Teacher, ("name", "pix_key", "status"), self._teachers)
+        self.student_rows = self._load(Student, ("name", "birth_date", "extra_info", "status"), self._students)
+        self.groups = self._load(StudentsGroup, ("scheduled_at", "teacher_id", "max_students"), self._groups)
+        self._load(StudentsGroup.students.through, ("studentsgroup_id", "student_id"), self._memberships)
+        self.contracts = self._load(
+            Contract,
+            ("student_id", "product_id", "payment_method", "statements", "first_lesson_on", "last_lesson_on"),
+            self._contracts,
+        )
+        self._load(Lesson, ("students_group_id", "teacher_id", "occurred_at", "notes"), self._lessons)
+        self._load(Payment, ("payment_method", "value", "paid_at", "description", "student_id", "contract_id"),
+                   self._payments)
+        self._load(TeacherPayments, ("teacher_id", "value", "paid_at", "payment_method", "description"),
+                   self._teacher_payments)
+        self._load(
+            Lead,
+            ("name", "goals", "birth_date", "interests", "email", "phone", "email_key", "phone_key", "student_id",
+             "contract_id", "converted_at"),
+            self._leads,
+        )
+        self._reset_sequences()
+        rebuild_funnel_summary()
+        self.log("Backfilling status history...")
+        for owner, history, field, active in (
+            (Student, StudentStatusHistory, "student", StudentsStatus.ACTIVE),
+            (Teacher, TeacherStatusHistory, "teacher", TeacherStatus.ACTIVE),
+        ):
+            self.counts[history._meta.db_table] = backfill_history(owner, history, field, active, self.connection.alias)
+        self.log("Rebuilding student ledgers...")
+        self.counts[LedgerEntry._meta.db_table] = rebuild_ledger(using=self.connection.alias)
+        return self.counts
+
+    def _load(self, model, columns, generate):
+        """
+        Load the rows of generate(next_id) and return the summaries it collected.
+
+        Generators yield (row, summary) pairs; row holds the values of columns
+        and summary is kept in memory for generating dependent tables.
+        """
+        has_timestamps = hasattr(model, "deleted_at")
+        all_columns = ("id",) + columns + (("created_at", "updated_at", "deleted_at") if has_timestamps else ())
+        first_id = (model._base_manager.using(self.connection.alias).aggregate(max_id=Max("id"))["max_id"] or 0) + 1
+        summaries = []
+
+        def rows():
+            for offset, (row, summary) in enumerate(generate()):
+                if summary:
+                    summaries.append((first_id + offset,) + summary)
+                yield (first_id + offset,) + row
+
+        self.log(f"Loading {model._meta.db_table}...")
+        with transaction.atomic(using=self.connection.alias):
+            count = self.loader.load(model, all_columns, rows())
+        self.counts[model._meta.db_table] = count
+        return summaries
+
+    def _reset_sequences(self):
+        models = [Product, Teacher, Student, StudentsGroup, StudentsGroup.students.through, Contract, Lesson,
+                  Payment, TeacherPayments, Lead]
+        statements = self.connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with self.connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+    # Helpers
+
+    def _moment(self, fraction):
+        return self.start + (self.end - self.start) * fraction
+
+    def _growth_moment(self):
+        """
+        Return a moment skewed towards the end of the period (a growing school).
+        """
+        return self._moment(self.rng.triangular(0, 1, 1))
+
+    def _stamps(self, created_at, parent_deleted=False):
+        """
+        Return (created_at, updated_at, deleted_at) for a row created at created_at.
+        """
+        span = max((self.end - created_at).total_seconds(), 0)
+        updated_at = created_at + timedelta(seconds=span * self.rng.random() ** 3)
+        deleted_at = None
+        if parent_deleted or self.rng.random() < self.deleted_fraction:
+            deleted_at = max(updated_at, created_at + timedelta(seconds=span * self.rng.random()))
+        return created_at, updated_at, deleted_at
+
+    def _name(self):
+        return f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+
+    def _birth_date(self):
+        age_days = round(self.rng.triangular(8, 65, 24) * 365.25)
+        return (self.end - timedelta(days=age_days)).date()
+
+    def _payment_method(self):
+        return self.rng.choices(list(PAYMENT_METHOD_WEIGHTS), weights=list(PAYMENT_METHOD_WEIGHTS.values()))[0]
+
+    def _weekly_slot(self, around):
+        """
+        Return the first weekday lesson slot (Monday to Saturday) on or after around.
+        """
+        day = around.date() + timedelta(days=self.rng.randrange(7))
+        if day.weekday() == 6:
+            day += timedelta(days=1)
+        hour = self.rng.choices(LESSON_HOURS, weights=LESSON_HOUR_WEIGHTS)[0]
+        return datetime.combine(day, time(hour), tzinfo=timezone.utc)
+
+    # Generators; each yields (row, summary)
+
+    def _products(self):
+        combinations = [(language, level) for language in LANGUAGES for level in LEVELS]
+        self.rng.shuffle(combinations)
+        for language, level in combinations[:self.plan[Product]]:
+            duration = self.rng.choice((12, 24, 36, 48))
+            price = Decimal(self.rng.randrange(30, 120) * duration // 12 * 10).quantize(Decimal("0.01"))
+            created_at, updated_at, deleted_at = self._stamps(self._moment(self.rng.random() * 0.2))
+            is_active = deleted_at is None and self.rng.random() > 0.1
+            row = (f"{language} {level}", f"{level} {language} course, {duration} lessons", price, duration,
+                   is_active, created_at, updated_at, deleted_at)
+            yield row, (price, duration, deleted_at is not None)
+
+    def _teachers(self):
+        for _ in range(self.plan[Teacher]):
+            name = self._name()
+            created_at, updated_at, deleted_at = self._stamps(self._moment(self.rng.triangular(0, 1, 0)))
+            status = TeacherStatus.FORMER if self.rng.random() < 0.15 else TeacherStatus.ACTIVE
+            pix_key = name.lower().replace(" ", ".") + f"{self.rng.randrange(100)}@pix.example.com"
+            row = (name, pix_key, status, created_at, updated_at, deleted_at)
+            yield row, (created_at, deleted_at is not None)
+
+    def _students(self):
+        for _ in range(self.students):
+            created_at, updated_at, deleted_at = self._stamps(self._growth_moment())
+            age = (created_at - self.start) / (self.end - self.start)
+            status = StudentsStatus.FORMER if self.rng.random() < 0.5 * (1 - age) else StudentsStatus.ACTIVE
+            extra_info = None if self.rng.random() < 0.7 else f"Prefers {self.rng.choice(LESSON_HOURS)}h lessons"
+            name, birth_date = self._name(), self._birth_date()
+            row = (name, birth_date, extra_info, status, created_at, updated_at, deleted_at)
+            # Students that came in through a lead keep the data for it.
+            converted = self.rng.random() < CONVERTED_STUDENT_FRACTION
+            yield row, (created_at, deleted_at is not None) + ((name, birth_date) if converted else (None, None))
+
+    def _groups(self):
+        live_teachers = [teacher for teacher in self.teachers if not teacher[2]] or self.teachers
+        for _ in range(self.plan[StudentsGroup]):
+            created_at = self._growth_moment()
+            teacher_id, _, teacher_deleted = self.rng.choice(live_teachers if self.rng.random() > 0.03
+                                                             else self.teachers)
+            created_at, updated_at, deleted_at = self._stamps(created_at, teacher_deleted)
+            scheduled_at = self._weekly_slot(created_at)
+            weeks = self.rng.randint(12, 104)
+            max_students = self.rng.randint(4, 20)
+            row = (scheduled_at, teacher_id, max_students, created_at, updated_at, deleted_at)
+            yield row, (created_at, scheduled_at, weeks, teacher_id, deleted_at is not None, max_students)
+
+    def _memberships(self):
+        # Students join groups with free seats that started around the time
+        # they enrolled; the window widens when the nearby groups are full.
+        by_created = sorted(self.groups, key=lambda group: group[1])
+        created = [group[1] for group in by_created]
+        seats = {group[0]: group[6] for group in by_created}
+        for student_id, student_created, *_ in self.student_rows:
+            index = bisect_left(created, student_created)
+            count = 2 if self.rng.random() < 0.2 else 1
+            width = 25
+            while True:
+                low, high = max(index - width, 0), min(index + width, len(by_created))
+                free = [group[0] for group in by_created[low:high] if seats[group[0]]]
+                if len(free) >= count or high - low == len(by_created):
+                    break
+                width *= 2
+            for group_id in self.rng.sample(free, min(count, len(free))):
+                seats[group_id] -= 1
+                yield (group_id, student_id), ()
+
+    def _contracts(self):
+        for student_id, student_created, student_deleted, *_ in self.student_rows:
+            count = self.rng.choices((1, 2, 3), weights=(75, 20, 5))[0]
+            for product_id, price, duration, product_deleted in self.rng.sample(self.products, count):
+                created_at = student_created + timedelta(minutes=self.rng.randrange(5, 240))
+                created_at, updated_at, deleted_at = self._stamps(created_at, student_deleted or product_deleted)
+                first_lesson_on = (created_at + timedelta(days=self.rng.randrange(15))).date()
+                last_lesson_on = first_lesson_on + timedelta(weeks=duration)
+                statements = self.rng.choices((1, 3, 6, 12), weights=(20, 15, 35, 30))[0]
+                method = self._payment_method()
+                row = (student_id, product_id, method, statements, first_lesson_on, last_lesson_on,
+                       created_at, updated_at, deleted_at)
+                yield row, (student_id, price, statements, method, first_lesson_on)
+
+    def _lessons(self):
+        live_teachers = [teacher[0] for teacher in self.teachers if not teacher[2]] or [self.teachers[0][0]]
+        for group_id, _, scheduled_at, weeks, teacher_id, group_deleted, _ in self.groups:
+            for week in range(weeks):
+                occurred_at = scheduled_at + timedelta(weeks=week, minutes=self.rng.randrange(-5, 10))
+                if occurred_at >= self.end:
+                    break
+                if self.rng.random() < 0.05:
+                    teacher_id_for_lesson = self.rng.choice(live_teachers)
+                else:
+                    teacher_id_for_lesson = teacher_id
+                created_at = occurred_at + timedelta(minutes=self.rng.randrange(60, 600))
+                created_at, updated_at, deleted_at = self._stamps(min(created_at, self.end), group_deleted)
+                notes = None if self.rng.random() < 0.6 else f"Covered unit {week + 1}"
+                yield (group_id, teacher_id_for_lesson, occurred_at, notes, created_at, updated_at, deleted_at), ()
+
+    def _payments(self):
+        for contract_id, student_id, price, statements, method, first_lesson_on in self.contracts:
+            value = (price / statements).quantize(Decimal("0.01"))
+            for number in range(statements):
+                month = first_lesson_on.month - 1 + number
+                due = date(first_lesson_on.year + month // 12, month % 12 + 1, 1)
+                day = min(max(round(self.rng.gauss(6, 3)), 1), 28)
+                paid_at = datetime.combine(due.replace(day=day), time(self.rng.randrange(7, 23)),
+                                           tzinfo=timezone.utc)
+                if paid_at >= self.end:
+                    break
+                created_at, updated_at, deleted_at = self._stamps(paid_at)
+                description = f"Contract #{contract_id} statement {number + 1}/{statements}"
+                yield (method, value, paid_at, description, student_id, contract_id, created_at, updated_at,
+                       deleted_at), ()
+
+    def _teacher_payments(self):
+        for teacher_id, teacher_created, teacher_deleted in self.teachers:
+            base = self.rng.randrange(1500, 6000)
+            months = math.floor((self.end - teacher_created).days / 30.44)
+            for number in range(1, months + 1):
+                month = teacher_created.month - 1 + number
+                paid_on = date(teacher_created.year + month // 12, month % 12 + 1, 5)
+                paid_at = datetime.combine(paid_on, time(10), tzinfo=timezone.utc)
+                if paid_at >= self.end:
+                    break
+                value = Decimal(base * self.rng.uniform(0.8, 1.2)).quantize(Decimal("0.01"))
+                created_at, updated_at, deleted_at = self._stamps(paid_at, teacher_deleted)
+                row = (teacher_id, value, paid_at, self._payment_method(), f"Salary {paid_on:%Y-%m}",
+                       created_at, updated_at, deleted_at)
+                yield row, ()
+
+    def _leads(self):
+        # The same person often arrives through several campaigns; repeat
+        # recent leads with formatting variations so deduplication has work to do.
+        peak = max(LEAD_SEASONALITY)
+        recent = deque(maxlen=1000)
+        for number in range(self.students * 2):
+            created_at = self._growth_moment()
+            while self.rng.random() > LEAD_SEASONALITY[created_at.month - 1] / peak:
+                created_at = self._growth_moment()
+            if recent and self.rng.random() < DUPLICATE_LEAD_FRACTION:
+                name, birth_date, email, phone = self.rng.choice(recent)
+                name = self.rng.choice((name.upper(), name.lower(), name))
+                email = email.upper() if email and self.rng.random() < 0.5 else email
+                if phone and self.rng.random() < 0.5:
+                    phone = "(" + phone[4:6] + ") " + phone[7:]
+            else:
+                first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+                name, birth_date = f"{first} {last}", self._birth_date()
+                email = None if self.rng.random() < 0.2 else f"{first}.{last}{number}@example.com".lower()
+                phone = None if self.rng.random() < 0.2 else (
+                    f"+55 11 9{self.rng.randrange(1000, 10000)}-{self.rng.randrange(1000, 10000)}"
+                )
+                recent.append((name, birth_date, email, phone))
+            yield self._lead_row(name, birth_date, email, phone, created_at), ()
+
+        # A conversion created the first contract of its student.
+        first_contracts = {}
+        for contract_id, student_id, *_ in self.contracts:
+            first_contracts.setdefault(student_id, contract_id)
+        for student_id, student_created, student_deleted, name, birth_date in self.student_rows:
+            if name is None:
+                continue
+            created_at = max(student_created - timedelta(days=self.rng.randint(1, 60)), self.start)
+            first, last = name.split(" ", 2)[:2]
+            email = None if self.rng.random() < 0.2 else f"{first}.{last}.{student_id}@example.com".lower()
+            phone = None if self.rng.random() < 0.2 else (
+                f"+55 11 9{self.rng.randrange(1000, 10000)}-{self.rng.randrange(1000, 10000)}"
+            )
+            yield self._lead_row(name, birth_date, email, phone, created_at, student_id,
+                                 first_contracts.get(student_id), student_created, student_deleted), ()
+
+    def _lead_row(self, name, birth_date, email, phone, created_at, student_id=None, contract_id=None,
+                  converted_at=None, parent_deleted=False):
+        interests = ", ".join(self.rng.sample(LANGUAGES, self.rng.randint(1, 3)))
+        created_at, updated_at, deleted_at = self._stamps(created_at, parent_deleted)
+        return (name, self.rng.choice(GOALS), birth_date, interests, email, phone, normalize_email(email),
+                normalize_phone(phone), student_id, contract_id, converted_at, created_at, updated_at, deleted_at)
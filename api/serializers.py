@@ -2,27 +2,72 @@
 API serializers for the NCC School Management system.
 """
 
+from datetime import datetime, timezone as dt_timezone
+
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from comercial.models import Product
-from financial.models import Payment, TeacherPayments
+from financial.models import DelinquencySnapshot, Payment, PaymentMethod, TeacherPayments
 from management.models import (
     Student, Teacher, Contract, StudentsGroup, Lesson
 )
-from crm.models import Lead
+from crm.dedup import find_duplicate
+from crm.models import FunnelMonthlySummary, Lead
+from common.instrumentation import timed
+from common.jobs import jobs_setting
+from common.models import AuditEntry, Job
+from .blacklist import blacklist
+from .tokens import VERSION_CLAIM, get_token_version
+
+
+class InstrumentedListSerializer(serializers.ListSerializer):
+    """
+    List serializer that reports serialization time to the request metrics.
+    """
+
+    @property
+    def data(self):
+        with timed("serialize"):
+            return super().data
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class InstrumentedModelSerializer(serializers.ModelSerializer):
+    """
+    Base model serializer that reports serialization time to the request metrics.
+
+    Database time spent while serializing (lazy querysets, related lookups)
+    is excluded and shows up under db instead.
+    """
+
+    @property
+    def data(self):
+        with timed("serialize"):
+            return super().data
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = cls.__dict__.get("Meta")
+        if meta is not None and not hasattr(meta, "list_serializer_class"):
+            meta.list_serializer_class = InstrumentedListSerializer
+
+
+class ProductSerializer(InstrumentedModelSerializer):
     """
     Serializer for Product model.
     """
     class Meta:
         model = Product
-        fields = "__all__"
+        exclude = ["change_seq"]
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(InstrumentedModelSerializer):
     """
     Serializer for Payment model.
+
+    A payment for a contract is credited to the contract's student when no
+    student is given.
     """
     payment_method_display = serializers.CharField(
         source="get_payment_method_display",
@@ -31,10 +76,85 @@ class PaymentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Payment
+        exclude = ["change_seq"]
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        contract = attrs.get("contract", getattr(self.instance, "contract", None))
+        if contract is not None:
+            student = attrs.get("student", getattr(self.instance, "student", None))
+            if student is None:
+                attrs["student"] = contract.student
+            elif student.pk != contract.student_id:
+                raise serializers.ValidationError({"student": "The contract belongs to another student."})
+        return attrs
+
+
+class DelinquencySnapshotSerializer(InstrumentedModelSerializer):
+    """
+    Serializer for DelinquencySnapshot model.
+    """
+    student_name = serializers.CharField(source="student.name", read_only=True)
+
+    class Meta:
+        model = DelinquencySnapshot
         fields = "__all__"
 
 
-class TeacherPaymentsSerializer(serializers.ModelSerializer):
+class AuditEntrySerializer(InstrumentedModelSerializer):
+    """
+    Serializer for AuditEntry model.
+    """
+    model = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AuditEntry
+        fields = ["id", "model", "object_id", "action", "changes", "actor", "created_at"]
+
+    def get_model(self, obj):
+        return f"{obj.content_type.app_label}.{obj.content_type.model}"
+
+
+class JobSerializer(InstrumentedModelSerializer):
+    """
+    Serializer for Job model; everything but the task, its arguments and priority is read-only.
+    """
+    task = serializers.ChoiceField(choices=[], help_text="Name of the task to run")
+
+    class Meta:
+        model = Job
+        fields = [
+            "id", "task", "args", "status", "priority", "attempts", "max_attempts", "progress", "progress_message",
+            "result", "error", "run_after", "created_by", "created_at", "started_at", "finished_at",
+        ]
+        read_only_fields = [
+            "status", "attempts", "max_attempts", "progress", "progress_message", "result", "error", "run_after",
+            "created_by", "created_at", "started_at", "finished_at",
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["task"].choices = sorted(jobs_setting("TASKS", {}))
+
+    def validate_args(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Must be an object of keyword arguments.")
+        return value
+
+
+class DelinquencyRefreshSerializer(serializers.Serializer):
+    """
+    Students whose delinquency snapshot is recomputed.
+    """
+    students = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=100,
+        help_text="Ids of the students to recompute"
+    )
+
+
+class TeacherPaymentsSerializer(InstrumentedModelSerializer):
     """
     Serializer for TeacherPayments model.
     """
@@ -46,10 +166,10 @@ class TeacherPaymentsSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = TeacherPayments
-        fields = "__all__"
+        exclude = ["change_seq"]
 
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(InstrumentedModelSerializer):
     """
     Serializer for Student model.
     """
@@ -60,10 +180,10 @@ class StudentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Student
-        fields = "__all__"
+        exclude = ["change_seq"]
 
 
-class TeacherSerializer(serializers.ModelSerializer):
+class TeacherSerializer(InstrumentedModelSerializer):
     """
     Serializer for Teacher model.
     """
@@ -74,10 +194,10 @@ class TeacherSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Teacher
-        fields = "__all__"
+        exclude = ["change_seq"]
 
 
-class ContractSerializer(serializers.ModelSerializer):
+class ContractSerializer(InstrumentedModelSerializer):
     """
     Serializer for Contract model.
     """
@@ -86,10 +206,10 @@ class ContractSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Contract
-        fields = "__all__"
+        exclude = ["change_seq"]
 
 
-class StudentsGroupSerializer(serializers.ModelSerializer):
+class StudentsGroupSerializer(InstrumentedModelSerializer):
     """
     Serializer for StudentsGroup model.
     """
@@ -103,10 +223,10 @@ class StudentsGroupSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = StudentsGroup
-        fields = "__all__"
+        exclude = ["change_seq"]
 
 
-class LessonSerializer(serializers.ModelSerializer):
+class LessonSerializer(InstrumentedModelSerializer):
     """
     Serializer for Lesson model.
     """
@@ -115,16 +235,124 @@ class LessonSerializer(serializers.ModelSerializer):
         source="students_group.__str__",
         read_only=True
     )
+    present_count = serializers.ReadOnlyField()
 
     class Meta:
         model = Lesson
-        fields = "__all__"
+        exclude = ["attendance_roster", "change_seq"]
 
 
-class LeadSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(serializers.Serializer):
+    """
+    Attendance of a lesson: the roster students who were absent.
+    """
+    absent = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=True,
+        max_length=1000,
+        help_text="Ids of the roster students who missed the lesson"
+    )
+
+
+class LeadSerializer(InstrumentedModelSerializer):
     """
     Serializer for Lead model.
+
+    Rejects leads whose email or phone matches an existing lead once
+    normalized (see ``crm.dedup.find_duplicate``).
     """
     class Meta:
         model = Lead
-        fields = "__all__"
+        exclude = ["change_seq"]
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        instance = self.instance
+        email = attrs.get("email", getattr(instance, "email", None))
+        phone = attrs.get("phone", getattr(instance, "phone", None))
+        if instance is not None and (email, phone) == (instance.email, instance.phone):
+            return attrs
+        duplicate = find_duplicate(email, phone, exclude_pk=getattr(instance, "pk", None))
+        if duplicate is not None:
+            pk, field = duplicate
+            raise serializers.ValidationError(
+                {field: f"A lead with this {field} already exists (lead {pk})."}, code="duplicate"
+            )
+        return attrs
+
+
+class LeadConversionListSerializer(serializers.ListSerializer):
+    """
+    Validates a batch of conversions, resolving all products with one query.
+    """
+
+    def validate(self, attrs):
+        product_ids = {conversion["product"] for conversion in attrs}
+        products = Product.objects.filter(is_active=True).in_bulk(product_ids)
+        missing = sorted(product_ids - set(products))
+        if missing:
+            raise serializers.ValidationError(
+                f"Unknown or inactive product(s): {', '.join(map(str, missing))}"
+            )
+        for conversion in attrs:
+            conversion["product"] = products[conversion["product"]]
+        return attrs
+
+
+class LeadConversionSerializer(serializers.Serializer):
+    """
+    Serializer for converting one lead into a student with a contract.
+    """
+    lead = serializers.IntegerField(help_text="Lead to convert")
+    product = serializers.IntegerField(help_text="Product of the contract created for the new student")
+    payment_method = serializers.ChoiceField(choices=PaymentMethod.choices, required=False, allow_null=True)
+    statements = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+    first_lesson_on = serializers.DateField(required=False, allow_null=True)
+    last_lesson_on = serializers.DateField(required=False, allow_null=True)
+
+    class Meta:
+        list_serializer_class = LeadConversionListSerializer
+
+    def validate(self, attrs):
+        first, last = attrs.get("first_lesson_on"), attrs.get("last_lesson_on")
+        if first and last and last < first:
+            raise serializers.ValidationError({"last_lesson_on": "Must not be before first_lesson_on."})
+        return attrs
+
+
+class FunnelMonthlySummarySerializer(InstrumentedModelSerializer):
+    """
+    Serializer for monthly funnel counters.
+    """
+    conversion_rate = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = FunnelMonthlySummary
+        fields = ["month", "leads", "converted", "contracts", "conversion_rate"]
+
+
+class BlacklistTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer that rejects revoked refresh tokens and revokes rotated ones.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        jti = refresh[api_settings.JTI_CLAIM]
+
+        if blacklist.is_revoked(jti):
+            raise InvalidToken("Token is blacklisted")
+
+        if VERSION_CLAIM in refresh:
+            user_id = refresh.get(api_settings.USER_ID_CLAIM)
+            if refresh[VERSION_CLAIM] != get_token_version(user_id):
+                raise InvalidToken("Token has been revoked")
+
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            # Revoking before rotating makes concurrent reuse of the same
+            # refresh token fail on the unique JTI instead of racing.
+            expires_at = datetime.fromtimestamp(refresh["exp"], tz=dt_timezone.utc)
+            if not blacklist.revoke(jti, expires_at):
+                raise InvalidToken("Token is blacklisted")
+
+        return super().validate(attrs)
@@ -0,0 +1,218 @@
+"""
+Signal handlers for the NCC School Management API.
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from comercial.models import Product
+from financial.forecasting import bump_forecast_version
+from financial.models import Payment
+from management.models import Contract, Lesson, Student, StudentsGroup, Teacher
+from .calendars import bump_calendar_version
+from .overview import bump_group_overview_version, bump_overview_version
+from .tokens import bump_token_version
+
+User = get_user_model()
+
+# Fields embedded in issued tokens; changing any of them revokes the user's tokens.
+TOKEN_FIELDS = ("is_active", "is_staff", "is_superuser", "password")
+
+
+@receiver(pre_save, sender=User)
+def detect_token_field_changes(sender, instance, update_fields=None, **kwargs):
+    """
+    Remember whether a save changes any field embedded in the user's tokens.
+    """
+    instance._token_fields_changed = False
+    if instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(TOKEN_FIELDS):
+        return
+    previous = sender.objects.filter(pk=instance.pk).values(*TOKEN_FIELDS).first()
+    if previous is None:
+        return
+    instance._token_fields_changed = any(
+        previous[field] != getattr(instance, field) for field in TOKEN_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_user_change(sender, instance, created, **kwargs):
+    """
+    Revoke issued tokens when a user's activity, privileges or password change.
+    """
+    if not created and getattr(instance, "_token_fields_changed", False):
+        bump_token_version(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def revoke_tokens_on_user_permissions_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Revoke issued tokens when a user's groups or direct permissions change.
+    """
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        bump_token_version(instance.pk)
+    else:
+        for user_id in pk_set or ():
+            bump_token_version(user_id)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def revoke_tokens_on_group_permissions_change(sender, instance, action, reverse, **kwargs):
+    """
+    Revoke tokens of every member when a group's permissions change.
+    """
+    if action not in ("post_add", "post_remove", "post_clear") or reverse:
+        return
+    for user_id in instance.user_set.values_list("pk", flat=True):
+        bump_token_version(user_id)
+
+
+def _bump_calendars(*teacher_ids):
+    # Bump after commit only, so a calendar rebuilt by another request before
+    # the commit (from the old data) is not kept.
+    transaction.on_commit(lambda: bump_calendar_version(*teacher_ids))
+
+
+@receiver(pre_save, sender=Lesson)
+@receiver(pre_save, sender=StudentsGroup)
+def detect_teacher_change(sender, instance, update_fields=None, **kwargs):
+    """
+    Remember the previous teacher of a lesson or group moved to another teacher.
+
+    The teacher it was loaded with is kept by ``TeacherSnapshotMixin``, so
+    this costs no query.
+    """
+    previous = getattr(instance, "_loaded_teacher_id", None)
+    saved = update_fields is None or "teacher" in update_fields or "teacher_id" in update_fields
+    instance._previous_teacher_id = previous if saved and previous != instance.teacher_id else None
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=StudentsGroup)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=StudentsGroup)
+def invalidate_teacher_calendar(sender, instance, **kwargs):
+    """
+    Invalidate the calendars of the teachers of a saved or deleted lesson or group.
+    """
+    _bump_calendars(instance.teacher_id, getattr(instance, "_previous_teacher_id", None))
+
+
+@receiver(post_save, sender=Teacher)
+def invalidate_calendar_on_teacher_change(sender, instance, created, **kwargs):
+    """
+    Invalidate a teacher's calendars when the teacher changes.
+    """
+    if not created:
+        _bump_calendars(instance.pk)
+
+
+@receiver(m2m_changed, sender=StudentsGroup.students.through)
+def invalidate_calendar_on_group_students_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidate calendars whose group student counts changed.
+    """
+    if reverse and action == "pre_clear":
+        # A student leaving all groups: find them before they are cleared.
+        _bump_calendars(*instance.groups.values_list("teacher_id", flat=True))
+    elif action in ("post_add", "post_remove", "post_clear") and not reverse:
+        _bump_calendars(instance.teacher_id)
+    elif action in ("post_add", "post_remove") and pk_set:
+        _bump_calendars(*StudentsGroup.objects.filter(pk__in=pk_set).values_list("teacher_id", flat=True))
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Contract)
+@receiver(post_delete, sender=Payment)
+def invalidate_revenue_forecast(sender, instance, **kwargs):
+    """
+    Invalidate cached revenue forecasts when contracts, payments, prices or student statuses change.
+    """
+    # Same reasoning as _bump_calendars: a forecast rebuilt before commit must not be kept.
+    transaction.on_commit(bump_forecast_version)
+
+
+def _bump_overviews(*student_ids):
+    # Same reasoning as _bump_calendars: an overview rebuilt before commit must not be kept.
+    student_ids = list(student_ids)
+    transaction.on_commit(lambda: bump_overview_version(*student_ids))
+
+
+def _bump_group_overviews(*group_ids):
+    transaction.on_commit(lambda: bump_group_overview_version(*group_ids))
+
+
+@receiver(pre_save, sender=Contract)
+@receiver(pre_save, sender=Payment)
+def detect_student_change(sender, instance, update_fields=None, **kwargs):
+    """
+    Remember the previous student of a contract or payment moved to another student.
+
+    The student it was loaded with comes from its audit snapshot, so this
+    costs no query.
+    """
+    previous = instance.loaded_value("student_id")
+    instance._previous_student_id = previous if previous != instance.student_id else None
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Contract)
+@receiver(post_delete, sender=Payment)
+def invalidate_overview_of_student(sender, instance, **kwargs):
+    """
+    Invalidate the overviews of the students of a saved or deleted contract or payment.
+    """
+    _bump_overviews(instance.student_id, getattr(instance, "_previous_student_id", None))
+
+
+@receiver(post_save, sender=Student)
+def invalidate_overview_on_student_change(sender, instance, created, **kwargs):
+    """
+    Invalidate a student's overview when the student changes.
+    """
+    if not created:
+        _bump_overviews(instance.pk)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_overview_on_lesson_change(sender, instance, **kwargs):
+    """
+    Invalidate the overviews of the students of a saved or deleted lesson's group.
+    """
+    _bump_group_overviews(instance.students_group_id)
+
+
+@receiver(post_save, sender=StudentsGroup)
+@receiver(post_delete, sender=StudentsGroup)
+def invalidate_overview_on_group_change(sender, instance, created=False, **kwargs):
+    """
+    Invalidate the overviews of the students of a saved or deleted group.
+    """
+    if not created:
+        _bump_group_overviews(instance.pk)
+
+
+@receiver(m2m_changed, sender=StudentsGroup.students.through)
+def invalidate_overview_on_group_students_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidate the overviews of students who joined or left a group.
+    """
+    if reverse and action in ("post_add", "post_remove", "post_clear"):
+        _bump_overviews(instance.pk)
+    elif not reverse and action == "post_clear":
+        _bump_group_overviews(instance.pk)
+    elif not reverse and action in ("post_add", "post_remove"):
+        _bump_overviews(*(pk_set or ()))
@@ -0,0 +1,167 @@
+"""
+Incremental sync for the NCC School Management system.
+
+Every write of a ``BaseModel`` row stamps it with a new change sequence
+number drawn by the database (``change_seq``, see
+``common.models.ChangeSequenceMixin``), so clients page through changes by
+``(change_seq, id)`` instead of timestamps, which clock skew and ties make
+lossy. List endpoints with ``ChangeSyncMixin`` accept
+``?changed_since=<cursor>`` and return the rows created or updated after
+the cursor, tombstones (``{"id", "deleted_at"}``) for the rows soft-deleted
+since, and the cursor of the next call; both reads are range scans of the
+``change_seq`` index.
+
+On PostgreSQL a number is drawn when a transaction writes but becomes
+visible when it commits, so numbers can show up after greater ones. The
+cursor therefore stops before the first change written by a transaction
+younger than the oldest one still running (the snapshot's xmin), however
+long that one runs, and before changes younger than ``SYNC["SAFETY_LAG"]``
+seconds. Changes past the cursor are returned again by the next call, so
+clients must apply changes by id. Hard deletes are not reported.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, Value
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+START = (0, 0)
+
+
+def _sync_setting(name, default):
+    return getattr(settings, "SYNC", {}).get(name, default)
+
+
+def parse_cursor(value):
+    """
+    Return the (change_seq, id) position of a cursor; an empty cursor or "0" is the start.
+
+    Raises ValueError for malformed cursors.
+    """
+    if not value:
+        return START
+    seq, _, pk = value.partition(".")
+    try:
+        position = int(seq), int(pk or 0)
+    except ValueError:
+        position = (-1, -1)
+    if min(position) < 0:
+        raise ValueError("'changed_since' must be a cursor returned by a previous sync, or 0 to start")
+    return position
+
+
+def format_cursor(position):
+    """
+    Return the cursor of a (change_seq, id) position.
+    """
+    return "{}.{}".format(*position)
+
+
+def parse_limit(value=None):
+    """
+    Return the requested number of changes, DEFAULT_LIMIT by default.
+
+    Raises ValueError for values that are not integers from 1 to MAX_LIMIT.
+    """
+    if not value:
+        return _sync_setting("DEFAULT_LIMIT", 500)
+    maximum = _sync_setting("MAX_LIMIT", 1000)
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= maximum:
+        raise ValueError(f"'limit' must be an integer between 1 and {maximum}")
+    return limit
+
+
+def _after(queryset, position):
+    seq, pk = position
+    return queryset.filter(change_seq__gte=seq).exclude(change_seq=seq, id__lte=pk).order_by("change_seq", "id")
+
+
+def committed_before_running(queryset):
+    """
+    Return an expression telling whether a row of queryset was written before every running transaction began.
+
+    Only such rows are final: a transaction still running may have drawn
+    smaller change sequence numbers than later writers. On PostgreSQL it
+    compares the row's xmin with the xmin of the current snapshot (``age``
+    handles xid wraparound, once the snapshot's 64-bit xid is cut down to
+    the 32 bits of xmin); other databases serialize writes, so every visible
+    row qualifies.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return Value(True)
+    table = connection.ops.quote_name(queryset.model._meta.db_table)
+    oldest_running = "(pg_snapshot_xmin(pg_current_snapshot())::text::bigint % 4294967296)::text::xid"
+    return RawSQL(f"age({table}.xmin) > age({oldest_running})", [], output_field=BooleanField())
+
+
+def changes_since(live, deleted, position, limit, now=None):
+    """
+    Return the first limit changes after position among live rows and soft-deleted rows (querysets).
+
+    Returns (rows, tombstones, next position, has_more). Tombstones are
+    left out when syncing from the start. The next position is that of the
+    last change before the first one that is not settled yet (see the
+    module docstring), or position when there is none.
+    """
+    live = _after(live, position).annotate(sync_settled=committed_before_running(live))
+    changes = [
+        (row.change_seq, row.pk, row.updated_at, row.sync_settled, row) for row in live[:limit + 1]
+    ]
+    if position != START:
+        deleted = _after(deleted, position).annotate(sync_settled=committed_before_running(deleted))
+        changes += [
+            (
+                row["change_seq"], row["id"], row["updated_at"], row["sync_settled"],
+                {"id": row["id"], "deleted_at": row["deleted_at"]},
+            )
+            for row in deleted.values("id", "deleted_at", "change_seq", "updated_at", "sync_settled")[:limit + 1]
+        ]
+    changes.sort(key=lambda change: change[:2])
+    page = changes[:limit]
+    settled_before = (now or timezone.now()) - timedelta(seconds=_sync_setting("SAFETY_LAG", 30))
+    cursor, settled = position, 0
+    for seq, pk, updated_at, committed, _ in page:
+        if not committed or updated_at > settled_before:
+            break
+        cursor, settled = (seq, pk), settled + 1
+    rows = [change[4] for change in page if not isinstance(change[4], dict)]
+    tombstones = [change[4] for change in page if isinstance(change[4], dict)]
+    return rows, tombstones, cursor, len(changes) > limit and settled == len(page)
+
+
+class ChangeSyncMixin:
+    """
+    ViewSet mixin answering ``list`` requests with ``?changed_since=<cursor>`` with the changes since the cursor.
+
+    The list filters and search apply to rows and tombstones alike; rows
+    that stop matching them are not reported.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if "changed_since" not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        try:
+            position = parse_cursor(request.query_params["changed_since"])
+            limit = parse_limit(request.query_params.get("limit"))
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.get_queryset()
+        live = self.filter_queryset(queryset)
+        deleted = self.filter_queryset(queryset.model.objects.only_deleted())
+        rows, tombstones, cursor, has_more = changes_since(live, deleted, position, limit)
+        return Response({
+            "results": self.get_serializer(rows, many=True).data,
+            "deleted": tombstones,
+            "cursor": format_cursor(cursor),
+            "has_more": has_more,
+        })
@@ -0,0 +1,35 @@
+"""
+Background job tasks of the api app (see ``common.jobs``).
+"""
+
+from .imports import CsvImporter, rejects_path, upload_path
+
+
+def import_csv_task(job, target, upload, dry_run=False):
+    """
+    Import a CSV file stored by ``api.imports.save_upload`` into target.
+
+    Returns the import summary with up to ``MAX_REPORTED_ERRORS`` row errors.
+    All rejected rows are written to a CSV file next to the upload, named in
+    the summary as ``rejects_file`` and served by ``GET /api/jobs/{id}/rejects/``.
+    The upload is deleted once the import succeeds or its last attempt fails,
+    the rejects file along with it unless the import succeeded with rejects;
+    ``prune_imports`` removes those later.
+    """
+    path = upload_path(upload)
+    rejects = rejects_path(upload)
+    succeeded = False
+    try:
+        job.progress(0, message=f"Importing {target}")
+        with open(path, newline="", encoding="utf-8-sig") as csv_file, \
+                open(rejects, "w", newline="", encoding="utf-8") as rejects_file:
+            summary = CsvImporter(target).run(csv_file, rejects_file=rejects_file, dry_run=dry_run)
+        if summary["rejected"]:
+            summary["rejects_file"] = rejects.name
+        succeeded = True
+        return summary
+    finally:
+        if succeeded or job.job.attempts >= job.job.max_attempts:
+            path.unlink(missing_ok=True)
+        if not (succeeded and summary["rejected"]):
+            rejects.unlink(missing_ok=True)
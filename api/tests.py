@@ -2,17 +2,49 @@
 Tests for API views and serializers.
 """
 
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from django.contrib.auth.models import User
+from django.contrib.auth.models import User, Permission
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.utils import timezone
 from decimal import Decimal
-from datetime import date
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 
 from comercial.models import Product
-from management.models import Student, Teacher
-from crm.models import Lead
+from common.audit import audit_scope
+from common.cache import TTLCache, is_shared
+from common.jobs import claim, execute
+from common.models import Job
+from management.attendance import mark_attendance
+from management.models import Contract, Lesson, Student, StudentsGroup, Teacher
+from crm.models import FunnelMonthlySummary, Lead
+from financial.delinquency import detect_delinquency
+from financial.models import Payment
+from .benchmark import compare, run_benchmarks, seed
+from .calendars import feed_token, week_range
+from .authentication import ClaimsUser, StatelessJWTAuthentication
+from .blacklist import BloomFilter, TokenBlacklist
+from .imports import CsvImporter
+from .seeding import ScaleSeeder
+from .models import RevokedToken
+from .throttling import LocalBucketStore
+from .views import ProductViewSet
+from .tokens import bump_token_version, get_token_version, tokens_for_user
 
 
 class APITestCase(APITestCase):
@@ -233,6 +265,18 @@ class LeadAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Lead.objects.count(), 1)
 
+    def test_create_duplicate_lead(self):
+        """
+        Test that a lead with an already registered email or phone is rejected.
+        """
+        url = reverse("lead-list")
+        self.client.post(url, self.lead_data)
+        duplicate = dict(self.lead_data, email="JOHN@example.com", phone="")
+        response = self.client.post(url, duplicate)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("email", response.data)
+        self.assertEqual(Lead.objects.count(), 1)
+
     def test_list_leads(self):
         """
         Test listing leads via API.
@@ -249,6 +293,735 @@ class LeadAPITest(APITestCase):
         self.assertEqual(len(response.data["results"]), 1)
 
 
+class LeadConversionAPITest(APITestCase):
+    """
+    Test cases for the lead conversion and funnel endpoints.
+    """
+
+    def setUp(self):
+        """
+        Set up test data and conversion permissions.
+        """
+        super().setUp()
+        self.product = Product.objects.create(name="English", description="General English", price=Decimal("100"))
+        self.leads = [
+            Lead.objects.create(name=f"Lead {number}", goals="Learn English", birth_date=date(2000, 1, 1))
+            for number in range(3)
+        ]
+        for codename in ("change_lead", "add_student", "add_contract"):
+            self.user.user_permissions.add(Permission.objects.get(codename=codename))
+
+    def test_bulk_convert(self):
+        """
+        Test converting several leads in one request.
+        """
+        payload = [
+            {"lead": lead.pk, "product": self.product.pk, "payment_method": "pix", "statements": 12}
+            for lead in self.leads[:2]
+        ]
+        response = self.client.post(reverse("lead-convert"), payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 2)
+        self.assertTrue(all(item["student"] for item in response.data))
+        self.assertEqual(Contract.objects.filter(payment_method="pix", statements=12).count(), 2)
+
+        response = self.client.post(reverse("lead-convert"), payload[:1], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Student.objects.count(), 2)
+
+    def test_convert_one(self):
+        """
+        Test converting a single lead through its detail route.
+        """
+        url = reverse("lead-convert-one", args=[self.leads[0].pk])
+        response = self.client.post(url, {"product": self.product.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNotNone(response.data["converted_at"])
+
+        response = self.client.post(url, {"product": 0}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_convert_requires_permissions(self):
+        """
+        Test that converting requires permission to create students and contracts.
+        """
+        self.user.user_permissions.remove(Permission.objects.get(codename="add_contract"))
+        self.user = User.objects.get(pk=self.user.pk)
+        url = reverse("lead-convert-one", args=[self.leads[0].pk])
+        response = self.client.post(url, {"product": self.product.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Student.objects.count(), 0)
+
+    def test_funnel(self):
+        """
+        Test the monthly funnel summary endpoint.
+        """
+        self.client.post(reverse("lead-convert"), [{"lead": self.leads[0].pk, "product": self.product.pk}],
+                         format="json")
+        month = timezone.localdate().strftime("%Y-%m")
+        response = self.client.get(reverse("lead-funnel"), {"from": month, "to": month})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        row = response.data[0]
+        self.assertEqual((row["leads"], row["converted"], row["contracts"]), (3, 1, 1))
+
+        response = self.client.get(reverse("lead-funnel"), {"from": "2024-13"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TeacherCalendarAPITest(APITestCase):
+    """
+    Test cases for teacher calendars and ICS feeds.
+    """
+
+    def setUp(self):
+        """
+        Set up a teacher with a weekly group and lessons this week.
+        """
+        super().setUp()
+        self.teacher = Teacher.objects.create(name="Jane Smith", pix_key="jane@example.com")
+        self.week_start, _ = week_range()
+        self.group = StudentsGroup.objects.create(
+            teacher=self.teacher, scheduled_at=self.week_start - timedelta(weeks=2) + timedelta(hours=10)
+        )
+        self.group.students.add(Student.objects.create(name="Student", birth_date=date(2000, 1, 1)))
+        self.lessons = [
+            Lesson.objects.create(students_group=self.group, teacher=self.teacher,
+                                  occurred_at=self.week_start + timedelta(days=days, hours=10), notes="Unit 1, part 2")
+            for days in (0, 7)
+        ]
+        self.url = reverse("teacher-calendar", args=[self.teacher.pk])
+
+    def test_calendar_defaults_to_this_week(self):
+        """
+        Test that the calendar returns this week's group occurrences and lessons in bounded queries.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(len(queries.captured_queries), 4)
+        self.assertEqual([lesson["id"] for lesson in response.data["lessons"]], [self.lessons[0].pk])
+        group = response.data["groups"][0]
+        self.assertEqual((group["id"], group["students_count"]), (self.group.pk, 1))
+        self.assertEqual(group["occurrences"], [self.week_start + timedelta(hours=10)])
+        self.assertIn("calendar.ics?token=", response.data["ics_url"])
+
+    def test_calendar_range(self):
+        """
+        Test explicit and invalid ranges.
+        """
+        start = (self.week_start + timedelta(days=7)).date().isoformat()
+        response = self.client.get(self.url, {"start": start, "end": f"{start}T23:59:59"})
+        self.assertEqual([lesson["id"] for lesson in response.data["lessons"]], [self.lessons[1].pk])
+
+        for params in ({"start": "yesterday"}, {"start": "2024-02-01", "end": "2024-01-01"},
+                       {"start": "2024-01-01", "end": "2025-01-01"}):
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_calendar_conditional_get(self):
+        """
+        Test that an unchanged calendar answers 304 until a lesson change commits.
+        """
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.lessons[0].notes = "Unit 2"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lessons[0].save()
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["lessons"][0]["notes"], "Unit 2")
+
+    def test_calendar_invalidated_when_lesson_moves(self):
+        """
+        Test that moving a lesson to another teacher refreshes both calendars, without reading the old teacher.
+        """
+        other = Teacher.objects.create(name="John Roe", pix_key="john@example.com")
+        other_url = reverse("teacher-calendar", args=[other.pk])
+        self.assertEqual(self.client.get(other_url).data["lessons"], [])
+        self.client.get(self.url)
+
+        lesson = Lesson.objects.get(pk=self.lessons[0].pk)
+        lesson.teacher = other
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+            lesson.save()
+        self.assertEqual(self.client.get(self.url).data["lessons"], [])
+        self.assertEqual(len(self.client.get(other_url).data["lessons"]), 1)
+
+        lesson.teacher = self.teacher
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson.save(update_fields=["teacher"])
+        self.assertEqual(self.client.get(other_url).data["lessons"], [])
+        self.assertEqual(len(self.client.get(self.url).data["lessons"]), 1)
+
+    def test_ics_feed(self):
+        """
+        Test the token-protected ICS feed and its conditional GET.
+        """
+        url = reverse("teacher_calendar_feed", args=[self.teacher.pk])
+        client = APIClient()
+        self.assertEqual(client.get(url, {"token": "wrong"}).status_code, status.HTTP_403_FORBIDDEN)
+
+        response = client.get(url, {"token": feed_token(self.teacher.pk)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        body = response.content.decode()
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\n"))
+        self.assertIn("RRULE:FREQ=WEEKLY", body)
+        self.assertIn(f"UID:lesson-{self.lessons[1].pk}@ncc-school-management", body)
+        self.assertIn("DESCRIPTION:Unit 1\\, part 2", body)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, {"token": feed_token(self.teacher.pk)}, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries.captured_queries), 0)
+
+
+class AttendanceAPITest(APITestCase):
+    """
+    Test cases for the attendance endpoints.
+    """
+
+    def setUp(self):
+        """
+        Set up a group with students and a lesson.
+        """
+        super().setUp()
+        teacher = Teacher.objects.create(name="Jane Smith", pix_key="jane@example.com")
+        group = StudentsGroup.objects.create(scheduled_at=timezone.now(), teacher=teacher)
+        self.students = [
+            Student.objects.create(name=f"Student {number}", birth_date=date(2000, 1, 1)) for number in range(4)
+        ]
+        group.students.add(*self.students)
+        self.lesson = Lesson.objects.create(students_group=group, teacher=teacher, occurred_at=timezone.now())
+        self.url = reverse("lesson-attendance", args=[self.lesson.pk])
+
+    def test_mark_and_read_attendance(self):
+        """
+        Test marking a lesson's attendance in one request and reading it back.
+        """
+        absent = self.students[0].pk
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {"absent": [absent]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(len(queries.captured_queries), 20)
+        self.assertEqual((response.data["present_count"], response.data["absent"]), (3, [absent]))
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["roster"], [student.pk for student in self.students])
+        lesson = self.client.get(reverse("lesson-detail", args=[self.lesson.pk])).data
+        self.assertEqual((lesson["absent_count"], lesson["present_count"]), (1, 3))
+        self.assertNotIn("attendance_roster", lesson)
+
+        response = self.client.post(self.url, {"absent": [0]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_student_attendance_rates(self):
+        """
+        Test the per-student attendance and the low-attendance listing.
+        """
+        self.client.post(self.url, {"absent": [self.students[0].pk]}, format="json")
+
+        response = self.client.get(reverse("student-attendance", args=[self.students[0].pk]))
+        self.assertEqual((response.data["lessons"], response.data["absences"]), (1, 1))
+        self.assertEqual(response.data["attendance_rate"], 0.0)
+
+        response = self.client.get(reverse("student-attendance-rates"), {"max_rate": "0.5"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["student"] for row in response.data["results"]], [self.students[0].pk])
+        response = self.client.get(reverse("student-attendance-rates"))
+        self.assertEqual(response.data["count"], 4)
+        self.assertEqual(
+            self.client.get(reverse("student-attendance-rates"), {"max_rate": "low"}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class StudentLedgerAPITest(APITestCase):
+    """
+    Test cases for the student ledger endpoints.
+    """
+
+    def setUp(self):
+        """
+        Set up students with contracts and payments.
+        """
+        super().setUp()
+        product = Product.objects.create(name="English", price=Decimal("400.00"))
+        self.students = [
+            Student.objects.create(name=f"Student {number}", birth_date=date(2000, 1, 1)) for number in range(3)
+        ]
+        for student in self.students:
+            Contract.objects.create(student=student, product=product)
+        self.contract = Contract.objects.get(student=self.students[0])
+
+    def test_payment_for_contract_credits_student(self):
+        """
+        Test that a payment for a contract is credited to the contract's student.
+        """
+        response = self.client.post(reverse("payment-list"), {
+            "payment_method": "pix", "value": "150.00", "paid_at": timezone.now().isoformat(),
+            "contract": self.contract.pk,
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["student"], self.students[0].pk)
+
+        response = self.client.get(reverse("student-ledger", args=[self.students[0].pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["balance"], Decimal("250.00"))
+        self.assertEqual([entry["kind"] for entry in response.data["entries"]], ["payment", "charge"])
+
+        response = self.client.post(reverse("payment-list"), {
+            "payment_method": "pix", "value": "10.00", "paid_at": timezone.now().isoformat(),
+            "contract": self.contract.pk, "student": self.students[1].pk,
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_ledgers_in_constant_queries(self):
+        """
+        Test that the batch endpoint's queries do not grow with the number of students.
+        """
+        url = reverse("student-ledgers")
+        ids = ",".join(str(student.pk) for student in self.students)
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(url, {"ids": str(self.students[0].pk)})
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url, {"ids": ids, "entries": "1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(many.captured_queries), len(one.captured_queries))
+        self.assertEqual([row["student"] for row in response.data], [student.pk for student in self.students])
+        self.assertTrue(all(row["balance"] == Decimal("400.00") for row in response.data))
+
+        for params in ({}, {"ids": "1,x"}, {"ids": ids, "entries": "0"}):
+            self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DelinquencyAPITest(APITestCase):
+    """
+    Test cases for the delinquency endpoints.
+    """
+
+    def setUp(self):
+        """
+        Set up two students with unpaid contracts and run the job.
+        """
+        super().setUp()
+        self.students = []
+        for number, price in enumerate(("100.00", "250.00")):
+            student = Student.objects.create(name=f"Student {number}", birth_date=date(2000, 1, 1))
+            product = Product.objects.create(name=f"Course {number}", price=Decimal(price))
+            Contract.objects.create(student=student, product=product, first_lesson_on=date(2026, 1, 1))
+            self.students.append(student)
+        call_command("detect_delinquency", "--as-of", "2026-02-01", stdout=io.StringIO())
+
+    def test_list_filter_and_summary(self):
+        """
+        Test filtering the snapshot and summarizing the filtered rows.
+        """
+        response = self.client.get(reverse("delinquencysnapshot-list"), {"overdue__gte": "200"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row["student"] for row in response.data["results"]], [self.students[1].pk])
+        self.assertEqual(response.data["results"][0]["days_overdue"], 31)
+
+        response = self.client.get(reverse("delinquencysnapshot-summary"))
+        self.assertEqual((response.data["contracts"], response.data["students"]), (2, 2))
+        self.assertEqual(response.data["overdue"], Decimal("350.00"))
+
+    def test_refresh_one_student(self):
+        """
+        Test recomputing the snapshot of a student after a payment.
+        """
+        student = self.students[0]
+        Payment.objects.create(
+            payment_method="pix", value=Decimal("100.00"), paid_at=timezone.now(),
+            student=student, contract=student.contracts.get()
+        )
+        response = self.client.post(reverse("delinquencysnapshot-refresh"), {"students": [student.pk]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+        self.assertEqual(self.client.get(reverse("delinquencysnapshot-list")).data["count"], 1)
+        response = self.client.post(reverse("delinquencysnapshot-refresh"), {"students": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RevenueForecastAPITest(APITestCase):
+    """
+    Test cases for the revenue forecast endpoint.
+    """
+
+    def test_forecast_scenarios(self):
+        """
+        Test the horizon, the custom churn scenario and parameter validation.
+        """
+        student = Student.objects.create(name="Ana", birth_date=date(2000, 1, 1))
+        product = Product.objects.create(name="English", price=Decimal("600.00"))
+        Contract.objects.create(student=student, product=product, statements=6, first_lesson_on=timezone.localdate())
+        url = reverse("revenue_forecast")
+
+        response = self.client.get(url, {"months": "6", "churn": "0.1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["months"]), 6)
+        self.assertEqual(response.data["scenarios"]["base"]["total"], Decimal("600.00"))
+        self.assertLess(response.data["scenarios"]["custom"]["total"], Decimal("600.00"))
+        self.assertEqual(self.client.get(url, {"months": "100"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TeacherUtilizationAPITest(APITestCase):
+    """
+    Test cases for the teacher utilization endpoints.
+    """
+
+    def test_utilization_overview_and_detail(self):
+        """
+        Test the overall and per-teacher heatmaps and period validation.
+        """
+        cache.clear()
+        teacher = Teacher.objects.create(name="Jane Smith", pix_key="jane@example.com")
+        group = StudentsGroup.objects.create(teacher=teacher, scheduled_at=timezone.now(), max_students=2)
+        group.students.add(Student.objects.create(name="Student", birth_date=date(2000, 1, 1)))
+        Lesson.objects.create(students_group=group, teacher=teacher, occurred_at=timezone.now())
+        url = reverse("teacher-utilization-overview")
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["lessons"], response.data["occupancy"]), (1, 0.5))
+        self.assertEqual(len(response.data["heatmap"]["lessons"]), 7)
+        self.assertEqual(response.data["teachers"][0]["name"], "Jane Smith")
+
+        response = self.client.get(reverse("teacher-utilization", args=[teacher.pk]), {"start": "2020-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {"start": "2020-01-01", "end": "2020-02-01"})
+        self.assertEqual((response.data["lessons"], response.data["occupancy"]), (0, None))
+
+
+class StatusHistoryAPITest(APITestCase):
+    """
+    Test cases for the status count and retention endpoints.
+    """
+
+    def test_status_counts_and_retention(self):
+        """
+        Test current and past status counts and the retention report.
+        """
+        student = Student.objects.create(name="Student", birth_date=date(2000, 1, 1))
+        Teacher.objects.create(name="Jane Smith", pix_key="jane@example.com")
+
+        response = self.client.get(reverse("student-status-counts"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["counts"], {"active": 1, "former": 0})
+        response = self.client.get(reverse("student-status-counts"), {"as_of": "2020-01-01"})
+        self.assertEqual(response.data["counts"], {"active": 0, "former": 0})
+        response = self.client.get(reverse("teacher-status-counts"), {"as_of": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(reverse("teacher-status-counts"))
+        self.assertEqual(response.data["counts"]["active"], 1)
+
+        student.status = "former"
+        student.save()
+        month = timezone.localdate().strftime("%Y-%m")
+        response = self.client.get(reverse("student-retention"), {"from": month, "to": month})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["active"], [0])
+        self.assertEqual(response.data["cohorts"], [{"cohort": month, "size": 1, "retention": [0.0]}])
+        response = self.client.get(reverse("student-retention"), {"from": "2020-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AuditAPITest(APITestCase):
+    """
+    Test cases for the audit log endpoint.
+    """
+
+    def test_entries_by_object_and_actor(self):
+        """
+        Test that staff can list entries of an object or a user and others cannot.
+        """
+        url = reverse("auditentry-list")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for_user(self.user).access_token}")
+
+        with audit_scope(actor=self.user), self.captureOnCommitCallbacks(execute=True):
+            student = Student.objects.create(name="Student", birth_date=date(2000, 1, 1))
+            Student.objects.create(name="Other", birth_date=date(2000, 1, 1))
+            student.name = "Renamed"
+            student.save()
+
+        response = self.client.get(url, {"model": "management.student", "object_id": student.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([entry["action"] for entry in response.data["results"]], ["update", "create"])
+        self.assertEqual(response.data["results"][0]["changes"], {"name": ["Student", "Renamed"]})
+        self.assertEqual(response.data["results"][0]["model"], "management.student")
+        response = self.client.get(url, {"actor": self.user.pk})
+        self.assertEqual(response.data["count"], 3)
+        response = self.client.get(url, {"model": "management.teacher"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class JobAPITest(APITestCase):
+    """
+    Test cases for the background job endpoints.
+    """
+
+    def test_queue_poll_and_cancel(self):
+        """
+        Test that staff queue jobs, creators poll them and queued jobs can be cancelled.
+        """
+        url = reverse("job-list")
+        self.assertEqual(self.client.post(url, {"task": "rebuild_ledger"}, format="json").status_code,
+                         status.HTTP_403_FORBIDDEN)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for_user(self.user).access_token}")
+
+        response = self.client.post(url, {"task": "rebuild_ledger", "priority": 3}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data["status"], response.data["priority"]), ("queued", 3))
+        self.assertEqual(response.data["created_by"], self.user.pk)
+        job_url = reverse("job-detail", args=[response.data["id"]])
+        self.assertEqual(self.client.get(job_url).data["progress"], 0.0)
+        response = self.client.post(url, {"task": "drop_database"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(reverse("job-cancel", args=[self.client.get(job_url).data["id"]]))
+        self.assertEqual(response.data["status"], "cancelled")
+        response = self.client.post(job_url + "cancel/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        other = User.objects.create_user(username="other", password="testpass123")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for_user(other).access_token}")
+        self.assertEqual(self.client.get(job_url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SyncAPITest(APITestCase):
+    """
+    Test cases for incremental sync with changed_since cursors.
+    """
+
+    def sync(self, cursor, **params):
+        response = self.client.get(reverse("product-list"), {"changed_since": cursor, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    @override_settings(SYNC={"SAFETY_LAG": 0})
+    def test_changes_and_tombstones_since_cursor(self):
+        """
+        Test that syncs return created, updated and soft-deleted rows once, in change order.
+        """
+        first, second, third = [
+            Product.objects.create(name=name, price=Decimal("10.00"), duration=1) for name in ("A", "B", "C")
+        ]
+        second.delete()
+        data = self.sync("0", limit=1)
+        self.assertEqual([row["name"] for row in data["results"]], ["A"])
+        self.assertEqual((data["deleted"], data["has_more"]), ([], True))
+        data = self.sync(data["cursor"])
+        self.assertEqual([row["name"] for row in data["results"]], ["C"])
+        self.assertEqual([tombstone["id"] for tombstone in data["deleted"]], [second.pk])
+        self.assertFalse(data["has_more"])
+        cursor = data["cursor"]
+        self.assertEqual(self.sync(cursor)["results"], [])
+
+        Product.objects.filter(pk=third.pk).update(is_active=False)
+        first.name = "A2"
+        first.save(update_fields=["name"])
+        third.delete()
+        data = self.sync(cursor)
+        self.assertEqual([row["name"] for row in data["results"]], ["A2"])
+        self.assertEqual([tombstone["id"] for tombstone in data["deleted"]], [third.pk])
+        self.assertNotIn("change_seq", data["results"][0])
+        self.assertEqual(self.sync(data["cursor"]), {
+            "results": [], "deleted": [], "cursor": data["cursor"], "has_more": False
+        })
+
+    def test_recent_changes_are_returned_again(self):
+        """
+        Test that cursors do not move past changes younger than the safety lag.
+        """
+        Product.objects.create(name="A", price=Decimal("10.00"), duration=1)
+        data = self.sync("0")
+        self.assertEqual(len(data["results"]), 1)
+        self.assertEqual(data["cursor"], "0.0")
+        self.assertEqual(len(self.sync(data["cursor"])["results"]), 1)
+
+    @override_settings(SYNC={"SAFETY_LAG": 0})
+    def test_cursor_waits_for_running_transactions(self):
+        """
+        Test that cursors do not move past rows written after a still running transaction began.
+
+        The running transaction draws a smaller number than B but commits
+        after it, however old B gets.
+        """
+        first = Product.objects.create(name="A", price=Decimal("10.00"), duration=1)
+        second = Product.objects.create(name="B", price=Decimal("10.00"), duration=1)
+        Product.objects.filter(pk=second.pk).update(change_seq=F("change_seq") + 10)
+        running = Case(When(name="B", then=Value(False)), default=Value(True))
+        with mock.patch("api.sync.committed_before_running", return_value=running):
+            data = self.sync("0")
+        self.assertEqual([row["name"] for row in data["results"]], ["A", "B"])
+        first_seq = Product.objects.values_list("change_seq", flat=True).get(pk=first.pk)
+        self.assertEqual(data["cursor"], f"{first_seq}.{first.pk}")
+
+        slow = Product.objects.create(name="Slow", price=Decimal("10.00"), duration=1)
+        Product.objects.filter(pk=slow.pk).update(change_seq=F("change_seq") - 10)
+        data = self.sync(data["cursor"])
+        self.assertEqual([row["name"] for row in data["results"]], ["Slow", "B"])
+
+    def test_invalid_parameters(self):
+        """
+        Test that malformed cursors and limits are rejected.
+        """
+        for params in ({"changed_since": "yesterday"}, {"changed_since": "1.-2"}, {"changed_since": "0", "limit": 0}):
+            response = self.client.get(reverse("product-list"), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BatchRetrieveAPITest(APITestCase):
+    """
+    Test cases for retrieving objects by ids.
+    """
+
+    def setUp(self):
+        """
+        Set up lessons of two groups and a client with stateless claims.
+        """
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for_user(self.user).access_token}")
+        teachers = [Teacher.objects.create(name=name, pix_key=f"{name}@example.com") for name in ("Ana", "Bia")]
+        self.lessons = [
+            Lesson.objects.create(
+                students_group=StudentsGroup.objects.create(scheduled_at=timezone.now(), teacher=teacher),
+                teacher=teacher, occurred_at=timezone.now(),
+            )
+            for teacher in teachers
+        ]
+
+    def test_objects_in_requested_order_with_missing_ids(self):
+        """
+        Test that ids come back in the order given, with missing ones reported, in one query.
+        """
+        first, second = self.lessons
+        url = reverse("lesson-list")
+        self.client.get(url, {"ids": first.pk})  # warm the token version cache
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"ids": f"{second.pk},999,{first.pk},{second.pk}"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([lesson["id"] for lesson in response.data["results"]], [second.pk, first.pk])
+        self.assertEqual([lesson["teacher_name"] for lesson in response.data["results"]], ["Bia", "Ana"])
+        self.assertEqual(response.data["missing"], [999])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("studentsgroup-list"), {"ids": first.students_group_id})
+        self.assertEqual(response.data["results"][0]["current_students_count"], 0)
+
+    def test_invalid_or_too_many_ids(self):
+        """
+        Test that malformed id lists and batches over the cap are rejected.
+        """
+        url = reverse("teacher-list")
+        ids = ",".join(str(pk) for pk in range(1, 102))
+        for value in ("1,two", "", ids):
+            response = self.client.get(url, {"ids": value})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StudentOverviewAPITest(APITestCase):
+    """
+    Test cases for the student overview endpoint.
+    """
+
+    def setUp(self):
+        """
+        Set up a student with contracts, a group with lessons and a payment.
+        """
+        super().setUp()
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for_user(self.user).access_token}")
+        self.student = Student.objects.create(name="Student", birth_date=date(2000, 1, 1))
+        for name in ("English", "Spanish"):
+            product = Product.objects.create(name=name, price=Decimal("400.00"))
+            Contract.objects.create(student=self.student, product=product)
+        teacher = Teacher.objects.create(name="Jane Smith", pix_key="jane@example.com")
+        self.group = StudentsGroup.objects.create(scheduled_at=timezone.now(), teacher=teacher)
+        self.group.students.add(self.student)
+        self.lessons = [
+            Lesson.objects.create(
+                students_group=self.group, teacher=teacher, occurred_at=timezone.now() - timedelta(days=days)
+            )
+            for days in (7, 0)
+        ]
+        mark_attendance(self.lessons[0].pk, [self.student.pk])
+        Payment.objects.create(payment_method="pix", value=Decimal("150.00"), paid_at=timezone.now(),
+                               student=self.student)
+        self.url = reverse("student-overview", args=[self.student.pk])
+
+    def test_overview_in_fixed_queries(self):
+        """
+        Test the overview contents, its query budget and that cached overviews need only the student query.
+        """
+        self.client.get(reverse("student-list"))  # warm the token version cache
+        # The student, their group ids and the five overview queries
+        with self.assertNumQueries(7):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["student"]["name"], "Student")
+        self.assertEqual([contract["product"]["name"] for contract in response.data["contracts"]],
+                         ["Spanish", "English"])
+        self.assertEqual(response.data["groups"][0]["teacher"]["name"], "Jane Smith")
+        self.assertEqual(response.data["groups"][0]["students_count"], 1)
+        self.assertEqual([lesson["present"] for lesson in response.data["recent_lessons"]], [None, False])
+        self.assertEqual(response.data["payments"]["count"], 1)
+        self.assertEqual(response.data["payments"]["total"], Decimal("150.00"))
+        self.assertEqual(response.data["payments"]["balance"], Decimal("650.00"))
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_writes_invalidate_overview(self):
+        """
+        Test that payments, lessons and group changes of the student invalidate the cached overview.
+
+        Group and lesson saves bump the group's version without reading its roster.
+        """
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(payment_method="pix", value=Decimal("50.00"), paid_at=timezone.now(),
+                                   student=self.student)
+        self.assertEqual(self.client.get(self.url).data["payments"]["count"], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lessons[1].delete()
+        self.assertEqual(len(self.client.get(self.url).data["recent_lessons"]), 1)
+        self.group.max_students = 3
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(1):
+            self.group.save(update_fields=["max_students"])
+        self.assertEqual(self.client.get(self.url).data["groups"][0]["max_students"], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.students.remove(self.student)
+        response = self.client.get(self.url)
+        self.assertEqual((response.data["groups"], response.data["recent_lessons"]), ([], []))
+        self.assertEqual(self.client.get(reverse("student-overview", args=[999])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_moved_payment_invalidates_both_overviews(self):
+        """
+        Test that moving a payment to another student invalidates the overviews of both students.
+        """
+        other = Student.objects.create(name="Other", birth_date=date(2000, 1, 1))
+        other_url = reverse("student-overview", args=[other.pk])
+        self.client.get(self.url)
+        self.client.get(other_url)
+        payment = Payment.objects.get(student=self.student)
+        payment.student = other
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.save()
+
+        self.assertEqual(self.client.get(self.url).data["payments"]["count"], 0)
+        self.assertEqual(self.client.get(other_url).data["payments"]["count"], 1)
+
+
 class AuthenticationTest(APITestCase):
     """
     Test cases for API authentication.
@@ -278,3 +1051,622 @@ class AuthenticationTest(APITestCase):
         self.assertIn("access_token", response.data)
         self.assertIn("refresh_token", response.data)
         self.assertIn("expires_at", response.data)
+
+
+class StatelessAuthenticationTest(APITestCase):
+    """
+    Test cases for stateless JWT authentication.
+    """
+
+    def setUp(self):
+        """
+        Set up a client authenticated with a token carrying stateless claims.
+        """
+        super().setUp()
+        refresh = tokens_for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    def test_requests_skip_user_query(self):
+        """
+        Test that authenticated requests do not load the user row.
+        """
+        Product.objects.create(name="Python Course", price=Decimal("299.99"), duration=6)
+        url = reverse("product-list")
+        self.client.get(url)  # warm the token version cache
+
+        # COUNT for pagination + page query, no auth_user lookup
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bumped_version_revokes_token(self):
+        """
+        Test that bumping the token version rejects previously issued tokens once it commits.
+        """
+        url = reverse("product-list")
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_token_version(self.user.pk)
+            # Read (and cached) before the bump commits.
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rolled_back_bump_keeps_token(self):
+        """
+        Test that a bump whose transaction rolls back leaves issued tokens valid.
+        """
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            bump_token_version(self.user.pk)
+            raise RuntimeError()
+
+        response = self.client.get(reverse("product-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bump_reaches_other_workers(self):
+        """
+        Test that a revocation by one worker reaches another through a shared cache, or once a per-process one expires.
+
+        The default cache of the tests is per-process.
+        """
+        clock = [1000.0]
+
+        def worker(django_cache):
+            return {"cache": django_cache, "_version_cache": TTLCache("worker", ttl=5)}
+
+        def version_seen_by(worker):
+            with mock.patch.multiple("api.tokens", **worker):
+                return get_token_version(self.user.pk)
+
+        self.assertFalse(is_shared(cache))
+        shared = LocMemCache("shared", {})
+        workers = {
+            "shared": (worker(shared), worker(shared)),
+            "separate": (worker(LocMemCache("first", {})), worker(LocMemCache("second", {}))),
+        }
+        with mock.patch("time.time", lambda: clock[0]), mock.patch("time.monotonic", lambda: clock[0]):
+            for name, (first, second) in workers.items():
+                with self.subTest(name):
+                    version = version_seen_by(second)
+                    with mock.patch.multiple("api.tokens", **first), self.captureOnCommitCallbacks(execute=True):
+                        bump_token_version(self.user.pk)
+                    self.assertEqual(version_seen_by(second), version)
+                    clock[0] += 11
+                    self.assertEqual(version_seen_by(second), version + 1)
+
+    def test_deactivating_user_revokes_token(self):
+        """
+        Test that deactivating a user revokes their tokens.
+        """
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        response = self.client.get(reverse("product-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_unrelated_user_change_keeps_token(self):
+        """
+        Test that saving unrelated user fields does not revoke tokens.
+        """
+        self.user.first_name = "Test"
+        self.user.save()
+
+        response = self.client.get(reverse("product-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_claims_user_permissions(self):
+        """
+        Test that permissions are answered from token claims.
+        """
+        permission = Permission.objects.get(codename="view_product")
+        self.user.user_permissions.add(permission)
+        self.user = User.objects.get(pk=self.user.pk)
+
+        token = tokens_for_user(self.user).access_token
+        user = StatelessJWTAuthentication().get_user(token)
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertTrue(user.has_perm("comercial.view_product"))
+        self.assertFalse(user.has_perm("comercial.delete_product"))
+        self.assertEqual(user.username, "testuser")
+
+
+class TokenBlacklistTest(APITestCase):
+    """
+    Test cases for the refresh token blacklist.
+    """
+
+    def setUp(self):
+        """
+        Set up a refresh token for the test user.
+        """
+        super().setUp()
+        self.refresh = str(tokens_for_user(self.user))
+        self.url = reverse("token_refresh")
+
+    def test_refresh_rotates_token(self):
+        """
+        Test that refreshing returns a new access and refresh token.
+        """
+        response = self.client.post(self.url, {"refresh": self.refresh})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.data)
+        self.assertNotEqual(response.data["refresh"], self.refresh)
+
+    def test_rotated_token_is_rejected(self):
+        """
+        Test that a refresh token cannot be used again after rotation.
+        """
+        self.client.post(self.url, {"refresh": self.refresh})
+        response = self.client.post(self.url, {"refresh": self.refresh})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rejected_after_version_bump(self):
+        """
+        Test that revoking a user's tokens also revokes refresh tokens.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_token_version(self.user.pk)
+        response = self.client.post(self.url, {"refresh": self.refresh})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_bloom_miss_skips_database(self):
+        """
+        Test that tokens absent from the Bloom filter are checked without queries.
+        """
+        tokens = TokenBlacklist(sync_interval=60)
+        tokens.revoke("revoked-jti", timezone.now() + timedelta(days=1))
+        self.assertTrue(tokens.is_revoked("revoked-jti"))
+        with self.assertNumQueries(0):
+            self.assertFalse(tokens.is_revoked("unknown-jti"))
+
+    def test_sync_picks_up_late_commits(self):
+        """
+        Test that a revocation committed after a later pull is still synced, once.
+        """
+        tokens = TokenBlacklist(sync_interval=0)
+        expires_at = timezone.now() + timedelta(days=1)
+        self.assertFalse(tokens.is_revoked("early-jti"))
+        RevokedToken.objects.create(id=100, jti="later-jti", expires_at=expires_at)
+        self.assertTrue(tokens.is_revoked("later-jti"))
+        # Revoked (and given its id) before the last pull, but only committed now.
+        late = RevokedToken.objects.create(id=50, jti="late-jti", expires_at=expires_at)
+        RevokedToken.objects.filter(pk=late.pk).update(revoked_at=timezone.now() - timedelta(seconds=30))
+        self.assertTrue(tokens.is_revoked("late-jti"))
+        self.assertEqual(tokens._bloom.count, 2)
+
+    def test_prune_removes_only_expired(self):
+        """
+        Test that pruning deletes expired entries in batches.
+        """
+        now = timezone.now()
+        for i in range(5):
+            RevokedToken.objects.create(jti=f"expired-{i}", expires_at=now - timedelta(minutes=1))
+        RevokedToken.objects.create(jti="live", expires_at=now + timedelta(days=1))
+
+        removed = TokenBlacklist().prune(batch_size=2)
+        self.assertEqual(removed, 5)
+        self.assertEqual(list(RevokedToken.objects.values_list("jti", flat=True)), ["live"])
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        """
+        Test that every added item is reported as present.
+        """
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        items = [f"jti-{i}" for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+
+
+class ThrottlingTest(APITestCase):
+    """
+    Test cases for token bucket throttling.
+    """
+
+    def test_bucket_refills_over_time(self):
+        """
+        Test that an empty bucket admits requests again after refilling.
+        """
+        now = [0.0]
+        store = LocalBucketStore(clock=lambda: now[0])
+        self.assertTrue(store.consume("key", 2, 1.0)[0])
+        self.assertTrue(store.consume("key", 2, 1.0)[0])
+        allowed, wait = store.consume("key", 2, 1.0)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1.0)
+
+        now[0] = 1.0
+        self.assertTrue(store.consume("key", 2, 1.0)[0])
+
+    def test_login_throttled_before_authenticate(self):
+        """
+        Test that throttled login attempts never reach authenticate().
+        """
+        url = reverse("token_obtain_pair")
+        data = {"username": "testuser", "password": "wrong"}
+        with override_settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {"login": "2/min", "login_username": None},
+        }):
+            with mock.patch("api.views.authenticate", return_value=None) as authenticate:
+                self.client.post(url, data)
+                self.client.post(url, data)
+                response = self.client.post(url, data)
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(authenticate.call_count, 2)
+
+    def test_login_throttled_per_username(self):
+        """
+        Test that attempts against one username are limited per IP without locking out other IPs.
+        """
+        url = reverse("token_obtain_pair")
+        data = {"username": "testuser", "password": "wrong"}
+        with override_settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {"login": "100/min", "login_username": "1/min"},
+        }):
+            self.client.post(url, data, REMOTE_ADDR="10.0.0.1")
+            response = self.client.post(url, {**data, "username": "TestUser"}, REMOTE_ADDR="10.0.0.1")
+            other = self.client.post(url, data, REMOTE_ADDR="10.0.0.2")
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertNotEqual(other.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_login_throttled_per_forwarded_client(self):
+        """
+        Test that clients behind the proxy get their own buckets, keyed on X-Forwarded-For.
+        """
+        url = reverse("token_obtain_pair")
+        data = {"username": "testuser", "password": "wrong"}
+        proxy = {"REMOTE_ADDR": "172.18.0.5"}
+        with override_settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {"login": "1/min", "login_username": None},
+            "NUM_PROXIES": 1,
+        }):
+            self.client.post(url, data, HTTP_X_FORWARDED_FOR="203.0.113.1", **proxy)
+            other = self.client.post(url, data, HTTP_X_FORWARDED_FOR="203.0.113.2", **proxy)
+            spoofed = self.client.post(url, data, HTTP_X_FORWARDED_FOR="198.51.100.9, 203.0.113.1", **proxy)
+
+        self.assertNotEqual(other.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(spoofed.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_forwarded_for_ignored_without_proxies(self):
+        """
+        Test that X-Forwarded-For is ignored unless NUM_PROXIES is set.
+        """
+        url = reverse("token_obtain_pair")
+        data = {"username": "testuser", "password": "wrong"}
+        with override_settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {"login": "1/min", "login_username": None},
+        }):
+            self.client.post(url, data, HTTP_X_FORWARDED_FOR="203.0.113.1")
+            spoofed = self.client.post(url, data, HTTP_X_FORWARDED_FOR="203.0.113.2")
+
+        self.assertEqual(spoofed.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_view_rate_overrides_default(self):
+        """
+        Test that a viewset's throttle_rates override the default rates.
+        """
+        url = reverse("product-list")
+        with mock.patch.object(ProductViewSet, "throttle_rates", {"user": "1/min"}, create=True):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class PerformanceInstrumentationTest(APITestCase):
+    """
+    Test cases for Server-Timing instrumentation of API requests.
+    """
+
+    def test_server_timing_header(self):
+        """
+        Test that sampled API responses to staff report db, serialize and render time.
+        """
+        Student.objects.create(name="John Doe", birth_date=date(2000, 1, 1))
+        self.user.is_staff = True
+        self.user.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens_for_user(self.user).access_token}")
+        with override_settings(PERFORMANCE_INSTRUMENTATION={"SAMPLE_RATE": 1.0}):
+            response = self.client.get(reverse("student-list"))
+
+        timing = response["Server-Timing"]
+        for phase in ("db;", "serialize;", "render;", "total;"):
+            self.assertIn(phase, timing)
+
+    def test_unsampled_requests_have_no_header(self):
+        """
+        Test that requests outside the sample are not instrumented.
+        """
+        with override_settings(PERFORMANCE_INSTRUMENTATION={"SAMPLE_RATE": 0.0}):
+            response = self.client.get(reverse("student-list"))
+        self.assertNotIn("Server-Timing", response)
+
+    def test_server_timing_hidden_from_other_clients(self):
+        """
+        Test that only staff get the header unless SERVER_TIMING is on.
+        """
+        url = reverse("student-list")
+        with override_settings(PERFORMANCE_INSTRUMENTATION={"SAMPLE_RATE": 1.0}):
+            self.assertNotIn("Server-Timing", self.client.get(url))
+            self.client.credentials()
+            self.assertNotIn("Server-Timing", self.client.get(url))
+        with override_settings(PERFORMANCE_INSTRUMENTATION={"SAMPLE_RATE": 1.0, "SERVER_TIMING": True}):
+            self.assertIn("Server-Timing", self.client.get(url))
+
+
+class BenchmarkTest(APITestCase):
+    """
+    Test cases for the API scale benchmark.
+    """
+
+    def test_benchmark_covers_every_endpoint(self):
+        """
+        Test that a tiny benchmark run measures every endpoint without errors.
+        """
+        seed(20, batch_size=7)
+        self.assertEqual(Student.objects.all_with_deleted().count(), 20)
+        detect_delinquency(as_of=date(2030, 1, 1))
+        with audit_scope(), self.captureOnCommitCallbacks(execute=True):
+            Student.objects.create(name="Audited", birth_date=date(2000, 1, 1))
+
+        results = run_benchmarks(iterations=1, warmup=0)
+        for prefix in ("products", "students", "contracts", "lessons", "payments", "leads"):
+            self.assertIn(f"{prefix}.list", results)
+            self.assertIn(f"{prefix}.create", results)
+        for prefix, field in (("delinquencies", "student"), ("audit", "object_id")):
+            self.assertIn(f"{prefix}.filter:{field}", results)
+            self.assertNotIn(f"{prefix}.create", results)
+        for key, figures in results.items():
+            self.assertEqual(figures["errors"], 0, key)
+            self.assertGreater(figures["queries"], 0, key)
+
+    def test_compare_flags_regressions(self):
+        """
+        Test that slower p95 latency and extra queries are reported as regressions.
+        """
+        figures = {"p95_ms": 10.0, "queries": 2}
+        baseline = {"results": {"100": {"a.list": figures, "b.list": figures, "c.list": figures}}}
+        current = {"results": {"100": {
+            "a.list": {"p95_ms": 20.0, "queries": 2},
+            "b.list": {"p95_ms": 10.5, "queries": 2},
+            "c.list": {"p95_ms": 10.0, "queries": 3},
+        }}}
+
+        regressions = compare(baseline, current, threshold=0.2)
+        self.assertEqual([r["scenario"] for r in regressions], ["a.list", "c.list"])
+
+
+class ScaleSeederTest(APITestCase):
+    """
+    Test cases for the synthetic data generator.
+    """
+
+    def generate(self, seed_value):
+        return ScaleSeeder(50, seed=seed_value, end_date=date(2025, 1, 1), batch_size=40).run()
+
+    def test_same_seed_generates_same_data(self):
+        """
+        Test that generation is deterministic for a seed and end date.
+        """
+        self.generate(3)
+        first = list(Lesson.objects.all_with_deleted().values_list(
+            "students_group_id", "occurred_at", "deleted_at"
+        ).order_by("pk"))
+        for model in (Lesson, Contract, StudentsGroup, Student, Teacher, Product, Lead):
+            model.objects.all_with_deleted().delete()
+        self.generate(3)
+        second = list(Lesson.objects.all_with_deleted().values_list(
+            "students_group_id", "occurred_at", "deleted_at"
+        ).order_by("pk"))
+
+        offset = second[0][0] - first[0][0]
+        self.assertEqual([(group_id + offset, *rest) for group_id, *rest in first], second)
+
+    def test_generated_data_is_consistent(self):
+        """
+        Test that timestamps are preserved and live rows never reference deleted ones.
+        """
+        counts = self.generate(0)
+
+        self.assertEqual(counts["management_students"], 50)
+        self.assertEqual(Student.objects.all_with_deleted().count(), 50)
+        end = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        self.assertFalse(Student.objects.all_with_deleted().filter(created_at__gte=end).exists())
+        self.assertFalse(Contract.objects.filter(student__deleted_at__isnull=False).exists())
+        self.assertFalse(Lesson.objects.filter(students_group__deleted_at__isnull=False).exists())
+        self.assertTrue(Lesson.objects.exists())
+        self.assertFalse(
+            StudentsGroup.objects.all_with_deleted().annotate(roster=Count("students"))
+            .filter(roster__gt=F("max_students")).exists()
+        )
+        converted = Lead.objects.filter(converted_at__isnull=False)
+        self.assertTrue(converted.exists())
+        self.assertFalse(converted.filter(Q(student__isnull=True) | Q(contract__isnull=True)).exists())
+        self.assertFalse(converted.filter(created_at__gt=F("converted_at")).exists())
+        self.assertEqual(
+            sum(FunnelMonthlySummary.objects.values_list("leads", flat=True)), Lead.objects.all_with_deleted().count()
+        )
+
+        # Sequences continue after the explicit ids.
+        student = Student.objects.create(name="New Student", birth_date=date(2000, 1, 1))
+        self.assertGreater(student.pk, Student.objects.all_with_deleted().exclude(pk=student.pk).latest("pk").pk)
+
+
+class CsvImportTest(APITestCase):
+    """
+    Test cases for bulk CSV imports.
+    """
+
+    csv_content = (
+        "name,birth_date,status\n"
+        "Ana Silva,2001-02-03,active\n"
+        "Bruno Costa,2002-03-04,\n"
+        "Carla Dias,not-a-date,unknown\n"
+    )
+
+    def setUp(self):
+        """
+        Keep uploads in a temporary directory.
+        """
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.upload_dir = directory.name
+        settings_override = override_settings(CSV_IMPORT={"UPLOAD_DIR": self.upload_dir})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, content, target="students", **params):
+        upload = SimpleUploadedFile("import.csv", content.encode(), content_type="text/csv")
+        url = reverse("csv_import", args=[target])
+        if params:
+            url += "?" + "&".join(f"{key}={value}" for key, value in params.items())
+        return self.client.post(url, {"file": upload}, format="multipart")
+
+    def run_job(self, response):
+        """
+        Run the import job queued by response and return it.
+        """
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(response["Location"].endswith(reverse("job-detail", args=[response.data["id"]])))
+        claim("worker")
+        execute(response.data["id"])
+        return self.client.get(response["Location"]).data
+
+    def grant(self, codename):
+        self.user.user_permissions.add(Permission.objects.get(codename=codename))
+
+    def test_upload_imports_valid_rows_and_reports_rejects(self):
+        """
+        Test that valid rows are imported and invalid ones reported per line.
+        """
+        self.grant("add_student")
+        response = self.upload(self.csv_content)
+        self.assertEqual(response.data["status"], "queued")
+        self.assertEqual(Student.objects.count(), 0)
+
+        job = self.run_job(response)
+        self.assertEqual(job["status"], "succeeded")
+        summary = job["result"]
+        self.assertEqual((summary["imported"], summary["rejected"]), (2, 1))
+        self.assertEqual(summary["errors"][0]["line"], 4)
+        self.assertEqual(set(summary["errors"][0]["errors"]), {"birth_date", "status"})
+        self.assertEqual(Student.objects.get(name="Bruno Costa").status, "active")
+        self.assertIsNotNone(Student.objects.get(name="Ana Silva").created_at)
+        self.assertEqual(os.listdir(self.upload_dir), [summary["rejects_file"]])
+
+        response = self.client.get(reverse("job-rejects", args=[job["id"]]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("4,Carla Dias,"))
+
+        call_command("prune_imports", "--days", "0", stdout=io.StringIO())
+        self.assertEqual(os.listdir(self.upload_dir), [])
+        response = self.client.get(reverse("job-rejects", args=[job["id"]]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_failed_import_deletes_rejects_with_upload(self):
+        """
+        Test that the last failed attempt deletes the upload and the rejects written so far.
+        """
+        self.grant("add_student")
+        response = self.upload(self.csv_content)
+        Job.objects.filter(pk=response.data["id"]).update(max_attempts=1)
+        with mock.patch("api.imports.CsvImporter._merge", side_effect=RuntimeError("boom")):
+            job = self.run_job(response)
+
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_dry_run_does_not_import(self):
+        """
+        Test that a dry run only validates rows.
+        """
+        self.grant("add_student")
+        job = self.run_job(self.upload(self.csv_content, dry_run="true"))
+
+        self.assertEqual((job["result"]["dry_run"], job["result"]["imported"]), (True, 2))
+        self.assertEqual(Student.objects.count(), 0)
+
+    def test_duplicate_leads_are_rejected(self):
+        """
+        Test that leads sharing an email or phone with a live lead or an earlier row are not imported.
+        """
+        birth_date = date(2000, 1, 1)
+        existing = Lead.objects.create(name="Ana", goals="Travel", birth_date=birth_date, email="ana@example.com")
+        Lead.objects.create(name="Old", goals="Work", birth_date=birth_date, email="old@example.com").delete()
+        content = (
+            "name,goals,birth_date,email,phone\n"
+            "Ana Again,Travel,2000-01-01,ANA+ads@example.com,\n"
+            "Bruno,Work,2000-01-01,bruno@example.com,(11) 91234-5678\n"
+            "Bruno Again,Work,2000-01-01,,+55 11 91234-5678\n"
+            "Old Again,Work,2000-01-01,old@example.com,\n"
+        )
+        rejects = io.StringIO()
+        summary = CsvImporter("leads").run(io.StringIO(content), rejects_file=rejects)
+
+        self.assertEqual((summary["imported"], summary["rejected"], summary["duplicates"]), (2, 2, 2))
+        self.assertEqual(summary["errors"], [
+            {"line": 2, "errors": {"email": [f"Duplicate of Lead #{existing.pk}"]}},
+            {"line": 4, "errors": {"phone": ["Duplicate of line 3"]}},
+        ])
+        self.assertEqual([line.split(",")[0] for line in rejects.getvalue().splitlines()], ["line", "2", "4"])
+        self.assertEqual(set(Lead.objects.values_list("name", flat=True)), {"Ana", "Bruno", "Old Again"})
+
+    def test_merge_skips_leads_created_during_import(self):
+        """
+        Test that the merge leaves out leads matching a live lead created after their chunk was checked.
+        """
+        Lead.objects.create(name="Ana", goals="Travel", birth_date=date(2000, 1, 1), phone="11912345678")
+        content = "name,goals,birth_date,phone\nAna Again,Travel,2000-01-01,011 91234-5678\n"
+        with mock.patch.object(CsvImporter, "_skip_duplicates", lambda self, valid, *args: valid):
+            summary = CsvImporter("leads").run(io.StringIO(content))
+
+        self.assertEqual(summary["imported"], 0)
+        self.assertEqual(Lead.objects.count(), 1)
+
+    def test_import_requires_add_permission(self):
+        """
+        Test that importing requires the add permission of the target model.
+        """
+        self.grant("add_student")
+        response = self.upload("name,goals,birth_date\nAna,Travel,2000-01-01\n", target="leads")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Lead.objects.count(), 0)
+
+    def test_missing_required_column(self):
+        """
+        Test that files without a required column are rejected as a whole.
+        """
+        self.grant("add_lead")
+        response = self.upload("name,birth_date\nAna,2000-01-01\n", target="leads")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("goals", response.data["error"])
+        self.assertFalse(Job.objects.exists())
+
+    def test_import_command_writes_rejects_file(self):
+        """
+        Test the import_csv management command.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "payments.csv")
+            rejects = os.path.join(directory, "rejects.csv")
+            with open(source, "w") as csv_file:
+                csv_file.write(
+                    "payment_method,value,paid_at,description\n"
+                    "pix,150.00,2024-05-06 10:00,May\n"
+                    "cash,0,2024-05-06 10:00,Invalid\n"
+                )
+            call_command("import_csv", "payments", source, "--rejects", rejects, stdout=io.StringIO())
+
+            with open(rejects) as rejects_file:
+                lines = rejects_file.read().splitlines()
+        self.assertEqual(Payment.objects.get().value, Decimal("150.00"))
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("3,cash,0,"))
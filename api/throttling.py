@@ -0,0 +1,223 @@
+"""
+Token bucket throttling for the NCC School Management API.
+
+Buckets live in process memory by default, so a throttle check is a dict
+lookup under a lock and never touches the database. Setting
+``THROTTLING["BACKEND"] = "cache"`` keeps the buckets in the shared Django
+cache instead, so limits hold across workers; if the cache is unavailable
+the check falls back to the in-process buckets.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+def _throttling_setting(name, default):
+    return getattr(settings, "THROTTLING", {}).get(name, default)
+
+
+class LocalBucketStore:
+    """
+    In-process token buckets keyed by string.
+    """
+
+    def __init__(self, max_keys=None, clock=time.monotonic):
+        self.max_keys = _throttling_setting("MAX_KEYS", 100000) if max_keys is None else max_keys
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate, cost=1):
+        """
+        Take cost tokens from the bucket; return (allowed, seconds to wait).
+        """
+        now = self.clock()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            if key not in self._buckets and len(self._buckets) >= self.max_keys:
+                self._evict(now, refill_rate, capacity)
+            self._buckets[key] = (tokens, now)
+        return allowed, 0 if allowed else (cost - tokens) / refill_rate
+
+    def _evict(self, now, refill_rate, capacity):
+        """
+        Drop buckets that have refilled completely; they behave like new ones.
+        """
+        idle = capacity / refill_rate
+        for key in [key for key, (_, updated_at) in self._buckets.items() if now - updated_at >= idle]:
+            del self._buckets[key]
+        while len(self._buckets) >= self.max_keys:
+            del self._buckets[next(iter(self._buckets))]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Token buckets kept in the shared Django cache.
+
+    The read-modify-write is not atomic, so concurrent requests for the same
+    key may occasionally both get the last token.
+    """
+
+    def __init__(self, fallback, clock=time.time):
+        self.fallback = fallback
+        self.clock = clock
+
+    def consume(self, key, capacity, refill_rate, cost=1):
+        now = self.clock()
+        cache_key = f"throttle:{key}"
+        try:
+            tokens, updated_at = cache.get(cache_key) or (capacity, now)
+            tokens = min(capacity, tokens + max(now - updated_at, 0) * refill_rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            cache.set(cache_key, (tokens, now), int(capacity / refill_rate) + 1)
+        except Exception:
+            return self.fallback.consume(key, capacity, refill_rate, cost)
+        return allowed, 0 if allowed else (cost - tokens) / refill_rate
+
+    def clear(self):
+        self.fallback.clear()
+
+
+local_store = LocalBucketStore()
+cache_store = CacheBucketStore(fallback=local_store)
+
+
+def get_store():
+    """
+    Return the bucket store selected by the THROTTLING setting.
+    """
+    return cache_store if _throttling_setting("BACKEND", "local") == "cache" else local_store
+
+
+def parse_rate(rate):
+    """
+    Turn a DRF rate string ("100/min") into (bucket capacity, tokens per second).
+    """
+    num, period = rate.split("/")
+    duration = {"s": 1, "m": 60, "h": 3600, "d": 86400}[period[0]]
+    return int(num), int(num) / duration
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Base throttle that draws one token per request from a keyed bucket.
+
+    Rates use the DRF format ("100/min") and come from the view's
+    ``throttle_rates`` dict when it has an entry for the scope, otherwise
+    from ``REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]``. A rate of None
+    disables the throttle.
+    """
+    scope = None
+
+    def __init__(self):
+        self._wait = 0
+
+    def get_rate(self, view, scope=None):
+        scope = scope or self.scope
+        view_rates = getattr(view, "throttle_rates", None) or {}
+        if scope in view_rates:
+            return view_rates[scope]
+        return api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+
+    def get_keys(self, request, view):
+        """
+        Return the bucket identifiers this request draws from.
+        """
+        raise NotImplementedError(".get_keys() must be overridden")
+
+    def consume(self, scope, key, rate):
+        """
+        Draw a token from the bucket for key; remember the wait when empty.
+        """
+        capacity, refill_rate = parse_rate(rate)
+        allowed, wait = get_store().consume(f"{scope}:{key}", capacity, refill_rate)
+        if not allowed:
+            self._wait = wait
+        return allowed
+
+    def allow_request(self, request, view):
+        rate = self.get_rate(view)
+        if rate is None:
+            return True
+        return all(self.consume(self.scope, key, rate) for key in self.get_keys(request, view))
+
+    def wait(self):
+        return self._wait
+
+
+class UserRateThrottle(TokenBucketThrottle):
+    """
+    Limits authenticated requests per user.
+    """
+    scope = "user"
+
+    def get_keys(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return [request.user.pk]
+        return []
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    """
+    Limits unauthenticated requests per client IP.
+    """
+    scope = "ip"
+
+    def get_keys(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return []
+        return [self.get_ident(request)]
+
+
+class EndpointRateThrottle(TokenBucketThrottle):
+    """
+    Limits requests to one endpoint across all clients.
+
+    Meant for expensive endpoints; it has no default rate and is enabled
+    per view through ``throttle_rates = {"endpoint": "..."}``.
+    """
+    scope = "endpoint"
+
+    def get_keys(self, request, view):
+        return [f"{view.__class__.__name__}.{getattr(view, 'action', None) or request.method}"]
+
+
+class LoginRateThrottle(TokenBucketThrottle):
+    """
+    Limits token requests per client IP and per username from that IP.
+
+    It runs before the view, so rejected attempts never reach the password
+    check. The IP bucket is checked first, so floods from one address are
+    rejected without parsing the request body. Username buckets are keyed
+    on the client IP too, so nobody can lock a user out from elsewhere.
+    """
+    scope = "login"
+    username_scope = "login_username"
+
+    def get_keys(self, request, view):
+        return [self.get_ident(request)]
+
+    def allow_request(self, request, view):
+        if not super().allow_request(request, view):
+            return False
+
+        rate = self.get_rate(view, self.username_scope)
+        username = request.data.get("username") if hasattr(request.data, "get") else None
+        if rate is None or not username:
+            return True
+        return self.consume(self.username_scope, f"{str(username).lower()}:{self.get_ident(request)}", rate)
@@ -0,0 +1,103 @@
+"""
+JWT issuing and revocation helpers for the NCC School Management system.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from common.cache import TTLCache, shared_timeout
+from .models import TokenVersion
+
+VERSION_CLAIM = "ver"
+USERNAME_CLAIM = "username"
+ACTIVE_CLAIM = "is_active"
+STAFF_CLAIM = "is_staff"
+SUPERUSER_CLAIM = "is_superuser"
+PERMISSIONS_CLAIM = "perms"
+
+CACHE_KEY_PREFIX = "jwt:ver:"
+
+
+def _stateless_setting(name, default):
+    return getattr(settings, "STATELESS_JWT", {}).get(name, default)
+
+
+def _shared_version_timeout():
+    return shared_timeout(cache, _stateless_setting("VERSION_CACHE_TTL", 5))
+
+
+_version_cache = TTLCache("jwt_token_versions", ttl=_stateless_setting("VERSION_CACHE_TTL", 5), max_size=10000)
+
+
+def get_token_version(user_id):
+    """
+    Return the current token version for a user.
+
+    Lookups go through a short-lived in-process cache, then the shared Django
+    cache, and only reach the database when both miss. Without a shared
+    Django cache its entries expire after VERSION_CACHE_TTL, so revocations
+    by other workers are seen within twice that time.
+    """
+    # Token claims carry the id as a string, model instances as an int.
+    user_id = str(user_id)
+    version = _version_cache.get(user_id)
+    if version is not None:
+        return version
+
+    key = f"{CACHE_KEY_PREFIX}{user_id}"
+    version = cache.get(key)
+    if version is None:
+        version = TokenVersion.objects.filter(user_id=user_id).values_list("version", flat=True).first() or 0
+        # add, not set: a version read before a concurrent bump committed
+        # must not replace the one the bump stores.
+        cache.add(key, version, _shared_version_timeout())
+
+    _version_cache.set(user_id, version)
+    return version
+
+
+def bump_token_version(user_id):
+    """
+    Increment the token version of a user, revoking all their issued tokens.
+
+    The cached version is replaced once the caller's transaction commits,
+    so a rollback leaves the issued tokens valid.
+    """
+    with transaction.atomic():
+        TokenVersion.objects.get_or_create(user_id=user_id)
+        TokenVersion.objects.filter(user_id=user_id).update(version=F("version") + 1)
+        version = TokenVersion.objects.filter(user_id=user_id).values_list("version", flat=True).get()
+
+        def publish():
+            cache.set(f"{CACHE_KEY_PREFIX}{user_id}", version, _shared_version_timeout())
+            _version_cache.delete(str(user_id))
+
+        transaction.on_commit(publish)
+    return version
+
+
+def clear_local_caches():
+    """
+    Drop the in-process token version cache.
+    """
+    _version_cache.clear()
+
+
+def tokens_for_user(user):
+    """
+    Issue a refresh token for user with the claims used by stateless authentication.
+
+    Access tokens derived from it inherit the same claims.
+    """
+    refresh = RefreshToken.for_user(user)
+    refresh[VERSION_CLAIM] = get_token_version(user.pk)
+    refresh[USERNAME_CLAIM] = user.get_username()
+    refresh[ACTIVE_CLAIM] = user.is_active
+    refresh[STAFF_CLAIM] = user.is_staff
+    refresh[SUPERUSER_CLAIM] = user.is_superuser
+    # Superusers pass every permission check, so their tokens skip the list.
+    refresh[PERMISSIONS_CLAIM] = [] if user.is_superuser else sorted(user.get_all_permissions())
+    return refresh
@@ -4,15 +4,13 @@ API URLs for the NCC School Management system.
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import (
-    TokenRefreshView,
-)
 
 from .views import (
     ProductViewSet, PaymentViewSet, TeacherPaymentsViewSet,
     StudentViewSet, TeacherViewSet, ContractViewSet,
-    StudentsGroupViewSet, LessonViewSet, LeadViewSet,
-    CustomTokenObtainPairView
+    StudentsGroupViewSet, LessonViewSet, LeadViewSet, DelinquencyViewSet,
+    CustomTokenObtainPairView, CustomTokenRefreshView, CsvImportView, TeacherCalendarFeedView,
+    RevenueForecastView, AuditEntryViewSet, JobViewSet
 )
 
 router = DefaultRouter()
@@ -25,9 +23,15 @@ router.register(r"contracts", ContractViewSet)
 router.register(r"students-groups", StudentsGroupViewSet)
 router.register(r"lessons", LessonViewSet)
 router.register(r"leads", LeadViewSet)
+router.register(r"delinquencies", DelinquencyViewSet)
+router.register(r"audit", AuditEntryViewSet)
+router.register(r"jobs", JobViewSet)
 
 urlpatterns = [
     path("auth/token/", CustomTokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("auth/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("auth/token/refresh/", CustomTokenRefreshView.as_view(), name="token_refresh"),
+    path("imports/<str:target>/", CsvImportView.as_view(), name="csv_import"),
+    path("forecasts/revenue/", RevenueForecastView.as_view(), name="revenue_forecast"),
+    path("teachers/<int:pk>/calendar.ics", TeacherCalendarFeedView.as_view(), name="teacher_calendar_feed"),
     path("", include(router.urls)),
 ]
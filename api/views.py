@@ -2,28 +2,91 @@
 API views for the NCC School Management system.
 """
 
-from rest_framework import viewsets, permissions, status
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenRefreshView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from django.contrib.auth import authenticate
+from django.http import FileResponse, HttpResponse
+from django.urls import reverse
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
+import csv
+import io
 
+from .calendars import (
+    calendar_etag, check_feed_token, etag_matches, feed_range, feed_token, get_calendar_version, parse_range,
+    teacher_calendar, teacher_feed
+)
+from .imports import IMPORT_TARGETS, CsvImporter, CsvImportError, save_upload, upload_path
+from .overview import student_overview
+from .sync import ChangeSyncMixin
+from .throttling import LoginRateThrottle
+from .tokens import tokens_for_user
 from .serializers import (
     ProductSerializer, PaymentSerializer, TeacherPaymentsSerializer,
     StudentSerializer, TeacherSerializer, ContractSerializer,
-    StudentsGroupSerializer, LessonSerializer, LeadSerializer
+    StudentsGroupSerializer, LessonSerializer, LeadSerializer,
+    LeadConversionSerializer, FunnelMonthlySummarySerializer, AttendanceSerializer,
+    DelinquencySnapshotSerializer, DelinquencyRefreshSerializer, AuditEntrySerializer, JobSerializer
 )
 from comercial.models import Product
-from financial.models import Payment, TeacherPayments
+from common.audit import parse_model_label
+from common.jobs import cancel, enqueue
+from common.models import AuditEntry, Job
+from financial.delinquency import delinquency_totals, detect_delinquency
+from financial.forecasting import parse_forecast_params, revenue_forecast
+from financial.ledger import student_statements
+from financial.models import DelinquencySnapshot, Payment, TeacherPayments
+from management.history import parse_as_of, parse_months, status_counts, student_retention
+from management.utilization import parse_period, utilization_report
+from management.attendance import AttendanceError, attendance_rates, mark_attendance, student_attendance
 from management.models import Student, Teacher, Contract, StudentsGroup, Lesson
-from crm.models import Lead
+from crm.funnel import ConversionError, convert_leads
+from crm.models import FunnelMonthlySummary, Lead
+
+
+def _ids_param(request, noun, maximum):
+    """
+    Return the distinct ids of ``?ids=1,2,3`` in the order given; there must be 1 to maximum.
+    """
+    try:
+        ids = [int(value) for value in request.query_params.get("ids", "").split(",") if value.strip()]
+    except ValueError:
+        raise ValidationError({"ids": f"Must be a comma-separated list of {noun} ids."})
+    ids = list(dict.fromkeys(ids))
+    if not 1 <= len(ids) <= maximum:
+        raise ValidationError({"ids": f"Pass between 1 and {maximum} {noun} ids."})
+    return ids
+
+
+class BatchRetrieveMixin:
+    """
+    ViewSet mixin answering ``list`` requests with ``?ids=1,2,3`` with those objects, fetched in one query.
+
+    Objects come in the order requested, from the same queryset and filters
+    as retrieve; ids not found are listed under ``missing``.
+    """
+    MAX_BATCH_IDS = 100
+
+    def list(self, request, *args, **kwargs):
+        if "ids" not in request.query_params:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        ids = _ids_param(request, queryset.model._meta.verbose_name.lower(), self.MAX_BATCH_IDS)
+        found = queryset.in_bulk(ids)
+        return Response({
+            "results": self.get_serializer([found[pk] for pk in ids if pk in found], many=True).data,
+            "missing": [pk for pk in ids if pk not in found],
+        })
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(BatchRetrieveMixin, ChangeSyncMixin, viewsets.ModelViewSet):
     """
     ViewSet for Product model.
     """
@@ -37,7 +100,7 @@ class ProductViewSet(viewsets.ModelViewSet):
     ordering = ["name"]
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(BatchRetrieveMixin, ChangeSyncMixin, viewsets.ModelViewSet):
     """
     ViewSet for Payment model.
     """
@@ -51,11 +114,11 @@ class PaymentViewSet(viewsets.ModelViewSet):
     ordering = ["-paid_at"]
 
 
-class TeacherPaymentsViewSet(viewsets.ModelViewSet):
+class TeacherPaymentsViewSet(BatchRetrieveMixin, ChangeSyncMixin, viewsets.ModelViewSet):
     """
     ViewSet for TeacherPayments model.
     """
-    queryset = TeacherPayments.objects.filter(deleted_at__isnull=True)
+    queryset = TeacherPayments.objects.filter(deleted_at__isnull=True).select_related("teacher")
     serializer_class = TeacherPaymentsSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -65,7 +128,138 @@ class TeacherPaymentsViewSet(viewsets.ModelViewSet):
     ordering = ["-paid_at"]
 
 
-class StudentViewSet(viewsets.ModelViewSet):
+class DelinquencyViewSet(BatchRetrieveMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for the delinquency snapshot computed by the ``detect_delinquency`` job.
+    """
+    queryset = DelinquencySnapshot.objects.select_related("student")
+    serializer_class = DelinquencySnapshotSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = {
+        "student": ["exact"],
+        "overdue": ["gte", "lte"],
+        "days_overdue": ["gte", "lte"],
+        "oldest_due_on": ["gte", "lte"],
+    }
+    search_fields = ["student__name"]
+    ordering_fields = ["overdue", "days_overdue", "oldest_due_on"]
+    ordering = ["-days_overdue", "contract"]
+
+    @action(detail=False, methods=["get"])
+    def summary(self, request):
+        """
+        Number of delinquent contracts and students and the amount overdue, with the list filters applied.
+        """
+        return Response(delinquency_totals(self.filter_queryset(self.get_queryset())))
+
+    @action(detail=False, methods=["post"])
+    def refresh(self, request):
+        """
+        Recompute the snapshot of the given students now instead of waiting for the nightly job.
+        """
+        serializer = DelinquencyRefreshSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        students = serializer.validated_data["students"]
+        detect_delinquency(student_ids=students)
+        snapshots = self.get_queryset().filter(student_id__in=students)
+        return Response(DelinquencySnapshotSerializer(snapshots, many=True).data)
+
+
+class AuditEntryViewSet(BatchRetrieveMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for the audit log of students, contracts and payments; staff only.
+
+    Filter by object with ``?model=financial.payment&object_id=1`` or by user
+    with ``?actor=``; both are served by indexes, newest entries first.
+    """
+    queryset = AuditEntry.objects.select_related("content_type")
+    serializer_class = AuditEntrySerializer
+    permission_classes = [permissions.IsAdminUser]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        "object_id": ["exact"],
+        "actor": ["exact"],
+        "action": ["exact"],
+        "created_at": ["gte", "lte"],
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        label = self.request.query_params.get("model")
+        if label:
+            try:
+                queryset = queryset.filter(content_type=parse_model_label(label))
+            except ValueError as error:
+                raise ValidationError({"model": str(error)})
+        return queryset
+
+
+class JobViewSet(BatchRetrieveMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
+                 viewsets.GenericViewSet):
+    """
+    ViewSet for background jobs: staff queue them, their creators poll for status and results.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["task", "status"]
+
+    def get_permissions(self):
+        if self.action in ("create", "cancel"):
+            return [permissions.IsAdminUser()]
+        return super().get_permissions()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by_id=self.request.user.pk)
+        return queryset
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        serializer.instance = enqueue(
+            data["task"], data.get("args"), priority=data.get("priority", 0), created_by_id=self.request.user.pk
+        )
+
+    @action(detail=True, methods=["post"])
+    def cancel(self, request, pk=None):
+        """
+        Cancel a job that has not started yet.
+        """
+        job = self.get_object()
+        if not cancel(job):
+            return Response({"error": "Only queued jobs can be cancelled"}, status=status.HTTP_400_BAD_REQUEST)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data)
+
+    @action(detail=True, methods=["get"])
+    def rejects(self, request, pk=None):
+        """
+        Download the rejected rows of an import job as CSV.
+        """
+        job = self.get_object()
+        name = (job.result or {}).get("rejects_file") if job.task == "import_csv" else None
+        try:
+            rejects = open(upload_path(name), "rb") if name else None
+        except (CsvImportError, OSError):
+            rejects = None
+        if rejects is None:
+            return Response({"error": "This job has no rejected rows to download"}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(rejects, as_attachment=True, filename=f"job-{job.pk}-rejects.csv",
+                            content_type="text/csv")
+
+
+def _status_counts(model, request):
+    try:
+        as_of = parse_as_of(request.query_params.get("as_of"))
+    except ValueError as error:
+        return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"as_of": as_of, "counts": status_counts(model, as_of)})
+
+
+class StudentViewSet(BatchRetrieveMixin, ChangeSyncMixin, viewsets.ModelViewSet):
     """
     ViewSet for Student model.
     """
@@ -78,8 +272,103 @@ class StudentViewSet(viewsets.ModelViewSet):
     ordering_fields = ["name", "birth_date", "created_at"]
     ordering = ["name"]
 
+    MAX_LEDGER_STUDENTS = 100
+    MAX_LEDGER_ENTRIES = 200
+    MAX_RETENTION_MONTHS = 24
+
+    def _positive_param(self, name, default, maximum):
+        value = self.request.query_params.get(name)
+        if not value:
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            value = 0
+        if not 1 <= value <= maximum:
+            raise ValidationError({name: f"Must be an integer between 1 and {maximum}."})
+        return value
+
+    @action(detail=True, methods=["get"])
+    def ledger(self, request, pk=None):
+        """
+        Balance and statement of this student, newest entries first.
+
+        ``?entries=`` limits the entries (default 50) and ``?before=<entry id>``
+        pages back through older ones.
+        """
+        student = self.get_object()
+        limit = self._positive_param("entries", 50, self.MAX_LEDGER_ENTRIES)
+        before = self._positive_param("before", None, 2 ** 63 - 1)
+        return Response(student_statements([student.pk], limit=limit, before=before)[0])
+
+    @action(detail=False, methods=["get"], url_path="ledger")
+    def ledgers(self, request):
+        """
+        Balances and latest entries of the students in ``?ids=1,2,3`` in constant queries.
+        """
+        ids = _ids_param(request, "student", self.MAX_LEDGER_STUDENTS)
+        limit = self._positive_param("entries", 10, self.MAX_LEDGER_ENTRIES)
+        found = set(self.get_queryset().filter(pk__in=ids).values_list("pk", flat=True))
+        return Response(student_statements([pk for pk in ids if pk in found], limit=limit))
+
+    @action(detail=True, methods=["get"])
+    def overview(self, request, pk=None):
+        """
+        This student with their contracts, groups, latest lessons and payment summary, in a fixed number of queries.
+        """
+        student = self.get_object()
+        return Response({"student": self.get_serializer(student).data, **student_overview(student)})
+
+    @action(detail=True, methods=["get"], url_path="attendance")
+    def attendance(self, request, pk=None):
+        """
+        Attendance counters and rates of this student, overall and per group.
+        """
+        return Response(student_attendance(self.get_object().pk))
+
+    @action(detail=False, methods=["get"], url_path="attendance")
+    def attendance_rates(self, request):
+        """
+        Students ordered by attendance rate, optionally only those at or below ``?max_rate=``.
+        """
+        max_rate = request.query_params.get("max_rate")
+        try:
+            max_rate = float(max_rate) if max_rate else None
+        except ValueError:
+            return Response({"error": "'max_rate' must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        page = self.paginate_queryset(attendance_rates(max_rate))
+        return self.get_paginated_response([
+            {
+                "student": row["student"],
+                "lessons": row["lessons_total"],
+                "absences": row["absences_total"],
+                "attendance_rate": round(row["attendance_rate"], 4),
+            }
+            for row in page
+        ])
+
+    @action(detail=False, methods=["get"], url_path="status-counts")
+    def status_counts(self, request):
+        """
+        Number of students per status as of ``?as_of=`` (a date or datetime, default now).
+        """
+        return _status_counts(Student, request)
+
+    @action(detail=False, methods=["get"])
+    def retention(self, request):
+        """
+        Monthly active students, churn and cohort retention from ``?from=YYYY-MM`` to ``?to=YYYY-MM``.
+        """
+        try:
+            first, last = parse_months(
+                request.query_params.get("from"), request.query_params.get("to"), self.MAX_RETENTION_MONTHS
+            )
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(student_retention(first, last))
+
 
-class TeacherViewSet(viewsets.ModelViewSet):
+class TeacherViewSet(BatchRetrieveMixin, ChangeSyncMixin, viewsets.ModelViewSet):
     """
     ViewSet for Teacher model.
     """
@@ -92,12 +381,63 @@ class TeacherViewSet(viewsets.ModelViewSet):
     ordering_fields = ["name", "created_at"]
     ordering = ["name"]
 
+    @action(detail=True, methods=["get"])
+    def calendar(self, request, pk=None):
+        """
+        Groups and lessons of this teacher between ``?start=`` and ``?end=`` (default: this week).
+
+        Supports conditional GET with ETag / If-None-Match.
+        """
+        teacher = self.get_object()
+        try:
+            start, end = parse_range(request.query_params.get("start"), request.query_params.get("end"))
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        version = get_calendar_version(teacher.pk)
+        headers = {"ETag": calendar_etag(teacher.pk, version, start, end), "Cache-Control": "private, no-cache"}
+        if etag_matches(request, headers["ETag"]):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        feed_url = reverse("teacher_calendar_feed", args=[teacher.pk])
+        data = dict(
+            teacher_calendar(teacher, start, end, version=version),
+            ics_url=request.build_absolute_uri(f"{feed_url}?token={feed_token(teacher.pk)}"),
+        )
+        return Response(data, headers=headers)
+
+    @action(detail=False, methods=["get"], url_path="status-counts")
+    def status_counts(self, request):
+        """
+        Number of teachers per status as of ``?as_of=`` (a date or datetime, default now).
+        """
+        return _status_counts(Teacher, request)
 
-class ContractViewSet(viewsets.ModelViewSet):
+    def _utilization(self, teacher_id=None):
+        try:
+            start, end = parse_period(self.request.query_params.get("start"), self.request.query_params.get("end"))
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(utilization_report(start, end, teacher_id))
+
+    @action(detail=True, methods=["get"], url_path="utilization")
+    def utilization(self, request, pk=None):
+        """
+        Weekday x hour heatmaps of this teacher's lessons and seat occupancy between ``?start=`` and ``?end=``.
+        """
+        return self._utilization(self.get_object().pk)
+
+    @action(detail=False, methods=["get"], url_path="utilization")
+    def utilization_overview(self, request):
+        """
+        Overall heatmaps and per-teacher occupancy (least occupied first) between ``?start=`` and ``?end=``.
+        """
+        return self._utilization()
+
+
+class ContractViewSet(BatchRetrieveMixin, ChangeSyncMixin, viewsets.ModelViewSet):
     """
     ViewSet for Contract model.
     """
-    queryset = Contract.objects.filter(deleted_at__isnull=True)
+    queryset = Contract.objects.filter(deleted_at__isnull=True).select_related("student", "product")
     serializer_class = ContractSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -107,11 +447,13 @@ class ContractViewSet(viewsets.ModelViewSet):
     ordering = ["-created_at"]
 
 
-class StudentsGroupViewSet(viewsets.ModelViewSet):
+class StudentsGroupViewSet(BatchRetrieveMixin, ChangeSyncMixin, viewsets.ModelViewSet):
     """
     ViewSet for StudentsGroup model.
     """
-    queryset = StudentsGroup.objects.filter(deleted_at__isnull=True)
+    queryset = (
+        StudentsGroup.objects.filter(deleted_at__isnull=True).select_related("teacher").prefetch_related("students")
+    )
     serializer_class = StudentsGroupSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -121,11 +463,11 @@ class StudentsGroupViewSet(viewsets.ModelViewSet):
     ordering = ["scheduled_at"]
 
 
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(BatchRetrieveMixin, ChangeSyncMixin, viewsets.ModelViewSet):
     """
     ViewSet for Lesson model.
     """
-    queryset = Lesson.objects.filter(deleted_at__isnull=True)
+    queryset = Lesson.objects.filter(deleted_at__isnull=True).select_related("teacher", "students_group__teacher")
     serializer_class = LessonSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -134,8 +476,32 @@ class LessonViewSet(viewsets.ModelViewSet):
     ordering_fields = ["occurred_at", "created_at"]
     ordering = ["-occurred_at"]
 
+    @action(detail=True, methods=["get", "post"])
+    def attendance(self, request, pk=None):
+        """
+        Read or mark (POST ``{"absent": [student ids]}``) the attendance of this lesson.
+
+        Every roster student not listed as absent is marked present.
+        """
+        lesson = self.get_object()
+        if request.method == "POST":
+            serializer = AttendanceSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            try:
+                lesson = mark_attendance(lesson.pk, serializer.validated_data["absent"])
+            except AttendanceError as error:
+                return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "lesson": lesson.pk,
+            "attendance_taken_at": lesson.attendance_taken_at,
+            "roster": lesson.attendance_roster,
+            "absent": sorted(lesson.absences.values_list("student_id", flat=True)),
+            "present_count": lesson.present_count,
+            "absent_count": lesson.absent_count,
+        })
 
-class LeadViewSet(viewsets.ModelViewSet):
+
+class LeadViewSet(BatchRetrieveMixin, ChangeSyncMixin, viewsets.ModelViewSet):
     """
     ViewSet for Lead model.
     """
@@ -147,12 +513,60 @@ class LeadViewSet(viewsets.ModelViewSet):
     ordering_fields = ["name", "birth_date", "created_at"]
     ordering = ["-created_at"]
 
+    MAX_CONVERSIONS = 1000
+
+    def _convert(self, data, many=True):
+        if not self.request.user.has_perms(["crm.change_lead", "management.add_student", "management.add_contract"]):
+            raise PermissionDenied()
+        serializer = LeadConversionSerializer(data=data, many=True, max_length=self.MAX_CONVERSIONS)
+        serializer.is_valid(raise_exception=True)
+        try:
+            leads = convert_leads(serializer.validated_data)
+        except ConversionError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = LeadSerializer(leads if many else leads[0], many=many)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["post"])
+    def convert(self, request):
+        """
+        Convert a list of leads into students with contracts in one transaction.
+        """
+        return self._convert(request.data)
+
+    @action(detail=True, methods=["post"], url_path="convert")
+    def convert_one(self, request, pk=None):
+        """
+        Convert this lead into a student with a contract.
+        """
+        lead = self.get_object()
+        return self._convert([dict(request.data.items(), lead=lead.pk)], many=False)
+
+    @action(detail=False, methods=["get"])
+    def funnel(self, request):
+        """
+        Monthly funnel counters, optionally limited with ``?from=YYYY-MM&to=YYYY-MM``.
+        """
+        summaries = FunnelMonthlySummary.objects.all()
+        for param, lookup in (("from", "month__gte"), ("to", "month__lte")):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    month = datetime.strptime(value, "%Y-%m").date()
+                except ValueError:
+                    return Response({"error": f"'{param}' must be in YYYY-MM format"},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                summaries = summaries.filter(**{lookup: month})
+        return Response(FunnelMonthlySummarySerializer(summaries, many=True).data)
+
 
 class CustomTokenObtainPairView(APIView):
     """
     Custom token obtain view that returns access_token, refresh_token, and expires_at.
     """
+    authentication_classes = []
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LoginRateThrottle]
 
     def post(self, request):
         username = request.data.get('username')
@@ -179,7 +593,7 @@ class CustomTokenObtainPairView(APIView):
             )
 
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = tokens_for_user(user)
         access_token = refresh.access_token
 
         # Calculate expiration time
@@ -197,3 +611,103 @@ class CustomTokenObtainPairView(APIView):
                 'last_name': user.last_name,
             }
         }, status=status.HTTP_200_OK)
+
+
+class CustomTokenRefreshView(TokenRefreshView):
+    """
+    Token refresh view that enforces the refresh token blacklist.
+    """
+    _serializer_class = "api.serializers.BlacklistTokenRefreshSerializer"
+
+
+class CsvImportView(APIView):
+    """
+    Bulk import a CSV upload (multipart field ``file``) into students, leads or payments.
+
+    The header is checked right away; the rows are imported by an
+    ``import_csv`` background job. Returns ``202 Accepted`` with the job,
+    whose URL (``Location``) can be polled by its creator; once it succeeds
+    the job's result holds the import summary with up to 100 row errors,
+    and all rejected rows can be downloaded from the job's ``rejects/``
+    URL. Pass ``dry_run=true`` to validate without importing.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, target):
+        if target not in IMPORT_TARGETS:
+            return Response({"error": f"Unknown import target '{target}'"}, status=status.HTTP_404_NOT_FOUND)
+        opts = IMPORT_TARGETS[target][0]._meta
+        if not request.user.has_perm(f"{opts.app_label}.add_{opts.model_name}"):
+            raise PermissionDenied()
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "A CSV file is required in the 'file' field"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            CsvImporter(target).check_header(next(csv.reader(text), None))
+        except (CsvImportError, UnicodeDecodeError) as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        finally:
+            # Keep the upload open for save_upload.
+            text.detach()
+        upload.seek(0)
+
+        dry_run = request.query_params.get("dry_run", "").lower() in ("1", "true", "yes")
+        job = enqueue(
+            "import_csv", {"target": target, "upload": save_upload(upload), "dry_run": dry_run},
+            created_by_id=request.user.pk,
+        )
+        location = request.build_absolute_uri(reverse("job-detail", args=[job.pk]))
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED, headers={"Location": location})
+
+
+class RevenueForecastView(APIView):
+    """
+    Monthly cash forecast from the unpaid installments of active contracts.
+
+    ``?months=`` sets the horizon (default 12) and ``?churn=0.03`` adds a
+    "custom" scenario with that monthly churn rate to the configured ones.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            months, scenarios = parse_forecast_params(
+                request.query_params.get("months"), request.query_params.get("churn")
+            )
+        except ValueError as error:
+            return Response({"error": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(revenue_forecast(months, scenarios))
+
+
+class TeacherCalendarFeedView(APIView):
+    """
+    ICS feed of a teacher's groups and lessons for calendar subscriptions.
+
+    Calendar clients cannot send JWTs, so the feed is authorized by the
+    signed ``?token=`` included in the calendar API's ``ics_url``. A client
+    polling an unchanged feed gets ``304 Not Modified`` without database
+    queries.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, pk):
+        if not check_feed_token(pk, request.query_params.get("token")):
+            return Response({"error": "Invalid calendar token"}, status=status.HTTP_403_FORBIDDEN)
+        version = get_calendar_version(pk)
+        etag = calendar_etag(pk, version, "ics", feed_range()[0])
+        if etag_matches(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            teacher = Teacher.objects.filter(pk=pk).first()
+            if teacher is None:
+                return Response({"error": "Teacher not found"}, status=status.HTTP_404_NOT_FOUND)
+            response = HttpResponse(teacher_feed(teacher, version=version), content_type="text/calendar; charset=utf-8")
+            response["Content-Disposition"] = f'inline; filename="teacher-{pk}.ics"'
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
@@ -3,22 +3,23 @@ Admin configuration for comercial models.
 """
 
 from django.contrib import admin
-from ncc_school_management.admin import make_active, make_inactive, soft_delete_selected
+from ncc_school_management.admin import BaseModelAdmin, export_as_csv, make_active, make_inactive, soft_delete_selected
 from .models import Product
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(BaseModelAdmin):
     """
     Admin configuration for Product model.
     """
     list_display = ["name", "price", "duration", "is_active", "created_at"]
     list_filter = ["is_active", "created_at", "updated_at"]
     search_fields = ["name", "description"]
+    autocomplete_search_fields = ["name"]
     readonly_fields = ["created_at", "updated_at", "deleted_at"]
     ordering = ["name"]
     list_per_page = 20
-    actions = [make_active, make_inactive, soft_delete_selected]
+    actions = [export_as_csv, make_active, make_inactive, soft_delete_selected]
 
     fieldsets = (
         ("Basic Information", {
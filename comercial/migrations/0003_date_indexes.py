@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comercial", "0002_remove_product_duration_months_product_duration"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="product",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, help_text="Timestamp when the record was created"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="product",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, help_text="Timestamp when the record was last updated"
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:37
+
+from django.db import migrations, models
+
+# Admin autocomplete searches run ``UPPER(name::text) LIKE UPPER('%term%')``
+# on PostgreSQL; a trigram GIN index on that expression serves them.
+TRIGRAM_INDEXES = (
+    ("comercial_products_name_trgm", "comercial_products"),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" USING gin (UPPER("name"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comercial", "0003_date_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="product",
+            name="name",
+            field=models.CharField(db_index=True, help_text="Name of the product or course", max_length=255),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("common", "0003_change_sequence"),
+        ("comercial", "0004_name_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="change_seq",
+            field=models.BigIntegerField(
+                db_default=0, db_index=True, editable=False, help_text="Change sequence number of the last write"
+            ),
+        ),
+    ]
@@ -12,7 +12,8 @@ class Product(BaseModel):
     """
     name = models.CharField(
         max_length=255,
-        help_text="Name of the product or course"
+        help_text="Name of the product or course",
+        db_index=True
     )
     description = models.TextField(
         blank=True,
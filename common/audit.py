@@ -0,0 +1,291 @@
+"""
+Audit log for the NCC School Management system.
+
+Models with ``AuditMixin`` (students, contracts and payments) compare the
+fields they save with the values they were loaded with and queue an
+``AuditEntry`` holding only the fields that changed, so a save costs no
+extra query. Entries are handed over with ``transaction.on_commit``, which
+drops the entries of rolled back transactions and savepoints, to the active
+``AuditScope``: ``AuditMiddleware`` opens one per request and writes its
+entries with a single ``bulk_create`` once the response is ready, stamped
+with the request's user. Commands and jobs batch the same way with
+``audit_scope()``; entries committed outside any scope are written at once.
+
+With ``AUDIT_LOG["SINK"] = "file"`` entries are appended as JSON lines to
+``AUDIT_LOG["FILE"]`` instead, and loaded into the database later with the
+``load_audit_log`` command.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from . import metrics
+from .models import AuditAction, AuditEntry, AuditMixin
+
+logger = logging.getLogger("ncc.audit")
+
+_current = contextvars.ContextVar("audit_scope", default=None)
+_file_lock = threading.Lock()
+
+# Timestamps and change numbers change on every save and would only add noise to the diffs.
+IGNORED_FIELDS = frozenset({"created_at", "updated_at", "change_seq"})
+
+
+def audit_setting(name, default):
+    return getattr(settings, "AUDIT_LOG", {}).get(name, default)
+
+
+class AuditScope:
+    """
+    Buffer of the audit entries committed while a request (or job) runs.
+
+    The actor is the authenticated user of request, read when the entries
+    are written, or the given actor (a user or user id).
+    """
+
+    def __init__(self, actor=None, request=None):
+        self.actor = actor
+        self.request = request
+        self.entries = []
+
+    def actor_id(self):
+        if self.request is not None:
+            user = getattr(self.request, "user", None)
+            return user.pk if user is not None and user.is_authenticated else None
+        return getattr(self.actor, "pk", self.actor)
+
+    def add(self, entry):
+        self.entries.append(entry)
+        if len(self.entries) >= audit_setting("MAX_BUFFER", 500):
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered entries, if any, with one statement.
+        """
+        entries, self.entries = self.entries, []
+        if entries:
+            actor_id = self.actor_id()
+            for entry in entries:
+                entry.actor_id = actor_id
+            write(entries)
+
+
+@contextmanager
+def audit_scope(actor=None, request=None):
+    """
+    Buffer the audit entries committed inside the block and write them when it exits.
+    """
+    scope = AuditScope(actor, request)
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+        scope.flush()
+
+
+def loaded_values(instance):
+    """
+    Return {attname: value} of the fields of instance as last loaded or saved, or None when unknown.
+    """
+    loaded = instance.__dict__.get("_audit_loaded")
+    if isinstance(loaded, tuple):
+        # As set by from_db: (field names, values).
+        loaded = dict(zip(*loaded))
+    return loaded
+
+
+def _capped(value, limit):
+    if isinstance(value, str) and len(value) > limit:
+        return value[:limit] + "..."
+    return value
+
+
+def capture(instance, created, update_fields=None, using=None):
+    """
+    Queue an audit entry with the fields of instance changed by the save that just ran.
+
+    Only fields loaded on the instance (and in update_fields, when given)
+    are compared; old values are null for creations and for instances that
+    were not loaded from the database.
+    """
+    if not audit_setting("ENABLED", True):
+        return None
+    data = instance.__dict__
+    saved = None
+    if update_fields is not None:
+        saved = {instance._meta.get_field(name).attname for name in update_fields}
+    current = {
+        field.attname: data[field.attname]
+        for field in instance._meta.concrete_fields
+        if field.attname in data and field.attname not in IGNORED_FIELDS and (saved is None or field.attname in saved)
+    }
+    loaded = None if created else loaded_values(instance)
+    if loaded is None:
+        changes = {name: [None, value] for name, value in current.items()}
+    else:
+        missing = object()
+        changes = {
+            name: [loaded.get(name), value] for name, value in current.items() if loaded.get(name, missing) != value
+        }
+    instance._audit_loaded = {**(loaded or {}), **current}
+    if not changes:
+        return None
+
+    old_deleted, new_deleted = changes.get("deleted_at", (None, None))
+    if created:
+        action = AuditAction.CREATE
+    elif new_deleted and not old_deleted:
+        action = AuditAction.DELETE
+    elif old_deleted and not new_deleted:
+        action = AuditAction.RESTORE
+    else:
+        action = AuditAction.UPDATE
+    limit = audit_setting("MAX_VALUE_LENGTH", 1000)
+    entry = AuditEntry(
+        content_type_id=ContentType.objects.get_for_model(instance).pk,
+        object_id=instance.pk,
+        action=action,
+        changes={name: [_capped(old, limit), _capped(new, limit)] for name, (old, new) in changes.items()},
+    )
+    transaction.on_commit(partial(_deliver, entry), using=using or instance._state.db)
+    return entry
+
+
+def capture_hard_delete(instance, pk, using=None):
+    """
+    Queue an audit entry for an instance (whose primary key was pk) deleted from the database.
+    """
+    if not audit_setting("ENABLED", True):
+        return None
+    entry = AuditEntry(
+        content_type_id=ContentType.objects.get_for_model(instance).pk,
+        object_id=pk,
+        action=AuditAction.HARD_DELETE,
+    )
+    transaction.on_commit(partial(_deliver, entry), using=using or instance._state.db)
+    return entry
+
+
+def _deliver(entry):
+    scope = _current.get()
+    if scope is None:
+        write([entry])
+    else:
+        scope.add(entry)
+
+
+def write(entries):
+    """
+    Write entries to the configured sink: the database (default) or the audit file.
+
+    Failures are logged with the entries instead of failing the request,
+    whose changes are already committed.
+    """
+    sink = audit_setting("SINK", "database")
+    start = time.perf_counter()
+    try:
+        if sink == "file":
+            _append(entries)
+        else:
+            AuditEntry.objects.bulk_create(entries)
+    except Exception:
+        logger.exception("Could not write %d audit entries: %s", len(entries), _lines(entries))
+        return 0
+    metrics.observe_audit(sink, len(entries), time.perf_counter() - start)
+    return len(entries)
+
+
+def _lines(entries):
+    lines = []
+    for entry in entries:
+        content_type = ContentType.objects.get_for_id(entry.content_type_id)
+        lines.append(json.dumps({
+            "model": f"{content_type.app_label}.{content_type.model}",
+            "object_id": entry.object_id,
+            "action": entry.action,
+            "changes": entry.changes,
+            "actor": entry.actor_id,
+            "created_at": entry.created_at,
+        }, cls=DjangoJSONEncoder))
+    return "".join(f"{line}\n" for line in lines)
+
+
+def _append(entries):
+    data = _lines(entries)
+    with _file_lock, open(audit_setting("FILE", "audit.jsonl"), "a", encoding="utf-8") as file:
+        file.write(data)
+
+
+def load_file(path=None, batch_size=1000):
+    """
+    Load the entries appended to the audit file into the database; returns the number loaded.
+
+    The file is renamed before loading, so workers keep appending to a new
+    one; a file left by an interrupted load is loaded first.
+    """
+    path = path or audit_setting("FILE", "audit.jsonl")
+    loading = f"{path}.loading"
+    if not os.path.exists(loading):
+        if not os.path.exists(path):
+            return 0
+        os.replace(path, loading)
+    count = 0
+    with open(loading, encoding="utf-8") as file, transaction.atomic():
+        batch = []
+        for line in file:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            batch.append(AuditEntry(
+                content_type=ContentType.objects.get_by_natural_key(*row["model"].split(".")),
+                object_id=row["object_id"],
+                action=row["action"],
+                changes=row["changes"],
+                actor_id=row["actor"],
+                created_at=parse_datetime(row["created_at"]),
+            ))
+            if len(batch) >= batch_size:
+                count += len(AuditEntry.objects.bulk_create(batch))
+                batch = []
+        count += len(AuditEntry.objects.bulk_create(batch))
+    os.remove(loading)
+    return count
+
+
+def parse_model_label(value):
+    """
+    Return the ContentType of an audited model given as "app_label.model".
+
+    Raises ValueError for unknown or unaudited models.
+    """
+    try:
+        content_type = ContentType.objects.get_by_natural_key(*value.lower().split(".", 1))
+    except (TypeError, ContentType.DoesNotExist):
+        content_type = None
+    model = content_type.model_class() if content_type else None
+    if model is None or not issubclass(model, AuditMixin):
+        raise ValueError(f"'{value}' is not an audited model (e.g. 'financial.payment')")
+    return content_type
+
+
+def entries_for(obj):
+    """
+    Return the audit entries of a model instance, newest first.
+    """
+    return AuditEntry.objects.filter(
+        content_type=ContentType.objects.get_for_model(obj), object_id=obj.pk
+    ).order_by("-created_at", "-id")
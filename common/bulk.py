@@ -0,0 +1,99 @@
+"""
+Bulk loading helpers for the NCC School Management system.
+
+Loaders write rows with explicit column values, bypassing model ``save()``
+and ``bulk_create``. Use ``get_loader`` to pick ``COPY`` on PostgreSQL and
+batched ``INSERT`` statements elsewhere.
+"""
+
+import csv
+import io
+
+
+def get_loader(connection, batch_size, method="auto"):
+    """
+    Return a loader for connection; method is "auto", "copy" or "insert".
+    """
+    if method == "auto":
+        method = "copy" if connection.vendor == "postgresql" else "insert"
+    loader_class = CopyLoader if method == "copy" else InsertLoader
+    return loader_class(connection, batch_size)
+
+
+class CopyLoader:
+    """
+    Load rows into PostgreSQL with ``COPY ... FROM STDIN`` in CSV format.
+    """
+
+    def __init__(self, connection, batch_size):
+        self.connection = connection
+        self.batch_size = batch_size
+
+    def load(self, model, columns, rows, table=None):
+        """
+        Load rows (tuples of column values) into table, the model's table by default.
+        """
+        table = self.connection.ops.quote_name(table or model._meta.db_table)
+        column_list = ", ".join(self.connection.ops.quote_name(column) for column in columns)
+        sql = f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)"
+        count = 0
+        for batch in _batches(rows, self.batch_size):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            with self.connection.cursor() as cursor:
+                raw = cursor.cursor
+                if hasattr(raw, "copy_expert"):
+                    raw.copy_expert(sql, buffer)
+                else:
+                    with raw.copy(sql) as copy:
+                        copy.write(buffer.getvalue())
+            count += len(batch)
+        return count
+
+
+class InsertLoader:
+    """
+    Load rows with batched ``INSERT`` statements.
+
+    ``bulk_create`` would overwrite explicit ``created_at``/``updated_at``
+    values (``auto_now``/``auto_now_add``), so values are prepared with each
+    field's ``get_db_prep_save`` and inserted with ``executemany`` instead.
+    """
+
+    def __init__(self, connection, batch_size):
+        self.connection = connection
+        self.batch_size = batch_size
+
+    def load(self, model, columns, rows, table=None):
+        """
+        Load rows (tuples of column values) into table, the model's table by default.
+        """
+        ops = self.connection.ops
+        fields = [model._meta.get_field(column) for column in columns]
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            ops.quote_name(table or model._meta.db_table),
+            ", ".join(ops.quote_name(column) for column in columns),
+            ", ".join(["%s"] * len(columns)),
+        )
+        count = 0
+        for batch in _batches(rows, self.batch_size):
+            params = [
+                [field.get_db_prep_save(value, self.connection) for field, value in zip(fields, row)]
+                for row in batch
+            ]
+            with self.connection.cursor() as cursor:
+                cursor.executemany(sql, params)
+            count += len(batch)
+        return count
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
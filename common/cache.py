@@ -0,0 +1,236 @@
+"""
+Caching helpers for the NCC School Management system.
+"""
+
+import threading
+import time
+import weakref
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache as django_cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import PyMemcacheCache
+from django.core.cache.backends.redis import RedisCache
+
+_registry = weakref.WeakSet()
+_backend_stats = {}
+_backend_stats_lock = threading.Lock()
+
+# Seconds a version lives in a shared cache. Versions are recreated or
+# reloaded when missing, so this only bounds the keys left behind.
+SHARED_VERSION_TIMEOUT = 7 * 86400
+
+
+def is_shared(cache):
+    """
+    Return whether a Django cache is shared by every worker process.
+    """
+    if cache is django_cache:
+        # django.core.cache.cache is a proxy to the default cache of the current thread.
+        cache = caches[DEFAULT_CACHE_ALIAS]
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def shared_timeout(cache, timeout):
+    """
+    Return the timeout of a value that other workers must see when it changes.
+
+    Such values (versions) live for SHARED_VERSION_TIMEOUT seconds in a
+    shared cache. In a per-process cache a worker never sees another worker's
+    changes, so they expire after timeout seconds and are reloaded.
+    """
+    return SHARED_VERSION_TIMEOUT if is_shared(cache) else timeout
+
+
+class CacheVersions:
+    """
+    Versions of cached results, stored in the Django cache under prefix + key.
+
+    Results are cached under keys that include their version, so bumping a
+    version invalidates them everywhere at once. This needs a cache shared
+    by every worker (see CACHES); with a per-process cache, workers do not
+    see each other's bumps, so versions expire after local_timeout seconds
+    instead, which bounds how stale their results get.
+    """
+
+    def __init__(self, prefix, local_timeout=60):
+        self.prefix = prefix
+        self.local_timeout = local_timeout
+
+    @staticmethod
+    def _new_version():
+        return f"{time.time_ns():x}"
+
+    def get(self, key=""):
+        """
+        Return the current version of key.
+
+        A missing version (never set, evicted or expired) is replaced by a
+        fresh one, so results cached under an older version are never served
+        again.
+        """
+        cache_key = f"{self.prefix}{key}"
+        version = django_cache.get(cache_key)
+        if version is None:
+            version = self._new_version()
+            if not django_cache.add(cache_key, version, shared_timeout(django_cache, self.local_timeout)):
+                version = django_cache.get(cache_key, version)
+        return version
+
+    def get_many(self, keys):
+        """
+        Return {key: current version} of keys, with one cache round trip when they are all set.
+        """
+        cache_keys = {f"{self.prefix}{key}": key for key in keys}
+        versions = {cache_keys[cache_key]: version for cache_key, version in django_cache.get_many(cache_keys).items()}
+        for key in cache_keys.values():
+            if key not in versions:
+                versions[key] = self.get(key)
+        return versions
+
+    def bump(self, *keys):
+        """
+        Invalidate the results cached under the current versions of keys (None keys are skipped).
+        """
+        version = self._new_version()
+        django_cache.set_many(
+            {f"{self.prefix}{key}": version for key in keys if key is not None},
+            shared_timeout(django_cache, self.local_timeout),
+        )
+
+
+def registered_caches():
+    """
+    Return every live TTLCache, e.g. to report hit ratios.
+    """
+    return list(_registry)
+
+
+class TTLCache:
+    """
+    Small thread-safe in-process cache with per-entry expiry.
+
+    Entries live in the memory of the current worker process only, so this is
+    meant for short-lived copies of data whose source of truth is elsewhere
+    (the database or the shared Django cache).
+    """
+
+    def __init__(self, name, ttl, max_size=1024):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+        self._lock = threading.Lock()
+        _registry.add(self)
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for key, or default when missing or expired.
+        """
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self.hits += 1
+                return value
+            with self._lock:
+                self._data.pop(key, None)
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        """
+        Store value under key for ttl seconds (defaults to the cache TTL).
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data.pop(key, None)
+            if len(self._data) >= self.max_size:
+                self._evict()
+            self._data[key] = (expires_at, value)
+
+    def delete(self, key):
+        """
+        Remove key from the cache if present.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """
+        Remove every entry from the cache.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _evict(self):
+        """
+        Drop expired entries, then the oldest ones, until there is room.
+        """
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._data.items() if expires_at <= now]:
+            del self._data[key]
+        while len(self._data) >= self.max_size:
+            del self._data[next(iter(self._data))]
+
+
+def backend_stats():
+    """
+    Return hit and miss counts of the instrumented Django caches, by alias.
+    """
+    with _backend_stats_lock:
+        return {alias: list(counts) for alias, counts in _backend_stats.items()}
+
+
+class CacheStatsMixin:
+    """
+    Count the hits and misses of a Django cache backend's get and get_many.
+
+    Django does not tell a backend its alias, so it is read from the ALIAS
+    key of the cache's CACHES entry.
+    """
+
+    # Whether the backend has its own get_many; the default one calls get.
+    native_get_many = True
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.alias = params.get("ALIAS", DEFAULT_CACHE_ALIAS)
+
+    def _count(self, hits, misses):
+        with _backend_stats_lock:
+            counts = _backend_stats.setdefault(self.alias, [0, 0])
+            counts[0] += hits
+            counts[1] += misses
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing_key, version=version)
+        if value is self._missing_key:
+            self._count(0, 1)
+            return default
+        self._count(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version=version)
+        if self.native_get_many:
+            self._count(len(found), len(keys) - len(found))
+        return found
+
+
+class StatsLocMemCache(CacheStatsMixin, LocMemCache):
+    native_get_many = False
+
+
+class StatsRedisCache(CacheStatsMixin, RedisCache):
+    pass
+
+
+class StatsPyMemcacheCache(CacheStatsMixin, PyMemcacheCache):
+    pass
@@ -0,0 +1,129 @@
+"""
+Per-request performance instrumentation for the NCC School Management system.
+
+``PerformanceMiddleware`` (see ``common.middleware``) attaches a
+``RequestMetrics`` to sampled requests. Database time and query counts are
+collected through ``connection.execute_wrapper``; other phases (serializer,
+renderer) are measured by wrapping code in ``timed(phase)``, which is a no-op
+for requests that are not sampled.
+"""
+
+import contextvars
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+def instrumentation_setting(name, default):
+    return getattr(settings, "PERFORMANCE_INSTRUMENTATION", {}).get(name, default)
+
+
+class RequestMetrics:
+    """
+    Timings collected while handling one request.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.total_time = None
+        self.db_time = 0.0
+        self.query_count = 0
+        self.queries = Counter()
+        self.phases = defaultdict(float)
+        self._active = set()
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """
+        Execute wrapper that times every query and counts repeated SQL.
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.query_count += 1
+            # Parameters are bound separately, so the same statement issued
+            # for different rows (an N+1 pattern) shares one SQL string.
+            self.queries[sql] += 1
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started_at
+
+    def duplicate_queries(self, threshold=None):
+        """
+        Return (sql, count) pairs executed at least threshold times.
+        """
+        if threshold is None:
+            threshold = instrumentation_setting("DUPLICATE_QUERY_THRESHOLD", 3)
+        return sorted(
+            ((sql, count) for sql, count in self.queries.items() if count >= threshold),
+            key=lambda item: -item[1],
+        )
+
+    def server_timing(self):
+        """
+        Return the value of the Server-Timing header.
+        """
+        duplicates = sum(count for _, count in self.duplicate_queries())
+        entries = [f'db;dur={self.db_time * 1000:.2f};desc="{self.query_count} queries, {duplicates} duplicated"']
+        for phase, duration in self.phases.items():
+            entries.append(f"{phase};dur={duration * 1000:.2f}")
+        if self.total_time is not None:
+            entries.append(f"total;dur={self.total_time * 1000:.2f}")
+        return ", ".join(entries)
+
+    def as_dict(self):
+        """
+        Return the metrics as a dict suitable for structured logging.
+        """
+        data = {
+            "total_ms": round((self.total_time or 0) * 1000, 2),
+            "db_ms": round(self.db_time * 1000, 2),
+            "queries": self.query_count,
+        }
+        for phase, duration in self.phases.items():
+            data[f"{phase}_ms"] = round(duration * 1000, 2)
+        duplicates = self.duplicate_queries()
+        if duplicates:
+            data["duplicate_queries"] = [{"sql": sql[:300], "count": count} for sql, count in duplicates]
+        return data
+
+
+def current_metrics():
+    """
+    Return the metrics of the request being handled, or None when not sampled.
+    """
+    return _current.get()
+
+
+def activate(metrics):
+    return _current.set(metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(phase):
+    """
+    Add the time spent in the block to phase, excluding database time.
+
+    Nested blocks for the same phase are only counted once.
+    """
+    metrics = _current.get()
+    if metrics is None or phase in metrics._active:
+        yield
+        return
+    metrics._active.add(phase)
+    start = time.perf_counter()
+    db_start = metrics.db_time
+    try:
+        yield
+    finally:
+        metrics.phases[phase] += (time.perf_counter() - start) - (metrics.db_time - db_start)
+        metrics._active.discard(phase)
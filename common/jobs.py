@@ -0,0 +1,335 @@
+"""
+Background job queue for the NCC School Management system.
+
+Jobs are rows of the ``Job`` table. Workers (``manage.py run_worker``) claim
+batches of queued jobs with ``SELECT ... FOR UPDATE SKIP LOCKED``, so any
+number of workers can poll the queue without waiting on each other's locks,
+and mark them running with one ``UPDATE``. The claim query is served by a
+partial index that only holds queued rows. Each job then runs in a process
+of the worker's pool, interrupted by ``SIGALRM`` when it exceeds its
+timeout; failures are queued again with an exponential delay until the job
+runs out of attempts. A process dying breaks its pool and every job in
+flight in it; the pool is replaced and those jobs are queued again. Jobs
+whose worker died are queued again once their lock (``locked_until``)
+expires.
+
+Tasks are plain functions registered by name in ``JOBS["TASKS"]``; they
+receive a ``JobContext`` (for progress reports) and the job's ``args``, and
+their return value is stored as the job's result.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .audit import audit_scope
+from .models import Job, JobStatus
+from .processes import init_worker_process
+
+logger = logging.getLogger("ncc.jobs")
+
+
+class JobTimeout(Exception):
+    """
+    Raised inside a job that ran longer than its timeout.
+    """
+
+
+def jobs_setting(name, default):
+    return getattr(settings, "JOBS", {}).get(name, default)
+
+
+def get_task(name):
+    """
+    Return the function registered as task name; raises ValueError for unknown tasks.
+    """
+    path = jobs_setting("TASKS", {}).get(name)
+    if path is None:
+        raise ValueError(f"Unknown task '{name}'")
+    return import_string(path)
+
+
+def enqueue(task, args=None, priority=0, run_after=None, max_attempts=None, timeout=None, created_by_id=None,
+            using="default"):
+    """
+    Queue a run of task with args (keyword arguments, JSON-serializable) and return the job.
+    """
+    get_task(task)
+    return Job.objects.using(using).create(
+        task=task,
+        args=args or {},
+        priority=priority,
+        run_after=run_after or timezone.now(),
+        max_attempts=max_attempts or jobs_setting("MAX_ATTEMPTS", 3),
+        timeout=timeout or jobs_setting("DEFAULT_TIMEOUT", 600),
+        # Users authenticated from token claims carry their id as a string.
+        created_by_id=Job._meta.get_field("created_by").to_python(created_by_id),
+    )
+
+
+def claim(worker, limit=1, using="default"):
+    """
+    Mark up to limit queued jobs that are due as running for worker and return them.
+
+    Rows locked by other workers' claims are skipped instead of waited for.
+    """
+    now = timezone.now()
+    grace = jobs_setting("LOCK_GRACE", 60)
+    with transaction.atomic(using=using):
+        jobs = list(
+            Job.objects.using(using)
+            .select_for_update(skip_locked=True)
+            .filter(status=JobStatus.QUEUED, run_after__lte=now)
+            .order_by("-priority", "run_after", "id")[:limit]
+        )
+        for job in jobs:
+            job.status = JobStatus.RUNNING
+            job.attempts += 1
+            job.worker = worker
+            job.started_at = now
+            job.locked_until = now + timedelta(seconds=job.timeout + grace)
+        if jobs:
+            Job.objects.using(using).bulk_update(
+                jobs, ["status", "attempts", "worker", "started_at", "locked_until"]
+            )
+    return jobs
+
+
+def requeue_stale(using="default"):
+    """
+    Queue again (or fail, without attempts left) running jobs whose lock expired; returns how many.
+
+    Such jobs belonged to a worker that died or was killed mid-job.
+    """
+    now = timezone.now()
+    stale = Job.objects.using(using).filter(status=JobStatus.RUNNING, locked_until__lt=now)
+    error = "The worker stopped before the job finished"
+    with transaction.atomic(using=using):
+        failed = stale.filter(attempts__gte=F("max_attempts")).update(
+            status=JobStatus.FAILED, error=error, finished_at=now, locked_until=None
+        )
+        requeued = stale.update(status=JobStatus.QUEUED, error=error, run_after=now, locked_until=None)
+    return failed + requeued
+
+
+class JobContext:
+    """
+    Handle passed to tasks to report their progress.
+
+    Reports are written at most once per ``JOBS["PROGRESS_INTERVAL"]``
+    seconds, except the last one (done == total).
+    """
+
+    def __init__(self, job, using="default"):
+        self.job = job
+        self.using = using
+        self._reported_at = 0.0
+
+    def progress(self, done, total=None, message=""):
+        """
+        Report done units of work out of total (done is a share from 0 to 1 without total).
+        """
+        fraction = min(max(done / total if total else done, 0.0), 1.0)
+        now = time.monotonic()
+        if fraction < 1.0 and now - self._reported_at < jobs_setting("PROGRESS_INTERVAL", 1.0):
+            return
+        self._reported_at = now
+        Job.objects.using(self.using).filter(pk=self.job.pk, status=JobStatus.RUNNING).update(
+            progress=fraction, progress_message=message[:255]
+        )
+
+
+def _raise_timeout(signum, frame):
+    raise JobTimeout()
+
+
+def _run_task(job, using):
+    task = get_task(job.task)
+    use_alarm = job.timeout and threading.current_thread() is threading.main_thread()
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, job.timeout)
+    try:
+        with audit_scope(actor=job.created_by_id):
+            return task(JobContext(job, using), **job.args)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def execute(job_id, using="default"):
+    """
+    Run one attempt of a claimed job and record its result or failure; returns the final status.
+
+    Updates only apply while the job is still the same running attempt, so
+    a job queued again after its lock expired is not overwritten.
+    """
+    close_old_connections()
+    job = Job.objects.using(using).get(pk=job_id)
+    if job.status != JobStatus.RUNNING:
+        return job.status
+    current = Job.objects.using(using).filter(pk=job.pk, status=JobStatus.RUNNING, attempts=job.attempts)
+    try:
+        result = _run_task(job, using)
+    except JobTimeout:
+        logger.warning("Job %s (%s) timed out after %s seconds", job.pk, job.task, job.timeout)
+        return fail(current, job, f"Timed out after {job.timeout} seconds")
+    except Exception as error:
+        logger.exception("Job %s (%s) failed", job.pk, job.task)
+        return fail(current, job, f"{type(error).__name__}: {error}")
+    current.update(
+        status=JobStatus.SUCCEEDED, result=result, progress=1.0, error="", finished_at=timezone.now(),
+        locked_until=None,
+    )
+    return JobStatus.SUCCEEDED
+
+
+def fail(current, job, message):
+    """
+    Record a failed attempt of job (current: queryset of the attempt) and return the new status.
+
+    Jobs with attempts left are queued again after RETRY_DELAY seconds,
+    doubled after every attempt.
+    """
+    now = timezone.now()
+    if job.attempts < job.max_attempts:
+        delay = jobs_setting("RETRY_DELAY", 30) * 2 ** (job.attempts - 1)
+        current.update(
+            status=JobStatus.QUEUED, error=message, run_after=now + timedelta(seconds=delay), locked_until=None
+        )
+        return JobStatus.QUEUED
+    current.update(status=JobStatus.FAILED, error=message, finished_at=now, locked_until=None)
+    return JobStatus.FAILED
+
+
+def retry(current, message):
+    """
+    Queue a job again right away without counting its attempt (current: queryset of the attempt).
+    """
+    current.update(
+        status=JobStatus.QUEUED, attempts=F("attempts") - 1, error=message, run_after=timezone.now(),
+        locked_until=None,
+    )
+    return JobStatus.QUEUED
+
+
+def cancel(job):
+    """
+    Cancel job if it is still queued; returns whether it was.
+    """
+    return bool(
+        Job.objects.filter(pk=job.pk, status=JobStatus.QUEUED).update(
+            status=JobStatus.CANCELLED, finished_at=timezone.now()
+        )
+    )
+
+
+class Worker:
+    """
+    Claim jobs and run them in a pool of processes until stopped.
+
+    executor defaults to a ``ProcessPoolExecutor`` of concurrency spawned
+    processes; any ``concurrent.futures`` executor whose tasks run in their
+    process's main thread will do.
+    """
+
+    def __init__(self, concurrency=None, poll_interval=None, executor=None, name=None, using="default", log=None):
+        self.concurrency = concurrency or jobs_setting("CONCURRENCY", 4)
+        self.poll_interval = poll_interval or jobs_setting("POLL_INTERVAL", 1.0)
+        self.executor = executor
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.using = using
+        self.log = log or (lambda message: None)
+        self.stopping = False
+
+    def stop(self, *args):
+        """
+        Stop claiming jobs; running jobs finish first.
+        """
+        self.stopping = True
+
+    def run(self, burst=False):
+        """
+        Process jobs until stop() is called, or until the queue is empty when burst is set.
+
+        Returns the number of jobs processed.
+        """
+        executor = self.executor or self._pool()
+        running = {}
+        processed = 0
+        stale_checked_at = 0.0
+        try:
+            while not self.stopping or running:
+                if time.monotonic() - stale_checked_at >= jobs_setting("STALE_CHECK_INTERVAL", 30):
+                    stale_checked_at = time.monotonic()
+                    if requeue_stale(self.using):
+                        self.log("Queued jobs abandoned by other workers again.")
+                free = self.concurrency - len(running)
+                if free and not self.stopping:
+                    for job in claim(self.name, free, self.using):
+                        running[executor.submit(execute, job.pk, self.using)] = job, executor
+                if not running:
+                    if burst:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+                done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, pool = running.pop(future)
+                    processed += 1
+                    if not self._finished(job, future) and pool is executor and self.executor is None:
+                        # The other jobs of the broken pool fail the same way; it is replaced once.
+                        executor.shutdown(wait=False)
+                        executor = self._pool()
+        finally:
+            if self.executor is None:
+                executor.shutdown(wait=True, cancel_futures=True)
+        return processed
+
+    def _pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.concurrency,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker_process,
+            max_tasks_per_child=jobs_setting("MAX_TASKS_PER_CHILD", 1000),
+        )
+
+    def _finished(self, job, future):
+        """
+        Log the outcome of a job; returns False when its pool is broken.
+
+        A broken pool fails every job in flight in it, not only the one whose
+        process died, so those jobs are queued again without counting the
+        attempt, unless their previous attempt ended the same way: a job that
+        keeps killing its process still runs out of attempts.
+        """
+        try:
+            status = future.result()
+        except Exception as error:
+            # The process died (killed, out of memory), so the job could not record its outcome.
+            logger.exception("Job %s crashed its worker process", job.pk)
+            current = Job.objects.using(self.using).filter(pk=job.pk, status=JobStatus.RUNNING, attempts=job.attempts)
+            message = f"{type(error).__name__}: {error}"
+            broken = isinstance(error, BrokenProcessPool)
+            if broken and not job.error.startswith(BrokenProcessPool.__name__):
+                status = retry(current, message)
+            else:
+                status = fail(current, job, message)
+            self.log(f"Job {job.pk} ({job.task}): {status}")
+            return not broken
+        self.log(f"Job {job.pk} ({job.task}): {status}")
+        return True
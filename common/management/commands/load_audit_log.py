@@ -0,0 +1,34 @@
+"""
+Load the audit file into the database.
+"""
+
+from django.core.management.base import BaseCommand
+
+from common.audit import load_file
+
+
+class Command(BaseCommand):
+    """
+    Load the audit entries appended to ``AUDIT_LOG["FILE"]`` (the "file" sink) into the database.
+
+    Schedule it periodically, e.g. every few minutes; workers keep appending
+    to a new file while it runs.
+    """
+    help = "Load the audit entries appended to the audit file into the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            default=None,
+            help="Audit file to load (default: AUDIT_LOG['FILE'])"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Entries inserted per statement"
+        )
+
+    def handle(self, *args, **options):
+        count = load_file(options["file"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Loaded {count} audit entry(ies)."))
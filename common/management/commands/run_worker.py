@@ -0,0 +1,56 @@
+"""
+Run background jobs.
+"""
+
+import signal
+
+from django.core.management.base import BaseCommand
+
+from common.jobs import Worker
+
+
+class Command(BaseCommand):
+    """
+    Claim queued jobs and run them in a pool of processes until stopped.
+
+    SIGTERM and SIGINT stop claiming jobs and exit once the running jobs
+    finish. Run as many workers as needed, on any number of hosts.
+    """
+    help = "Run queued background jobs in a pool of processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="Jobs run at the same time (default: JOBS['CONCURRENCY'])"
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=None,
+            help="Seconds between polls of an empty queue (default: JOBS['POLL_INTERVAL'])"
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty"
+        )
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Database alias holding the queue"
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options["concurrency"],
+            poll_interval=options["poll_interval"],
+            using=options["database"],
+            log=lambda message: self.stdout.write(message),
+        )
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        self.stdout.write(f"Worker {worker.name} running {worker.concurrency} job(s) at a time.")
+        processed = worker.run(burst=options["burst"])
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s)."))
@@ -0,0 +1,429 @@
+"""
+Prometheus-format metrics for the NCC School Management system.
+
+Each worker process keeps its metrics in memory, so recording a request is
+a handful of dict updates. When ``METRICS["DIRECTORY"]`` is set, workers
+also write a snapshot of their metrics to
+``<directory>/metrics_<pid>_<start>.json`` at most once per
+``FLUSH_INTERVAL`` seconds, and the ``/metrics`` endpoint merges the
+snapshots of all workers: counters and histograms are summed, gauges and
+process stats only come from workers that are still running. Keying
+snapshots by start time as well as PID keeps a new worker that reuses the
+PID of an exited one from overwriting its counters. Snapshots of exited
+workers are folded into ``metrics_dead.json`` and removed, so their
+counters are kept without their files piling up.
+"""
+
+import atexit
+import bisect
+import fcntl
+import json
+import os
+import resource
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from .cache import backend_stats, registered_caches
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def metrics_setting(name, default):
+    return getattr(settings, "METRICS", {}).get(name, default)
+
+
+class Metric:
+    """
+    A named metric with labelled values.
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        return [[list(labels), value] for labels, value in self.values.items()]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self.values.get(labels)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, with a final +Inf slot, sum, count.
+                state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self):
+        return [[list(labels), [list(counts), total, count]] for labels, (counts, total, count) in self.values.items()]
+
+
+REQUESTS = Counter("http_requests_total", "Total HTTP requests.", ("route", "method", "status"))
+LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency in seconds.", ("route", "method"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being handled.")
+DB_QUERIES = Counter("db_queries_total", "Database queries executed while handling requests.", ("route", "method"))
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "Database queries per request.", ("route", "method"),
+    buckets=(1, 2, 5, 10, 20, 50, 100),
+)
+AUDIT_ENTRIES = Counter("audit_entries_total", "Audit entries written.", ("sink",))
+AUDIT_WRITE_DURATION = Histogram(
+    "audit_write_duration_seconds", "Time spent writing a batch of audit entries.", ("sink",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+METRICS = [REQUESTS, LATENCY, IN_FLIGHT, DB_QUERIES, DB_QUERIES_PER_REQUEST, AUDIT_ENTRIES, AUDIT_WRITE_DURATION]
+
+DEAD_SNAPSHOT = "metrics_dead.json"
+
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+_identity = (None, 0)
+
+
+def observe_request(route, method, status, duration, queries):
+    """
+    Record one finished request.
+    """
+    REQUESTS.inc((route, method, str(status)))
+    LATENCY.observe((route, method), duration)
+    DB_QUERIES.inc((route, method), queries)
+    DB_QUERIES_PER_REQUEST.observe((route, method), queries)
+    maybe_flush()
+
+
+def observe_audit(sink, entries, duration):
+    """
+    Record one batch of audit entries written to sink.
+    """
+    AUDIT_ENTRIES.inc((sink,), entries)
+    AUDIT_WRITE_DURATION.observe((sink,), duration)
+
+
+def process_stats():
+    """
+    Return resource usage of the current process.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    stats = {
+        "process_cpu_seconds_total": usage.ru_utime + usage.ru_stime,
+        "process_max_resident_memory_bytes": usage.ru_maxrss * 1024,
+    }
+    try:
+        with open("/proc/self/statm") as statm:
+            stats["process_resident_memory_bytes"] = int(statm.read().split()[1]) * resource.getpagesize()
+        stats["process_open_fds"] = len(os.listdir("/proc/self/fd"))
+    except OSError:
+        pass
+    return stats
+
+
+def cache_stats():
+    """
+    Return hit and miss counts of the in-process caches.
+    """
+    return {cache.name: [cache.hits, cache.misses] for cache in registered_caches()}
+
+
+# Snapshot key, metric prefix, label and description of each kind of cache.
+CACHE_KINDS = (
+    ("caches", "cache", "cache", "In-process cache"),
+    ("django_caches", "django_cache", "alias", "Django cache"),
+)
+
+
+def process_identity():
+    """
+    Return (pid, start) of the current process.
+
+    start is taken on first use in each process, so workers forked from a
+    process that already used it get their own.
+    """
+    global _identity
+    pid = os.getpid()
+    if _identity[0] != pid:
+        _identity = (pid, time.time_ns())
+    return _identity
+
+
+def _snapshot_filename(pid, start):
+    return f"metrics_{pid}_{start}.json"
+
+
+def snapshot():
+    """
+    Return the metrics of the current process as JSON-serializable data.
+    """
+    pid, start = process_identity()
+    return {
+        "pid": pid,
+        "start": start,
+        "metrics": {metric.name: metric.snapshot() for metric in METRICS},
+        "caches": cache_stats(),
+        "django_caches": backend_stats(),
+        "process": process_stats(),
+    }
+
+
+def maybe_flush(force=False):
+    """
+    Write this process's snapshot to the metrics directory if one is configured.
+    """
+    global _last_flush
+    directory = metrics_setting("DIRECTORY", None)
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < metrics_setting("FLUSH_INTERVAL", 1.0):
+        return
+    if not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as tmp:
+            json.dump(snapshot(), tmp)
+        os.replace(tmp_path, os.path.join(directory, _snapshot_filename(*process_identity())))
+    finally:
+        _flush_lock.release()
+
+
+atexit.register(maybe_flush, force=True)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _load(path):
+    try:
+        with open(path) as snapshot_file:
+            return json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _merge_into(totals, data, gauges=True):
+    """
+    Add the counters, histograms and cache counts of a snapshot (and its gauges when gauges) to totals.
+    """
+    for metric in METRICS:
+        if metric.type == "gauge" and not gauges:
+            continue
+        merged = totals["metrics"].setdefault(metric.name, {})
+        for labels, value in data["metrics"].get(metric.name, []):
+            key = tuple(labels)
+            if metric.type == "histogram":
+                counts, total, count = merged.get(key, [[0] * len(value[0]), 0.0, 0])
+                merged[key] = [[a + b for a, b in zip(counts, value[0])], total + value[1], count + value[2]]
+            else:
+                merged[key] = merged.get(key, 0) + value
+    for kind, *_ in CACHE_KINDS:
+        for name, (hits, misses) in data.get(kind, {}).items():
+            cache_totals = totals.setdefault(kind, {}).setdefault(name, [0, 0])
+            cache_totals[0] += hits
+            cache_totals[1] += misses
+
+
+def _merge_dead(directory, dead):
+    """
+    Fold the snapshots of exited workers (a list of (filename, data)) into the dead snapshot and remove them.
+
+    Runs under a file lock, as every worker answering /metrics may do it.
+    The dead snapshot lists the files it last absorbed, so a file left
+    behind by an interrupted merge is removed without being counted twice.
+    """
+    path = os.path.join(directory, DEAD_SNAPSHOT)
+    with open(os.path.join(directory, "metrics_dead.lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        previous = _load(path) or {"metrics": {}, "caches": {}, "merged": []}
+        totals = {"metrics": {}, "caches": {}}
+        _merge_into(totals, previous, gauges=False)
+        absorbed = set(previous.get("merged", []))
+        merged = []
+        for filename, data in dead:
+            if not os.path.exists(os.path.join(directory, filename)):
+                continue  # Merged by another worker meanwhile.
+            if filename not in absorbed:
+                _merge_into(totals, data, gauges=False)
+            merged.append(filename)
+        if not merged:
+            return
+        aggregate = {
+            "pid": None,
+            "start": 0,
+            "metrics": {
+                name: [[list(labels), value] for labels, value in values.items()]
+                for name, values in totals["metrics"].items()
+            },
+            "caches": totals.get("caches", {}),
+            "django_caches": totals.get("django_caches", {}),
+            "process": {},
+            "merged": merged,
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as tmp:
+            json.dump(aggregate, tmp)
+        os.replace(tmp_path, path)
+        for filename in merged:
+            try:
+                os.remove(os.path.join(directory, filename))
+            except FileNotFoundError:
+                pass
+
+
+def collect():
+    """
+    Return snapshots of every running worker, with the current process taken live, and of exited ones.
+
+    Snapshots of exited workers are folded into the dead snapshot first. A
+    PID reused by a new worker makes its older snapshots look alive, so only
+    the latest start of each PID counts as running.
+    """
+    current = snapshot()
+    current["alive"] = True
+    snapshots = [current]
+    directory = metrics_setting("DIRECTORY", None)
+    if not directory or not os.path.isdir(directory):
+        return snapshots
+
+    own = _snapshot_filename(current["pid"], current["start"])
+    found = []
+    for filename in os.listdir(directory):
+        if not filename.startswith("metrics_") or not filename.endswith(".json") or filename in (own, DEAD_SNAPSHOT):
+            continue
+        data = _load(os.path.join(directory, filename))
+        if data is not None:
+            found.append((filename, data))
+    latest = {current["pid"]: current["start"]}
+    for _, data in found:
+        pid = data.get("pid", 0)
+        latest[pid] = max(latest.get(pid, 0), data.get("start", 0))
+
+    dead = []
+    for filename, data in found:
+        pid = data.get("pid", 0)
+        if data.get("start", 0) == latest[pid] and _pid_alive(pid):
+            data["alive"] = True
+            snapshots.append(data)
+        else:
+            dead.append((filename, data))
+    if dead:
+        _merge_dead(directory, dead)
+    aggregate = _load(os.path.join(directory, DEAD_SNAPSHOT))
+    if aggregate is not None:
+        aggregate["alive"] = False
+        snapshots.append(aggregate)
+    return snapshots
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """
+    Return all metrics, merged across workers, in the Prometheus text format.
+    """
+    snapshots = collect()
+    totals = {"metrics": {}, "caches": {}}
+    for data in snapshots:
+        _merge_into(totals, data, gauges=data["alive"])
+    lines = []
+
+    for metric in METRICS:
+        merged = totals["metrics"].get(metric.name, {})
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        if metric.type == "gauge" and not merged and not metric.labelnames:
+            merged[()] = 0
+        for labels, value in sorted(merged.items()):
+            if metric.type != "histogram":
+                lines.append(f"{metric.name}{_format_labels(metric.labelnames, labels)} {_format_value(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(list(metric.buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else _format_value(float(bound))
+                lines.append(
+                    f"{metric.name}_bucket{_format_labels(metric.labelnames, labels, [('le', le)])} {cumulative}"
+                )
+            lines.append(f"{metric.name}_sum{_format_labels(metric.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{metric.name}_count{_format_labels(metric.labelnames, labels)} {count}")
+
+    for kind, prefix, label, description in CACHE_KINDS:
+        cache_totals = totals.get(kind, {})
+        for suffix, index in (("hits", 0), ("misses", 1)):
+            lines.append(f"# HELP {prefix}_{suffix}_total {description} {suffix}.")
+            lines.append(f"# TYPE {prefix}_{suffix}_total counter")
+            for name, counts in sorted(cache_totals.items()):
+                lines.append(f'{prefix}_{suffix}_total{{{label}="{_escape(name)}"}} {counts[index]}')
+        lines.append(f"# HELP {prefix}_hit_ratio {description} hit ratio.")
+        lines.append(f"# TYPE {prefix}_hit_ratio gauge")
+        for name, (hits, misses) in sorted(cache_totals.items()):
+            ratio = hits / (hits + misses) if hits + misses else 0.0
+            lines.append(f'{prefix}_hit_ratio{{{label}="{_escape(name)}"}} {ratio!r}')
+
+    stat_names = sorted({name for data in snapshots if data["alive"] for name in data.get("process", {})})
+    for name in stat_names:
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines.append(f"# TYPE {name} {kind}")
+        for data in snapshots:
+            if data["alive"] and name in data.get("process", {}):
+                lines.append(f'{name}{{pid="{data["pid"]}"}} {_format_value(data["process"][name])}')
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,126 @@
+"""
+Middleware for the NCC School Management system.
+"""
+
+import json
+import logging
+import random
+import time
+
+from django.db import connection
+
+from . import metrics
+from .audit import audit_scope
+from .instrumentation import RequestMetrics, activate, deactivate, instrumentation_setting
+
+logger = logging.getLogger("ncc.performance")
+
+
+class PerformanceMiddleware:
+    """
+    Measure database, serializer and render time for a sample of requests.
+
+    Sampled requests get one structured log line, and a Server-Timing header
+    when the user is staff or ``SERVER_TIMING`` is on, since query counts and
+    timings tell clients about the backend. Repeated queries (N+1 patterns)
+    are logged as warnings. Requests outside the sample pay only for one
+    random() call.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= instrumentation_setting("SAMPLE_RATE", 0.0):
+            return self.get_response(request)
+
+        request_metrics = RequestMetrics()
+        token = activate(request_metrics)
+        try:
+            with connection.execute_wrapper(request_metrics.db_wrapper):
+                response = self.get_response(request)
+        finally:
+            deactivate(token)
+        request_metrics.finish()
+
+        if self.show_server_timing(request):
+            response["Server-Timing"] = request_metrics.server_timing()
+
+        data = request_metrics.as_dict()
+        data.update(method=request.method, path=request.path, status=response.status_code)
+        if "duplicate_queries" in data:
+            logger.warning("Repeated queries detected: %s", json.dumps(data))
+        else:
+            logger.info(json.dumps(data))
+        return response
+
+    @staticmethod
+    def show_server_timing(request):
+        """
+        Return whether the response to request may carry the Server-Timing header.
+
+        The user is read once the view has run, so API users authenticated
+        by REST framework count as well.
+        """
+        if instrumentation_setting("SERVER_TIMING", False):
+            return True
+        user = getattr(request, "user", None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+class QueryCounter:
+    """
+    Execute wrapper that only counts queries.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Record request count, latency, in-flight requests and query counts per route.
+
+    Routes are labelled by URL name (e.g. ``student-list``), which keeps the
+    label set bounded; unresolved paths share the ``unmatched`` label.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        status = 500
+        metrics.IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.IN_FLIGHT.dec()
+            match = getattr(request, "resolver_match", None)
+            route = (match.view_name or match.route) if match else "unmatched"
+            metrics.observe_request(route, request.method, status, time.perf_counter() - start, counter.count)
+
+
+class AuditMiddleware:
+    """
+    Write the audit entries committed while handling a request with one statement.
+
+    Entries are stamped with the request's user, so the middleware must come
+    after AuthenticationMiddleware; users authenticated by DRF in the view
+    are picked up as well.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit_scope(request=request):
+            return self.get_response(request)
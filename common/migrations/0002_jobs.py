@@ -0,0 +1,136 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:04
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("common", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Job",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("task", models.CharField(help_text="Name of the task to run, a key of JOBS['TASKS']", max_length=100)),
+                (
+                    "args",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                        help_text="Keyword arguments passed to the task",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Queued"),
+                            ("running", "Running"),
+                            ("succeeded", "Succeeded"),
+                            ("failed", "Failed"),
+                            ("cancelled", "Cancelled"),
+                        ],
+                        default="queued",
+                        help_text="Current status of the job",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "priority",
+                    models.SmallIntegerField(default=0, help_text="Jobs with higher priority are claimed first"),
+                ),
+                (
+                    "run_after",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="Earliest time the job (or its next attempt) may start",
+                    ),
+                ),
+                ("attempts", models.PositiveSmallIntegerField(default=0, help_text="Number of attempts started")),
+                (
+                    "max_attempts",
+                    models.PositiveSmallIntegerField(default=3, help_text="Attempts allowed before the job fails"),
+                ),
+                (
+                    "timeout",
+                    models.PositiveIntegerField(
+                        default=600, help_text="Seconds an attempt may run before it is interrupted"
+                    ),
+                ),
+                ("progress", models.FloatField(default=0.0, help_text="Share of the work done, from 0 to 1")),
+                (
+                    "progress_message",
+                    models.CharField(blank=True, help_text="Description of the current step", max_length=255),
+                ),
+                (
+                    "result",
+                    models.JSONField(
+                        blank=True,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                        help_text="Value returned by the task",
+                        null=True,
+                    ),
+                ),
+                ("error", models.TextField(blank=True, help_text="Error of the last failed attempt")),
+                (
+                    "worker",
+                    models.CharField(blank=True, help_text="Worker running (or that last ran) the job", max_length=100),
+                ),
+                (
+                    "locked_until",
+                    models.DateTimeField(
+                        blank=True, help_text="When a running job is considered abandoned by its worker", null=True
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, help_text="Timestamp when the job was queued")),
+                (
+                    "started_at",
+                    models.DateTimeField(blank=True, help_text="Timestamp when the last attempt started", null=True),
+                ),
+                (
+                    "finished_at",
+                    models.DateTimeField(
+                        blank=True, help_text="Timestamp when the job succeeded, failed or was cancelled", null=True
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        help_text="User who queued the job",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Job",
+                "verbose_name_plural": "Jobs",
+                "db_table": "common_jobs",
+                "ordering": ["-created_at", "-id"],
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("status", "queued")),
+                        fields=["-priority", "run_after", "id"],
+                        name="jobs_queued_idx",
+                    ),
+                    models.Index(
+                        condition=models.Q(("status", "running")), fields=["locked_until"], name="jobs_running_idx"
+                    ),
+                    models.Index(fields=["created_by", "-created_at"], name="jobs_created_by_idx"),
+                ],
+            },
+        ),
+    ]
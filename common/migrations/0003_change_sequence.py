@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:10
+
+from django.db import migrations
+
+# Change sequence numbers (``ChangeSequenceMixin.change_seq``) are drawn from
+# one sequence shared by every table on PostgreSQL; other databases derive
+# them from each table's highest number.
+CHANGE_SEQUENCE = "common_change_seq"
+
+
+def create_change_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f'CREATE SEQUENCE IF NOT EXISTS "{CHANGE_SEQUENCE}"')
+
+
+def drop_change_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f'DROP SEQUENCE IF EXISTS "{CHANGE_SEQUENCE}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("common", "0002_jobs"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_change_sequence, drop_change_sequence),
+    ]
@@ -2,11 +2,71 @@
 Common models and mixins for the NCC School Management system.
 """
 
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 
 
-class SoftDeleteManager(models.Manager):
+CHANGE_SEQUENCE = "common_change_seq"
+
+
+def next_change_seq_sql(model, connection):
+    """
+    Return SQL evaluating to the next change sequence number of model's rows.
+
+    PostgreSQL draws numbers from one shared sequence, so concurrent writers
+    never wait on each other; other databases, which serialize writes, take
+    the table's highest number plus one.
+    """
+    if connection.vendor == "postgresql":
+        return f"nextval('{CHANGE_SEQUENCE}')"
+    quote = connection.ops.quote_name
+    return f"(SELECT COALESCE(MAX({quote('change_seq')}), 0) + 1 FROM {quote(model._meta.db_table)})"
+
+
+class NextChangeSeq(models.Expression):
+    """
+    Expression assigning the next change sequence number in an INSERT or UPDATE.
+    """
+    output_field = models.BigIntegerField()
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def as_sql(self, compiler, connection):
+        return next_change_seq_sql(self.model, connection), []
+
+
+class ChangeTrackingQuerySet(models.QuerySet):
+    """
+    QuerySet stamping the rows written by update() and bulk_create() with new change sequence numbers.
+    """
+
+    def _tracks_changes(self):
+        return issubclass(self.model, ChangeSequenceMixin)
+
+    def update(self, **kwargs):
+        if self._tracks_changes():
+            kwargs.setdefault("change_seq", NextChangeSeq(self.model))
+            kwargs.setdefault("updated_at", timezone.now())
+        return super().update(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        if not self._tracks_changes():
+            return super().bulk_create(objs, *args, **kwargs)
+        for obj in objs:
+            obj.change_seq = NextChangeSeq(self.model)
+        try:
+            return super().bulk_create(objs, *args, **kwargs)
+        finally:
+            for obj in objs:
+                obj.__dict__.pop("change_seq", None)
+
+
+class SoftDeleteManager(models.Manager.from_queryset(ChangeTrackingQuerySet)):
     """
     Manager that filters out soft-deleted records by default.
     """
@@ -35,10 +95,12 @@ class TimestampMixin(models.Model):
     """
     created_at = models.DateTimeField(
         auto_now_add=True,
+        db_index=True,
         help_text="Timestamp when the record was created"
     )
     updated_at = models.DateTimeField(
         auto_now=True,
+        db_index=True,
         help_text="Timestamp when the record was last updated"
     )
 
@@ -82,9 +144,283 @@ class SoftDeleteMixin(models.Model):
         return self.deleted_at is not None
 
 
-class BaseModel(TimestampMixin, SoftDeleteMixin):
+class ChangeSequenceMixin(models.Model):
+    """
+    Abstract model numbering every write of a row with an increasing change sequence number.
+
+    The number is assigned by the database within the INSERT or UPDATE, so
+    it costs no extra query, and it is only loaded back when accessed. Sync
+    clients page through changes by (change_seq, id); see ``api.sync``.
+    """
+    change_seq = models.BigIntegerField(
+        db_default=0,
+        db_index=True,
+        editable=False,
+        help_text="Change sequence number of the last write"
+    )
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        """
+        Save the instance, stamping its row with the next change sequence number.
+
+        Partial saves (update_fields) also write updated_at, which sync uses
+        to tell settled changes from recent ones.
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields:
+            tracked = {"change_seq", "updated_at"} if isinstance(self, TimestampMixin) else {"change_seq"}
+            kwargs["update_fields"] = {*update_fields, *tracked}
+        self.change_seq = NextChangeSeq(type(self))
+        try:
+            super().save(*args, **kwargs)
+        finally:
+            self.__dict__.pop("change_seq", None)
+
+
+class BaseModel(TimestampMixin, SoftDeleteMixin, ChangeSequenceMixin):
     """
-    Base model that combines timestamp and soft delete functionality.
+    Base model that combines timestamp, soft delete and change tracking functionality.
     """
     class Meta:
         abstract = True
+
+
+class AuditMixin:
+    """
+    Record field-level changes of saves (soft deletes included) in the audit log.
+
+    The field values loaded from the database are remembered, so diffs need
+    no extra query; entries are written in batches after the transaction
+    commits. See ``common.audit``.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._audit_loaded = (field_names, values)
+        return instance
+
+    def loaded_value(self, attname, default=None):
+        """
+        Return the value of the field attname as last loaded or saved, or default when unknown.
+        """
+        from .audit import loaded_values
+
+        return (loaded_values(self) or {}).get(attname, default)
+
+    def save(self, *args, **kwargs):
+        """
+        Save the instance and queue an audit entry with the fields that changed.
+        """
+        from .audit import capture
+
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        capture(self, adding, kwargs.get("update_fields"), kwargs.get("using"))
+
+    def hard_delete(self, using=None, keep_parents=False):
+        """
+        Permanently delete the instance and queue an audit entry for it.
+        """
+        from .audit import capture_hard_delete
+
+        pk = self.pk
+        super().hard_delete(using=using, keep_parents=keep_parents)
+        capture_hard_delete(self, pk, using)
+
+
+class AuditAction(models.TextChoices):
+    """
+    Enum for audited actions.
+    """
+    CREATE = "create", "Create"
+    UPDATE = "update", "Update"
+    DELETE = "delete", "Soft delete"
+    RESTORE = "restore", "Restore"
+    HARD_DELETE = "hard_delete", "Hard delete"
+
+
+class AuditEntry(models.Model):
+    """
+    Append-only record of a change to an audited object.
+
+    ``changes`` maps each changed field (by column attribute, e.g.
+    ``student_id``) to its ``[old, new]`` values; old values are null for
+    creations.
+    """
+    content_type = models.ForeignKey(
+        "contenttypes.ContentType",
+        on_delete=models.CASCADE,
+        related_name="+",
+        help_text="Model of the changed object"
+    )
+    object_id = models.BigIntegerField(
+        help_text="Primary key of the changed object"
+    )
+    action = models.CharField(
+        max_length=20,
+        choices=AuditAction.choices,
+        help_text="Kind of change"
+    )
+    changes = models.JSONField(
+        encoder=DjangoJSONEncoder,
+        default=dict,
+        help_text="Changed fields mapped to their [old, new] values"
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name="+",
+        help_text="User who made the change, null for jobs and commands"
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Timestamp when the change was saved"
+    )
+
+    class Meta:
+        db_table = "common_audit_entries"
+        verbose_name = "Audit Entry"
+        verbose_name_plural = "Audit Entries"
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["content_type", "object_id", "-created_at"], name="audit_entries_object_idx"),
+            models.Index(fields=["actor", "-created_at"], name="audit_entries_actor_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_action_display()} of {self.content_type_id}:{self.object_id}"
+
+
+class JobStatus(models.TextChoices):
+    """
+    Enum for background job statuses.
+    """
+    QUEUED = "queued", "Queued"
+    RUNNING = "running", "Running"
+    SUCCEEDED = "succeeded", "Succeeded"
+    FAILED = "failed", "Failed"
+    CANCELLED = "cancelled", "Cancelled"
+
+
+class Job(models.Model):
+    """
+    Background job run by the ``run_worker`` command.
+
+    Queued jobs are claimed in priority order once ``run_after`` has passed;
+    failed attempts are queued again with a growing delay until
+    ``max_attempts`` is reached. See ``common.jobs``.
+    """
+    task = models.CharField(
+        max_length=100,
+        help_text="Name of the task to run, a key of JOBS['TASKS']"
+    )
+    args = models.JSONField(
+        encoder=DjangoJSONEncoder,
+        default=dict,
+        blank=True,
+        help_text="Keyword arguments passed to the task"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=JobStatus.choices,
+        default=JobStatus.QUEUED,
+        help_text="Current status of the job"
+    )
+    priority = models.SmallIntegerField(
+        default=0,
+        help_text="Jobs with higher priority are claimed first"
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now,
+        help_text="Earliest time the job (or its next attempt) may start"
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Number of attempts started"
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=3,
+        help_text="Attempts allowed before the job fails"
+    )
+    timeout = models.PositiveIntegerField(
+        default=600,
+        help_text="Seconds an attempt may run before it is interrupted"
+    )
+    progress = models.FloatField(
+        default=0.0,
+        help_text="Share of the work done, from 0 to 1"
+    )
+    progress_message = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Description of the current step"
+    )
+    result = models.JSONField(
+        encoder=DjangoJSONEncoder,
+        null=True,
+        blank=True,
+        help_text="Value returned by the task"
+    )
+    error = models.TextField(
+        blank=True,
+        help_text="Error of the last failed attempt"
+    )
+    worker = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Worker running (or that last ran) the job"
+    )
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When a running job is considered abandoned by its worker"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name="+",
+        help_text="User who queued the job"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp when the job was queued"
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Timestamp when the last attempt started"
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Timestamp when the job succeeded, failed or was cancelled"
+    )
+
+    class Meta:
+        db_table = "common_jobs"
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            # Only queued rows are indexed, so claiming stays fast however many jobs have finished.
+            models.Index(
+                fields=["-priority", "run_after", "id"],
+                name="jobs_queued_idx",
+                condition=models.Q(status="queued"),
+            ),
+            models.Index(fields=["locked_until"], name="jobs_running_idx", condition=models.Q(status="running")),
+            models.Index(fields=["created_by", "-created_at"], name="jobs_created_by_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.get_status_display()})"
@@ -0,0 +1,20 @@
+"""
+Set-up of the processes of the job worker pool (see ``common.jobs``).
+
+Spawned processes import this module before Django is set up, so it must
+not import models.
+"""
+
+import signal
+
+import django
+
+
+def init_worker_process():
+    """
+    Set up Django in a new pool process.
+    """
+    django.setup()
+    # Stopping is up to the parent, which lets running jobs finish.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
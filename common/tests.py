@@ -2,11 +2,31 @@
 Tests for common models and mixins.
 """
 
-from django.test import TestCase
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
 from django.utils import timezone
-from django.db import models
+from django.db import connection, models, transaction
 
-from .models import TimestampMixin, SoftDeleteMixin
+from comercial.models import Product
+from management.models import Contract, Student
+from . import metrics
+from .cache import SHARED_VERSION_TIMEOUT, CacheVersions, StatsRedisCache, backend_stats
+from .audit import audit_scope, capture, entries_for, load_file, parse_model_label
+from .jobs import JobTimeout, Worker, _run_task, claim, enqueue, execute, requeue_stale
+from .instrumentation import RequestMetrics, activate, current_metrics, deactivate, timed
+from .middleware import AuditMiddleware
+from .models import AuditEntry, Job, JobStatus, TimestampMixin, SoftDeleteMixin
 
 
 class TestModel(TimestampMixin, SoftDeleteMixin, models.Model):
@@ -121,3 +141,498 @@ class BaseModelTest(TestCase):
         self.assertIsNone(self.test_model.deleted_at)
         self.test_model.delete()
         self.assertIsNotNone(self.test_model.deleted_at)
+
+    def test_writes_advance_change_sequence(self):
+        """
+        Test that saves, updates, bulk creations and soft deletes stamp rows with increasing change numbers.
+        """
+        def change_seq(product):
+            return Product.objects.all_with_deleted().values_list("change_seq", flat=True).get(pk=product.pk)
+
+        product = Product.objects.create(name="A", price=Decimal("10.00"), duration=1)
+        created = change_seq(product)
+        product.name = "B"
+        product.save(update_fields=["name"])
+        saved = change_seq(product)
+        Product.objects.filter(pk=product.pk).update(is_active=False)
+        updated = change_seq(product)
+        bulk = Product.objects.bulk_create([Product(name="C", price=Decimal("10.00"), duration=1)])
+        product.delete()
+        self.assertLess(0, created)
+        self.assertLess(created, saved)
+        self.assertLess(saved, updated)
+        self.assertLess(updated, change_seq(bulk[0]))
+        self.assertLess(change_seq(bulk[0]), change_seq(product))
+
+
+class CacheVersionsTest(TestCase):
+    """
+    Test cases for versions of cached results.
+    """
+
+    def setUp(self):
+        """
+        Start from an empty cache.
+        """
+        cache.clear()
+
+    def test_bump_replaces_versions(self):
+        """
+        Test that versions are stable until bumped and that bumps only touch the given keys.
+        """
+        versions = CacheVersions("test:ver:")
+        first, second = versions.get(1), versions.get(2)
+        self.assertEqual(versions.get(1), first)
+        versions.bump(1, None)
+        self.assertNotEqual(versions.get(1), first)
+        self.assertEqual(versions.get(2), second)
+
+    def test_versions_expire_without_shared_cache(self):
+        """
+        Test that versions in a per-process cache expire quickly, and versions in a shared one after days.
+        """
+        clock = [1000.0]
+        versions = CacheVersions("test:ver:", local_timeout=60)
+        with mock.patch("time.time", lambda: clock[0]):
+            version = versions.get(1)
+            clock[0] += 30
+            self.assertEqual(versions.get(1), version)
+            clock[0] += 31
+            self.assertNotEqual(versions.get(1), version)
+            with mock.patch("common.cache.is_shared", return_value=True):
+                version = versions.get(2)
+                clock[0] += 3600
+                self.assertEqual(versions.get(2), version)
+                clock[0] += SHARED_VERSION_TIMEOUT
+                self.assertNotEqual(versions.get(2), version)
+
+
+class RequestMetricsTest(TestCase):
+    """
+    Test cases for per-request performance metrics.
+    """
+
+    def test_timed_is_noop_without_active_metrics(self):
+        """
+        Test that timed() does nothing outside a sampled request.
+        """
+        with timed("serialize"):
+            pass
+        self.assertIsNone(current_metrics())
+
+    def test_timed_excludes_database_time(self):
+        """
+        Test that queries inside a timed block count as db time only.
+        """
+        metrics = RequestMetrics()
+        token = activate(metrics)
+        try:
+            with connection.execute_wrapper(metrics.db_wrapper):
+                with timed("serialize"):
+                    TestModel.objects.count()
+        finally:
+            deactivate(token)
+
+        self.assertEqual(metrics.query_count, 1)
+        self.assertGreater(metrics.db_time, 0)
+        self.assertIn("serialize", metrics.phases)
+
+    def test_duplicate_queries_are_flagged(self):
+        """
+        Test that the same SQL repeated in one request is reported.
+        """
+        for i in range(3):
+            TestModel.objects.create(name=f"Test {i}")
+        metrics = RequestMetrics()
+        with connection.execute_wrapper(metrics.db_wrapper):
+            for obj in TestModel.objects.all():
+                TestModel.objects.filter(pk=obj.pk).exists()
+
+        duplicates = metrics.duplicate_queries(threshold=3)
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(duplicates[0][1], 3)
+        self.assertIn("3 duplicated", metrics.server_timing())
+
+
+class MetricsTest(TestCase):
+    """
+    Test cases for the Prometheus metrics endpoint.
+    """
+
+    def test_metrics_endpoint_reports_routes(self):
+        """
+        Test that requests show up per route in the exposition output.
+        """
+        self.client.get("/api/products/")
+        self.client.force_login(User.objects.create_user("admin", is_staff=True))
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('http_requests_total{route="product-list",method="GET",status="401"}', body)
+        self.assertIn('http_request_duration_seconds_bucket{route="product-list",method="GET",le="+Inf"}', body)
+        self.assertIn("# TYPE http_requests_in_flight gauge", body)
+        self.assertIn("process_cpu_seconds_total", body)
+
+    def test_django_cache_hits_and_misses_by_alias(self):
+        """
+        Test that get and get_many on the Django cache count each key once, labelled by alias.
+        """
+        cache.set("present", 1)
+        before = backend_stats().get("default", [0, 0])
+        cache.get("present")
+        cache.get("absent")
+        cache.get_many(["present", "absent", "other"])
+        after = backend_stats()["default"]
+        self.assertEqual([after[0] - before[0], after[1] - before[1]], [2, 3])
+        self.assertEqual(StatsRedisCache("redis://localhost", {"ALIAS": "sessions"}).alias, "sessions")
+
+        self.client.force_login(User.objects.create_user("admin", is_staff=True))
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('django_cache_hits_total{alias="default"}', body)
+        self.assertIn('django_cache_hit_ratio{alias="default"}', body)
+
+    def test_metrics_token_required_when_configured(self):
+        """
+        Test that a configured scrape token is enforced.
+        """
+        with override_settings(METRICS={"TOKEN": "secret"}):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+            self.assertEqual(response.status_code, 200)
+
+    def test_metrics_restricted_to_staff_without_token(self):
+        """
+        Test that without a scrape token only staff users can read the metrics.
+        """
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.client.force_login(User.objects.create_user("user"))
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.client.force_login(User.objects.create_user("admin", is_staff=True))
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    def test_snapshots_are_merged_across_workers(self):
+        """
+        Test that counters from other workers' snapshots are summed.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            other = {
+                "pid": 2 ** 22 + 1,  # above pid_max defaults, so never alive
+                "metrics": {
+                    "http_requests_total": [[["other-route", "GET", "200"], 5]],
+                    "http_requests_in_flight": [[[], 3]],
+                },
+                "caches": {},
+                "process": {},
+            }
+            with open(os.path.join(directory, "metrics_other.json"), "w") as snapshot_file:
+                json.dump(other, snapshot_file)
+
+            with override_settings(METRICS={"DIRECTORY": directory}):
+                body = metrics.render()
+
+        self.assertIn('http_requests_total{route="other-route",method="GET",status="200"} 5', body)
+        # Gauges from workers that are gone are ignored.
+        self.assertNotIn("http_requests_in_flight 3", body)
+
+    def test_exited_workers_are_folded_into_dead_snapshot(self):
+        """
+        Test that snapshots of exited workers, and of a reused PID, are counted once and then removed.
+        """
+        def worker_snapshot(pid, start, requests):
+            return {
+                "pid": pid, "start": start, "caches": {}, "process": {},
+                "metrics": {
+                    "http_requests_total": [[["old-route", "GET", "200"], requests]],
+                    "http_requests_in_flight": [[[], 3]],
+                },
+            }
+
+        pid, start = metrics.process_identity()
+        with tempfile.TemporaryDirectory() as directory:
+            for filename, data in (
+                (f"metrics_{2 ** 22 + 1}_1.json", worker_snapshot(2 ** 22 + 1, 1, 5)),
+                # An earlier worker with the current process's PID.
+                (f"metrics_{pid}_{start - 1}.json", worker_snapshot(pid, start - 1, 2)),
+            ):
+                with open(os.path.join(directory, filename), "w") as snapshot_file:
+                    json.dump(data, snapshot_file)
+
+            with override_settings(METRICS={"DIRECTORY": directory}):
+                first, second = metrics.render(), metrics.render()
+            files = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+
+        for body in (first, second):
+            self.assertIn('http_requests_total{route="old-route",method="GET",status="200"} 7', body)
+            self.assertNotIn("http_requests_in_flight 3", body)
+        self.assertEqual(files, ["metrics_dead.json"])
+
+
+class AuditTest(TestCase):
+    """
+    Test cases for the audit log.
+    """
+
+    def test_saves_record_changed_fields_after_commit(self):
+        """
+        Test creation, update, no-op, soft delete and rolled back entries.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            student = Student.objects.create(name="Ana", birth_date=date(2000, 1, 1))
+        student = Student.objects.get(pk=student.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            student.name = "Ana Maria"
+            student.save()
+            student.save()
+            try:
+                with transaction.atomic():
+                    student.extra_info = "rolled back"
+                    student.save()
+                    raise ValueError
+            except ValueError:
+                pass
+        with self.captureOnCommitCallbacks(execute=True):
+            student.delete()
+
+        entries = list(entries_for(student).order_by("id"))
+        self.assertEqual([entry.action for entry in entries], ["create", "update", "delete"])
+        self.assertEqual(entries[0].changes["name"], [None, "Ana"])
+        self.assertEqual(entries[1].changes, {"name": ["Ana", "Ana Maria"]})
+        self.assertEqual(list(entries[2].changes), ["deleted_at"])
+        self.assertIsNone(entries[0].actor_id)
+
+    def test_scope_writes_one_batch_with_actor(self):
+        """
+        Test that saves add no query and a scope writes its entries with one statement.
+        """
+        user = User.objects.create_user(username="auditor", password="secret")
+        product = Product.objects.create(name="English", price=Decimal("100.00"), duration=10)
+        student = Student.objects.create(name="Ana", birth_date=date(2000, 1, 1))
+        contract = Contract.objects.create(student=student, product=product)
+        student, contract = Student.objects.get(pk=student.pk), Contract.objects.get(pk=contract.pk)
+        with audit_scope(actor=user) as scope:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertNumQueries(1):
+                    student.name = "Ana Maria"
+                    student.save()
+                contract.statements = 3
+                contract.save()
+            self.assertEqual(len(scope.entries), 2)
+            self.assertFalse(AuditEntry.objects.exists())
+            with self.assertNumQueries(1):
+                scope.flush()
+        self.assertEqual(AuditEntry.objects.filter(actor=user).count(), 2)
+        self.assertEqual(entries_for(contract).get().changes, {"statements": [None, 3]})
+
+    def test_middleware_stamps_request_user(self):
+        """
+        Test that entries committed during a request get the request's user.
+        """
+        user = User.objects.create_user(username="auditor", password="secret")
+        request = RequestFactory().post("/api/students/")
+
+        def view(request):
+            request.user = user
+            with self.captureOnCommitCallbacks(execute=True):
+                Student.objects.create(name="Ana", birth_date=date(2000, 1, 1))
+            self.assertFalse(AuditEntry.objects.exists())
+            return "response"
+
+        self.assertEqual(AuditMiddleware(view)(request), "response")
+        self.assertEqual(AuditEntry.objects.get().actor, user)
+
+    def test_file_sink_is_loaded_later(self):
+        """
+        Test that the file sink appends JSON lines that load_file moves into the database.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "audit.jsonl")
+            with override_settings(AUDIT_LOG={"SINK": "file", "FILE": path}):
+                with self.captureOnCommitCallbacks(execute=True):
+                    student = Student.objects.create(name="Ana", birth_date=date(2000, 1, 1))
+                self.assertFalse(AuditEntry.objects.exists())
+                self.assertEqual(load_file(), 1)
+                self.assertEqual(load_file(), 0)
+            self.assertFalse(os.listdir(directory))
+        entry = entries_for(student).get()
+        self.assertEqual((entry.action, entry.changes["birth_date"]), ("create", [None, "2000-01-01"]))
+
+    def test_capture_overhead_is_capped(self):
+        """
+        Test that diffing a save stays well below a millisecond.
+        """
+        student = Student.objects.get(pk=Student.objects.create(name="Ana", birth_date=date(2000, 1, 1)).pk)
+        iterations = 1000
+        with self.captureOnCommitCallbacks(execute=False):
+            start = time.perf_counter()
+            for number in range(iterations):
+                student.name = f"Ana {number}"
+                capture(student, False)
+            elapsed = time.perf_counter() - start
+        self.assertLess(elapsed / iterations, 0.0005)
+
+    def test_parse_model_label(self):
+        """
+        Test that only audited models can be queried.
+        """
+        self.assertEqual(parse_model_label("financial.Payment").model, "payment")
+        for label in ("management.teacher", "unknown", "auth.user"):
+            with self.assertRaises(ValueError):
+                parse_model_label(label)
+
+
+def echo_task(job, **kwargs):
+    """
+    Test task returning its arguments.
+    """
+    job.progress(1, 2, "Halfway")
+    return kwargs
+
+
+def failing_task(job):
+    """
+    Test task that always fails.
+    """
+    raise RuntimeError("boom")
+
+
+def sleeping_task(job, seconds=1):
+    """
+    Test task that sleeps.
+    """
+    time.sleep(seconds)
+
+
+class InlineExecutor:
+    """
+    Executor running submitted calls right away, in the test process.
+    """
+
+    def submit(self, function, *args):
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+
+class BrokenExecutor:
+    """
+    Executor whose calls all fail as if one of its processes had died.
+    """
+
+    def submit(self, function, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+@override_settings(JOBS={
+    "TASKS": {
+        "echo": "common.tests.echo_task",
+        "fail": "common.tests.failing_task",
+        "sleep": "common.tests.sleeping_task",
+    },
+    "RETRY_DELAY": 10,
+    "PROGRESS_INTERVAL": 0,
+})
+class JobQueueTest(TestCase):
+    """
+    Test cases for the background job queue.
+    """
+
+    def test_claim_by_priority_and_due_time(self):
+        """
+        Test that claims take due jobs by priority and mark them running.
+        """
+        normal = enqueue("echo")
+        enqueue("echo", run_after=timezone.now() + timedelta(hours=1))
+        urgent = enqueue("echo", priority=5)
+        with self.assertRaises(ValueError):
+            enqueue("unknown")
+
+        jobs = claim("worker-1", limit=5)
+        self.assertEqual([job.pk for job in jobs], [urgent.pk, normal.pk])
+        normal.refresh_from_db()
+        self.assertEqual((normal.status, normal.attempts, normal.worker), (JobStatus.RUNNING, 1, "worker-1"))
+        self.assertGreater(normal.locked_until, timezone.now())
+        self.assertEqual(claim("worker-2", limit=5), [])
+
+    def test_execute_records_result_and_progress(self):
+        """
+        Test that a successful job stores the task's result.
+        """
+        job = enqueue("echo", {"answer": 42})
+        claim("worker")
+        self.assertEqual(execute(job.pk), JobStatus.SUCCEEDED)
+        job.refresh_from_db()
+        self.assertEqual((job.result, job.progress, job.progress_message), ({"answer": 42}, 1.0, "Halfway"))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failures_are_retried_then_fail(self):
+        """
+        Test that failed attempts are queued again with a delay until none are left.
+        """
+        job = enqueue("fail", max_attempts=2)
+        claim("worker")
+        self.assertEqual(execute(job.pk), JobStatus.QUEUED)
+        job.refresh_from_db()
+        self.assertEqual(job.error, "RuntimeError: boom")
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(claim("worker"), [])
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        claim("worker")
+        self.assertEqual(execute(job.pk), JobStatus.FAILED)
+        self.assertEqual(Job.objects.get(pk=job.pk).attempts, 2)
+
+    def test_timeout_interrupts_the_task(self):
+        """
+        Test that a task running longer than its timeout is interrupted.
+        """
+        job = enqueue("sleep", {"seconds": 5})
+        job.timeout = 0.05
+        start = time.monotonic()
+        with self.assertRaises(JobTimeout):
+            _run_task(job, "default")
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_stale_jobs_are_queued_again(self):
+        """
+        Test that running jobs whose lock expired are queued again or failed.
+        """
+        retried, exhausted = enqueue("echo"), enqueue("echo", max_attempts=1)
+        claim("dead-worker", limit=2)
+        self.assertEqual(requeue_stale(), 0)
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(requeue_stale(), 2)
+        self.assertEqual(Job.objects.get(pk=retried.pk).status, JobStatus.QUEUED)
+        self.assertEqual(Job.objects.get(pk=exhausted.pk).status, JobStatus.FAILED)
+
+    def test_worker_burst_processes_queue(self):
+        """
+        Test that a burst worker runs every due job and stops.
+        """
+        for number in range(5):
+            enqueue("echo", {"number": number})
+        enqueue("fail", max_attempts=1)
+        worker = Worker(concurrency=2, poll_interval=0.01, executor=InlineExecutor())
+        self.assertEqual(worker.run(burst=True), 6)
+        self.assertEqual(Job.objects.filter(status=JobStatus.SUCCEEDED).count(), 5)
+        self.assertEqual(Job.objects.filter(status=JobStatus.FAILED).count(), 1)
+
+    def test_broken_pool_is_replaced_once(self):
+        """
+        Test that the jobs of a broken pool are queued again without losing an attempt, unless it broke twice.
+        """
+        for number in range(3):
+            enqueue("echo", {"number": number}, max_attempts=1)
+        worker = Worker(concurrency=3, poll_interval=0.01)
+        with mock.patch.object(worker, "_pool", side_effect=[BrokenExecutor() for _ in range(3)]) as pool:
+            # Each job runs in both broken pools: the first break is not counted, the second uses the last attempt.
+            self.assertEqual(worker.run(burst=True), 6)
+        self.assertEqual(pool.call_count, 3)
+        self.assertEqual(set(Job.objects.values_list("status", "attempts")), {(JobStatus.FAILED, 1)})
+        for error in Job.objects.values_list("error", flat=True):
+            self.assertTrue(error.startswith("BrokenProcessPool"), error)
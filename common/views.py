@@ -0,0 +1,27 @@
+"""
+Views for the NCC School Management system.
+"""
+
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from . import metrics
+
+
+def metrics_view(request):
+    """
+    Expose metrics in the Prometheus text format.
+
+    When METRICS["TOKEN"] is set, scrapers must send it as a bearer token;
+    otherwise only staff users (logged in to the admin) may read them.
+    """
+    token = getattr(settings, "METRICS", {}).get("TOKEN")
+    if token:
+        expected = f"Bearer {token}"
+        if not hmac.compare_digest(request.META.get("HTTP_AUTHORIZATION", ""), expected):
+            return HttpResponseForbidden()
+    elif not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -4,6 +4,7 @@ Pytest configuration for Django tests.
 
 import os
 import django
+import pytest
 from django.test.utils import get_runner  # noqa: F401
 
 # Set the Django settings module
@@ -14,3 +15,22 @@ django.setup()
 
 # Configure pytest-django
 pytest_plugins = ["pytest_django"]
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    Reset shared and in-process caches so state does not leak between tests.
+    """
+    from django.core.cache import cache
+    from api.authentication import clear_user_cache
+    from api.blacklist import blacklist
+    from api.throttling import local_store
+    from api.tokens import clear_local_caches
+
+    cache.clear()
+    clear_local_caches()
+    clear_user_cache()
+    blacklist.reset()
+    local_store.clear()
+    yield
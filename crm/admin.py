@@ -3,22 +3,22 @@ Admin configuration for CRM models.
 """
 
 from django.contrib import admin
-from ncc_school_management.admin import soft_delete_selected
-from .models import Lead
+from ncc_school_management.admin import BaseModelAdmin, export_as_csv, soft_delete_selected
+from .models import FunnelMonthlySummary, Lead
 
 
 @admin.register(Lead)
-class LeadAdmin(admin.ModelAdmin):
+class LeadAdmin(BaseModelAdmin):
     """
     Admin configuration for Lead model.
     """
-    list_display = ["name", "email", "phone", "birth_date", "created_at"]
-    list_filter = ["birth_date", "created_at", "updated_at"]
+    list_display = ["name", "email", "phone", "birth_date", "converted_at", "created_at"]
+    list_filter = ["birth_date", "converted_at", "created_at", "updated_at"]
     search_fields = ["name", "email", "phone", "goals", "interests"]
-    readonly_fields = ["created_at", "updated_at", "deleted_at"]
+    readonly_fields = ["student", "converted_at", "created_at", "updated_at", "deleted_at"]
     ordering = ["-created_at"]
     list_per_page = 20
-    actions = [soft_delete_selected]
+    actions = [export_as_csv, soft_delete_selected]
 
     fieldsets = (
         ("Personal Information", {
@@ -27,8 +27,26 @@ class LeadAdmin(admin.ModelAdmin):
         ("Goals & Interests", {
             "fields": ("goals", "interests")
         }),
+        ("Conversion", {
+            "fields": ("student", "converted_at")
+        }),
         ("Timestamps", {
             "fields": ("created_at", "updated_at", "deleted_at"),
             "classes": ("collapse",)
         }),
     )
+
+
+@admin.register(FunnelMonthlySummary)
+class FunnelMonthlySummaryAdmin(admin.ModelAdmin):
+    """
+    Read-only admin for the monthly funnel counters.
+    """
+    list_display = ["month", "leads", "converted", "contracts", "updated_at"]
+    ordering = ["-month"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,258 @@
+"""
+Lead deduplication for the NCC School Management system.
+
+Duplicates are found without comparing every pair of leads:
+
+* leads sharing a normalized email or phone key are grouped in the
+  database (``GROUP BY`` over the indexed key columns);
+* the remaining leads are streamed ordered by birth date and only compared
+  within small blocks of the same birth date and name initial, using
+  ``difflib`` similarity of accent-free, token-sorted names.
+
+Matches are clustered with union-find and each cluster is merged into its
+converted lead, or its oldest lead when none was converted: the others are
+soft-deleted with ``merged_into`` pointing at the survivor, whose missing
+contact details are filled from them. Clusters with several converted leads
+(distinct students) are left alone.
+"""
+
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from itertools import groupby
+
+from django.db import connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from common.models import next_change_seq_sql
+
+from .models import Lead, normalize_email, normalize_phone
+
+# Minimum name similarity for leads with the same birth date.
+NAME_THRESHOLD = 0.88
+# Minimum name similarity for leads sharing an email or phone but with
+# different birth dates (e.g. siblings sharing a parent's email are kept).
+CONTACT_NAME_THRESHOLD = 0.8
+# Blocks larger than this are compared against their first leads only.
+MAX_BLOCK_SIZE = 500
+FILL_FIELDS = ("email", "phone", "interests")
+
+
+def normalize_name(name):
+    """
+    Return name without accents, punctuation or case, with its tokens sorted.
+    """
+    text = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode().lower()
+    tokens = "".join(char if char.isalnum() else " " for char in text).split()
+    return " ".join(sorted(tokens))
+
+
+def name_similarity(first, second):
+    matcher = SequenceMatcher(None, first, second)
+    if matcher.real_quick_ratio() < CONTACT_NAME_THRESHOLD:
+        return 0.0
+    return matcher.ratio()
+
+
+def find_duplicate(email=None, phone=None, exclude_pk=None):
+    """
+    Return (pk, field) of a live lead sharing email or phone, or None.
+
+    This is one lookup on the indexed contact key columns.
+    """
+    email_key, phone_key = normalize_email(email), normalize_phone(phone)
+    condition = Q()
+    if email_key:
+        condition |= Q(email_key=email_key)
+    if phone_key:
+        condition |= Q(phone_key=phone_key)
+    if not condition:
+        return None
+    queryset = Lead.objects.filter(condition).order_by()
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    match = queryset.values_list("pk", "email_key")[:1]
+    if not match:
+        return None
+    pk, match_email_key = match[0]
+    return pk, "email" if email_key and match_email_key == email_key else "phone"
+
+
+class UnionFind:
+    """
+    Disjoint sets of lead ids.
+    """
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        root = self.parent.setdefault(item, item)
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            # The smaller id (the older lead) becomes the root.
+            self.parent[max(first, second)] = min(first, second)
+
+    def clusters(self):
+        groups = defaultdict(list)
+        for item in self.parent:
+            groups[self.find(item)].append(item)
+        return [sorted(members) for members in groups.values() if len(members) > 1]
+
+
+def _match_contact_groups(key_field, union):
+    """
+    Union leads sharing key_field whose names or birth dates agree.
+    """
+    duplicated = (
+        Lead.objects.exclude(**{f"{key_field}__isnull": True}).order_by()
+        .values(key_field).annotate(total=Count("id")).filter(total__gt=1).values(key_field)
+    )
+    rows = (
+        Lead.objects.filter(**{f"{key_field}__in": duplicated})
+        .order_by(key_field, "id")
+        .values_list(key_field, "id", "name", "birth_date")
+        .iterator(chunk_size=5000)
+    )
+    pairs = 0
+    for _, group in groupby(rows, key=lambda row: row[0]):
+        leads = [(pk, normalize_name(name), birth_date) for _, pk, name, birth_date in group]
+        for index, (pk, name, birth_date) in enumerate(leads[:MAX_BLOCK_SIZE]):
+            for other_pk, other_name, other_birth_date in leads[index + 1:]:
+                if birth_date == other_birth_date or name_similarity(name, other_name) >= CONTACT_NAME_THRESHOLD:
+                    union.union(pk, other_pk)
+                    pairs += 1
+    return pairs
+
+
+def _match_names(union):
+    """
+    Union leads with the same birth date and similar names.
+    """
+    rows = Lead.objects.order_by("birth_date").values_list("birth_date", "id", "name").iterator(chunk_size=5000)
+    pairs = 0
+    for _, group in groupby(rows, key=lambda row: row[0]):
+        blocks = defaultdict(list)
+        for _, pk, name in group:
+            normalized = normalize_name(name)
+            if normalized:
+                blocks[normalized[0]].append((pk, normalized))
+        for block in blocks.values():
+            for index, (pk, name) in enumerate(block[:MAX_BLOCK_SIZE]):
+                for other_pk, other_name in block[index + 1:]:
+                    if name == other_name or name_similarity(name, other_name) >= NAME_THRESHOLD:
+                        union.union(pk, other_pk)
+                        pairs += 1
+    return pairs
+
+
+def find_clusters():
+    """
+    Return clusters (sorted lists of lead ids) of duplicate live leads, except those with several converted leads.
+    """
+    union = UnionFind()
+    _match_contact_groups("email_key", union)
+    _match_contact_groups("phone_key", union)
+    _match_names(union)
+    clusters = union.clusters()
+    converted = set(
+        Lead.objects.filter(pk__in=[pk for cluster in clusters for pk in cluster], converted_at__isnull=False)
+        .values_list("id", flat=True)
+    )
+    return [cluster for cluster in clusters if len(converted.intersection(cluster)) < 2]
+
+
+def merge_clusters(clusters, now=None):
+    """
+    Merge each cluster of lead ids into its converted lead, or its oldest lead when none was converted.
+
+    Survivors get missing contact details from their duplicates; duplicates
+    are soft-deleted and point at their survivor. Clusters with several
+    converted leads are skipped. Returns the survivors.
+    """
+    now = now or timezone.now()
+    ids = [pk for cluster in clusters for pk in cluster]
+    leads = Lead.objects.filter(pk__in=ids).only("id", "created_at", "converted_at", *FILL_FIELDS).in_bulk()
+    survivors, changed, duplicates = [], [], []
+    for cluster in clusters:
+        # The converted lead keeps its student, conversion and contracts.
+        members = sorted(
+            (leads[pk] for pk in cluster if pk in leads),
+            key=lambda lead: (not lead.is_converted, lead.created_at, lead.pk),
+        )
+        if len(members) < 2 or members[1].is_converted:
+            continue
+        survivor = members[0]
+        survivors.append(survivor)
+        missing = [field for field in FILL_FIELDS if not getattr(survivor, field)]
+        for field in missing:
+            value = next((getattr(lead, field) for lead in members[1:] if getattr(lead, field)), None)
+            if value:
+                setattr(survivor, field, value)
+        if missing and any(getattr(survivor, field) for field in missing):
+            survivor.email_key = normalize_email(survivor.email)
+            survivor.phone_key = normalize_phone(survivor.phone)
+            survivor.updated_at = now
+            changed.append(survivor)
+        for lead in members[1:]:
+            lead.merged_into_id, lead.deleted_at, lead.updated_at = survivor.pk, now, now
+            duplicates.append(lead)
+
+    _update_rows(changed, FILL_FIELDS + ("email_key", "phone_key", "updated_at"))
+    _update_rows(duplicates, ("merged_into", "deleted_at", "updated_at"))
+    return survivors
+
+
+def _update_rows(leads, field_names):
+    """
+    Write field_names of leads with one executemany.
+
+    ``bulk_update`` builds a CASE expression per row and field, which costs
+    more than the update itself for tens of thousands of rows.
+    """
+    if not leads:
+        return
+    connection = connections[Lead.objects.db]
+    ops = connection.ops
+    fields = [Lead._meta.get_field(name) for name in field_names]
+    assignments = ", ".join(
+        [f"{ops.quote_name(field.column)} = %s" for field in fields]
+        + [f"{ops.quote_name('change_seq')} = {next_change_seq_sql(Lead, connection)}"]
+    )
+    sql = f"UPDATE {ops.quote_name(Lead._meta.db_table)} SET {assignments} WHERE {ops.quote_name('id')} = %s"
+    params = [
+        [field.get_db_prep_save(getattr(lead, field.attname), connection) for field in fields] + [lead.pk]
+        for lead in leads
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def deduplicate(dry_run=False, batch_size=500, log=None):
+    """
+    Find and merge duplicate leads; return {"clusters": n, "merged": n}.
+
+    Clusters are merged in transactions of batch_size clusters.
+    """
+    log = log or (lambda message: None)
+    clusters = find_clusters()
+    merged = sum(len(cluster) - 1 for cluster in clusters)
+    log(f"Found {len(clusters)} cluster(s) covering {merged} duplicate lead(s)")
+    if not dry_run:
+        for start in range(0, len(clusters), batch_size):
+            # Each batch is stamped when it is written, so updated_at stays
+            # close to the commit that sync clients wait for.
+            with transaction.atomic():
+                merge_clusters(clusters[start:start + batch_size])
+            log(f"Merged {min(start + batch_size, len(clusters))}/{len(clusters)} cluster(s)")
+        # The funnel summary counts every lead ever created, merged ones
+        # included, and conversions stay on the survivors, so it is unchanged.
+    return {"clusters": len(clusters), "merged": merged, "dry_run": dry_run}
@@ -0,0 +1,130 @@
+"""
+Lead conversion and funnel tracking for the NCC School Management system.
+"""
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from financial.forecasting import bump_forecast_version
+from financial.ledger import sync_contracts
+from management.history import record_created
+from management.models import Contract, Student
+from .models import FunnelMonthlySummary, Lead
+
+
+class ConversionError(Exception):
+    """
+    Raised when leads cannot be converted (missing or already converted).
+    """
+
+
+def _student_extra_info(lead):
+    lines = [f"Goals: {lead.goals}"]
+    if lead.interests:
+        lines.append(f"Interests: {lead.interests}")
+    for label, value in (("Email", lead.email), ("Phone", lead.phone)):
+        if value:
+            lines.append(f"{label}: {value}")
+    return "\n".join(lines)
+
+
+def convert_leads(conversions, now=None):
+    """
+    Convert leads into students with contracts in one transaction.
+
+    conversions is a list of dicts with ``lead`` (id) and ``product`` (a
+    Product) plus optional ``payment_method``, ``statements``,
+    ``first_lesson_on`` and ``last_lesson_on`` for the contract. Students
+    and contracts are created with ``bulk_create``, the leads are marked
+    converted, the contracts are charged to the students' ledgers and the
+    funnel counters are incremented. Returns the leads.
+    """
+    now = now or timezone.now()
+    lead_ids = [conversion["lead"] for conversion in conversions]
+    if len(set(lead_ids)) != len(lead_ids):
+        raise ConversionError("Each lead can only be converted once per request")
+
+    with transaction.atomic():
+        leads = {lead.pk: lead for lead in Lead.objects.select_for_update().filter(pk__in=lead_ids)}
+        missing = [pk for pk in lead_ids if pk not in leads]
+        if missing:
+            raise ConversionError(f"Lead(s) not found: {', '.join(map(str, missing))}")
+        converted = [pk for pk in lead_ids if leads[pk].is_converted]
+        if converted:
+            raise ConversionError(f"Lead(s) already converted: {', '.join(map(str, converted))}")
+
+        ordered = [leads[pk] for pk in lead_ids]
+        students = Student.objects.bulk_create([
+            Student(name=lead.name, birth_date=lead.birth_date, extra_info=_student_extra_info(lead))
+            for lead in ordered
+        ])
+        record_created(students, now=now)
+        contracts = Contract.objects.bulk_create([
+            Contract(
+                student=student,
+                product=conversion["product"],
+                payment_method=conversion.get("payment_method"),
+                statements=conversion.get("statements"),
+                first_lesson_on=conversion.get("first_lesson_on"),
+                last_lesson_on=conversion.get("last_lesson_on"),
+            )
+            for student, conversion in zip(students, conversions)
+        ])
+        # bulk_create skips Contract.save and its signals, so charge the
+        # contracts and invalidate revenue forecasts here (and open the
+        # students' status history above).
+        sync_contracts(contracts)
+        transaction.on_commit(bump_forecast_version)
+        for lead, student, contract in zip(ordered, students, contracts):
+            lead.student, lead.contract, lead.converted_at, lead.updated_at = student, contract, now, now
+        Lead.objects.bulk_update(ordered, ["student", "contract", "converted_at", "updated_at"])
+        FunnelMonthlySummary.increment(now, converted=len(ordered), contracts=len(ordered))
+    return ordered
+
+
+def count_contract(contract, live):
+    """
+    Add a converted lead's contract back to (live) or remove it from the contracts counter.
+
+    The counter belongs to the month of the conversion; contracts not
+    created by a conversion are not counted. Called when a contract is
+    soft-deleted, restored or hard-deleted.
+    """
+    converted_at = (
+        Lead.objects.all_with_deleted().filter(contract=contract).values_list("converted_at", flat=True).first()
+    )
+    if converted_at is not None:
+        FunnelMonthlySummary.increment(converted_at, contracts=1 if live else -1)
+
+
+def rebuild_funnel_summary():
+    """
+    Recompute every month of the funnel summary from the raw rows.
+
+    Used after bulk loads (seeding) that bypass the incremental counters,
+    and counts what they count: every lead ever created (soft-deleted and
+    merged ones included), conversions by the month they happened and the
+    live contracts those conversions created. Runs one grouped query per
+    counter.
+    """
+    months = {}
+    leads = Lead.objects.all_with_deleted()
+    converted = leads.filter(converted_at__isnull=False).annotate(month=TruncMonth("converted_at"))
+    counters = (
+        ("leads", leads.annotate(month=TruncMonth("created_at"))),
+        ("converted", converted),
+        ("contracts", converted.filter(contract__isnull=False, contract__deleted_at__isnull=True)),
+    )
+    for name, queryset in counters:
+        for row in queryset.order_by().values("month").annotate(total=Count("id")):
+            month = row["month"].date() if hasattr(row["month"], "date") else row["month"]
+            months.setdefault(month, {"leads": 0, "converted": 0, "contracts": 0})[name] = row["total"]
+
+    with transaction.atomic():
+        FunnelMonthlySummary.objects.all().delete()
+        FunnelMonthlySummary.objects.bulk_create([
+            FunnelMonthlySummary(month=month, **values) for month, values in sorted(months.items())
+        ])
+    return len(months)
@@ -0,0 +1,38 @@
+"""
+Find and merge duplicate leads.
+"""
+
+from django.core.management.base import BaseCommand
+
+from crm.dedup import deduplicate
+
+
+class Command(BaseCommand):
+    """
+    Cluster duplicate leads by contact keys and fuzzy name matching, then merge them.
+    """
+    help = "Merge duplicate leads into their oldest record"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many duplicates would be merged"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Clusters merged per transaction"
+        )
+
+    def handle(self, *args, **options):
+        result = deduplicate(
+            dry_run=options["dry_run"],
+            batch_size=options["batch_size"],
+            log=self.stdout.write if options["verbosity"] > 1 else None,
+        )
+        verb = "Would merge" if result["dry_run"] else "Merged"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['merged']} duplicate lead(s) in {result['clusters']} cluster(s)."
+        ))
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from crm.models import normalize_email, normalize_phone
+
+
+def fill_contact_keys(apps, schema_editor):
+    Lead = apps.get_model("crm", "Lead")
+    batch = []
+    for lead in Lead._base_manager.only("id", "email", "phone").iterator(chunk_size=2000):
+        lead.email_key = normalize_email(lead.email)
+        lead.phone_key = normalize_phone(lead.phone)
+        batch.append(lead)
+        if len(batch) >= 2000:
+            Lead._base_manager.bulk_update(batch, ["email_key", "phone_key"])
+            batch = []
+    if batch:
+        Lead._base_manager.bulk_update(batch, ["email_key", "phone_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crm", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lead",
+            name="email_key",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Normalized email used to detect duplicate leads",
+                max_length=254,
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="lead",
+            name="merged_into",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="Lead this duplicate was merged into",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="merged_leads",
+                to="crm.lead",
+            ),
+        ),
+        migrations.AddField(
+            model_name="lead",
+            name="phone_key",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Normalized phone number used to detect duplicate leads",
+                max_length=20,
+                null=True,
+            ),
+        ),
+        migrations.RunPython(fill_contact_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crm", "0002_lead_contact_keys"),
+        ("management", "0003_contract_first_lesson_on_contract_last_lesson_on_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FunnelMonthlySummary",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("month", models.DateField(help_text="First day of the month the counters refer to", unique=True)),
+                ("leads", models.PositiveIntegerField(default=0, help_text="Leads created in the month")),
+                (
+                    "converted",
+                    models.PositiveIntegerField(default=0, help_text="Leads converted into students in the month"),
+                ),
+                (
+                    "contracts",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Contracts created by lead conversions in the month"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, help_text="Timestamp when the counters were last updated"),
+                ),
+            ],
+            options={
+                "verbose_name": "Funnel Monthly Summary",
+                "verbose_name_plural": "Funnel Monthly Summaries",
+                "db_table": "crm_funnel_monthly_summaries",
+                "ordering": ["month"],
+            },
+        ),
+        migrations.AddField(
+            model_name="lead",
+            name="converted_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Timestamp when the lead was converted into a student",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="lead",
+            name="student",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="Student created when the lead was converted",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="leads",
+                to="management.student",
+            ),
+        ),
+    ]
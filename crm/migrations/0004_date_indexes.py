@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crm", "0003_lead_conversion_funnel"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="lead",
+            name="birth_date",
+            field=models.DateField(db_index=True, help_text="Date of birth of the lead"),
+        ),
+        migrations.AlterField(
+            model_name="lead",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, help_text="Timestamp when the record was created"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="lead",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, help_text="Timestamp when the record was last updated"
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def link_conversion_contracts(apps, schema_editor):
+    # Conversions created the student's first contract.
+    Lead = apps.get_model("crm", "Lead")
+    Contract = apps.get_model("management", "Contract")
+    first_contract = Contract.objects.filter(student_id=OuterRef("student_id")).order_by("id").values("id")[:1]
+    Lead.objects.filter(converted_at__isnull=False, student__isnull=False).update(
+        contract_id=Subquery(first_contract)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crm", "0005_change_seq"),
+        ("management", "0009_change_seq"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lead",
+            name="contract",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="Contract created when the lead was converted",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="management.contract",
+            ),
+        ),
+        migrations.RunPython(link_conversion_contracts, migrations.RunPython.noop),
+    ]
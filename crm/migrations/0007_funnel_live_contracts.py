@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:12
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+
+def count_live_contracts(apps, schema_editor):
+    # Conversion contracts deleted so far were still counted.
+    Lead = apps.get_model("crm", "Lead")
+    FunnelMonthlySummary = apps.get_model("crm", "FunnelMonthlySummary")
+    live = dict(
+        Lead.objects.filter(converted_at__isnull=False, contract__isnull=False, contract__deleted_at__isnull=True)
+        .annotate(month=TruncMonth("converted_at"))
+        .order_by()
+        .values("month")
+        .annotate(total=Count("id"))
+        .values_list("month", "total")
+    )
+    live = {(month.date() if hasattr(month, "date") else month): total for month, total in live.items()}
+    for summary in FunnelMonthlySummary.objects.all():
+        summary.contracts = live.get(summary.month, 0)
+        summary.save(update_fields=["contracts"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crm", "0006_lead_contract"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="funnelmonthlysummary",
+            name="contracts",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Live (not deleted) contracts created by lead conversions in the month"
+            ),
+        ),
+        migrations.RunPython(count_live_contracts, migrations.RunPython.noop),
+    ]
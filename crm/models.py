@@ -2,9 +2,51 @@
 CRM models for the NCC School Management system.
 """
 
-from django.db import models
+import re
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
 from common.models import BaseModel
 
+GMAIL_DOMAINS = {"gmail.com", "googlemail.com"}
+
+
+def normalize_email(email):
+    """
+    Return a comparison key for an email address, or None.
+
+    Lowercases the address and drops ``+tag`` suffixes; for Gmail, dots in
+    the local part are ignored and googlemail.com is folded into gmail.com.
+    """
+    if not email:
+        return None
+    local, _, domain = email.strip().lower().rpartition("@")
+    if not local or not domain:
+        return None
+    local = local.split("+", 1)[0]
+    if domain in GMAIL_DOMAINS:
+        local, domain = local.replace(".", ""), "gmail.com"
+    return f"{local}@{domain}"
+
+
+def normalize_phone(phone):
+    """
+    Return a comparison key for a phone number (national digits), or None.
+
+    Strips formatting, the ``00``/``+55`` country prefix and the ``0`` trunk
+    prefix, so "+55 (11) 91234-5678" and "011912345678" share a key.
+    """
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", phone)
+    if digits.startswith("00"):
+        digits = digits[2:]
+    if digits.startswith("55") and len(digits) in (12, 13):
+        digits = digits[2:]
+    digits = digits.lstrip("0")
+    return digits if len(digits) >= 8 else None
+
 
 class Lead(BaseModel):
     """
@@ -18,7 +60,8 @@ class Lead(BaseModel):
         help_text="Goals and objectives of the lead"
     )
     birth_date = models.DateField(
-        help_text="Date of birth of the lead"
+        help_text="Date of birth of the lead",
+        db_index=True
     )
     interests = models.TextField(
         blank=True,
@@ -36,6 +79,56 @@ class Lead(BaseModel):
         null=True,
         help_text="Phone number of the lead"
     )
+    email_key = models.CharField(
+        max_length=254,
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True,
+        help_text="Normalized email used to detect duplicate leads"
+    )
+    phone_key = models.CharField(
+        max_length=20,
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True,
+        help_text="Normalized phone number used to detect duplicate leads"
+    )
+    merged_into = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False,
+        related_name="merged_leads",
+        help_text="Lead this duplicate was merged into"
+    )
+    student = models.ForeignKey(
+        "management.Student",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False,
+        related_name="leads",
+        help_text="Student created when the lead was converted"
+    )
+    converted_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True,
+        help_text="Timestamp when the lead was converted into a student"
+    )
+    contract = models.ForeignKey(
+        "management.Contract",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False,
+        related_name="+",
+        help_text="Contract created when the lead was converted"
+    )
 
     class Meta:
         db_table = "crm_leads"
@@ -45,3 +138,85 @@ class Lead(BaseModel):
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        """
+        Save the lead, keeping the normalized contact keys in sync.
+        """
+        adding = self._state.adding
+        self.email_key = normalize_email(self.email)
+        self.phone_key = normalize_phone(self.phone)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"email", "phone"} & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | {"email_key", "phone_key"}
+        super().save(*args, **kwargs)
+        if adding:
+            FunnelMonthlySummary.increment(self.created_at, leads=1)
+
+    @property
+    def is_converted(self):
+        """
+        Check if the lead was converted into a student.
+        """
+        return self.converted_at is not None
+
+
+class FunnelMonthlySummary(models.Model):
+    """
+    Monthly lead funnel counters: leads created, leads converted into
+    students and contracts created by those conversions.
+
+    Counters are updated incrementally when leads are created or converted;
+    ``crm.funnel.rebuild_funnel_summary`` recomputes them after bulk loads.
+    """
+    month = models.DateField(
+        unique=True,
+        help_text="First day of the month the counters refer to"
+    )
+    leads = models.PositiveIntegerField(
+        default=0,
+        help_text="Leads created in the month"
+    )
+    converted = models.PositiveIntegerField(
+        default=0,
+        help_text="Leads converted into students in the month"
+    )
+    contracts = models.PositiveIntegerField(
+        default=0,
+        help_text="Live (not deleted) contracts created by lead conversions in the month"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Timestamp when the counters were last updated"
+    )
+
+    class Meta:
+        db_table = "crm_funnel_monthly_summaries"
+        verbose_name = "Funnel Monthly Summary"
+        verbose_name_plural = "Funnel Monthly Summaries"
+        ordering = ["month"]
+
+    def __str__(self):
+        return f"Funnel {self.month:%Y-%m}"
+
+    @property
+    def conversion_rate(self):
+        """
+        Share of the month's leads count converted in the same month.
+        """
+        return self.converted / self.leads if self.leads else None
+
+    @classmethod
+    def increment(cls, moment, **counters):
+        """
+        Add counters (e.g. ``leads=1``) to the month of moment, creating the row if needed.
+        """
+        month = timezone.localdate(moment).replace(day=1)
+        changes = {name: F(name) + amount for name, amount in counters.items()}
+        if cls.objects.filter(month=month).update(updated_at=timezone.now(), **changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(month=month, **counters)
+        except IntegrityError:
+            cls.objects.filter(month=month).update(updated_at=timezone.now(), **changes)
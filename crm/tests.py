@@ -2,10 +2,17 @@
 Tests for CRM models.
 """
 
+from django.core.management import call_command
 from django.test import TestCase
-from datetime import date
+from django.utils import timezone
+from datetime import date, datetime, timezone as dt_timezone
+from io import StringIO
 
-from .models import Lead
+from comercial.models import Product
+from management.models import Contract, Student
+from .dedup import deduplicate, find_duplicate, normalize_name
+from .funnel import ConversionError, convert_leads, rebuild_funnel_summary
+from .models import FunnelMonthlySummary, Lead, normalize_email, normalize_phone
 
 
 class LeadModelTest(TestCase):
@@ -80,3 +87,203 @@ class LeadModelTest(TestCase):
         lead = Lead.objects.create(**self.lead_data)
         self.assertIsNotNone(lead.created_at)
         self.assertIsNotNone(lead.updated_at)
+
+
+class LeadDeduplicationTest(TestCase):
+    """
+    Test cases for lead contact keys and deduplication.
+    """
+
+    def create_lead(self, name, birth_date=date(2000, 1, 1), **kwargs):
+        return Lead.objects.create(name=name, goals="Learn English", birth_date=birth_date, **kwargs)
+
+    def test_contact_normalization(self):
+        """
+        Test that equivalent emails and phone numbers share a key.
+        """
+        self.assertEqual(normalize_email(" Ana.Silva+promo@GoogleMail.com "), "anasilva@gmail.com")
+        self.assertEqual(normalize_email("Ana.Silva@Example.com"), "ana.silva@example.com")
+        self.assertIsNone(normalize_email("not-an-email"))
+        self.assertEqual(normalize_phone("+55 (11) 91234-5678"), "11912345678")
+        self.assertEqual(normalize_phone("011 91234 5678"), "11912345678")
+        self.assertIsNone(normalize_phone("123"))
+        self.assertEqual(normalize_name("SILVA, João"), "joao silva")
+
+    def test_keys_are_saved(self):
+        """
+        Test that saving a lead fills its contact keys.
+        """
+        lead = self.create_lead("Ana Silva", email="Ana@Example.com", phone="+55 11 91234-5678")
+        lead.phone = "(21) 99876-5432"
+        lead.save(update_fields=["phone"])
+        lead.refresh_from_db()
+        self.assertEqual((lead.email_key, lead.phone_key), ("ana@example.com", "21998765432"))
+
+    def test_find_duplicate(self):
+        """
+        Test the insert-time duplicate lookup.
+        """
+        lead = self.create_lead("Ana Silva", email="ana@example.com", phone="11912345678")
+        self.assertEqual(find_duplicate("ANA@example.com"), (lead.pk, "email"))
+        self.assertEqual(find_duplicate("other@example.com", "+55 11 91234-5678"), (lead.pk, "phone"))
+        self.assertIsNone(find_duplicate("ana@example.com", exclude_pk=lead.pk))
+        self.assertIsNone(find_duplicate(None, None))
+
+    def test_deduplicate_merges_clusters(self):
+        """
+        Test that duplicates by contact or by name and birth date are merged into the oldest lead.
+        """
+        original = self.create_lead("Ana Silva", email="ana@example.com")
+        by_email = self.create_lead("ANA SILVA", birth_date=date(2000, 1, 2), email="Ana@Example.com",
+                                    phone="11912345678")
+        by_name = self.create_lead("Silva, Ana", interests="Spanish")
+        sibling = self.create_lead("Bruno Silva", birth_date=date(2010, 5, 5), email="ana@example.com")
+        other = self.create_lead("Carlos Lima")
+        funnel = list(FunnelMonthlySummary.objects.values_list("month", "leads"))
+
+        result = deduplicate()
+
+        self.assertEqual((result["clusters"], result["merged"]), (1, 2))
+        self.assertEqual(
+            set(Lead.objects.values_list("pk", flat=True)), {original.pk, sibling.pk, other.pk}
+        )
+        for duplicate in (by_email, by_name):
+            duplicate = Lead.objects.all_with_deleted().get(pk=duplicate.pk)
+            self.assertEqual(duplicate.merged_into_id, original.pk)
+            self.assertTrue(duplicate.is_deleted)
+        original.refresh_from_db()
+        self.assertEqual((original.phone, original.interests), ("11912345678", "Spanish"))
+        self.assertEqual(list(FunnelMonthlySummary.objects.values_list("month", "leads")), funnel)
+
+    def test_deduplicate_keeps_conversions(self):
+        """
+        Test that a converted duplicate survives the merge and that clusters of converted leads are left alone.
+        """
+        product = Product.objects.create(name="English", description="General English", price=100)
+        original = self.create_lead("Ana Silva", email="ana@example.com")
+        duplicate = self.create_lead("Ana Silva", phone="11912345678")
+        first = self.create_lead("Bruno Lima")
+        second = self.create_lead("Bruno Lima")
+        convert_leads([{"lead": pk, "product": product} for pk in (duplicate.pk, first.pk, second.pk)])
+
+        result = deduplicate()
+
+        self.assertEqual((result["clusters"], result["merged"]), (1, 1))
+        original = Lead.objects.all_with_deleted().get(pk=original.pk)
+        self.assertEqual(original.merged_into_id, duplicate.pk)
+        duplicate.refresh_from_db()
+        self.assertTrue(duplicate.is_converted)
+        self.assertEqual((duplicate.email, duplicate.phone), ("ana@example.com", "11912345678"))
+        self.assertEqual(Lead.objects.filter(pk__in=[first.pk, second.pk]).count(), 2)
+        summary = FunnelMonthlySummary.objects.get()
+        self.assertEqual((summary.leads, summary.converted, summary.contracts), (4, 3, 3))
+
+    def test_dedup_command_dry_run(self):
+        """
+        Test that the dedup_leads command only reports in dry-run mode.
+        """
+        self.create_lead("Ana Silva")
+        self.create_lead("Ana  Silva")
+        out = StringIO()
+        call_command("dedup_leads", "--dry-run", stdout=out)
+        self.assertIn("Would merge 1 duplicate lead(s)", out.getvalue())
+        self.assertEqual(Lead.objects.count(), 2)
+
+
+class LeadConversionTest(TestCase):
+    """
+    Test cases for lead conversion and the funnel summary.
+    """
+
+    def setUp(self):
+        """
+        Set up test data.
+        """
+        self.product = Product.objects.create(name="English", description="General English", price=100)
+        self.leads = [
+            Lead.objects.create(name=name, goals="Learn English", birth_date=date(2000, 1, 1), email=email)
+            for name, email in (("Ana Silva", "ana@example.com"), ("Bruno Lima", None))
+        ]
+
+    def test_convert_leads(self):
+        """
+        Test that converting leads creates students and contracts and counts them.
+        """
+        now = datetime(2024, 3, 10, 12, tzinfo=dt_timezone.utc)
+        converted = convert_leads(
+            [{"lead": lead.pk, "product": self.product, "statements": 6} for lead in self.leads], now=now
+        )
+
+        self.assertEqual(Student.objects.count(), 2)
+        self.assertEqual(Contract.objects.filter(product=self.product, statements=6).count(), 2)
+        for lead in converted:
+            lead.refresh_from_db()
+            self.assertTrue(lead.is_converted)
+            self.assertEqual(lead.student.name, lead.name)
+            self.assertEqual(lead.contract.student, lead.student)
+        self.assertIn("Email: ana@example.com", converted[0].student.extra_info)
+        summary = FunnelMonthlySummary.objects.get(month=date(2024, 3, 1))
+        self.assertEqual((summary.converted, summary.contracts), (2, 2))
+
+    def test_deleted_contracts_leave_the_funnel(self):
+        """
+        Test that soft-deleting, restoring and hard-deleting conversion contracts update the contracts counter.
+        """
+        now = datetime(2024, 3, 10, 12, tzinfo=dt_timezone.utc)
+        convert_leads([{"lead": lead.pk, "product": self.product} for lead in self.leads], now=now)
+        first, second = Contract.objects.order_by("pk")
+        renewal = Contract.objects.create(
+            student=first.student, product=Product.objects.create(name="English 2", description="Advanced", price=100)
+        )
+
+        def counters():
+            summary = FunnelMonthlySummary.objects.get(month=date(2024, 3, 1))
+            return summary.converted, summary.contracts
+
+        first.delete()
+        renewal.delete()
+        self.assertEqual(counters(), (2, 1))
+        first.deleted_at = None
+        first.save()
+        self.assertEqual(counters(), (2, 2))
+        first.save()
+        Contract.objects.get(pk=second.pk).hard_delete()
+        self.assertEqual(counters(), (2, 1))
+
+        FunnelMonthlySummary.objects.all().delete()
+        rebuild_funnel_summary()
+        self.assertEqual(counters(), (2, 1))
+
+    def test_convert_is_all_or_nothing(self):
+        """
+        Test that missing or already converted leads abort the whole conversion.
+        """
+        convert_leads([{"lead": self.leads[0].pk, "product": self.product}])
+        with self.assertRaisesMessage(ConversionError, "already converted"):
+            convert_leads([{"lead": lead.pk, "product": self.product} for lead in self.leads])
+        with self.assertRaisesMessage(ConversionError, "not found"):
+            convert_leads([{"lead": self.leads[1].pk, "product": self.product}, {"lead": 0, "product": self.product}])
+        self.assertEqual(Student.objects.count(), 1)
+        self.assertFalse(Lead.objects.get(pk=self.leads[1].pk).is_converted)
+
+    def test_rebuild_funnel_summary(self):
+        """
+        Test that rebuilding the summary reproduces the incremental counters.
+
+        Renewal contracts of converted students and soft-deleted leads, which
+        the counters already counted, must not change the rebuilt figures.
+        """
+        convert_leads([{"lead": self.leads[0].pk, "product": self.product}])
+        student = Lead.objects.get(pk=self.leads[0].pk).student
+        renewal = Product.objects.create(name="English 2", description="Advanced English", price=100)
+        Contract.objects.create(student=student, product=renewal)
+        self.leads[1].delete()
+        month = timezone.localdate().replace(day=1)
+        expected = list(FunnelMonthlySummary.objects.values_list("month", "leads", "converted", "contracts"))
+        self.assertEqual(expected, [(month, 2, 1, 1)])
+
+        FunnelMonthlySummary.objects.all().delete()
+        self.assertEqual(rebuild_funnel_summary(), 1)
+        rebuilt = FunnelMonthlySummary.objects.get()
+        self.assertEqual((rebuilt.month, rebuilt.leads, rebuilt.converted, rebuilt.contracts), expected[0])
+        self.assertEqual(rebuilt.conversion_rate, 0.5)
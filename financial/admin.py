@@ -3,27 +3,31 @@ Admin configuration for financial models.
 """
 
 from django.contrib import admin
-from ncc_school_management.admin import soft_delete_selected
-from .models import Payment, TeacherPayments
+from ncc_school_management.admin import BaseModelAdmin, export_as_csv, soft_delete_selected
+from .models import DelinquencySnapshot, LedgerEntry, Payment, StudentBalance, TeacherPayments
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(BaseModelAdmin):
     """
     Admin configuration for Payment model.
     """
-    list_display = ["payment_method", "value", "paid_at", "description", "created_at"]
+    list_display = ["payment_method", "value", "student", "contract", "paid_at", "description", "created_at"]
     list_filter = ["payment_method", "paid_at", "created_at", "updated_at"]
     search_fields = ["description"]
+    autocomplete_fields = ["student", "contract"]
     readonly_fields = ["created_at", "updated_at", "deleted_at"]
     ordering = ["-paid_at"]
     list_per_page = 20
-    actions = [soft_delete_selected]
+    actions = [export_as_csv, soft_delete_selected]
 
     fieldsets = (
         ("Payment Information", {
             "fields": ("payment_method", "value", "paid_at", "description")
         }),
+        ("Account", {
+            "fields": ("student", "contract")
+        }),
         ("Timestamps", {
             "fields": ("created_at", "updated_at", "deleted_at"),
             "classes": ("collapse",)
@@ -32,17 +36,18 @@ class PaymentAdmin(admin.ModelAdmin):
 
 
 @admin.register(TeacherPayments)
-class TeacherPaymentsAdmin(admin.ModelAdmin):
+class TeacherPaymentsAdmin(BaseModelAdmin):
     """
     Admin configuration for TeacherPayments model.
     """
     list_display = ["teacher", "value", "payment_method", "paid_at", "description", "created_at"]
     list_filter = ["payment_method", "paid_at", "created_at", "updated_at"]
     search_fields = ["teacher__name", "description"]
+    autocomplete_fields = ["teacher"]
     readonly_fields = ["created_at", "updated_at", "deleted_at"]
     ordering = ["-paid_at"]
     list_per_page = 20
-    actions = [soft_delete_selected]
+    actions = [export_as_csv, soft_delete_selected]
 
     fieldsets = (
         ("Payment Information", {
@@ -53,3 +58,58 @@ class TeacherPaymentsAdmin(admin.ModelAdmin):
             "classes": ("collapse",)
         }),
     )
+
+
+@admin.register(StudentBalance)
+class StudentBalanceAdmin(admin.ModelAdmin):
+    """
+    Read-only admin for the materialized student balances.
+    """
+    list_display = ["student", "charged", "paid", "balance", "updated_at"]
+    list_select_related = ["student"]
+    search_fields = ["student__name"]
+    ordering = ["-balance"]
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    """
+    Read-only admin for the append-only student ledger.
+    """
+    list_display = ["id", "student", "kind", "amount", "balance", "description", "created_at"]
+    list_filter = ["kind"]
+    list_select_related = ["student"]
+    raw_id_fields = ["student", "contract", "payment"]
+    ordering = ["-id"]
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DelinquencySnapshot)
+class DelinquencySnapshotAdmin(admin.ModelAdmin):
+    """
+    Read-only admin for the latest delinquency snapshot.
+    """
+    list_display = ["contract", "student", "overdue", "days_overdue", "oldest_due_on", "as_of"]
+    list_select_related = ["student", "contract__student", "contract__product"]
+    search_fields = ["student__name"]
+    ordering = ["-days_overdue"]
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
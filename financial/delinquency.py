@@ -0,0 +1,138 @@
+"""
+Delinquency detection for the NCC School Management system.
+
+A contract's product price is split into ``statements`` monthly installments
+(one when unset), the first due on ``first_lesson_on`` (or the day the
+contract was created) and the next ones on the same day of the following
+months; everything is due by ``last_lesson_on``. A contract is delinquent
+when the live payments linked to it add up to less than the installments
+due. ``detect_delinquency`` finds those contracts with one grouped query
+and replaces their ``DelinquencySnapshot`` rows with the bulk loader.
+"""
+
+import calendar
+from datetime import date
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear, Greatest, Least, TruncDate
+from django.utils import timezone
+
+from common.bulk import get_loader
+from management.models import Contract
+from .models import DelinquencySnapshot
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+SNAPSHOT_COLUMNS = (
+    "contract_id", "student_id", "as_of", "installments", "installments_due", "expected", "received", "overdue",
+    "oldest_due_on", "days_overdue", "computed_at",
+)
+
+
+def delinquent_contracts(contracts, as_of):
+    """
+    Annotate contracts with their installments due and amount received by as_of.
+
+    Returns the values (dicts) of the contracts paid less than their due
+    installments. The comparison is ``received * installments < price *
+    installments_due``, so no division happens in the database.
+    """
+    elapsed = (
+        (Value(as_of.year) - ExtractYear("start_on")) * 12
+        + (Value(as_of.month) - ExtractMonth("start_on"))
+        + Case(When(start_on__day__lte=as_of.day, then=Value(1)), default=Value(0))
+    )
+    return (
+        contracts.order_by()
+        .annotate(
+            start_on=Coalesce("first_lesson_on", TruncDate("created_at")),
+            installments=Greatest(Coalesce("statements", Value(1)), Value(1)),
+        )
+        .filter(start_on__lte=as_of)
+        .annotate(
+            installments_due=Case(
+                When(last_lesson_on__lte=as_of, then=F("installments")),
+                default=Least(elapsed, F("installments")),
+                output_field=IntegerField(),
+            ),
+            price=F("product__price"),
+            received=Coalesce(
+                Sum("payments__value", filter=Q(payments__deleted_at__isnull=True)),
+                Value(ZERO),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+        .alias(
+            received_share=F("received") * F("installments"),
+            due_share=F("price") * F("installments_due"),
+        )
+        .filter(received_share__lt=F("due_share"))
+        .values("pk", "student_id", "start_on", "last_lesson_on", "installments", "installments_due", "price",
+                "received")
+    )
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _snapshot_row(row, as_of, now):
+    """
+    Return the snapshot columns of a delinquent contract row, or None if it is paid up.
+    """
+    price, installments, received = row["price"], row["installments"], row["received"]
+    expected = (price * row["installments_due"] / installments).quantize(CENT)
+    overdue = expected - received
+    if overdue <= ZERO:
+        return None
+    paid_installments = int(received * installments // price)
+    oldest_due_on = _add_months(row["start_on"], paid_installments)
+    if row["last_lesson_on"] is not None:
+        oldest_due_on = min(oldest_due_on, row["last_lesson_on"])
+    return (
+        row["pk"], row["student_id"], as_of, installments, row["installments_due"], expected, received, overdue,
+        oldest_due_on, max((as_of - oldest_due_on).days, 0), now,
+    )
+
+
+def detect_delinquency(as_of=None, student_ids=None, using="default", batch_size=5000):
+    """
+    Replace the delinquency snapshot of every live contract, or of the contracts of student_ids.
+
+    Runs a delete, one grouped query over contracts and payments, and the
+    bulk load of the delinquent rows in a single transaction, so readers
+    never see a partial snapshot. Returns the number of delinquent contracts.
+    """
+    as_of = as_of or timezone.localdate()
+    now = timezone.now()
+    connection = connections[using]
+    contracts = Contract.objects.using(using).filter(student__deleted_at__isnull=True)
+    snapshots = DelinquencySnapshot.objects.using(using)
+    if student_ids is not None:
+        student_ids = list(student_ids)
+        contracts = contracts.filter(student_id__in=student_ids)
+        snapshots = snapshots.filter(student_id__in=student_ids)
+
+    with transaction.atomic(using=using):
+        snapshots.delete()
+        rows = delinquent_contracts(contracts, as_of).iterator(chunk_size=batch_size)
+        snapshot_rows = (_snapshot_row(row, as_of, now) for row in rows)
+        return get_loader(connection, batch_size).load(
+            DelinquencySnapshot, SNAPSHOT_COLUMNS, (row for row in snapshot_rows if row is not None)
+        )
+
+
+def delinquency_totals(snapshots):
+    """
+    Return the number of contracts and students and the amount overdue in snapshots.
+    """
+    totals = snapshots.order_by().aggregate(
+        contracts=Count("pk"), students=Count("student", distinct=True), overdue=Sum("overdue")
+    )
+    totals["overdue"] = totals["overdue"] or ZERO
+    return totals
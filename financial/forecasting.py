@@ -0,0 +1,197 @@
+"""
+Revenue forecasting for the NCC School Management system.
+
+Contracts are split into installments the same way as in
+``financial.delinquency``: ``statements`` monthly installments (one when
+unset) from ``first_lesson_on``, all due by the end of the contract
+(``last_lesson_on``, or ``Product.duration`` lessons after the start).
+Payments linked to a contract settle its installments in order.
+
+``load_contracts`` reads the contracts of active students with a single
+grouped query into NumPy arrays (amounts in integer cents) and
+``project_revenue`` spreads the unpaid installments over the coming months
+with array operations only. Churn scenarios scale each month by the share
+of contracts expected to remain, so they cost nothing on top of the
+projection. ``revenue_forecast`` caches the projection under a version
+bumped by contract, payment and product saves (see ``api.signals``), kept
+in the cache shared by the workers (see ``common.cache.CacheVersions``).
+"""
+
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BigIntegerField, F, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, Round, TruncDate
+from django.utils import timezone
+
+from common.cache import CacheVersions
+from management.models import Contract, StudentsStatus
+from .models import PaymentMethod
+
+CACHE_KEY_PREFIX = "forecast:revenue:"
+
+_versions = CacheVersions("forecast:revenue:ver")
+
+
+def _forecast_setting(name, default):
+    return getattr(settings, "REVENUE_FORECAST", {}).get(name, default)
+
+
+def get_forecast_version():
+    """
+    Return the current version of the revenue data, creating one if missing.
+    """
+    return _versions.get()
+
+
+def bump_forecast_version():
+    """
+    Invalidate the cached revenue projections.
+    """
+    _versions.bump("")
+
+
+def load_contracts(contracts=None):
+    """
+    Load the installment inputs of contracts (default: live contracts of active students) into arrays.
+
+    Returns a dict of equally long arrays: price and received (int64 cents),
+    installments, start and end (datetime64[D], end NaT when unknown),
+    duration (lessons) and collection (expected share collected).
+    """
+    if contracts is None:
+        contracts = Contract.objects.filter(student__deleted_at__isnull=True, student__status=StudentsStatus.ACTIVE)
+    rows = list(
+        contracts.order_by()
+        .annotate(
+            price_cents=Cast(Round(F("product__price") * 100), BigIntegerField()),
+            installment_count=Greatest(Coalesce("statements", Value(1)), Value(1)),
+            received_cents=Cast(
+                Round(Coalesce(Sum("payments__value", filter=Q(payments__deleted_at__isnull=True)), Value(0)) * 100),
+                BigIntegerField(),
+            ),
+            start_on=Coalesce("first_lesson_on", TruncDate("created_at")),
+        )
+        .values_list(
+            "price_cents", "received_cents", "installment_count", "start_on", "last_lesson_on", "product__duration",
+            "payment_method",
+        )
+    )
+    columns = list(zip(*rows)) or [()] * 7
+    rates = _forecast_setting("COLLECTION_RATES", {})
+    methods = [None, *PaymentMethod.values]
+    codes = {method: index for index, method in enumerate(methods)}
+    method_rates = np.array([rates.get(method, 1.0) for method in methods], dtype=np.float64)
+    return {
+        "price": np.array(columns[0], dtype=np.int64),
+        "received": np.array(columns[1], dtype=np.int64),
+        "installments": np.array(columns[2], dtype=np.int64),
+        "start": np.array(columns[3], dtype="datetime64[D]"),
+        "end": np.array(columns[4], dtype="datetime64[D]"),
+        "duration": np.array(columns[5], dtype=np.int64),
+        "collection": method_rates[np.array([codes.get(method, 0) for method in columns[6]], dtype=np.int64)],
+    }
+
+
+def project_revenue(arrays, first_month, months):
+    """
+    Project the unpaid installments of arrays over months months from first_month.
+
+    first_month is a datetime64[M]. Returns (monthly, overdue): expected cash
+    per month in cents (float64, weighted by collection rates, no churn) and
+    the unpaid cents of installments due before first_month.
+    """
+    price, installments = arrays["price"], arrays["installments"]
+    if not len(price):
+        return np.zeros(months), 0
+    start = arrays["start"]
+    interval = _forecast_setting("LESSON_INTERVAL_DAYS", 7)
+    end = np.where(np.isnat(arrays["end"]), start + arrays["duration"] * interval, arrays["end"])
+    start_month = start.astype("datetime64[M]").astype(np.int64)
+    end_month = np.maximum(end.astype("datetime64[M]").astype(np.int64), start_month)
+
+    # Installments due by the end of each month, from the month before
+    # first_month (everything overdue) to the last projected one: one column
+    # per month, however many installments a contract has.
+    month = first_month.astype(np.int64) - 1 + np.arange(months + 1)
+    due = np.clip(month - start_month[:, None] + 1, 0, installments[:, None])
+    due = np.where(month >= end_month[:, None], installments[:, None], due)
+    base, extra = price // installments, price % installments
+    # Payments settle installments in order, so what is unpaid by a month is
+    # the cents due by then less everything received.
+    unpaid = np.maximum(base[:, None] * due + np.minimum(due, extra[:, None]) - arrays["received"][:, None], 0)
+    overdue = int(unpaid[:, 0].sum())
+    monthly = np.diff(unpaid, axis=1) * arrays["collection"][:, None]
+    return monthly.sum(axis=0), overdue
+
+
+def _cents(value):
+    return Decimal(int(round(value))).scaleb(-2)
+
+
+def apply_churn(monthly, churn):
+    """
+    Scale monthly cents by the share of contracts left after churn per month.
+    """
+    survival = (1.0 - churn) ** np.arange(len(monthly))
+    return monthly * survival
+
+
+def parse_forecast_params(months=None, churn=None):
+    """
+    Return the (months, churn scenarios) requested as query parameter strings.
+
+    A churn rate adds a "custom" scenario to the configured ones. Raises
+    ValueError for invalid values or horizons longer than MAX_MONTHS.
+    """
+    max_months = _forecast_setting("MAX_MONTHS", 24)
+    try:
+        months = int(months) if months else 12
+    except ValueError:
+        raise ValueError("'months' must be an integer") from None
+    if not 1 <= months <= max_months:
+        raise ValueError(f"'months' must be between 1 and {max_months}")
+    scenarios = dict(_forecast_setting("CHURN_SCENARIOS", {"base": 0.0}))
+    if churn:
+        try:
+            scenarios["custom"] = float(churn)
+        except ValueError:
+            raise ValueError("'churn' must be a number") from None
+        if not 0 <= scenarios["custom"] < 1:
+            raise ValueError("'churn' must be at least 0 and below 1")
+    return months, scenarios
+
+
+def revenue_forecast(months=12, churn_scenarios=None, today=None):
+    """
+    Return the cash forecast for the months starting with the current one.
+
+    The projection is cached per month and horizon under the revenue data
+    version; churn_scenarios (name -> monthly churn rate, the configured
+    scenarios by default) are applied to the cached projection.
+    """
+    today = today or timezone.localdate()
+    first_month = np.datetime64(today, "M")
+    key = f"{CACHE_KEY_PREFIX}{get_forecast_version()}:{first_month}:{months}"
+    cached = cache.get(key)
+    if cached is None:
+        arrays = load_contracts()
+        monthly, overdue = project_revenue(arrays, first_month, months)
+        cached = {"monthly": monthly.tolist(), "overdue": overdue, "contracts": len(arrays["price"])}
+        cache.set(key, cached, _forecast_setting("CACHE_TTL", 3600))
+
+    if churn_scenarios is None:
+        churn_scenarios = _forecast_setting("CHURN_SCENARIOS", {"base": 0.0})
+    monthly = np.array(cached["monthly"], dtype=np.float64)
+    scenarios = {}
+    for name, churn in churn_scenarios.items():
+        projected = [_cents(value) for value in apply_churn(monthly, churn)]
+        scenarios[name] = {"churn": churn, "monthly": projected, "total": sum(projected, Decimal("0.00"))}
+    return {
+        "months": [str(first_month + number) for number in range(months)],
+        "contracts": cached["contracts"],
+        "overdue": _cents(cached["overdue"]),
+        "scenarios": scenarios,
+    }
@@ -0,0 +1,237 @@
+"""
+Student account ledger for the NCC School Management system.
+
+Every contract charges its product price to the student and every payment
+linked to a student credits its value. Entries are append-only: when a
+contract or payment changes (or is soft-deleted), ``sync_contracts`` and
+``sync_payments`` post the difference between what its entries add up to
+and what they should. ``post_entries`` writes entries and updates the
+students' ``StudentBalance`` rows in the same transaction, so balances are
+read without summing the ledger.
+"""
+
+import heapq
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.db.models import F, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from comercial.models import Product
+from common.bulk import get_loader
+from management.models import Contract
+from .models import LedgerEntry, LedgerEntryKind, Payment, StudentBalance
+
+ZERO = Decimal("0.00")
+
+
+def post_entries(entries, now=None):
+    """
+    Post unsaved LedgerEntry objects in order and update the balances.
+
+    Balances of the affected students are locked, so concurrent postings
+    for a student are serialized and running balances stay consistent.
+    """
+    if not entries:
+        return []
+    now = now or timezone.now()
+    student_ids = sorted({entry.student_id for entry in entries})
+    with transaction.atomic():
+        StudentBalance.objects.bulk_create(
+            [StudentBalance(student_id=student_id) for student_id in student_ids], ignore_conflicts=True
+        )
+        balances = {
+            balance.student_id: balance
+            for balance in StudentBalance.objects.select_for_update().filter(student_id__in=student_ids).order_by("pk")
+        }
+        for entry in entries:
+            balance = balances[entry.student_id]
+            if entry.kind == LedgerEntryKind.CHARGE:
+                balance.charged += entry.amount
+            else:
+                balance.paid -= entry.amount
+            balance.balance += entry.amount
+            balance.updated_at = now
+            entry.balance = balance.balance
+        LedgerEntry.objects.bulk_create(entries)
+        StudentBalance.objects.bulk_update(list(balances.values()), ["charged", "paid", "balance", "updated_at"])
+    return entries
+
+
+def _sync(source_field, kind, objects, targets, describe):
+    """
+    Post the entries that bring each object's ledger total to its target.
+
+    targets maps object pk -> {student_id: amount}; objects whose students
+    changed get a reversal for the old student and an entry for the new one.
+    """
+    posted = defaultdict(dict)
+    rows = (
+        LedgerEntry.objects.filter(**{f"{source_field}__in": [obj.pk for obj in objects]})
+        .order_by()
+        .values(source_field, "student")
+        .annotate(total=Sum("amount"))
+        .values_list(source_field, "student", "total")
+    )
+    for source_id, student_id, total in rows:
+        posted[source_id][student_id] = total
+
+    entries = []
+    for obj in objects:
+        target, current = targets[obj.pk], posted[obj.pk]
+        for student_id in sorted(set(target) | set(current)):
+            delta = target.get(student_id, ZERO) - current.get(student_id, ZERO)
+            if delta:
+                entries.append(LedgerEntry(
+                    student_id=student_id, kind=kind, amount=delta, description=describe(obj),
+                    **{source_field: obj},
+                ))
+    return post_entries(entries)
+
+
+def sync_contracts(contracts):
+    """
+    Charge the product price of each live contract to its student.
+    """
+    contracts = list(contracts)
+    if not contracts:
+        return []
+    prices = dict(
+        Product.objects.all_with_deleted()
+        .filter(pk__in={contract.product_id for contract in contracts})
+        .values_list("pk", "price")
+    )
+    targets = {
+        contract.pk: {} if contract.deleted_at else {contract.student_id: prices[contract.product_id]}
+        for contract in contracts
+    }
+    return _sync("contract", LedgerEntryKind.CHARGE, contracts, targets, lambda contract: f"Contract #{contract.pk}")
+
+
+def sync_payments(payments):
+    """
+    Credit the value of each live payment to its student, if it has one.
+    """
+    payments = list(payments)
+    if not payments:
+        return []
+    targets = {
+        payment.pk: {} if payment.deleted_at or not payment.student_id else {payment.student_id: -payment.value}
+        for payment in payments
+    }
+    return _sync("payment", LedgerEntryKind.PAYMENT, payments, targets, lambda payment: f"Payment #{payment.pk}")
+
+
+def _entry_dict(entry):
+    return {
+        "id": entry["id"],
+        "kind": entry["kind"],
+        "amount": entry["amount"],
+        "balance": entry["balance"],
+        "contract": entry["contract"],
+        "payment": entry["payment"],
+        "description": entry["description"],
+        "created_at": entry["created_at"],
+    }
+
+
+def student_statements(student_ids, limit=20, before=None):
+    """
+    Return the balance and latest entries (newest first) of each student.
+
+    Runs two queries whatever the number of students: one for the balances
+    and one for up to limit entries per student (a window function ranks
+    them), optionally older than entry id before.
+    """
+    student_ids = list(student_ids)
+    balances = {
+        row["student"]: row
+        for row in StudentBalance.objects.filter(student_id__in=student_ids).values(
+            "student", "charged", "paid", "balance", "updated_at"
+        )
+    }
+    entries = LedgerEntry.objects.filter(student_id__in=student_ids)
+    if before is not None:
+        entries = entries.filter(id__lt=before)
+    entries = (
+        entries.annotate(rank=Window(RowNumber(), partition_by=F("student_id"), order_by=F("id").desc()))
+        .filter(rank__lte=limit)
+        .order_by("student_id", "-id")
+        .values("id", "student", "kind", "amount", "balance", "contract", "payment", "description", "created_at")
+    )
+    by_student = defaultdict(list)
+    for entry in entries:
+        by_student[entry["student"]].append(_entry_dict(entry))
+
+    statements = []
+    for student_id in student_ids:
+        balance = balances.get(student_id, {"charged": ZERO, "paid": ZERO, "balance": ZERO, "updated_at": None})
+        statements.append({
+            "student": student_id,
+            "charged": balance["charged"],
+            "paid": balance["paid"],
+            "balance": balance["balance"],
+            "updated_at": balance["updated_at"],
+            "entries": by_student[student_id],
+        })
+    return statements
+
+
+def rebuild_ledger(using="default", batch_size=5000):
+    """
+    Recreate every ledger entry and balance from the live contracts and payments.
+
+    Used after bulk loads that bypass ``save()`` (seeding, imports). Streams
+    contracts and payments ordered by student and time, merging them to
+    compute running balances, and loads the result with the bulk loader.
+    Returns the number of entries.
+    """
+    connection = connections[using]
+    loader = get_loader(connection, batch_size)
+    charges = (
+        Contract.objects.using(using).filter(student__isnull=False)
+        .order_by("student_id", "created_at", "id")
+        .values_list("student_id", "created_at", "id", "product__price")
+        .iterator(chunk_size=batch_size)
+    )
+    credits = (
+        Payment.objects.using(using).filter(student__isnull=False)
+        .order_by("student_id", "paid_at", "id")
+        .values_list("student_id", "paid_at", "id", "value")
+        .iterator(chunk_size=batch_size)
+    )
+    merged = heapq.merge(
+        ((student_id, moment, 0, pk, price) for student_id, moment, pk, price in charges),
+        ((student_id, moment, 1, pk, value) for student_id, moment, pk, value in credits),
+    )
+    totals = {}
+    now = timezone.now()
+
+    def entries():
+        for student_id, moment, source, pk, value in merged:
+            charged, paid = totals.get(student_id, (ZERO, ZERO))
+            if source == 0:
+                charged += value
+                amount, kind, contract_id, payment_id = value, LedgerEntryKind.CHARGE, pk, None
+                description = f"Contract #{pk}"
+            else:
+                paid += value
+                amount, kind, contract_id, payment_id = -value, LedgerEntryKind.PAYMENT, None, pk
+                description = f"Payment #{pk}"
+            totals[student_id] = (charged, paid)
+            yield (student_id, kind, amount, charged - paid, contract_id, payment_id, description, moment)
+
+    columns = ("student_id", "kind", "amount", "balance", "contract_id", "payment_id", "description", "created_at")
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            for model in (LedgerEntry, StudentBalance):
+                cursor.execute(f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)}")
+        count = loader.load(LedgerEntry, columns, entries())
+        loader.load(
+            StudentBalance,
+            ("student_id", "charged", "paid", "balance", "updated_at"),
+            ((student_id, charged, paid, charged - paid, now) for student_id, (charged, paid) in totals.items()),
+        )
+    return count
@@ -0,0 +1,58 @@
+"""
+Detect contracts that are behind on payments.
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from financial.delinquency import detect_delinquency
+
+
+class Command(BaseCommand):
+    """
+    Recompute the delinquency snapshot of every live contract, or of some students.
+
+    Schedule it nightly (e.g. from cron); pass ``--student`` to refresh a few
+    students after their payments change.
+    """
+    help = "Recompute the delinquency snapshot from contracts and payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--as-of",
+            help="Date to compute the installments due for (YYYY-MM-DD, default today)"
+        )
+        parser.add_argument(
+            "--student",
+            type=int,
+            action="append",
+            dest="students",
+            help="Only recompute the contracts of this student (repeatable)"
+        )
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Database alias to use"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows read and written per batch"
+        )
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options["as_of"]:
+            try:
+                as_of = date.fromisoformat(options["as_of"])
+            except ValueError:
+                raise CommandError("--as-of must be in YYYY-MM-DD format.")
+        count = detect_delinquency(
+            as_of=as_of,
+            student_ids=options["students"],
+            using=options["database"],
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Found {count} delinquent contract(s)."))
@@ -0,0 +1,34 @@
+"""
+Rebuild the student ledger from contracts and payments.
+"""
+
+from django.core.management.base import BaseCommand
+
+from financial.ledger import rebuild_ledger
+
+
+class Command(BaseCommand):
+    """
+    Recreate every ledger entry and student balance from the live contracts and payments.
+
+    Run it after loads that bypass ``save()`` (bulk imports, raw SQL) or to
+    repair balances; regular saves keep the ledger up to date.
+    """
+    help = "Recreate ledger entries and student balances from contracts and payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="Database alias to rebuild"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows read and written per batch"
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_ledger(using=options["database"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the ledger with {count} entry(ies)."))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financial", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="payment",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, help_text="Timestamp when the record was created"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="payment",
+            name="paid_at",
+            field=models.DateTimeField(db_index=True, help_text="Timestamp when the payment was completed"),
+        ),
+        migrations.AlterField(
+            model_name="payment",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, help_text="Timestamp when the record was last updated"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="teacherpayments",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, help_text="Timestamp when the record was created"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="teacherpayments",
+            name="paid_at",
+            field=models.DateTimeField(db_index=True, help_text="Timestamp when the payment was completed"),
+        ),
+        migrations.AlterField(
+            model_name="teacherpayments",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, help_text="Timestamp when the record was last updated"
+            ),
+        ),
+    ]
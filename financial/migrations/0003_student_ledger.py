@@ -0,0 +1,153 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financial", "0002_date_indexes"),
+        ("management", "0007_lesson_attendance"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StudentBalance",
+            fields=[
+                (
+                    "student",
+                    models.OneToOneField(
+                        help_text="Student the balance belongs to",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="balance",
+                        serialize=False,
+                        to="management.student",
+                    ),
+                ),
+                (
+                    "charged",
+                    models.DecimalField(
+                        decimal_places=2, default=0, help_text="Total charged to the student", max_digits=12
+                    ),
+                ),
+                (
+                    "paid",
+                    models.DecimalField(
+                        decimal_places=2, default=0, help_text="Total paid by the student", max_digits=12
+                    ),
+                ),
+                (
+                    "balance",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="Amount owed by the student (charged minus paid)",
+                        max_digits=12,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True, help_text="Timestamp of the last entry")),
+            ],
+            options={
+                "verbose_name": "Student Balance",
+                "verbose_name_plural": "Student Balances",
+                "db_table": "financial_student_balances",
+            },
+        ),
+        migrations.AddField(
+            model_name="payment",
+            name="contract",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Contract the payment refers to",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="payments",
+                to="management.contract",
+            ),
+        ),
+        migrations.AddField(
+            model_name="payment",
+            name="student",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Student the payment is credited to",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="payments",
+                to="management.student",
+            ),
+        ),
+        migrations.CreateModel(
+            name="LedgerEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("charge", "Charge"), ("payment", "Payment")],
+                        help_text="Whether the entry is a charge or a payment",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        help_text="Amount added to the balance (charges positive, payments negative)",
+                        max_digits=12,
+                    ),
+                ),
+                (
+                    "balance",
+                    models.DecimalField(
+                        decimal_places=2, help_text="Balance owed by the student after this entry", max_digits=12
+                    ),
+                ),
+                ("description", models.CharField(blank=True, help_text="Description of the entry", max_length=255)),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, help_text="Timestamp when the entry was posted"),
+                ),
+                (
+                    "contract",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Contract that originated the charge",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="ledger_entries",
+                        to="management.contract",
+                    ),
+                ),
+                (
+                    "payment",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Payment that originated the credit",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="ledger_entries",
+                        to="financial.payment",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        help_text="Student whose account the entry belongs to",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ledger_entries",
+                        to="management.student",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ledger Entry",
+                "verbose_name_plural": "Ledger Entries",
+                "db_table": "financial_ledger_entries",
+                "ordering": ["-id"],
+                "indexes": [models.Index(fields=["student", "id"], name="ledger_entries_student_idx")],
+            },
+        ),
+    ]
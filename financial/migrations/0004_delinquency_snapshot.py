@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financial", "0003_student_ledger"),
+        ("management", "0007_lesson_attendance"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DelinquencySnapshot",
+            fields=[
+                (
+                    "contract",
+                    models.OneToOneField(
+                        help_text="Contract behind on payments",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="delinquency",
+                        serialize=False,
+                        to="management.contract",
+                    ),
+                ),
+                ("as_of", models.DateField(help_text="Date the figures were computed for")),
+                ("installments", models.PositiveIntegerField(help_text="Number of installments of the contract")),
+                ("installments_due", models.PositiveIntegerField(help_text="Installments due by the as-of date")),
+                (
+                    "expected",
+                    models.DecimalField(decimal_places=2, help_text="Amount due by the as-of date", max_digits=12),
+                ),
+                (
+                    "received",
+                    models.DecimalField(decimal_places=2, help_text="Amount paid for the contract", max_digits=12),
+                ),
+                (
+                    "overdue",
+                    models.DecimalField(
+                        db_index=True,
+                        decimal_places=2,
+                        help_text="Amount due but not paid (expected minus received)",
+                        max_digits=12,
+                    ),
+                ),
+                ("oldest_due_on", models.DateField(help_text="Due date of the oldest unpaid installment")),
+                (
+                    "days_overdue",
+                    models.PositiveIntegerField(
+                        db_index=True, help_text="Days since the oldest unpaid installment was due"
+                    ),
+                ),
+                ("computed_at", models.DateTimeField(help_text="Timestamp when the snapshot was computed")),
+                (
+                    "student",
+                    models.ForeignKey(
+                        help_text="Student of the contract",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="delinquencies",
+                        to="management.student",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Delinquency Snapshot",
+                "verbose_name_plural": "Delinquency Snapshots",
+                "db_table": "financial_delinquency_snapshots",
+                "ordering": ["-days_overdue", "contract"],
+            },
+        ),
+    ]
@@ -2,9 +2,9 @@
 Financial models for the NCC School Management system.
 """
 
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
-from common.models import BaseModel
+from common.models import AuditMixin, BaseModel
 
 
 class PaymentMethod(models.TextChoices):
@@ -16,7 +16,7 @@ class PaymentMethod(models.TextChoices):
     BOLETO = "boleto", "Boleto"
 
 
-class Payment(BaseModel):
+class Payment(AuditMixin, BaseModel):
     """
     Payment model representing individual payments.
     """
@@ -32,7 +32,8 @@ class Payment(BaseModel):
         help_text="Amount paid in local currency"
     )
     paid_at = models.DateTimeField(
-        help_text="Timestamp when the payment was completed"
+        help_text="Timestamp when the payment was completed",
+        db_index=True
     )
     description = models.CharField(
         max_length=255,
@@ -40,6 +41,22 @@ class Payment(BaseModel):
         null=True,
         help_text="Description or reference for the payment"
     )
+    student = models.ForeignKey(
+        "management.Student",
+        on_delete=models.SET_NULL,
+        related_name="payments",
+        null=True,
+        blank=True,
+        help_text="Student the payment is credited to"
+    )
+    contract = models.ForeignKey(
+        "management.Contract",
+        on_delete=models.SET_NULL,
+        related_name="payments",
+        null=True,
+        blank=True,
+        help_text="Contract the payment refers to"
+    )
 
     class Meta:
         db_table = "financial_payments"
@@ -50,6 +67,18 @@ class Payment(BaseModel):
     def __str__(self):
         return f"Payment of {self.value} via {self.get_payment_method_display()}"
 
+    def save(self, *args, **kwargs):
+        """
+        Save the payment and post its credit (or correction) to the student's ledger.
+        """
+        from .ledger import sync_payments
+
+        with transaction.atomic():
+            adding = self._state.adding
+            super().save(*args, **kwargs)
+            if self.student_id or not adding:
+                sync_payments([self])
+
 
 class TeacherPayments(BaseModel):
     """
@@ -68,7 +97,8 @@ class TeacherPayments(BaseModel):
         help_text="Amount paid to the teacher in local currency"
     )
     paid_at = models.DateTimeField(
-        help_text="Timestamp when the payment was completed"
+        help_text="Timestamp when the payment was completed",
+        db_index=True
     )
     payment_method = models.CharField(
         max_length=20,
@@ -82,6 +112,9 @@ class TeacherPayments(BaseModel):
         help_text="Description or reference for the payment"
     )
 
+    # Relations read by __str__, joined by admin changelists that list this model.
+    str_related_fields = ("teacher",)
+
     class Meta:
         db_table = "financial_teacher_payments"
         verbose_name = "Teacher Payment"
@@ -90,3 +123,188 @@ class TeacherPayments(BaseModel):
 
     def __str__(self):
         return f"Payment to {self.teacher.name}: {self.value} via {self.get_payment_method_display()}"
+
+
+class LedgerEntryKind(models.TextChoices):
+    """
+    Enum for ledger entry kinds.
+    """
+    CHARGE = "charge", "Charge"
+    PAYMENT = "payment", "Payment"
+
+
+class LedgerEntry(models.Model):
+    """
+    Append-only entry of a student's account.
+
+    Charges (from contracts) have positive amounts and payments negative
+    ones; corrections are new entries with the opposite amount. ``balance``
+    is the student's running balance after the entry.
+    """
+    student = models.ForeignKey(
+        "management.Student",
+        on_delete=models.CASCADE,
+        related_name="ledger_entries",
+        help_text="Student whose account the entry belongs to"
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=LedgerEntryKind.choices,
+        help_text="Whether the entry is a charge or a payment"
+    )
+    amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        help_text="Amount added to the balance (charges positive, payments negative)"
+    )
+    balance = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        help_text="Balance owed by the student after this entry"
+    )
+    contract = models.ForeignKey(
+        "management.Contract",
+        on_delete=models.SET_NULL,
+        related_name="ledger_entries",
+        null=True,
+        blank=True,
+        help_text="Contract that originated the charge"
+    )
+    payment = models.ForeignKey(
+        Payment,
+        on_delete=models.SET_NULL,
+        related_name="ledger_entries",
+        null=True,
+        blank=True,
+        help_text="Payment that originated the credit"
+    )
+    description = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Description of the entry"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp when the entry was posted"
+    )
+
+    class Meta:
+        db_table = "financial_ledger_entries"
+        verbose_name = "Ledger Entry"
+        verbose_name_plural = "Ledger Entries"
+        ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["student", "id"], name="ledger_entries_student_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of {self.amount} for student {self.student_id}"
+
+
+class StudentBalance(models.Model):
+    """
+    Materialized balance of a student's ledger, updated with every entry.
+    """
+    student = models.OneToOneField(
+        "management.Student",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="balance",
+        help_text="Student the balance belongs to"
+    )
+    charged = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Total charged to the student"
+    )
+    paid = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Total paid by the student"
+    )
+    balance = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Amount owed by the student (charged minus paid)"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Timestamp of the last entry"
+    )
+
+    class Meta:
+        db_table = "financial_student_balances"
+        verbose_name = "Student Balance"
+        verbose_name_plural = "Student Balances"
+
+    def __str__(self):
+        return f"Balance of student {self.student_id}: {self.balance}"
+
+
+class DelinquencySnapshot(models.Model):
+    """
+    Latest delinquency figures of a contract that is behind on payments.
+
+    Rows are replaced by ``financial.delinquency.detect_delinquency``; contracts
+    that are up to date have no row.
+    """
+    contract = models.OneToOneField(
+        "management.Contract",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="delinquency",
+        help_text="Contract behind on payments"
+    )
+    student = models.ForeignKey(
+        "management.Student",
+        on_delete=models.CASCADE,
+        related_name="delinquencies",
+        help_text="Student of the contract"
+    )
+    as_of = models.DateField(
+        help_text="Date the figures were computed for"
+    )
+    installments = models.PositiveIntegerField(
+        help_text="Number of installments of the contract"
+    )
+    installments_due = models.PositiveIntegerField(
+        help_text="Installments due by the as-of date"
+    )
+    expected = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        help_text="Amount due by the as-of date"
+    )
+    received = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        help_text="Amount paid for the contract"
+    )
+    overdue = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        db_index=True,
+        help_text="Amount due but not paid (expected minus received)"
+    )
+    oldest_due_on = models.DateField(
+        help_text="Due date of the oldest unpaid installment"
+    )
+    days_overdue = models.PositiveIntegerField(
+        db_index=True,
+        help_text="Days since the oldest unpaid installment was due"
+    )
+    computed_at = models.DateTimeField(
+        help_text="Timestamp when the snapshot was computed"
+    )
+
+    class Meta:
+        db_table = "financial_delinquency_snapshots"
+        verbose_name = "Delinquency Snapshot"
+        verbose_name_plural = "Delinquency Snapshots"
+        ordering = ["-days_overdue", "contract"]
+
+    def __str__(self):
+        return f"Contract {self.contract_id}: {self.overdue} overdue for {self.days_overdue} days"
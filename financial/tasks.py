@@ -0,0 +1,25 @@
+"""
+Background job tasks of the financial app (see ``common.jobs``).
+"""
+
+from django.utils.dateparse import parse_date
+
+from .delinquency import detect_delinquency
+from .ledger import rebuild_ledger
+
+
+def detect_delinquency_task(job, as_of=None, student_ids=None):
+    """
+    Refresh the delinquency snapshot as of the as_of date (ISO 8601, default today).
+    """
+    job.progress(0, message="Scanning contracts")
+    count = detect_delinquency(as_of=parse_date(as_of) if as_of else None, student_ids=student_ids)
+    return {"delinquent_contracts": count}
+
+
+def rebuild_ledger_task(job):
+    """
+    Recreate the student ledger from contracts and payments.
+    """
+    job.progress(0, message="Rebuilding the ledger")
+    return {"entries": rebuild_ledger()}
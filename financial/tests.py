@@ -2,12 +2,25 @@
 Tests for financial models.
 """
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
+from datetime import date
 from decimal import Decimal
 
-from .models import Payment, TeacherPayments, PaymentMethod
-from management.models import Teacher
+import numpy as np
+
+from .delinquency import delinquency_totals, detect_delinquency
+from .forecasting import load_contracts, parse_forecast_params, project_revenue, revenue_forecast
+from .ledger import rebuild_ledger, student_statements
+from .models import (
+    DelinquencySnapshot, LedgerEntry, LedgerEntryKind, Payment, TeacherPayments, PaymentMethod, StudentBalance
+)
+from comercial.models import Product
+from common.jobs import claim, enqueue, execute
+from common.models import JobStatus
+from management.models import Contract, Student, Teacher
 
 
 class PaymentModelTest(TestCase):
@@ -127,3 +140,292 @@ class TeacherPaymentsModelTest(TestCase):
 
         # Should not appear in default queryset
         self.assertFalse(TeacherPayments.objects.filter(id=payment_id).exists())
+
+
+class StudentLedgerTest(TestCase):
+    """
+    Test cases for the student ledger and materialized balances.
+    """
+
+    def setUp(self):
+        """
+        Set up a student with a contract.
+        """
+        self.student = Student.objects.create(name="Ana", birth_date="2000-01-01")
+        self.product = Product.objects.create(name="English", price=Decimal("500.00"))
+        self.contract = Contract.objects.create(student=self.student, product=self.product)
+
+    def pay(self, value, **kwargs):
+        """
+        Create a payment of value for the student.
+        """
+        return Payment.objects.create(
+            payment_method=PaymentMethod.PIX, value=Decimal(value), paid_at=timezone.now(),
+            student=self.student, **kwargs
+        )
+
+    def balance(self):
+        """
+        Return the student's materialized balance.
+        """
+        return StudentBalance.objects.get(student=self.student)
+
+    def test_contract_charges_student(self):
+        """
+        Test that saving a contract charges its product price once.
+        """
+        self.contract.save()
+        balance = self.balance()
+        self.assertEqual(balance.charged, Decimal("500.00"))
+        self.assertEqual(balance.balance, Decimal("500.00"))
+        entry = LedgerEntry.objects.get(student=self.student)
+        self.assertEqual(entry.kind, LedgerEntryKind.CHARGE)
+        self.assertEqual(entry.balance, Decimal("500.00"))
+
+    def test_payment_credits_student(self):
+        """
+        Test that payments reduce the balance and record running balances.
+        """
+        self.pay("200.00")
+        self.pay("100.00", contract=self.contract)
+        balance = self.balance()
+        self.assertEqual(balance.paid, Decimal("300.00"))
+        self.assertEqual(balance.balance, Decimal("200.00"))
+        self.assertEqual(
+            list(LedgerEntry.objects.order_by("id").values_list("balance", flat=True)),
+            [Decimal("500.00"), Decimal("300.00"), Decimal("200.00")]
+        )
+
+    def test_payment_without_student_has_no_entry(self):
+        """
+        Test that payments not linked to a student stay off the ledger.
+        """
+        Payment.objects.create(payment_method=PaymentMethod.PIX, value=Decimal("10.00"), paid_at=timezone.now())
+        self.assertFalse(LedgerEntry.objects.filter(kind=LedgerEntryKind.PAYMENT).exists())
+
+    def test_changed_and_deleted_payment_post_corrections(self):
+        """
+        Test that editing or soft-deleting a payment appends correcting entries.
+        """
+        payment = self.pay("200.00")
+        payment.value = Decimal("250.00")
+        payment.save()
+        self.assertEqual(self.balance().balance, Decimal("250.00"))
+        payment.delete()
+        balance = self.balance()
+        self.assertEqual(balance.paid, Decimal("0.00"))
+        self.assertEqual(balance.balance, Decimal("500.00"))
+        self.assertEqual(LedgerEntry.objects.filter(payment=payment).count(), 3)
+
+    def test_payment_moved_to_another_student(self):
+        """
+        Test that moving a payment reverses it for the old student.
+        """
+        other = Student.objects.create(name="Bia", birth_date="2001-01-01")
+        payment = self.pay("200.00")
+        payment.student = other
+        payment.save()
+        self.assertEqual(self.balance().balance, Decimal("500.00"))
+        self.assertEqual(StudentBalance.objects.get(student=other).balance, Decimal("-200.00"))
+
+    def test_student_statements(self):
+        """
+        Test that statements return balances and limited entries in two queries.
+        """
+        other = Student.objects.create(name="Bia", birth_date="2001-01-01")
+        for value in ("100.00", "50.00", "25.00"):
+            self.pay(value)
+        with self.assertNumQueries(2):
+            statements = student_statements([self.student.pk, other.pk], limit=2)
+        first, second = statements
+        self.assertEqual(first["balance"], Decimal("325.00"))
+        self.assertEqual([entry["amount"] for entry in first["entries"]], [Decimal("-25.00"), Decimal("-50.00")])
+        older = student_statements([self.student.pk], limit=5, before=first["entries"][-1]["id"])[0]
+        self.assertEqual(len(older["entries"]), 2)
+        self.assertEqual(second["balance"], Decimal("0.00"))
+        self.assertEqual(second["entries"], [])
+
+    def test_rebuild_ledger_matches_incremental_balances(self):
+        """
+        Test that rebuilding the ledger reproduces the incremental balances.
+        """
+        self.pay("120.00")
+        self.pay("80.00").delete()
+        expected = self.balance()
+        count = rebuild_ledger()
+        self.assertEqual(count, 2)
+        balance = self.balance()
+        self.assertEqual(
+            (balance.charged, balance.paid, balance.balance), (expected.charged, expected.paid, expected.balance)
+        )
+        self.assertEqual(LedgerEntry.objects.order_by("-id").first().balance, Decimal("380.00"))
+
+
+class DelinquencyTest(TestCase):
+    """
+    Test cases for the delinquency detection job.
+    """
+
+    AS_OF = date(2026, 2, 15)
+
+    def setUp(self):
+        """
+        Set up a student with a three-installment contract started last month.
+        """
+        self.student = Student.objects.create(name="Ana", birth_date="2000-01-01")
+        self.contract = self.contract_for(self.student, "Course", statements=3)
+
+    def contract_for(self, student, name, price="300.00", **kwargs):
+        """
+        Create a contract of a new product for student.
+        """
+        product = Product.objects.create(name=name, price=Decimal(price))
+        kwargs.setdefault("first_lesson_on", date(2026, 1, 10))
+        return Contract.objects.create(student=student, product=product, **kwargs)
+
+    def pay(self, contract, value):
+        """
+        Create a payment of value for contract.
+        """
+        return Payment.objects.create(
+            payment_method=PaymentMethod.PIX, value=Decimal(value), paid_at=timezone.now(),
+            student=contract.student, contract=contract
+        )
+
+    def test_detects_installments_behind(self):
+        """
+        Test expected and received amounts and the age of the oldest unpaid installment.
+        """
+        self.pay(self.contract, "100.00")
+        self.pay(self.contract, "500.00").delete()
+        self.assertEqual(detect_delinquency(as_of=self.AS_OF), 1)
+        snapshot = DelinquencySnapshot.objects.get()
+        self.assertEqual((snapshot.installments, snapshot.installments_due), (3, 2))
+        self.assertEqual((snapshot.expected, snapshot.received), (Decimal("200.00"), Decimal("100.00")))
+        self.assertEqual(snapshot.overdue, Decimal("100.00"))
+        self.assertEqual((snapshot.oldest_due_on, snapshot.days_overdue), (date(2026, 2, 10), 5))
+
+    def test_runs_as_background_job(self):
+        """
+        Test the detect_delinquency task through the job queue.
+        """
+        job = enqueue("detect_delinquency", {"as_of": self.AS_OF.isoformat()})
+        claim("worker")
+        self.assertEqual(execute(job.pk), JobStatus.SUCCEEDED)
+        job.refresh_from_db()
+        self.assertEqual(job.result, {"delinquent_contracts": 1})
+        self.assertEqual(DelinquencySnapshot.objects.get().as_of, self.AS_OF)
+
+    def test_paid_future_and_finished_contracts(self):
+        """
+        Test that paid-up and unstarted contracts are skipped and finished ones are fully due.
+        """
+        self.pay(self.contract, "200.00")
+        self.contract_for(self.student, "Future", first_lesson_on=date(2026, 3, 1))
+        finished = self.contract_for(
+            self.student, "Finished", statements=10, first_lesson_on=date(2026, 1, 1), last_lesson_on=date(2026, 2, 1)
+        )
+        detect_delinquency(as_of=self.AS_OF)
+        snapshot = DelinquencySnapshot.objects.get()
+        self.assertEqual(snapshot.contract_id, finished.pk)
+        self.assertEqual((snapshot.installments_due, snapshot.overdue), (10, Decimal("300.00")))
+        self.assertEqual(snapshot.oldest_due_on, date(2026, 1, 1))
+
+    def test_student_rerun_and_constant_queries(self):
+        """
+        Test that re-running for one student keeps the others and queries do not grow with contracts.
+        """
+        with CaptureQueriesContext(connection) as one:
+            detect_delinquency(as_of=self.AS_OF)
+        others = [Student.objects.create(name=f"Student {number}", birth_date="2000-01-01") for number in range(5)]
+        for number, student in enumerate(others):
+            self.contract_for(student, f"Course {number}")
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(detect_delinquency(as_of=self.AS_OF), 6)
+        self.assertEqual(len(many.captured_queries), len(one.captured_queries))
+
+        self.pay(self.contract, "300.00")
+        self.assertEqual(detect_delinquency(as_of=self.AS_OF, student_ids=[self.student.pk]), 0)
+        totals = delinquency_totals(DelinquencySnapshot.objects.all())
+        self.assertEqual((totals["contracts"], totals["students"]), (5, 5))
+        self.assertEqual(totals["overdue"], Decimal("1500.00"))
+
+
+class RevenueForecastTest(TestCase):
+    """
+    Test cases for the vectorized revenue forecast.
+    """
+
+    TODAY = date(2026, 10, 19)
+
+    def setUp(self):
+        """
+        Set up a three-installment contract that started last month, partly paid.
+        """
+        self.student = Student.objects.create(name="Ana", birth_date="2000-01-01")
+        product = Product.objects.create(name="English", price=Decimal("299.99"))
+        self.contract = Contract.objects.create(
+            student=self.student, product=product, statements=3, first_lesson_on=date(2026, 9, 5),
+            payment_method=PaymentMethod.BOLETO,
+        )
+        Payment.objects.create(
+            payment_method=PaymentMethod.BOLETO, value=Decimal("50.00"), paid_at=timezone.now(),
+            student=self.student, contract=self.contract
+        )
+
+    def test_project_installments_in_cents(self):
+        """
+        Test that installments split the price exactly and payments settle them in order.
+        """
+        arrays = load_contracts()
+        self.assertEqual((arrays["price"][0], arrays["received"][0]), (29999, 5000))
+        monthly, overdue = project_revenue(arrays, np.datetime64(self.TODAY, "M"), 4)
+        self.assertEqual(monthly.tolist(), [10000, 9999, 0, 0])
+        self.assertEqual(overdue, 5000)
+
+    def test_contract_end_and_collection_rates(self):
+        """
+        Test that installments after the last lesson fall due on it and collection rates weight them.
+        """
+        self.contract.last_lesson_on = date(2026, 10, 30)
+        self.contract.save()
+        with override_settings(REVENUE_FORECAST={"COLLECTION_RATES": {"boleto": 0.5}}):
+            monthly, _ = project_revenue(load_contracts(), np.datetime64(self.TODAY, "M"), 2)
+        self.assertEqual(monthly.tolist(), [9999.5, 0])
+
+    def test_many_installments_in_bounded_memory(self):
+        """
+        Test that a contract with a huge number of installments is projected per month, not per installment.
+        """
+        Contract.objects.filter(pk=self.contract.pk).update(statements=10**9, last_lesson_on=date(2026, 11, 30))
+        monthly, overdue = project_revenue(load_contracts(), np.datetime64(self.TODAY, "M"), 3)
+        self.assertEqual(monthly.tolist(), [0, 24999, 0])
+        self.assertEqual(overdue, 0)
+
+    def test_cached_forecast_with_churn(self):
+        """
+        Test churn scenarios and that saves invalidate the cached projection.
+        """
+        forecast = revenue_forecast(3, {"base": 0.0, "half": 0.5}, today=self.TODAY)
+        self.assertEqual(forecast["months"], ["2026-10", "2026-11", "2026-12"])
+        self.assertEqual(forecast["overdue"], Decimal("50.00"))
+        self.assertEqual(forecast["scenarios"]["base"]["total"], Decimal("199.99"))
+        self.assertEqual(forecast["scenarios"]["half"]["monthly"][:2], [Decimal("100.00"), Decimal("50.00")])
+        with self.assertNumQueries(0):
+            revenue_forecast(3, {"base": 0.0}, today=self.TODAY)
+
+        self.student.status = "former"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.save()
+        forecast = revenue_forecast(3, {"base": 0.0}, today=self.TODAY)
+        self.assertEqual((forecast["contracts"], forecast["scenarios"]["base"]["total"]), (0, Decimal("0.00")))
+
+    def test_parse_forecast_params(self):
+        """
+        Test horizon and churn validation.
+        """
+        months, scenarios = parse_forecast_params("6", "0.1")
+        self.assertEqual((months, scenarios["custom"]), (6, 0.1))
+        for params in (("0", None), ("x", None), ("999", None), (None, "1"), (None, "fast")):
+            with self.assertRaises(ValueError):
+                parse_forecast_params(*params)
@@ -3,22 +3,23 @@ Admin configuration for management models.
 """
 
 from django.contrib import admin
-from ncc_school_management.admin import soft_delete_selected
+from ncc_school_management.admin import BaseModelAdmin, export_as_csv, soft_delete_selected
 from .models import Student, Teacher, Contract, StudentsGroup, Lesson
 
 
 @admin.register(Student)
-class StudentAdmin(admin.ModelAdmin):
+class StudentAdmin(BaseModelAdmin):
     """
     Admin configuration for Student model.
     """
     list_display = ["name", "birth_date", "status", "created_at"]
     list_filter = ["status", "birth_date", "created_at", "updated_at"]
     search_fields = ["name", "extra_info"]
+    autocomplete_search_fields = ["name"]
     readonly_fields = ["created_at", "updated_at", "deleted_at"]
     ordering = ["name"]
     list_per_page = 20
-    actions = [soft_delete_selected]
+    actions = [export_as_csv, soft_delete_selected]
 
     fieldsets = (
         ("Personal Information", {
@@ -35,17 +36,18 @@ class StudentAdmin(admin.ModelAdmin):
 
 
 @admin.register(Teacher)
-class TeacherAdmin(admin.ModelAdmin):
+class TeacherAdmin(BaseModelAdmin):
     """
     Admin configuration for Teacher model.
     """
     list_display = ["name", "status", "pix_key", "created_at"]
     list_filter = ["status", "created_at", "updated_at"]
     search_fields = ["name", "pix_key"]
+    autocomplete_search_fields = ["name"]
     readonly_fields = ["created_at", "updated_at", "deleted_at"]
     ordering = ["name"]
     list_per_page = 20
-    actions = [soft_delete_selected]
+    actions = [export_as_csv, soft_delete_selected]
 
     fieldsets = (
         ("Personal Information", {
@@ -62,7 +64,7 @@ class TeacherAdmin(admin.ModelAdmin):
 
 
 @admin.register(Contract)
-class ContractAdmin(admin.ModelAdmin):
+class ContractAdmin(BaseModelAdmin):
     """
     Admin configuration for Contract model.
     """
@@ -70,10 +72,11 @@ class ContractAdmin(admin.ModelAdmin):
                     "statements", "first_lesson_on", "last_lesson_on", "created_at"]
     list_filter = ["created_at", "updated_at", "first_lesson_on", "last_lesson_on"]
     search_fields = ["student__name", "product__name"]
+    autocomplete_fields = ["student", "product"]
     readonly_fields = ["created_at", "updated_at", "deleted_at"]
     ordering = ["-created_at"]
     list_per_page = 20
-    actions = [soft_delete_selected]
+    actions = [export_as_csv, soft_delete_selected]
 
     fieldsets = (
         ("Contract Information", {
@@ -88,7 +91,7 @@ class ContractAdmin(admin.ModelAdmin):
 
 
 @admin.register(StudentsGroup)
-class StudentsGroupAdmin(admin.ModelAdmin):
+class StudentsGroupAdmin(BaseModelAdmin):
     """
     Admin configuration for StudentsGroup model.
     """
@@ -98,8 +101,8 @@ class StudentsGroupAdmin(admin.ModelAdmin):
     readonly_fields = ["created_at", "updated_at", "deleted_at"]
     ordering = ["scheduled_at"]
     list_per_page = 20
-    filter_horizontal = ["students"]
-    actions = [soft_delete_selected]
+    autocomplete_fields = ["teacher", "students"]
+    actions = [export_as_csv, soft_delete_selected]
 
     fieldsets = (
         ("Group Information", {
@@ -116,17 +119,18 @@ class StudentsGroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(BaseModelAdmin):
     """
     Admin configuration for Lesson model.
     """
-    list_display = ["teacher", "students_group", "occurred_at", "created_at"]
+    list_display = ["teacher", "students_group", "occurred_at", "attendance_taken_at", "absent_count", "created_at"]
     list_filter = ["occurred_at", "created_at", "updated_at"]
     search_fields = ["teacher__name", "notes"]
-    readonly_fields = ["created_at", "updated_at", "deleted_at"]
+    autocomplete_fields = ["students_group", "teacher"]
+    readonly_fields = ["attendance_taken_at", "absent_count", "created_at", "updated_at", "deleted_at"]
     ordering = ["-occurred_at"]
     list_per_page = 20
-    actions = [soft_delete_selected]
+    actions = [export_as_csv, soft_delete_selected]
 
     fieldsets = (
         ("Lesson Information", {
@@ -135,6 +139,9 @@ class LessonAdmin(admin.ModelAdmin):
         ("Notes", {
             "fields": ("notes",)
         }),
+        ("Attendance", {
+            "fields": ("attendance_taken_at", "absent_count")
+        }),
         ("Timestamps", {
             "fields": ("created_at", "updated_at", "deleted_at"),
             "classes": ("collapse",)
@@ -0,0 +1,135 @@
+"""
+Lesson attendance for the NCC School Management system.
+
+Marking attendance stores the group's roster on the lesson and one
+``LessonAbsence`` row per absent student. ``StudentAttendance`` counters
+(lessons marked and absences per student and group) are adjusted by the
+difference with the previous marking, with one ``UPDATE`` per kind of
+change, so attendance rates never aggregate lesson x student rows.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, FloatField, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Lesson, LessonAbsence, StudentAttendance
+
+
+class AttendanceError(Exception):
+    """
+    Raised when attendance cannot be marked (e.g. absent students not on the roster).
+    """
+
+
+def mark_attendance(lesson_id, absent_ids, now=None):
+    """
+    Mark attendance of a lesson: absent_ids missed it, the rest of the roster attended.
+
+    The roster is the group's current live students. Marking again replaces
+    the previous marking and only the difference reaches the counters.
+    Returns the updated lesson.
+    """
+    now = now or timezone.now()
+    absent = set(absent_ids)
+    with transaction.atomic():
+        lesson = Lesson.objects.select_for_update().select_related("students_group").get(pk=lesson_id)
+        roster = set(lesson.students_group.students.values_list("pk", flat=True))
+        unknown = absent - roster
+        if unknown:
+            raise AttendanceError(
+                f"Student(s) not in the group's roster: {', '.join(map(str, sorted(unknown)))}"
+            )
+
+        previous_roster = set(lesson.attendance_roster or ())
+        previous_absent = set(lesson.absences.values_list("student_id", flat=True))
+        deltas = defaultdict(list)
+        for student_id in roster | previous_roster:
+            change = (
+                (student_id in roster) - (student_id in previous_roster),
+                (student_id in absent) - (student_id in previous_absent),
+            )
+            if change != (0, 0):
+                deltas[change].append(student_id)
+        _apply_deltas(lesson.students_group_id, deltas)
+
+        removed = previous_absent - absent
+        if removed:
+            lesson.absences.filter(student_id__in=removed).delete()
+        LessonAbsence.objects.bulk_create(
+            [LessonAbsence(lesson=lesson, student_id=student_id) for student_id in absent - previous_absent]
+        )
+        lesson.attendance_roster = sorted(roster)
+        lesson.absent_count = len(absent)
+        lesson.attendance_taken_at = now
+        lesson.save(update_fields=["attendance_roster", "absent_count", "attendance_taken_at", "updated_at"])
+    return lesson
+
+
+def _apply_deltas(students_group_id, deltas):
+    """
+    Add (lessons, absences) deltas to the counters of the students in deltas.
+    """
+    students = [student_id for student_ids in deltas.values() for student_id in student_ids]
+    if not students:
+        return
+    StudentAttendance.objects.bulk_create(
+        [StudentAttendance(student_id=student_id, students_group_id=students_group_id) for student_id in students],
+        ignore_conflicts=True,
+    )
+    now = timezone.now()
+    for (lessons, absences), student_ids in deltas.items():
+        StudentAttendance.objects.filter(students_group_id=students_group_id, student_id__in=student_ids).update(
+            lessons=F("lessons") + lessons, absences=F("absences") + absences, updated_at=now
+        )
+
+
+def student_attendance(student_id):
+    """
+    Return the attendance counters and rates of a student, overall and per group.
+    """
+    groups = list(
+        StudentAttendance.objects.filter(student_id=student_id)
+        .order_by("students_group_id")
+        .values("students_group", "lessons", "absences")
+    )
+    for group in groups:
+        group["attendance_rate"] = _rate(group["lessons"], group["absences"])
+    lessons = sum(group["lessons"] for group in groups)
+    absences = sum(group["absences"] for group in groups)
+    return {
+        "student": student_id,
+        "lessons": lessons,
+        "absences": absences,
+        "attendance_rate": _rate(lessons, absences),
+        "groups": groups,
+    }
+
+
+def attendance_rates(max_rate=None):
+    """
+    Return a queryset of per-student totals and attendance rates from the counters.
+
+    Rows have student, lessons_total, absences_total and attendance_rate;
+    only students with marked lessons are included, optionally those at or
+    below max_rate. Lowest rates come first.
+    """
+    queryset = (
+        StudentAttendance.objects.filter(student__deleted_at__isnull=True)
+        .order_by()
+        .values("student")
+        .annotate(lessons_total=Sum("lessons"), absences_total=Sum("absences"))
+        .filter(lessons_total__gt=0)
+        .annotate(
+            attendance_rate=Cast(F("lessons_total") - F("absences_total"), FloatField()) / F("lessons_total")
+        )
+    )
+    if max_rate is not None:
+        queryset = queryset.filter(attendance_rate__lte=max_rate)
+    return queryset.order_by("attendance_rate", "student")
+
+
+def _rate(lessons, absences):
+    return round((lessons - absences) / lessons, 4) if lessons else None
@@ -0,0 +1,260 @@
+"""
+Student and teacher status history for the NCC School Management system.
+
+Every status change closes the owner's current period (``valid_to``) and
+opens a new one, in the same transaction as the save (see
+``StatusHistoryMixin``). Periods are half-open ``[valid_from, valid_to)``
+ranges, so "status as of" questions are single range predicates served by
+the ``(status, valid_from, valid_to)`` indexes, and monthly active counts,
+churn and cohort retention are conditional aggregates computed by the
+database in two queries, whatever the number of months.
+"""
+
+from datetime import date, datetime, time as dt_time, timedelta
+
+from django.db import connections
+from django.db.models import Count, DateTimeField, OuterRef, Q, Subquery
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Student, StudentStatusHistory, StudentsStatus, Teacher, TeacherStatus, TeacherStatusHistory
+
+HISTORY_MODELS = {
+    Student: (StudentStatusHistory, "student"),
+    Teacher: (TeacherStatusHistory, "teacher"),
+}
+
+
+def record_status(instance, created=False, now=None):
+    """
+    Close the current status period of instance (a Student or Teacher) and open one with its status.
+
+    Nothing changes when the current period already has that status. Call it
+    inside the transaction that saved the status.
+    """
+    history_model, owner_field = HISTORY_MODELS[type(instance)]
+    now = now or timezone.now()
+    if not created:
+        current = (
+            history_model.objects.select_for_update()
+            .filter(**{owner_field: instance, "valid_to__isnull": True})
+            .first()
+        )
+        if current is not None:
+            if current.status == instance.status:
+                return current
+            current.valid_to = now
+            current.save(update_fields=["valid_to"])
+    return history_model.objects.create(**{owner_field: instance}, status=instance.status, valid_from=now)
+
+
+def record_created(instances, now=None):
+    """
+    Open the first status period of students or teachers created with ``bulk_create``.
+    """
+    instances = list(instances)
+    if not instances:
+        return []
+    history_model, owner_field = HISTORY_MODELS[type(instances[0])]
+    now = now or timezone.now()
+    return history_model.objects.bulk_create([
+        history_model(**{owner_field: instance}, status=instance.status, valid_from=now) for instance in instances
+    ])
+
+
+def backfill_history(owner_model, history_model, owner_field, active_status, using="default"):
+    """
+    Create status periods for owners without any, inferred from their timestamps.
+
+    Owners get a current period with their status from ``created_at``; those
+    who are no longer active are assumed active until ``updated_at``. Used
+    after loads that bypass ``save()`` and by the migration that adds the
+    history. Two ``INSERT ... SELECT`` statements; returns rows inserted.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    history, owners = quote(history_model._meta.db_table), quote(owner_model._meta.db_table)
+    owner_column = quote(history_model._meta.get_field(owner_field).column)
+    count = 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {history} ({owner_column}, status, valid_from, valid_to) "
+            f"SELECT o.id, %s, o.created_at, o.updated_at FROM {owners} o "
+            f"WHERE o.status <> %s AND o.updated_at > o.created_at "
+            f"AND NOT EXISTS (SELECT 1 FROM {history} h WHERE h.{owner_column} = o.id)",
+            [active_status, active_status],
+        )
+        count += cursor.rowcount
+        cursor.execute(
+            f"INSERT INTO {history} ({owner_column}, status, valid_from, valid_to) "
+            f"SELECT o.id, o.status, CASE WHEN o.status = %s THEN o.created_at ELSE o.updated_at END, NULL "
+            f"FROM {owners} o "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {history} h WHERE h.{owner_column} = o.id AND h.valid_to IS NULL)",
+            [active_status],
+        )
+        count += cursor.rowcount
+    return count
+
+
+def backfill_status_history(using="default"):
+    """
+    Backfill the status history of every student and teacher without one.
+    """
+    return (
+        backfill_history(Student, StudentStatusHistory, "student", StudentsStatus.ACTIVE, using)
+        + backfill_history(Teacher, TeacherStatusHistory, "teacher", TeacherStatus.ACTIVE, using)
+    )
+
+
+def valid_at(moment):
+    """
+    Q matching the status periods that cover moment.
+    """
+    return Q(valid_from__lte=moment) & (Q(valid_to__isnull=True) | Q(valid_to__gt=moment))
+
+
+def status_counts(owner_model, as_of):
+    """
+    Return {status: count} of the students or teachers (owner_model) as of the moment as_of.
+
+    Owners soft-deleted by then are left out.
+    """
+    history_model, owner_field = HISTORY_MODELS[owner_model]
+    live = Q(**{f"{owner_field}__deleted_at__isnull": True}) | Q(**{f"{owner_field}__deleted_at__gt": as_of})
+    rows = (
+        history_model.objects.filter(valid_at(as_of), live)
+        .order_by()
+        .values("status")
+        .annotate(total=Count("id"))
+        .values_list("status", "total")
+    )
+    counts = {status: 0 for status, _ in history_model._meta.get_field("status").choices}
+    counts.update(rows)
+    return counts
+
+
+def parse_as_of(value=None):
+    """
+    Return the moment requested as an ISO 8601 date or datetime, now by default.
+
+    A date means the end of that (local) day. Raises ValueError for invalid values.
+    """
+    if not value:
+        return timezone.now()
+    try:
+        day, moment = parse_date(value), parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if day is not None:
+        return _day_start(day + timedelta(days=1)) - timedelta(microseconds=1)
+    if moment is None:
+        raise ValueError("'as_of' must be an ISO 8601 date or datetime")
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+def parse_months(first=None, last=None, max_months=24):
+    """
+    Return the (first, last) months (dates on day 1) requested as YYYY-MM strings.
+
+    Defaults to the 12 months up to the current one. Raises ValueError for
+    invalid months or ranges longer than max_months.
+    """
+    months = {}
+    for name, value in (("from", first), ("to", last)):
+        if value:
+            try:
+                months[name] = datetime.strptime(value, "%Y-%m").date()
+            except ValueError:
+                raise ValueError(f"'{name}' must be in YYYY-MM format") from None
+    last = months.get("to") or timezone.localdate().replace(day=1)
+    first = months.get("from") or _add_months(last, -11)
+    count = _month_number(last) - _month_number(first) + 1
+    if count < 1:
+        raise ValueError("'to' must not be before 'from'")
+    if count > max_months:
+        raise ValueError(f"The range cannot be longer than {max_months} months")
+    return first, last
+
+
+def _month_number(day):
+    return day.year * 12 + day.month - 1
+
+
+def _add_months(day, months):
+    number = _month_number(day) + months
+    return date(number // 12, number % 12 + 1, 1)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+def student_retention(first, last):
+    """
+    Return monthly active counts, churn and cohort retention of students from first to last month.
+
+    A student is active in a month when active at its end; churned students
+    were active when the month started and stopped being active during it.
+    Cohorts group students by the month they first became active; each
+    cohort's retention lists the share still active at the end of every
+    month from its own to last.
+    """
+    months = [_add_months(first, number) for number in range(_month_number(last) - _month_number(first) + 1)]
+    starts = [_day_start(month) for month in months]
+    ends = starts[1:] + [_day_start(_add_months(last, 1))]
+    active = StudentsStatus.ACTIVE
+
+    def active_before(moment):
+        # Active at the instant just before moment.
+        return Q(status=active, valid_from__lt=moment) & (Q(valid_to__isnull=True) | Q(valid_to__gte=moment))
+
+    history = StudentStatusHistory.objects.filter(student__deleted_at__isnull=True).order_by()
+    aggregates = {}
+    for number, (start, end) in enumerate(zip(starts, ends)):
+        aggregates[f"opening_{number}"] = Count("student", distinct=True, filter=active_before(start))
+        aggregates[f"active_{number}"] = Count("student", distinct=True, filter=active_before(end))
+        aggregates[f"churned_{number}"] = Count("student", distinct=True, filter=Q(
+            status=active, valid_from__lt=start, valid_to__gte=start, valid_to__lt=end
+        ))
+    totals = history.aggregate(**aggregates)
+
+    first_active = (
+        StudentStatusHistory.objects.filter(student=OuterRef("student"), status=active)
+        .order_by("valid_from")
+        .values("valid_from")[:1]
+    )
+    cohort_rows = (
+        history.filter(status=active)
+        .annotate(cohort=TruncMonth(Subquery(first_active, output_field=DateTimeField())))
+        .filter(cohort__gte=starts[0], cohort__lt=ends[-1])
+        .values("cohort")
+        .annotate(
+            size=Count("student", distinct=True),
+            **{f"active_{number}": Count("student", distinct=True, filter=active_before(end))
+               for number, end in enumerate(ends)},
+        )
+        .order_by("cohort")
+    )
+    cohorts = []
+    for row in cohort_rows:
+        cohort = timezone.localtime(row["cohort"]).date() if isinstance(row["cohort"], datetime) else row["cohort"]
+        offset = _month_number(cohort) - _month_number(first)
+        cohorts.append({
+            "cohort": cohort.strftime("%Y-%m"),
+            "size": row["size"],
+            "retention": [
+                round(row[f"active_{number}"] / row["size"], 4) for number in range(offset, len(months))
+            ],
+        })
+
+    opening = [totals[f"opening_{number}"] for number in range(len(months))]
+    churned = [totals[f"churned_{number}"] for number in range(len(months))]
+    return {
+        "months": [month.strftime("%Y-%m") for month in months],
+        "opening": opening,
+        "active": [totals[f"active_{number}"] for number in range(len(months))],
+        "churned": churned,
+        "churn_rate": [round(lost / start, 4) if start else None for lost, start in zip(churned, opening)],
+        "cohorts": cohorts,
+    }
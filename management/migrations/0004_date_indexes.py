@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("management", "0003_contract_first_lesson_on_contract_last_lesson_on_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="contract",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, help_text="Timestamp when the record was created"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="contract",
+            name="first_lesson_on",
+            field=models.DateField(blank=True, db_index=True, help_text="Date of the first lesson", null=True),
+        ),
+        migrations.AlterField(
+            model_name="contract",
+            name="last_lesson_on",
+            field=models.DateField(blank=True, db_index=True, help_text="Date of the last lesson", null=True),
+        ),
+        migrations.AlterField(
+            model_name="contract",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, help_text="Timestamp when the record was last updated"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="lesson",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, help_text="Timestamp when the record was created"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="lesson",
+            name="occurred_at",
+            field=models.DateTimeField(db_index=True, help_text="Date and time when the lesson took place"),
+        ),
+        migrations.AlterField(
+            model_name="lesson",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, help_text="Timestamp when the record was last updated"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="student",
+            name="birth_date",
+            field=models.DateField(db_index=True, help_text="Date of birth of the student"),
+        ),
+        migrations.AlterField(
+            model_name="student",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, help_text="Timestamp when the record was created"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="student",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, help_text="Timestamp when the record was last updated"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="studentsgroup",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, help_text="Timestamp when the record was created"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="studentsgroup",
+            name="scheduled_at",
+            field=models.DateTimeField(db_index=True, help_text="Scheduled date and time for the group lessons"),
+        ),
+        migrations.AlterField(
+            model_name="studentsgroup",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, help_text="Timestamp when the record was last updated"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="teacher",
+            name="created_at",
+            field=models.DateTimeField(
+                auto_now_add=True, db_index=True, help_text="Timestamp when the record was created"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="teacher",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, db_index=True, help_text="Timestamp when the record was last updated"
+            ),
+        ),
+    ]
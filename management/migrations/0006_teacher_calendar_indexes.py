@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("management", "0005_name_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="lesson",
+            index=models.Index(fields=["teacher", "occurred_at"], name="lessons_teacher_occurred_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="studentsgroup",
+            index=models.Index(fields=["teacher", "scheduled_at"], name="students_groups_teacher_idx"),
+        ),
+    ]
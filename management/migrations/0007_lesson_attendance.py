@@ -0,0 +1,114 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("management", "0006_teacher_calendar_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lesson",
+            name="absent_count",
+            field=models.PositiveIntegerField(
+                db_default=0, default=0, editable=False, help_text="Number of roster students absent from the lesson"
+            ),
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="attendance_roster",
+            field=models.JSONField(
+                blank=True,
+                editable=False,
+                help_text="Ids of the group's students when attendance was marked",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="attendance_taken_at",
+            field=models.DateTimeField(
+                blank=True, editable=False, help_text="Timestamp when attendance was last marked", null=True
+            ),
+        ),
+        migrations.CreateModel(
+            name="LessonAbsence",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, help_text="Timestamp when the absence was recorded"),
+                ),
+                (
+                    "lesson",
+                    models.ForeignKey(
+                        help_text="Lesson that was missed",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="absences",
+                        to="management.lesson",
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        help_text="Student who missed the lesson",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="absences",
+                        to="management.student",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Lesson Absence",
+                "verbose_name_plural": "Lesson Absences",
+                "db_table": "management_lesson_absences",
+                "indexes": [models.Index(fields=["student", "lesson"], name="lesson_absences_student_idx")],
+                "unique_together": {("lesson", "student")},
+            },
+        ),
+        migrations.CreateModel(
+            name="StudentAttendance",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "lessons",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Lessons with attendance marked while the student was on the roster"
+                    ),
+                ),
+                ("absences", models.PositiveIntegerField(default=0, help_text="Lessons the student missed")),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, help_text="Timestamp when the counters last changed"),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        help_text="Student the counters belong to",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attendance",
+                        to="management.student",
+                    ),
+                ),
+                (
+                    "students_group",
+                    models.ForeignKey(
+                        help_text="Group the counters belong to",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attendance",
+                        to="management.studentsgroup",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Student Attendance",
+                "verbose_name_plural": "Student Attendance",
+                "db_table": "management_student_attendance",
+                "unique_together": {("student", "students_group")},
+            },
+        ),
+    ]
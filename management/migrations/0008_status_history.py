@@ -0,0 +1,128 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from management.history import backfill_history
+
+
+def backfill_status_history(apps, schema_editor):
+    # Existing rows only have their current status; infer periods from their timestamps.
+    for owner, history, field in (
+        ("Student", "StudentStatusHistory", "student"),
+        ("Teacher", "TeacherStatusHistory", "teacher"),
+    ):
+        backfill_history(
+            apps.get_model("management", owner),
+            apps.get_model("management", history),
+            field,
+            "active",
+            using=schema_editor.connection.alias,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("management", "0007_lesson_attendance"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StudentStatusHistory",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("valid_from", models.DateTimeField(help_text="Start of the period (inclusive)")),
+                (
+                    "valid_to",
+                    models.DateTimeField(
+                        blank=True, help_text="End of the period (exclusive); empty for the current status", null=True
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("active", "Active"), ("former", "Former")],
+                        help_text="Status of the student during the period",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "student",
+                    models.ForeignKey(
+                        help_text="Student the period belongs to",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="status_history",
+                        to="management.student",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Student Status Period",
+                "verbose_name_plural": "Student Status History",
+                "db_table": "management_student_status_history",
+                "ordering": ["valid_from"],
+                "abstract": False,
+                "indexes": [
+                    models.Index(fields=["student", "valid_from"], name="student_status_student_idx"),
+                    models.Index(fields=["status", "valid_from", "valid_to"], name="student_status_as_of_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("valid_to__isnull", True)),
+                        fields=("student",),
+                        name="student_status_one_current",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="TeacherStatusHistory",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("valid_from", models.DateTimeField(help_text="Start of the period (inclusive)")),
+                (
+                    "valid_to",
+                    models.DateTimeField(
+                        blank=True, help_text="End of the period (exclusive); empty for the current status", null=True
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("active", "Active"), ("former", "Former")],
+                        help_text="Status of the teacher during the period",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "teacher",
+                    models.ForeignKey(
+                        help_text="Teacher the period belongs to",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="status_history",
+                        to="management.teacher",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Teacher Status Period",
+                "verbose_name_plural": "Teacher Status History",
+                "db_table": "management_teacher_status_history",
+                "ordering": ["valid_from"],
+                "abstract": False,
+                "indexes": [
+                    models.Index(fields=["teacher", "valid_from"], name="teacher_status_teacher_idx"),
+                    models.Index(fields=["status", "valid_from", "valid_to"], name="teacher_status_as_of_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("valid_to__isnull", True)),
+                        fields=("teacher",),
+                        name="teacher_status_one_current",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_status_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("common", "0003_change_sequence"),
+        ("management", "0008_status_history"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contract",
+            name="change_seq",
+            field=models.BigIntegerField(
+                db_default=0, db_index=True, editable=False, help_text="Change sequence number of the last write"
+            ),
+        ),
+        migrations.AddField(
+            model_name="lesson",
+            name="change_seq",
+            field=models.BigIntegerField(
+                db_default=0, db_index=True, editable=False, help_text="Change sequence number of the last write"
+            ),
+        ),
+        migrations.AddField(
+            model_name="student",
+            name="change_seq",
+            field=models.BigIntegerField(
+                db_default=0, db_index=True, editable=False, help_text="Change sequence number of the last write"
+            ),
+        ),
+        migrations.AddField(
+            model_name="studentsgroup",
+            name="change_seq",
+            field=models.BigIntegerField(
+                db_default=0, db_index=True, editable=False, help_text="Change sequence number of the last write"
+            ),
+        ),
+        migrations.AddField(
+            model_name="teacher",
+            name="change_seq",
+            field=models.BigIntegerField(
+                db_default=0, db_index=True, editable=False, help_text="Change sequence number of the last write"
+            ),
+        ),
+    ]
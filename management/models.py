@@ -2,9 +2,9 @@
 Management models for the NCC School Management system.
 """
 
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
-from common.models import BaseModel
+from common.models import AuditMixin, BaseModel
 from financial.models import PaymentMethod
 
 
@@ -24,16 +24,77 @@ class TeacherStatus(models.TextChoices):
     FORMER = "former", "Former"
 
 
-class Student(BaseModel):
+class StatusHistoryMixin:
+    """
+    Record changes of the model's ``status`` in its status history table.
+
+    The status loaded from the database is remembered, so saves that do not
+    change it cost no extra query. See ``management.history``.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save the instance and open a new status period if the status changed.
+        """
+        from .history import record_status
+
+        update_fields = kwargs.get("update_fields")
+        adding = self._state.adding
+        changed = adding or (
+            "status" in self.__dict__
+            and getattr(self, "_loaded_status", None) != self.status
+            and (update_fields is None or "status" in update_fields)
+        )
+        if not changed:
+            return super().save(*args, **kwargs)
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+            record_status(self, created=adding)
+        self._loaded_status = self.status
+
+
+class TeacherSnapshotMixin:
+    """
+    Remember the teacher loaded from the database.
+
+    Saves moving the instance to another teacher can then tell the previous
+    one without a query (see ``api.signals``).
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_teacher_id = instance.__dict__.get("teacher_id")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save the instance and remember the teacher it was saved with.
+        """
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "teacher" in update_fields or "teacher_id" in update_fields:
+            self._loaded_teacher_id = self.teacher_id
+
+
+class Student(AuditMixin, StatusHistoryMixin, BaseModel):
     """
     Student model representing enrolled students.
     """
     name = models.CharField(
         max_length=255,
-        help_text="Full name of the student"
+        help_text="Full name of the student",
+        db_index=True
     )
     birth_date = models.DateField(
-        help_text="Date of birth of the student"
+        help_text="Date of birth of the student",
+        db_index=True
     )
     extra_info = models.TextField(
         blank=True,
@@ -57,13 +118,14 @@ class Student(BaseModel):
         return self.name
 
 
-class Teacher(BaseModel):
+class Teacher(StatusHistoryMixin, BaseModel):
     """
     Teacher model representing school teachers.
     """
     name = models.CharField(
         max_length=255,
-        help_text="Full name of the teacher"
+        help_text="Full name of the teacher",
+        db_index=True
     )
     pix_key = models.CharField(
         max_length=255,
@@ -86,7 +148,7 @@ class Teacher(BaseModel):
         return self.name
 
 
-class Contract(BaseModel):
+class Contract(AuditMixin, BaseModel):
     """
     Contract model representing student enrollment in products.
     """
@@ -116,15 +178,20 @@ class Contract(BaseModel):
     )
     first_lesson_on = models.DateField(
         help_text="Date of the first lesson",
+        db_index=True,
         blank=True,
         null=True
     )
     last_lesson_on = models.DateField(
         help_text="Date of the last lesson",
+        db_index=True,
         blank=True,
         null=True
     )
 
+    # Relations read by __str__, joined by admin changelists that list this model.
+    str_related_fields = ("student", "product")
+
     class Meta:
         db_table = "management_contracts"
         verbose_name = "Contract"
@@ -135,13 +202,56 @@ class Contract(BaseModel):
     def __str__(self):
         return f"Contract: {self.student.name} - {self.product.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_deleted_at = instance.__dict__.get("deleted_at")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save the contract and post its charge (or correction) to the student's ledger.
+
+        Soft-deleting or restoring the contract of a converted lead also
+        updates the contracts counter of the funnel summary.
+        """
+        from crm.funnel import count_contract
+        from financial.ledger import sync_contracts
+
+        update_fields = kwargs.get("update_fields")
+        liveness_changed = (
+            not self._state.adding
+            and hasattr(self, "_loaded_deleted_at")
+            and "deleted_at" in self.__dict__
+            and (self._loaded_deleted_at is None) != (self.deleted_at is None)
+            and (update_fields is None or "deleted_at" in update_fields)
+        )
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            sync_contracts([self])
+            if liveness_changed:
+                count_contract(self, live=self.deleted_at is None)
+        self._loaded_deleted_at = self.__dict__.get("deleted_at")
 
-class StudentsGroup(BaseModel):
+    def hard_delete(self, using=None, keep_parents=False):
+        """
+        Permanently delete the contract, removing it from the funnel summary if it was live.
+        """
+        from crm.funnel import count_contract
+
+        with transaction.atomic(using=using):
+            if self.deleted_at is None:
+                count_contract(self, live=False)
+            return super().hard_delete(using=using, keep_parents=keep_parents)
+
+
+class StudentsGroup(TeacherSnapshotMixin, BaseModel):
     """
     Students group model representing classes with scheduled lessons.
     """
     scheduled_at = models.DateTimeField(
-        help_text="Scheduled date and time for the group lessons"
+        help_text="Scheduled date and time for the group lessons",
+        db_index=True
     )
     students = models.ManyToManyField(
         Student,
@@ -161,11 +271,17 @@ class StudentsGroup(BaseModel):
         help_text="Maximum number of students allowed in this group"
     )
 
+    # Relations read by __str__, joined by admin changelists that list this model.
+    str_related_fields = ("teacher",)
+
     class Meta:
         db_table = "management_students_groups"
         verbose_name = "Students Group"
         verbose_name_plural = "Students Groups"
         ordering = ["scheduled_at"]
+        indexes = [
+            models.Index(fields=["teacher", "scheduled_at"], name="students_groups_teacher_idx"),
+        ]
 
     def __str__(self):
         return f"Group with {self.teacher.name} at {self.scheduled_at}"
@@ -174,11 +290,15 @@ class StudentsGroup(BaseModel):
     def current_students_count(self):
         """
         Get the current number of students in the group.
+
+        Uses the prefetched students when available instead of a COUNT query.
         """
+        if "students" in getattr(self, "_prefetched_objects_cache", {}):
+            return sum(1 for student in self.students.all() if student.deleted_at is None)
         return self.students.filter(deleted_at__isnull=True).count()
 
 
-class Lesson(BaseModel):
+class Lesson(TeacherSnapshotMixin, BaseModel):
     """
     Lesson model representing individual class sessions.
     """
@@ -195,19 +315,236 @@ class Lesson(BaseModel):
         help_text="Teacher who conducted the lesson"
     )
     occurred_at = models.DateTimeField(
-        help_text="Date and time when the lesson took place"
+        help_text="Date and time when the lesson took place",
+        db_index=True
     )
     notes = models.TextField(
         blank=True,
         null=True,
         help_text="Notes about the lesson content or student performance"
     )
+    attendance_taken_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Timestamp when attendance was last marked"
+    )
+    attendance_roster = models.JSONField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Ids of the group's students when attendance was marked"
+    )
+    absent_count = models.PositiveIntegerField(
+        default=0,
+        db_default=0,
+        editable=False,
+        help_text="Number of roster students absent from the lesson"
+    )
+
+    # Relations read by __str__, joined by admin changelists that list this model.
+    str_related_fields = ("teacher",)
 
     class Meta:
         db_table = "management_lessons"
         verbose_name = "Lesson"
         verbose_name_plural = "Lessons"
         ordering = ["-occurred_at"]
+        indexes = [
+            models.Index(fields=["teacher", "occurred_at"], name="lessons_teacher_occurred_idx"),
+        ]
 
     def __str__(self):
         return f"Lesson with {self.teacher.name} at {self.occurred_at}"
+
+    @property
+    def present_count(self):
+        """
+        Number of roster students present, or None before attendance is marked.
+        """
+        if self.attendance_roster is None:
+            return None
+        return len(self.attendance_roster) - self.absent_count
+
+
+class LessonAbsence(models.Model):
+    """
+    A roster student who missed a lesson.
+
+    Only absences are stored; presence is the lesson's roster minus its
+    absences, which keeps attendance to a fraction of lesson x student rows.
+    """
+    lesson = models.ForeignKey(
+        Lesson,
+        on_delete=models.CASCADE,
+        related_name="absences",
+        help_text="Lesson that was missed"
+    )
+    student = models.ForeignKey(
+        Student,
+        on_delete=models.CASCADE,
+        related_name="absences",
+        help_text="Student who missed the lesson"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp when the absence was recorded"
+    )
+
+    class Meta:
+        db_table = "management_lesson_absences"
+        verbose_name = "Lesson Absence"
+        verbose_name_plural = "Lesson Absences"
+        unique_together = ["lesson", "student"]
+        indexes = [
+            models.Index(fields=["student", "lesson"], name="lesson_absences_student_idx"),
+        ]
+
+    def __str__(self):
+        return f"Absence of student {self.student_id} from lesson {self.lesson_id}"
+
+
+class StudentAttendance(models.Model):
+    """
+    Attendance counters of a student in a group.
+
+    Maintained by ``management.attendance.mark_attendance`` so attendance
+    rates are read from one indexed row per student and group instead of
+    aggregating lessons and absences.
+    """
+    student = models.ForeignKey(
+        Student,
+        on_delete=models.CASCADE,
+        related_name="attendance",
+        help_text="Student the counters belong to"
+    )
+    students_group = models.ForeignKey(
+        StudentsGroup,
+        on_delete=models.CASCADE,
+        related_name="attendance",
+        help_text="Group the counters belong to"
+    )
+    lessons = models.PositiveIntegerField(
+        default=0,
+        help_text="Lessons with attendance marked while the student was on the roster"
+    )
+    absences = models.PositiveIntegerField(
+        default=0,
+        help_text="Lessons the student missed"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Timestamp when the counters last changed"
+    )
+
+    class Meta:
+        db_table = "management_student_attendance"
+        verbose_name = "Student Attendance"
+        verbose_name_plural = "Student Attendance"
+        unique_together = ["student", "students_group"]
+
+    def __str__(self):
+        return f"Attendance of student {self.student_id} in group {self.students_group_id}"
+
+    @property
+    def attendance_rate(self):
+        """
+        Share of marked lessons attended, or None before any lesson is marked.
+        """
+        return (self.lessons - self.absences) / self.lessons if self.lessons else None
+
+
+class StatusPeriod(models.Model):
+    """
+    Abstract period during which a student or teacher had a status.
+
+    Periods of the same owner do not overlap; the current one has no
+    ``valid_to``.
+    """
+    valid_from = models.DateTimeField(
+        help_text="Start of the period (inclusive)"
+    )
+    valid_to = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="End of the period (exclusive); empty for the current status"
+    )
+
+    class Meta:
+        abstract = True
+        ordering = ["valid_from"]
+
+    @property
+    def is_current(self):
+        """
+        Whether this is the owner's current status.
+        """
+        return self.valid_to is None
+
+
+class StudentStatusHistory(StatusPeriod):
+    """
+    Status history of a student, written on every status change.
+    """
+    student = models.ForeignKey(
+        Student,
+        on_delete=models.CASCADE,
+        related_name="status_history",
+        help_text="Student the period belongs to"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=StudentsStatus.choices,
+        help_text="Status of the student during the period"
+    )
+
+    class Meta(StatusPeriod.Meta):
+        db_table = "management_student_status_history"
+        verbose_name = "Student Status Period"
+        verbose_name_plural = "Student Status History"
+        indexes = [
+            models.Index(fields=["student", "valid_from"], name="student_status_student_idx"),
+            models.Index(fields=["status", "valid_from", "valid_to"], name="student_status_as_of_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["student"], condition=models.Q(valid_to__isnull=True), name="student_status_one_current"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Student {self.student_id} {self.status} from {self.valid_from}"
+
+
+class TeacherStatusHistory(StatusPeriod):
+    """
+    Status history of a teacher, written on every status change.
+    """
+    teacher = models.ForeignKey(
+        Teacher,
+        on_delete=models.CASCADE,
+        related_name="status_history",
+        help_text="Teacher the period belongs to"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=TeacherStatus.choices,
+        help_text="Status of the teacher during the period"
+    )
+
+    class Meta(StatusPeriod.Meta):
+        db_table = "management_teacher_status_history"
+        verbose_name = "Teacher Status Period"
+        verbose_name_plural = "Teacher Status History"
+        indexes = [
+            models.Index(fields=["teacher", "valid_from"], name="teacher_status_teacher_idx"),
+            models.Index(fields=["status", "valid_from", "valid_to"], name="teacher_status_as_of_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["teacher"], condition=models.Q(valid_to__isnull=True), name="teacher_status_one_current"
+            ),
+        ]
+
+    def __str__(self):
+        return f"Teacher {self.teacher_id} {self.status} from {self.valid_from}"
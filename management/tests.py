@@ -2,13 +2,25 @@
 Tests for management models.
 """
 
+import csv
+import io
+
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.utils import timezone
-from datetime import date
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 
+from .attendance import AttendanceError, attendance_rates, mark_attendance, student_attendance
+from .history import backfill_status_history, parse_as_of, parse_months, status_counts, student_retention
+from .utilization import parse_period, utilization_report
 from .models import (
     Student, Teacher, Contract, StudentsGroup, Lesson,
-    StudentsStatus, TeacherStatus
+    StudentsStatus, TeacherStatus, LessonAbsence, StudentAttendance, StudentStatusHistory, TeacherStatusHistory
 )
 from comercial.models import Product
 
@@ -248,3 +260,381 @@ class LessonModelTest(TestCase):
         )
         expected_str = f"Lesson with {self.teacher.name} at {lesson.occurred_at}"
         self.assertEqual(str(lesson), expected_str)
+
+
+class LessonAdminTest(TestCase):
+    """
+    Test cases for the Lesson admin changelist.
+    """
+
+    def setUp(self):
+        """
+        Set up test data and an admin user.
+        """
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "adminpass123")
+        self.client.force_login(self.admin)
+
+    def create_lessons(self, count):
+        now = timezone.now()
+        for number in range(count):
+            teacher = Teacher.objects.create(name=f"Teacher {number}", pix_key=f"teacher{number}@example.com")
+            group = StudentsGroup.objects.create(scheduled_at=now, teacher=teacher)
+            Lesson.objects.create(students_group=group, teacher=teacher, occurred_at=now - timedelta(days=number))
+
+    def test_list_select_related_follows_str(self):
+        """
+        Test that list_select_related covers list_display and the relations their __str__ reads.
+        """
+        model_admin = site._registry[Lesson]
+        self.assertEqual(
+            model_admin.get_list_select_related(None), ["teacher", "students_group", "students_group__teacher"]
+        )
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """
+        Test that the changelist runs the same number of queries for 1 and 10 lessons.
+        """
+        url = reverse("admin:management_lesson_changelist")
+        self.create_lessons(1)
+        with CaptureQueriesContext(connection) as single:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.create_lessons(9)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["cl"].result_count, 10)
+        self.assertEqual(len(many.captured_queries), len(single.captured_queries))
+
+
+class AdminAutocompleteTest(TestCase):
+    """
+    Test cases for admin autocomplete widgets.
+    """
+
+    def setUp(self):
+        """
+        Set up test data and an admin user.
+        """
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "adminpass123")
+        self.client.force_login(self.admin)
+        self.teacher = Teacher.objects.create(name="Jane Smith", pix_key="jane@example.com")
+        self.students = [
+            Student.objects.create(name=f"Student {number}", birth_date=date(2000, 1, 1)) for number in range(5)
+        ]
+
+    def test_group_form_does_not_render_students(self):
+        """
+        Test that the StudentsGroup form loads students through autocomplete instead of rendering them.
+        """
+        response = self.client.get(reverse("admin:management_studentsgroup_add"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "Student 3")
+        self.assertContains(response, "admin-autocomplete")
+
+    def test_autocomplete_skips_deleted_students(self):
+        """
+        Test that student autocomplete matches names and excludes soft-deleted students.
+        """
+        self.students[0].delete()
+        response = self.client.get(reverse("admin:autocomplete"), {
+            "app_label": "management",
+            "model_name": "studentsgroup",
+            "field_name": "students",
+            "term": "student",
+        })
+        self.assertEqual(response.status_code, 200)
+        names = [result["text"] for result in response.json()["results"]]
+        self.assertEqual(names, [f"Student {number}" for number in range(1, 5)])
+
+    def test_group_autocomplete_joins_teacher(self):
+        """
+        Test that group autocomplete results do not query the teacher per row.
+        """
+        for _ in range(3):
+            StudentsGroup.objects.create(scheduled_at=timezone.now(), teacher=self.teacher)
+        params = {"app_label": "management", "model_name": "lesson", "field_name": "students_group", "term": "jane"}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("admin:autocomplete"), params)
+        self.assertEqual(len(response.json()["results"]), 3)
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'FROM "management_teachers"' in query["sql"]])
+
+
+class AdminExportTest(TestCase):
+    """
+    Test cases for the CSV export admin action.
+    """
+
+    def setUp(self):
+        """
+        Set up test data and an admin user.
+        """
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "adminpass123")
+        self.client.force_login(self.admin)
+        self.product = Product.objects.create(name="English", description="General English", price=100)
+        self.contracts = [
+            Contract.objects.create(
+                student=Student.objects.create(name=f"Student {number}", birth_date=date(2000, 1, 1)),
+                product=self.product,
+                statements=number,
+            )
+            for number in range(3)
+        ]
+
+    def export(self, pks):
+        response = self.client.post(reverse("admin:management_contract_changelist"), {
+            "action": "export_as_csv",
+            "_selected_action": pks,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response
+
+    def test_export_selected_contracts(self):
+        """
+        Test that the export streams the selected rows with related names.
+        """
+        response = self.export([contract.pk for contract in self.contracts[:2]])
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(len(rows), 2)
+        self.assertNotIn("deleted_at", rows[0])
+        self.assertEqual(
+            {(row["student__name"], row["product__name"], row["statements"]) for row in rows},
+            {("Student 0", "English", "0"), ("Student 1", "English", "1")},
+        )
+
+    def test_export_runs_one_query(self):
+        """
+        Test that exporting reads every row with a single query.
+        """
+        response = self.export([contract.pk for contract in self.contracts])
+        with CaptureQueriesContext(connection) as queries:
+            content = b"".join(response.streaming_content)
+        self.assertEqual(content.count(b"\n"), 4)
+        self.assertEqual(len(queries.captured_queries), 1)
+
+
+class AttendanceTest(TestCase):
+    """
+    Test cases for lesson attendance marking and counters.
+    """
+
+    def setUp(self):
+        """
+        Set up a group with three students and two lessons.
+        """
+        teacher = Teacher.objects.create(name="Jane Smith", pix_key="jane@example.com")
+        self.group = StudentsGroup.objects.create(scheduled_at=timezone.now(), teacher=teacher)
+        self.students = [
+            Student.objects.create(name=f"Student {number}", birth_date=date(2000, 1, 1)) for number in range(3)
+        ]
+        self.group.students.add(*self.students)
+        self.lessons = [
+            Lesson.objects.create(students_group=self.group, teacher=teacher, occurred_at=timezone.now())
+            for _ in range(2)
+        ]
+
+    def counters(self):
+        return dict(StudentAttendance.objects.values_list("student_id", "lessons").order_by()), dict(
+            StudentAttendance.objects.values_list("student_id", "absences").order_by()
+        )
+
+    def test_mark_attendance(self):
+        """
+        Test that marking stores the roster and absences and updates the counters.
+        """
+        first, second, third = (student.pk for student in self.students)
+        lesson = mark_attendance(self.lessons[0].pk, [first])
+        mark_attendance(self.lessons[1].pk, [first, second])
+
+        self.assertEqual((lesson.attendance_roster, lesson.absent_count, lesson.present_count),
+                         (sorted([first, second, third]), 1, 2))
+        self.assertEqual(LessonAbsence.objects.count(), 3)
+        self.assertEqual(self.counters(), ({first: 2, second: 2, third: 2}, {first: 2, second: 1, third: 0}))
+        self.assertEqual(student_attendance(second)["attendance_rate"], 0.5)
+        rates = list(attendance_rates(max_rate=0.5).values_list("student", flat=True))
+        self.assertEqual(rates, [first, second])
+
+    def test_remark_applies_only_the_difference(self):
+        """
+        Test that marking a lesson again with another roster adjusts the counters.
+        """
+        first, second, third = (student.pk for student in self.students)
+        mark_attendance(self.lessons[0].pk, [first, second])
+        self.group.students.remove(self.students[2])
+        newcomer = Student.objects.create(name="Newcomer", birth_date=date(2000, 1, 1))
+        self.group.students.add(newcomer)
+
+        mark_attendance(self.lessons[0].pk, [second])
+
+        self.assertEqual(
+            self.counters(),
+            ({first: 1, second: 1, third: 0, newcomer.pk: 1}, {first: 0, second: 1, third: 0, newcomer.pk: 0}),
+        )
+        self.assertEqual(list(LessonAbsence.objects.values_list("student_id", flat=True)), [second])
+
+    def test_absent_student_must_be_on_roster(self):
+        """
+        Test that absences of students outside the roster are rejected.
+        """
+        outsider = Student.objects.create(name="Outsider", birth_date=date(2000, 1, 1))
+        with self.assertRaisesMessage(AttendanceError, str(outsider.pk)):
+            mark_attendance(self.lessons[0].pk, [outsider.pk])
+        self.assertFalse(StudentAttendance.objects.exists())
+        self.assertIsNone(Lesson.objects.get(pk=self.lessons[0].pk).attendance_taken_at)
+
+
+class UtilizationTest(TestCase):
+    """
+    Test cases for the teacher utilization heatmaps.
+    """
+
+    START, END = date(2026, 1, 5), date(2026, 1, 12)
+
+    def setUp(self):
+        """
+        Set up a half-full group with three lessons and an idle teacher.
+        """
+        cache.clear()
+        self.teacher = Teacher.objects.create(name="Busy", pix_key="busy@example.com")
+        self.idle = Teacher.objects.create(name="Idle", pix_key="idle@example.com")
+        Teacher.objects.create(name="Former", pix_key="former@example.com", status=TeacherStatus.FORMER)
+        group = StudentsGroup.objects.create(scheduled_at=timezone.now(), teacher=self.teacher, max_students=4)
+        group.students.add(*[Student.objects.create(name=name, birth_date=date(2000, 1, 1)) for name in ("A", "B")])
+        for day, hour in ((5, 10), (5, 10), (7, 14), (12, 10)):
+            occurred_at = datetime(2026, 1, day, hour, tzinfo=dt_timezone.utc)
+            Lesson.objects.create(students_group=group, teacher=self.teacher, occurred_at=occurred_at)
+
+    def test_overall_heatmaps(self):
+        """
+        Test lesson counts and occupancy per weekday and hour, and the per-teacher ranking.
+        """
+        report = utilization_report(self.START, self.END)
+        self.assertEqual((report["lessons"], report["seats_taken"], report["seats_offered"]), (3, 6, 12))
+        self.assertEqual(report["heatmap"]["lessons"][0][10], 2)
+        self.assertEqual(report["heatmap"]["lessons"][2][14], 1)
+        self.assertEqual(report["heatmap"]["occupancy"][0][10], 0.5)
+        self.assertIsNone(report["heatmap"]["occupancy"][0][11])
+        self.assertEqual(report["peak"], {"weekday": "Mon", "hour": 10})
+        self.assertEqual([row["teacher"] for row in report["teachers"]], [self.idle.pk, self.teacher.pk])
+        self.assertEqual(report["teachers"][1]["occupancy"], 0.5)
+
+    def test_teacher_report_is_cached(self):
+        """
+        Test a single teacher's report and that the period is served from cache.
+        """
+        utilization_report(self.START, self.END)
+        with self.assertNumQueries(0):
+            report = utilization_report(self.START, self.END, self.teacher.pk)
+            idle = utilization_report(self.START, self.END, self.idle.pk)
+        self.assertEqual((report["lessons"], report["occupancy"]), (3, 0.5))
+        self.assertEqual((idle["lessons"], idle["occupancy"], idle["peak"]), (0, None, None))
+
+    def test_parse_period(self):
+        """
+        Test period defaults and validation.
+        """
+        start, end = parse_period()
+        self.assertEqual((end - start).days, 28)
+        self.assertEqual(parse_period("2026-01-05", "2026-01-12"), (self.START, self.END))
+        for period in (("2026-01-12", "2026-01-05"), ("soon", None), ("2024-01-01", "2026-01-01")):
+            with self.assertRaises(ValueError):
+                parse_period(*period)
+
+
+class StatusHistoryTest(TestCase):
+    """
+    Test cases for the status history and retention reports.
+    """
+
+    def moment(self, month, day):
+        """
+        Return an aware datetime in 2026.
+        """
+        return datetime(2026, month, day, 12, tzinfo=dt_timezone.utc)
+
+    def test_status_changes_open_periods(self):
+        """
+        Test that creating and changing a status writes periods and other saves do not.
+        """
+        student = Student.objects.create(name="Ana", birth_date=date(2000, 1, 1))
+        student = Student.objects.get(pk=student.pk)
+        with self.assertNumQueries(1):
+            student.name = "Ana Maria"
+            student.save()
+        student.status = StudentsStatus.FORMER
+        student.save()
+        periods = list(student.status_history.order_by("valid_from"))
+        self.assertEqual([period.status for period in periods], ["active", "former"])
+        self.assertEqual(periods[0].valid_to, periods[1].valid_from)
+        self.assertTrue(periods[1].is_current)
+
+        teacher = Teacher.objects.create(name="Jane", pix_key="jane@example.com")
+        teacher.status = TeacherStatus.FORMER
+        teacher.save()
+        self.assertEqual(TeacherStatusHistory.objects.filter(teacher=teacher).count(), 2)
+
+    def test_status_counts_as_of(self):
+        """
+        Test point-in-time counts, leaving out students deleted by then.
+        """
+        ana = Student.objects.create(name="Ana", birth_date=date(2000, 1, 1))
+        bia = Student.objects.create(name="Bia", birth_date=date(2000, 1, 1))
+        StudentStatusHistory.objects.all().delete()
+        StudentStatusHistory.objects.bulk_create([
+            StudentStatusHistory(student=ana, status="active", valid_from=self.moment(1, 1),
+                                 valid_to=self.moment(3, 1)),
+            StudentStatusHistory(student=ana, status="former", valid_from=self.moment(3, 1)),
+            StudentStatusHistory(student=bia, status="active", valid_from=self.moment(2, 1)),
+        ])
+        self.assertEqual(status_counts(Student, self.moment(1, 15)), {"active": 1, "former": 0})
+        self.assertEqual(status_counts(Student, parse_as_of("2026-03-01")), {"active": 1, "former": 1})
+        Student.objects.filter(pk=bia.pk).update(deleted_at=self.moment(4, 1))
+        self.assertEqual(status_counts(Student, self.moment(5, 1)), {"active": 0, "former": 1})
+        self.assertEqual(status_counts(Student, self.moment(3, 15))["active"], 1)
+
+    def test_backfill_from_timestamps(self):
+        """
+        Test that rows loaded without save() get periods inferred from their timestamps, once.
+        """
+        created, updated = self.moment(1, 1), self.moment(2, 1)
+        Student.objects.bulk_create([
+            Student(name="Ana", birth_date=date(2000, 1, 1)),
+            Student(name="Bia", birth_date=date(2000, 1, 1), status=StudentsStatus.FORMER),
+        ])
+        Student.objects.update(created_at=created, updated_at=updated)
+        self.assertEqual(backfill_status_history(), 3)
+        self.assertEqual(backfill_status_history(), 0)
+        bia = StudentStatusHistory.objects.filter(student__name="Bia").order_by("valid_from")
+        self.assertEqual(
+            [(period.status, period.valid_from, period.valid_to) for period in bia],
+            [("active", created, updated), ("former", updated, None)]
+        )
+
+    def test_retention_cohorts_and_churn(self):
+        """
+        Test monthly active counts, churn rates and cohort retention.
+        """
+        ana, bia, caio = [Student.objects.create(name=name, birth_date=date(2000, 1, 1)) for name in "ABC"]
+        StudentStatusHistory.objects.all().delete()
+        StudentStatusHistory.objects.bulk_create([
+            StudentStatusHistory(student=ana, status="active", valid_from=self.moment(1, 10),
+                                 valid_to=self.moment(2, 15)),
+            StudentStatusHistory(student=ana, status="former", valid_from=self.moment(2, 15)),
+            StudentStatusHistory(student=bia, status="active", valid_from=self.moment(1, 10)),
+            StudentStatusHistory(student=caio, status="active", valid_from=self.moment(2, 3)),
+        ])
+        with self.assertNumQueries(2):
+            report = student_retention(*parse_months("2026-01", "2026-03"))
+        self.assertEqual(report["months"], ["2026-01", "2026-02", "2026-03"])
+        self.assertEqual(report["active"], [2, 2, 2])
+        self.assertEqual(report["churned"], [0, 1, 0])
+        self.assertEqual(report["churn_rate"], [None, 0.5, 0.0])
+        self.assertEqual(report["cohorts"], [
+            {"cohort": "2026-01", "size": 2, "retention": [1.0, 0.5, 0.5]},
+            {"cohort": "2026-02", "size": 1, "retention": [1.0, 1.0]},
+        ])
+        for months in (("2026-03", "2026-01"), ("2024-01", "2026-03"), ("March", None)):
+            with self.assertRaises(ValueError):
+                parse_months(*months)
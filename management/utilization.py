@@ -0,0 +1,178 @@
+"""
+Teacher utilization analytics for the NCC School Management system.
+
+Lessons in a period are counted with one grouped query by teacher, group,
+local weekday and hour; the roster size and capacity (``max_students``) of
+the groups involved come from a second, much smaller query. NumPy then bins
+the rows into teacher x weekday x hour arrays of lessons, seats taken
+(roster size per lesson) and seats offered (``max_students`` per lesson),
+from which heatmaps and occupancy rates are derived. The arrays are cached
+per period, so dashboards polling the same period never reach the database.
+"""
+
+from datetime import datetime, time as dt_time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Lesson, StudentsGroup, Teacher, TeacherStatus
+
+CACHE_KEY_PREFIX = "utilization:"
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+SLOTS = len(WEEKDAYS) * 24
+
+
+def _utilization_setting(name, default):
+    return getattr(settings, "UTILIZATION", {}).get(name, default)
+
+
+def parse_period(start=None, end=None):
+    """
+    Return the (start, end) dates requested; end is exclusive.
+
+    Defaults to the DEFAULT_DAYS days up to and including today. Raises
+    ValueError for invalid dates or periods longer than MAX_DAYS.
+    """
+    days = {}
+    for name, value in (("start", start), ("end", end)):
+        if value:
+            days[name] = parse_date(value)
+            if days[name] is None:
+                raise ValueError(f"'{name}' must be a date in YYYY-MM-DD format")
+    end = days.get("end") or timezone.localdate() + timedelta(days=1)
+    start = days.get("start") or end - timedelta(days=_utilization_setting("DEFAULT_DAYS", 28))
+    if end <= start:
+        raise ValueError("'end' must be after 'start'")
+    max_days = _utilization_setting("MAX_DAYS", 366)
+    if (end - start).days > max_days:
+        raise ValueError(f"The period cannot be longer than {max_days} days")
+    return start, end
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+def _columns(rows, width):
+    return [np.array(column, dtype=np.int64) for column in (list(zip(*rows)) or [()] * width)]
+
+
+def compute_utilization(start, end):
+    """
+    Bin the lessons that occurred from start to end (dates, end exclusive).
+
+    Returns a dict with teachers (teacher ids, int64), their names and the
+    lessons, taken and offered arrays of shape (teachers, 7, 24). Active
+    teachers without lessons in the period are included with zeros.
+    """
+    lessons = Lesson.objects.filter(occurred_at__gte=_midnight(start), occurred_at__lt=_midnight(end))
+    rows = list(
+        lessons.order_by()
+        .annotate(weekday=ExtractIsoWeekDay("occurred_at"), hour=ExtractHour("occurred_at"))
+        .values_list("teacher_id", "students_group_id", "weekday", "hour")
+        .annotate(total=Count("id"))
+    )
+    groups = (
+        StudentsGroup.objects.all_with_deleted()
+        .filter(pk__in=lessons.values("students_group_id"))
+        .annotate(roster=Count("students", filter=Q(students__deleted_at__isnull=True)))
+        .order_by("pk")
+        .values_list("pk", "roster", "max_students")
+    )
+    group_ids, rosters, capacities = _columns(groups, 3)
+    teacher_ids, group_of, weekday, hour, total = _columns(rows, 5)
+    active = np.fromiter(Teacher.objects.filter(status=TeacherStatus.ACTIVE).values_list("pk", flat=True), np.int64)
+    teachers, teacher_index = np.unique(np.concatenate([teacher_ids, active]), return_inverse=True)
+    slot = teacher_index[:len(teacher_ids)] * SLOTS + (weekday - 1) * 24 + hour
+    group_index = np.searchsorted(group_ids, group_of)
+    shape = (len(teachers), len(WEEKDAYS), 24)
+
+    def binned(weights):
+        return np.bincount(slot, weights=weights, minlength=len(teachers) * SLOTS).reshape(shape)
+
+    names = Teacher.objects.all_with_deleted().filter(pk__in=teachers.tolist()).values_list("pk", "name")
+    return {
+        "teachers": teachers,
+        "names": dict(names),
+        "lessons": binned(total),
+        "taken": binned(total * rosters[group_index]),
+        "offered": binned(total * capacities[group_index]),
+    }
+
+
+def get_utilization(start, end):
+    """
+    Return compute_utilization(start, end), cached per period.
+
+    Periods that already ended are cached for PAST_CACHE_TTL, others for
+    CACHE_TTL.
+    """
+    key = f"{CACHE_KEY_PREFIX}{start.isoformat()}:{end.isoformat()}"
+    utilization = cache.get(key)
+    if utilization is None:
+        utilization = compute_utilization(start, end)
+        ended = end <= timezone.localdate()
+        ttl = _utilization_setting("PAST_CACHE_TTL", 86400) if ended else _utilization_setting("CACHE_TTL", 900)
+        cache.set(key, utilization, ttl)
+    return utilization
+
+
+def _occupancy(taken, offered):
+    """
+    Return taken / offered rounded to 4 places, None where nothing was offered.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = np.round(taken / offered, 4)
+    if np.ndim(rates) == 0:
+        return float(rates) if offered else None
+    return [[float(rate) if seats else None for rate, seats in zip(row, row_offered)]
+            for row, row_offered in zip(rates, offered)]
+
+
+def _summary(lessons, taken, offered):
+    peak = np.unravel_index(np.argmax(lessons), lessons.shape) if lessons.any() else None
+    return {
+        "lessons": int(lessons.sum()),
+        "seats_taken": int(taken.sum()),
+        "seats_offered": int(offered.sum()),
+        "occupancy": _occupancy(taken.sum(), offered.sum()),
+        "peak": {"weekday": WEEKDAYS[peak[0]], "hour": int(peak[1])} if peak else None,
+    }
+
+
+def utilization_report(start, end, teacher_id=None):
+    """
+    Return the utilization report of a period, overall or for one teacher.
+
+    The report has the weekday x hour heatmaps of lessons and occupancy and,
+    overall, a summary per teacher ordered from the least occupied.
+    """
+    utilization = get_utilization(start, end)
+    lessons, taken, offered = utilization["lessons"], utilization["taken"], utilization["offered"]
+    report = {"start": start, "end": end, "weekdays": list(WEEKDAYS), "hours": list(range(24))}
+    if teacher_id is not None:
+        index = np.searchsorted(utilization["teachers"], teacher_id)
+        if index < len(utilization["teachers"]) and utilization["teachers"][index] == teacher_id:
+            lessons, taken, offered = lessons[index], taken[index], offered[index]
+        else:
+            lessons = taken = offered = np.zeros(lessons.shape[1:])
+        report["teacher"] = teacher_id
+    else:
+        teachers = [
+            {"teacher": int(pk), "name": utilization["names"].get(int(pk)), **_summary(*arrays)}
+            for pk, *arrays in zip(utilization["teachers"], lessons, taken, offered)
+        ]
+        teachers.sort(key=lambda row: (row["occupancy"] is not None, row["occupancy"] or 0, row["teacher"]))
+        report["teachers"] = teachers
+        lessons, taken, offered = lessons.sum(axis=0), taken.sum(axis=0), offered.sum(axis=0)
+    report.update(_summary(lessons, taken, offered))
+    report["heatmap"] = {
+        "lessons": lessons.astype(np.int64).tolist(),
+        "occupancy": _occupancy(taken, offered),
+    }
+    return report
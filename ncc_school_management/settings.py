@@ -58,14 +58,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "common.middleware.MetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "common.middleware.PerformanceMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "common.middleware.AuditMiddleware",
 ]
 
 ROOT_URLCONF = "ncc_school_management.urls"
@@ -103,6 +106,41 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Token versions, the versions of cached calendars, forecasts and student
+# overviews, and shared throttle buckets live here, so every worker should see
+# the same cache: Redis when REDIS_URL is set (docker-compose runs one), or
+# Memcached when MEMCACHED_LOCATION is set (requires ``pymemcache``). Without
+# either, each worker keeps its own in-memory cache and versions expire after
+# a short timeout instead (see common.cache.CacheVersions). The common.cache
+# backends wrap Django's to count hits and misses for /metrics, by ALIAS.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "common.cache.StatsRedisCache",
+            "ALIAS": "default",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+elif os.getenv("MEMCACHED_LOCATION"):
+    CACHES = {
+        "default": {
+            "BACKEND": "common.cache.StatsPyMemcacheCache",
+            "ALIAS": "default",
+            "LOCATION": os.getenv("MEMCACHED_LOCATION"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "common.cache.StatsLocMemCache",
+            "ALIAS": "default",
+            "OPTIONS": {"MAX_ENTRIES": 100000},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -147,13 +185,41 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Django REST Framework
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.StatelessJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.InstrumentedJSONRenderer",
+        "api.renderers.InstrumentedBrowsableAPIRenderer",
+    ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
+    "DEFAULT_THROTTLE_CLASSES": [
+        "api.throttling.UserRateThrottle",
+        "api.throttling.IPRateThrottle",
+        "api.throttling.EndpointRateThrottle",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "user": os.getenv("THROTTLE_USER_RATE", "1200/min"),
+        "ip": os.getenv("THROTTLE_IP_RATE", "300/min"),
+        "endpoint": None,
+        "login": os.getenv("THROTTLE_LOGIN_RATE", "10/min"),
+        "login_username": os.getenv("THROTTLE_LOGIN_USERNAME_RATE", "5/min"),
+    },
+    # Number of reverse proxies in front of the app, used to read the client IP
+    # from X-Forwarded-For. Only set it when every request goes through the
+    # proxies (1 behind the bundled nginx), or clients can spoof their IP.
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", "0")),
+}
+
+# Token bucket throttling (api.throttling)
+THROTTLING = {
+    # "local" keeps buckets in each worker; "cache" shares them through CACHES.
+    "BACKEND": os.getenv("THROTTLE_BACKEND", "local"),
+    # Upper bound on buckets kept per worker.
+    "MAX_KEYS": 100000,
 }
 
 # JWT Settings
@@ -184,6 +250,185 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 }
 
+# Stateless JWT authentication (api.authentication.StatelessJWTAuthentication)
+STATELESS_JWT = {
+    # Seconds a worker trusts its local copy of a user's token version.
+    # Revocations take effect across workers within this window (twice it
+    # when CACHES is per-process, see common.cache.shared_timeout).
+    "VERSION_CACHE_TTL": int(os.getenv("JWT_VERSION_CACHE_TTL", "5")),
+    # Seconds a full user loaded from the database is reused by the same worker.
+    "USER_CACHE_TTL": int(os.getenv("JWT_USER_CACHE_TTL", "60")),
+}
+
+# Refresh token blacklist (api.blacklist)
+TOKEN_BLACKLIST = {
+    # Seconds between pulls of JTIs revoked by other workers.
+    "SYNC_INTERVAL": 2,
+    # Seconds each pull reaches back, for revocations that commit late.
+    "SYNC_LAG": 60,
+    # Seconds between full rebuilds of the Bloom filter (drops expired JTIs).
+    "REBUILD_INTERVAL": 3600,
+    "BLOOM_CAPACITY": 100000,
+    "BLOOM_ERROR_RATE": 0.001,
+}
+
+# Per-request performance instrumentation (common.middleware.PerformanceMiddleware)
+PERFORMANCE_INSTRUMENTATION = {
+    # Fraction of requests measured; unsampled requests skip instrumentation.
+    "SAMPLE_RATE": float(os.getenv("PERF_SAMPLE_RATE", "1.0" if DEBUG else "0.01")),
+    # Add a Server-Timing header to sampled responses for every client; when
+    # off (the default without DEBUG), only staff users get it.
+    "SERVER_TIMING": os.getenv("PERF_SERVER_TIMING", "1" if DEBUG else "0") == "1",
+    # Flag SQL executed at least this many times in one request (N+1 patterns).
+    "DUPLICATE_QUERY_THRESHOLD": 3,
+}
+
+# Prometheus metrics (common.metrics), exposed at /metrics
+METRICS = {
+    # Directory shared by all workers on a host; each worker writes its own
+    # snapshot there so /metrics reports totals across workers. Clear it on
+    # deploy. Leave unset to report the answering worker only.
+    "DIRECTORY": os.getenv("METRICS_DIR") or None,
+    # Minimum seconds between snapshot writes of one worker.
+    "FLUSH_INTERVAL": 1.0,
+    # Bearer token required to scrape /metrics. Without one, only staff
+    # users logged in to the admin can read the metrics.
+    "TOKEN": os.getenv("METRICS_TOKEN") or None,
+}
+
+# Admin changelists (ncc_school_management.admin.BaseModelAdmin)
+ADMIN_CHANGELIST = {
+    # Above this many rows (pg_class.reltuples), changelists on PostgreSQL
+    # show the planner's row estimate instead of running an exact COUNT(*).
+    "ESTIMATED_COUNT_THRESHOLD": 100000,
+}
+
+# Incremental sync of list endpoints with ?changed_since= (api.sync)
+SYNC = {
+    # Changes returned per call by default and at most (?limit=).
+    "DEFAULT_LIMIT": 500,
+    "MAX_LIMIT": 1000,
+    # Seconds a change must be old before cursors move past it. On PostgreSQL
+    # cursors also wait for every running transaction, so this only covers
+    # the moment between drawing a number and the writer getting its xid.
+    "SAFETY_LAG": 30,
+}
+
+# Teacher calendars and ICS feeds (api.calendars)
+TEACHER_CALENDAR = {
+    # Seconds a built calendar stays cached; saves invalidate it earlier.
+    "CACHE_TTL": 300,
+    # Longest range served by /api/teachers/{id}/calendar/.
+    "MAX_DAYS": 92,
+    # Days before and after the current week covered by ICS feeds.
+    "FEED_PAST_DAYS": 30,
+    "FEED_FUTURE_DAYS": 90,
+    # Duration of a lesson in calendar events.
+    "LESSON_MINUTES": 60,
+}
+
+# Student overview endpoint (api.overview)
+STUDENT_OVERVIEW = {
+    # Seconds an overview stays cached (0 disables the cache); writes to the
+    # student's contracts, groups, lessons and payments invalidate it earlier.
+    "CACHE_TTL": 60,
+    # Latest lessons listed.
+    "RECENT_LESSONS": 10,
+}
+
+# Teacher utilization analytics (management.utilization)
+UTILIZATION = {
+    # Seconds the figures of a period that includes today stay cached.
+    "CACHE_TTL": 900,
+    # Seconds the figures of a period that already ended stay cached.
+    "PAST_CACHE_TTL": 86400,
+    # Default and longest period served by /api/teachers/utilization/.
+    "DEFAULT_DAYS": 28,
+    "MAX_DAYS": 366,
+}
+
+# Revenue forecasts (financial.forecasting)
+REVENUE_FORECAST = {
+    # Seconds a projection stays cached; contract, payment and product saves invalidate it earlier.
+    "CACHE_TTL": 3600,
+    # Longest horizon served by /api/forecasts/revenue/.
+    "MAX_MONTHS": 24,
+    # Monthly churn rate of each scenario returned by default.
+    "CHURN_SCENARIOS": {"base": 0.0, "moderate": 0.02, "high": 0.05},
+    # Share of installments expected to be collected per payment method (1.0 when missing).
+    "COLLECTION_RATES": {},
+    # Days between lessons, used to estimate the end of contracts without last_lesson_on.
+    "LESSON_INTERVAL_DAYS": 7,
+}
+
+# Audit log of student, contract and payment changes (common.audit)
+AUDIT_LOG = {
+    "ENABLED": True,
+    # "database" writes entries with one bulk INSERT per request; "file"
+    # appends JSON lines to FILE, loaded later with the load_audit_log command.
+    "SINK": os.getenv("AUDIT_SINK", "database"),
+    "FILE": os.getenv("AUDIT_FILE", str(BASE_DIR / "audit.jsonl")),
+    # Entries buffered by a request or job before they are written early.
+    "MAX_BUFFER": 500,
+    # Longer text values are truncated in the stored diffs.
+    "MAX_VALUE_LENGTH": 1000,
+}
+
+# CSV uploads to /api/imports/{target}/ (api.imports), imported by the import_csv job
+CSV_IMPORT = {
+    # Directory shared by the web and worker processes where uploads wait for their job.
+    "UPLOAD_DIR": os.getenv("IMPORT_UPLOAD_DIR", str(BASE_DIR / "imports")),
+    # Days the rejected rows of finished imports stay downloadable (prune_imports).
+    "REJECTS_RETENTION_DAYS": 7,
+}
+
+# Background jobs (common.jobs), run by the run_worker command
+JOBS = {
+    # Task names accepted by POST /api/jobs/ and the functions that run them.
+    "TASKS": {
+        "detect_delinquency": "financial.tasks.detect_delinquency_task",
+        "rebuild_ledger": "financial.tasks.rebuild_ledger_task",
+        "import_csv": "api.tasks.import_csv_task",
+    },
+    # Jobs each worker runs at the same time, one process each.
+    "CONCURRENCY": int(os.getenv("JOBS_CONCURRENCY", "4")),
+    # Seconds between polls of an empty queue.
+    "POLL_INTERVAL": 1.0,
+    "DEFAULT_TIMEOUT": 600,
+    "MAX_ATTEMPTS": 3,
+    # Seconds before the first retry of a failed job, doubled after every attempt.
+    "RETRY_DELAY": 30,
+    # Seconds past a job's timeout before another worker may take it over.
+    "LOCK_GRACE": 60,
+    "STALE_CHECK_INTERVAL": 30,
+    # Minimum seconds between progress writes of a job.
+    "PROGRESS_INTERVAL": 1.0,
+    # Jobs run by a pool process before it is replaced (bounds memory leaks).
+    "MAX_TASKS_PER_CHILD": 1000,
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+        },
+    },
+    "loggers": {
+        "ncc.performance": {
+            "handlers": ["console"],
+            "level": os.getenv("PERF_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+        "ncc.jobs": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "").split(",") if os.getenv("CORS_ALLOWED_ORIGINS") else [
     "http://localhost:3000",
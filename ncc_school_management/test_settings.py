@@ -24,6 +24,14 @@ class DisableMigrations:
 
 MIGRATION_MODULES = DisableMigrations()
 
+# Tests run in one process, and query count assertions expect cache hits to be free
+CACHES = {
+    "default": {
+        "BACKEND": "common.cache.StatsLocMemCache",
+        "ALIAS": "default",
+    }
+}
+
 # Speed up password hashing for tests
 PASSWORD_HASHERS = [
     "django.contrib.auth.hashers.MD5PasswordHasher",